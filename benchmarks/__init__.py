@@ -0,0 +1 @@
+# Offline benchmarks of ZipNN on synthetic tensors
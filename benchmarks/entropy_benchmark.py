@@ -0,0 +1,147 @@
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import torch
+import zstandard as zstd
+import split_dtype
+from benchmarks.generators import FLOAT_GENERATORS, generate
+from benchmarks.run_benchmark import KB, MB, parse_size, make_report
+
+# The bit and byte reorder of ZipNN for every dtype, and its byte groups from the most significant one
+DTYPES = {
+    "bfloat16": (1, 10, ("exponent", "mantissa")),
+    "float16": (0, 10, ("exponent", "mantissa")),
+    "float32": (1, 220, ("exponent", "mantissa_high", "mantissa_mid", "mantissa_low")),
+}
+
+
+def make_codecs():
+    """
+    Returns the entropy coders to compare, each one is (compress, decompress(data, size)).
+    Like method AUTO, a chunk that isn't compressible is None.
+    """
+    zstd_compressor = zstd.ZstdCompressor(level=3)
+    zstd_decompressor = zstd.ZstdDecompressor()
+    codecs = {
+        "huffman": (split_dtype.huffman_compress, split_dtype.huffman_decompress),
+        "fse": (split_dtype.fse_compress, split_dtype.fse_decompress),
+        "zstd": (zstd_compressor.compress, lambda data, size: zstd_decompressor.decompress(data)),
+    }
+    try:
+        import lz4.frame
+
+        codecs["lz4"] = (lz4.frame.compress, lambda data, size: lz4.frame.decompress(data))
+    except ImportError:
+        pass
+    return codecs
+
+
+def split_groups(tensor, dtype):
+    """
+    Splits a tensor to its byte groups, the way ZipNN does before the compression.
+    """
+    bit_reorder, byte_reorder, names = DTYPES[dtype]
+    data = bytearray(tensor.view(torch.uint8).numpy().tobytes())
+    if dtype == "float32":
+        groups = split_dtype.split_dtype32(data, bit_reorder, byte_reorder, 0, 1)
+    else:
+        groups = split_dtype.split_groups16(data, bit_reorder, byte_reorder, 1)
+    # The groups are from the least significant byte
+    return dict(zip(names, reversed([bytes(group) for group in groups])))
+
+
+def run_group(group, chunk_size, codec, repeat):
+    """
+    Compresses and decompresses a byte group chunk by chunk on one thread, like method AUTO does.
+
+    Returns
+    -------------------------------------
+    The compression ratio (a chunk that isn't compressible is stored as is), and GB/s of compression and decompression
+    (of the size of the group, the best of the repetitions).
+    """
+    compress, decompress = codec
+    chunks = [group[offset : offset + chunk_size] for offset in range(0, len(group), chunk_size)]
+    compress_time = decompress_time = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        compressed = [compress(chunk) for chunk in chunks]
+        compress_time = min(compress_time, time.perf_counter() - start)
+        start = time.perf_counter()
+        for chunk, comp in zip(chunks, compressed):
+            if comp is not None and len(comp) < len(chunk) and decompress(comp, len(chunk)) != chunk:
+                raise RuntimeError("The decompressed chunk is different from the original")
+        decompress_time = min(decompress_time, time.perf_counter() - start)
+    compressed_bytes = sum(len(chunk) if comp is None else min(len(comp), len(chunk)) for chunk, comp in zip(chunks, compressed))
+    return compressed_bytes / len(group), len(group) / compress_time / 1e9, len(group) / decompress_time / 1e9
+
+
+def run_sweep(dtypes, generators, size, compression_chunk, repeat=3, seed=0, log=None):
+    """
+    Compares the entropy coders on every byte group of every generator.
+
+    Returns
+    -------------------------------------
+    A list with the result of every dtype, generator, byte group and codec.
+    """
+    codecs = make_codecs()
+    results = []
+    for dtype in dtypes:
+        for generator in generators:
+            groups = split_groups(generate(generator, dtype, size, seed), dtype)
+            # The chunks of every byte group are compression_chunk / the number of groups, like in ZipNN
+            chunk_size = compression_chunk // len(groups)
+            for group_name, group in groups.items():
+                for codec_name, codec in codecs.items():
+                    if codec_name == "huffman" and chunk_size > split_dtype.HUFFMAN_MAX_CHUNK:
+                        continue
+                    ratio, compress_gbps, decompress_gbps = run_group(group, chunk_size, codec, repeat)
+                    result = dict(
+                        dtype=dtype,
+                        generator=generator,
+                        group=group_name,
+                        codec=codec_name,
+                        name=f"{dtype}/{generator}/{group_name}/{codec_name}",
+                        ratio=ratio,
+                        compress_gbps=compress_gbps,
+                        decompress_gbps=decompress_gbps,
+                    )
+                    results.append(result)
+                    if log is not None:
+                        log(
+                            f"{result['name']:<60} ratio {ratio:.4f}  compress {compress_gbps:.2f} GB/s"
+                            f"  decompress {decompress_gbps:.2f} GB/s"
+                        )
+    return results
+
+
+if __name__ == "__main__":
+
+    def parse_list(value):
+        return [item for item in value.split(",") if item]
+
+    parser = argparse.ArgumentParser(description="Compare the entropy coders on the byte groups of synthetic tensors, offline.")
+    parser.add_argument(
+        "--dtypes", type=parse_list, default=list(DTYPES), help="Comma separated dtypes (default: bfloat16,float16,float32)."
+    )
+    parser.add_argument(
+        "--generators", type=parse_list, default=list(FLOAT_GENERATORS), help="Comma separated generators (default: all of them)."
+    )
+    parser.add_argument("--size", type=parse_size, default=16 * MB, help="The size of every tensor (default: 16MB).")
+    parser.add_argument(
+        "--compression_chunk", type=parse_size, default=256 * KB, help="The compression_chunk of ZipNN (default: 256KB)."
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Repetitions of every case, the best time is reported (default: 3).")
+    parser.add_argument("--seed", type=int, default=0, help="The seed of the generators (default: 0).")
+    parser.add_argument("--output", help="Path of the JSON report.")
+    args = parser.parse_args()
+
+    results = run_sweep(args.dtypes, args.generators, args.size, args.compression_chunk, args.repeat, args.seed, log=print)
+    if args.output:
+        with open(args.output, "w") as out_file:
+            json.dump(make_report(results, vars(args)), out_file, indent=2)
+        print(f"The report is in {args.output}")
@@ -0,0 +1,126 @@
+# Synthetic tensors for the ZipNN benchmarks, shaped like the data of real checkpoints
+import numpy as np
+import torch
+
+FLOAT_DTYPES = {
+    "bfloat16": torch.bfloat16,
+    "float16": torch.float16,
+    "float32": torch.float32,
+    "float8_e4m3fn": torch.float8_e4m3fn,
+    "float8_e5m2": torch.float8_e5m2,
+}
+
+
+def gaussian_weights(num_elements, generator):
+    """
+    Weights of a trained layer, normally distributed around zero with a std of 0.02.
+    """
+    return torch.randn(num_elements, generator=generator) * 0.02
+
+
+def adam_exp_avg(num_elements, generator):
+    """
+    The first moment of Adam, small gradients averaged over the steps - mostly tiny values and a few large ones.
+    """
+    scale = torch.exp(torch.randn(num_elements, generator=generator) * 1.5 - 9)
+    return torch.randn(num_elements, generator=generator) * scale
+
+
+def adam_exp_avg_sq(num_elements, generator):
+    """
+    The second moment of Adam, positive values spread over many orders of magnitude (log-normal).
+    """
+    return torch.exp(torch.randn(num_elements, generator=generator) * 2 - 18)
+
+
+def pruned_weights(num_elements, generator, sparsity=0.9):
+    """
+    Gaussian weights after unstructured magnitude pruning, the smallest sparsity of them are zeros.
+    """
+    weights = gaussian_weights(num_elements, generator)
+    threshold = torch.quantile(weights[: min(num_elements, 1 << 20)].abs().float(), sparsity)
+    return torch.where(weights.abs() < threshold, torch.zeros_like(weights), weights)
+
+
+def block_pruned_weights(num_elements, generator, sparsity=0.8, block=64):
+    """
+    Gaussian weights after structured pruning, whole blocks of block elements are zeros.
+    """
+    weights = gaussian_weights(num_elements, generator)
+    num_blocks = (num_elements + block - 1) // block
+    keep = torch.rand(num_blocks, generator=generator) >= sparsity
+    return weights * keep.repeat_interleave(block)[:num_elements]
+
+
+def quantized_int8(num_elements, generator):
+    """
+    int8 quantized weights (GPTQ/AWQ like) stored as uint32, a bell shaped histogram around 128.
+    """
+    values = torch.randn(num_elements, generator=generator) * 24 + 128
+    return values.round().clamp(0, 255).to(torch.int64).numpy().astype(np.uint32)
+
+
+def quantized_int16(num_elements, generator):
+    """
+    16 bit quantized values stored as uint32, so the high bytes are zeros.
+    """
+    values = torch.randn(num_elements, generator=generator) * 4096 + 32768
+    return values.round().clamp(0, 65535).to(torch.int64).numpy().astype(np.uint32)
+
+
+def token_ids(num_elements, generator, vocab_size=128 * 1024):
+    """
+    Token ids of a dataset, Zipf like frequencies over the vocabulary.
+    """
+    ranks = torch.exp(torch.rand(num_elements, generator=generator) * np.log(vocab_size))
+    return (ranks.to(torch.int64) - 1).clamp(0, vocab_size - 1).numpy().astype(np.uint32)
+
+
+# name -> function(num_elements, generator), the float generators are cast to the dtype
+FLOAT_GENERATORS = {
+    "gaussian_weights": gaussian_weights,
+    "adam_exp_avg": adam_exp_avg,
+    "adam_exp_avg_sq": adam_exp_avg_sq,
+    "pruned_weights": pruned_weights,
+    "block_pruned_weights": block_pruned_weights,
+}
+UINT32_GENERATORS = {
+    "quantized_int8": quantized_int8,
+    "quantized_int16": quantized_int16,
+    "token_ids": token_ids,
+}
+
+
+def generate(name, dtype, size, seed=0):
+    """
+    Generates a synthetic tensor.
+
+    Parameters
+    -------------------------------------
+    name: string
+            The name of a generator in FLOAT_GENERATORS or UINT32_GENERATORS.
+
+    dtype: string
+            bfloat16, float16, float32, float8_e4m3fn or float8_e5m2 for FLOAT_GENERATORS, uint32 for UINT32_GENERATORS.
+
+    size: int
+            The size of the tensor in bytes.
+
+    seed: int
+            The seed of the random generator, the same seed gives the same tensor.
+            Default is 0.
+
+    Returns
+    -------------------------------------
+    A torch tensor for the float dtypes, and a numpy array for uint32.
+    """
+    generator = torch.Generator().manual_seed(seed)
+    if dtype == "uint32":
+        if name not in UINT32_GENERATORS:
+            raise ValueError(f"Generator {name} doesn't support uint32")
+        return UINT32_GENERATORS[name](size // 4, generator)
+    if dtype not in FLOAT_DTYPES or name not in FLOAT_GENERATORS:
+        raise ValueError(f"Generator {name} doesn't support {dtype}")
+    torch_dtype = FLOAT_DTYPES[dtype]
+    num_elements = size // (torch.finfo(torch_dtype).bits // 8)
+    return FLOAT_GENERATORS[name](num_elements, generator).to(torch_dtype)
@@ -0,0 +1,347 @@
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import itertools
+import threading
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+import torch
+import split_dtype
+from zipnn import ZipNN
+from benchmarks.generators import FLOAT_DTYPES, FLOAT_GENERATORS, UINT32_GENERATORS, generate
+
+KB = 1024
+MB = 1024 * 1024
+GB = 1024 * 1024 * 1024
+
+
+def parse_size(size):
+    """
+    Parses a size in bytes, an integer or a string with a KB/MB/GB suffix (e.g. 256KB).
+    """
+    size = str(size).strip()
+    if size.isdigit():
+        return int(size)
+    units = {"KB": KB, "MB": MB, "GB": GB}
+    if size[-2:].upper() not in units or not size[:-2].isdigit():
+        raise ValueError(f"Invalid size: {size}. Use bytes or a KB/MB/GB suffix.")
+    return int(size[:-2]) * units[size[-2:].upper()]
+
+
+def format_size(size):
+    """
+    Formats a size in bytes the way parse_size reads it.
+    """
+    for unit, unit_size in (("GB", GB), ("MB", MB), ("KB", KB)):
+        if size and size % unit_size == 0:
+            return f"{size // unit_size}{unit}"
+    return str(size)
+
+
+class PeakRSS:
+    """
+    Samples the RSS of the process in a thread, to measure the peak of a single case without running it in a new process.
+    Reads /proc/self/statm, on other systems it falls back to the peak of the whole process (ru_maxrss).
+    """
+
+    def __init__(self, interval=0.001):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def current():
+        try:
+            with open("/proc/self/statm") as statm:
+                return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError, IndexError):
+            import resource
+
+            max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            return max_rss if sys.platform == "darwin" else max_rss * KB
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self.current())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak = self.current()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.current())
+
+
+def case_name(case):
+    """
+    Returns the name of a case, the key of the case in a baseline report.
+    The bitshuffle of the case is in the name only if it is set, so the names of reports without it are unchanged.
+    """
+    return (
+        f"{case['dtype']}/{case['generator']}/chunk={format_size(case['compression_chunk'])}"
+        f"/threads={case['threads']}/method={case['method']}/streaming={format_size(case['streaming_chunk'])}"
+        + ("/bitshuffle=1" if case.get("bitshuffle") else "")
+    )
+
+
+def run_case(case, data, repeat):
+    """
+    Compresses and decompresses data repeat times with the ZipNN configuration of case.
+
+    Parameters
+    -------------------------------------
+    case: dict
+            dtype, generator, compression_chunk, threads, method, streaming_chunk (0 - not streaming) and bitshuffle of the case.
+
+    data: torch.Tensor or numpy array
+            The tensor to compress.
+
+    repeat: int
+            Number of repetitions, the best time of them is reported.
+
+    Returns
+    -------------------------------------
+    The result of the case: its configuration, the compression ratio, GB/s of compression and decompression
+    (of the original size), and the peak RSS in MB while the case ran.
+    """
+    kwargs = {"method": case["method"], "threads": case["threads"], "compression_chunk": case["compression_chunk"]}
+    kwargs["bitshuffle"] = bool(case.get("bitshuffle"))
+    if case["streaming_chunk"]:
+        original = data.view(torch.uint8).numpy().tobytes()
+        zpn = ZipNN(bytearray_dtype=case["dtype"], is_streaming=True, streaming_chunk_kb=case["streaming_chunk"], **kwargs)
+    elif case["dtype"] == "uint32":
+        original = data
+        zpn = ZipNN(input_format="numpy", **kwargs)
+    else:
+        original = data
+        zpn = ZipNN(input_format="torch", **kwargs)
+    original_bytes = original.nbytes if not isinstance(original, bytes) else len(original)
+
+    # The byte input may be reordered in place, every run gets a copy.
+    # The peak RSS is measured on a first run that isn't timed, the sampling thread would slow down the timed runs.
+    with PeakRSS() as rss:
+        compressed = zpn.compress(bytearray(original) if isinstance(original, bytes) else original)
+        zpn.decompress(compressed)
+    compress_time = decompress_time = float("inf")
+    for _ in range(repeat):
+        to_compress = bytearray(original) if isinstance(original, bytes) else original
+        start = time.perf_counter()
+        compressed = zpn.compress(to_compress)
+        compress_time = min(compress_time, time.perf_counter() - start)
+        start = time.perf_counter()
+        decompressed = zpn.decompress(compressed)
+        decompress_time = min(decompress_time, time.perf_counter() - start)
+    if isinstance(original, bytes):
+        ok = decompressed == original
+    elif isinstance(original, torch.Tensor):
+        ok = torch.equal(decompressed, original)
+    else:
+        ok = np.array_equal(decompressed, original)
+    if not ok:
+        raise RuntimeError(f"{case_name(case)}: the decompressed data is different from the original")
+
+    return dict(
+        case,
+        name=case_name(case),
+        original_bytes=original_bytes,
+        compressed_bytes=len(compressed),
+        ratio=len(compressed) / original_bytes,
+        compress_gbps=original_bytes / compress_time / 1e9,
+        decompress_gbps=original_bytes / decompress_time / 1e9,
+        peak_rss_mb=rss.peak / MB,
+    )
+
+
+def run_sweep(
+    dtypes, generators, size, compression_chunks, threads, methods, streaming_chunks, bitshuffles=(0,), repeat=3, seed=0, log=None
+):
+    """
+    Runs every combination of the parameters on every generator that supports the dtype.
+    The streaming cases run only for the float dtypes, ZipNN streams only bytes.
+
+    Returns
+    -------------------------------------
+    A list with the result of every case.
+    """
+    results = []
+    for dtype in dtypes:
+        names = UINT32_GENERATORS if dtype == "uint32" else FLOAT_GENERATORS
+        for generator in [name for name in generators if name in names]:
+            data = generate(generator, dtype, size, seed)
+            for compression_chunk, num_threads, method, streaming_chunk, bitshuffle in itertools.product(
+                compression_chunks, threads, methods, streaming_chunks, bitshuffles
+            ):
+                if streaming_chunk and dtype == "uint32":
+                    continue
+                case = dict(
+                    dtype=dtype,
+                    generator=generator,
+                    compression_chunk=compression_chunk,
+                    threads=num_threads,
+                    method=method,
+                    streaming_chunk=streaming_chunk,
+                    bitshuffle=bitshuffle,
+                )
+                result = run_case(case, data, repeat)
+                results.append(result)
+                if log is not None:
+                    log(
+                        f"{result['name']:<90} ratio {result['ratio']:.4f}  compress {result['compress_gbps']:.2f} GB/s"
+                        f"  decompress {result['decompress_gbps']:.2f} GB/s  peak RSS {result['peak_rss_mb']:.0f} MB"
+                    )
+    return results
+
+
+def compare_to_baseline(results, baseline, tolerance=0.1, ratio_tolerance=0.005):
+    """
+    Compares the results to a baseline report of an earlier run.
+
+    Parameters
+    -------------------------------------
+    results: list of dicts
+            The results of run_sweep.
+
+    baseline: dict
+            A report of an earlier run (see make_report), the cases are matched by name.
+
+    tolerance: float
+            A drop of compression or decompression GB/s by more than this fraction is a regression.
+            Default is 0.1.
+
+    ratio_tolerance: float
+            An increase of the compression ratio by more than this fraction is a regression.
+            Default is 0.005.
+
+    Returns
+    -------------------------------------
+    A list of the regressions, each one is (name, metric, baseline value, value).
+    """
+    baseline_results = {result["name"]: result for result in baseline["results"]}
+    regressions = []
+    for result in results:
+        base = baseline_results.get(result["name"])
+        if base is None:
+            continue
+        for metric in ("compress_gbps", "decompress_gbps"):
+            if result[metric] < base[metric] * (1 - tolerance):
+                regressions.append((result["name"], metric, base[metric], result[metric]))
+        if result["ratio"] > base["ratio"] * (1 + ratio_tolerance):
+            regressions.append((result["name"], "ratio", base["ratio"], result["ratio"]))
+    return regressions
+
+
+def make_report(results, args=None):
+    """
+    Returns the JSON report of the results, with the machine and the versions they were measured on.
+    """
+    zpn = ZipNN()
+    return {
+        "meta": {
+            "zipnn_version": f"{zpn._version_major}.{zpn._version_minor}.{zpn._version_tiny}",
+            "simd_level": split_dtype.get_simd_level(),
+            "cpu_count": os.cpu_count(),
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "torch": torch.__version__,
+            "numpy": np.__version__,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "args": args,
+        },
+        "results": results,
+    }
+
+
+if __name__ == "__main__":
+
+    def parse_list(value, parse=str):
+        return [parse(item) for item in value.split(",") if item]
+
+    parser = argparse.ArgumentParser(description="Benchmark ZipNN on synthetic tensors, offline.")
+    parser.add_argument(
+        "--dtypes",
+        type=parse_list,
+        default=list(FLOAT_DTYPES) + ["uint32"],
+        help="Comma separated dtypes (default: bfloat16,float16,float32,float8_e4m3fn,float8_e5m2,uint32).",
+    )
+    parser.add_argument(
+        "--generators",
+        type=parse_list,
+        default=list(FLOAT_GENERATORS) + list(UINT32_GENERATORS),
+        help="Comma separated generators (default: all of them).",
+    )
+    parser.add_argument("--size", type=parse_size, default=16 * MB, help="The size of every tensor (default: 16MB).")
+    parser.add_argument(
+        "--compression_chunk",
+        type=lambda value: parse_list(value, parse_size),
+        default=[64 * KB, 256 * KB],
+        help="Comma separated compression_chunk sizes (default: 64KB,256KB).",
+    )
+    parser.add_argument(
+        "--threads", type=lambda value: parse_list(value, int), default=[1, 4], help="Comma separated threads (default: 1,4)."
+    )
+    parser.add_argument("--method", type=parse_list, default=["auto", "zstd"], help="Comma separated methods (default: auto,zstd).")
+    parser.add_argument(
+        "--streaming_chunk",
+        type=lambda value: parse_list(value, parse_size),
+        default=[0],
+        help="Comma separated streaming chunk sizes, 0 is not streaming (default: 0).",
+    )
+    parser.add_argument(
+        "--bitshuffle",
+        type=lambda value: parse_list(value, int),
+        default=[0],
+        help="Comma separated bitshuffle values, 1 lets method auto transpose the bit planes (default: 0).",
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Repetitions of every case, the best time is reported (default: 3).")
+    parser.add_argument("--seed", type=int, default=0, help="The seed of the generators (default: 0).")
+    parser.add_argument("--output", help="Path of the JSON report.")
+    parser.add_argument("--baseline", help="Path of a JSON report to compare to, exits with 1 if there is a regression.")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.1, help="The drop of GB/s from the baseline that is a regression (default: 0.1)."
+    )
+    parser.add_argument(
+        "--ratio_tolerance",
+        type=float,
+        default=0.005,
+        help="The increase of the compression ratio from the baseline that is a regression (default: 0.005).",
+    )
+    args = parser.parse_args()
+
+    results = run_sweep(
+        args.dtypes,
+        args.generators,
+        args.size,
+        args.compression_chunk,
+        args.threads,
+        args.method,
+        args.streaming_chunk,
+        bitshuffles=args.bitshuffle,
+        repeat=args.repeat,
+        seed=args.seed,
+        log=print,
+    )
+    report = make_report(results, vars(args))
+    if args.output:
+        with open(args.output, "w") as out_file:
+            json.dump(report, out_file, indent=2)
+        print(f"The report is in {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            regressions = compare_to_baseline(results, json.load(baseline_file), args.tolerance, args.ratio_tolerance)
+        for name, metric, base_value, value in regressions:
+            print(f"REGRESSION {name} {metric}: {base_value:.4f} -> {value:.4f}")
+        if regressions:
+            sys.exit(1)
+        print("No regressions from the baseline")
@@ -0,0 +1,1061 @@
+#include "byte_group.h"
+#include <stdlib.h>
+#include <string.h>
+
+#if defined(__x86_64__) && defined(__GNUC__)
+#define ZIPNN_X86 1
+#include <immintrin.h>
+#define ZIPNN_AVX2 __attribute__((target("avx2")))
+#elif defined(__aarch64__) && defined(__ARM_NEON)
+#define ZIPNN_ARM 1
+#include <arm_neon.h>
+#endif
+
+// A shift of every 32 bit word: ((u >> shr) & shrMask) | ((u << shl) &
+// shlMask) | (u & keepMask), this is the form of all the bit orderings
+typedef struct {
+  int shr;
+  uint32_t shrMask;
+  int shl;
+  uint32_t shlMask;
+  uint32_t keepMask;
+} bits_op;
+
+static const bits_op REORDER_BITS16 = {8, 0x00800080, 1, 0xFF00FF00,
+                                       0x007F007F};
+static const bits_op REVERT_BITS16 = {1, 0x7F807F80, 8, 0x80008000,
+                                      0x007F007F};
+static const bits_op REORDER_BITS32 = {8, 0x00800000, 1, 0xFF000000,
+                                       0x007FFFFF};
+static const bits_op REVERT_BITS32 = {1, 0x7F800000, 8, 0x80000000,
+                                      0x007FFFFF};
+// float8 - the exponent is moved before the sign bit of every byte
+static const bits_op REORDER_BITS8_E4M3 = {4, 0x08080808, 1, 0xF0F0F0F0,
+                                           0x07070707};
+static const bits_op REVERT_BITS8_E4M3 = {1, 0x78787878, 4, 0x80808080,
+                                          0x07070707};
+static const bits_op REORDER_BITS8_E5M2 = {5, 0x04040404, 1, 0xF8F8F8F8,
+                                           0x03030303};
+static const bits_op REVERT_BITS8_E5M2 = {1, 0x7C7C7C7C, 5, 0x80808080,
+                                          0x03030303};
+// Swaps the high nibble of the first byte of every 16 bit pair with the low
+// nibble of the second one, its own inverse
+static const bits_op SWAP_NIBBLES16 = {4, 0x00F000F0, 4, 0x0F000F00,
+                                       0xF00FF00F};
+
+typedef struct {
+  void (*split2)(const uint8_t *, size_t, uint8_t *, uint8_t *);
+  void (*combine2)(const uint8_t *, const uint8_t *, uint8_t *, size_t);
+  void (*split4)(const uint8_t *, size_t, uint8_t *, uint8_t *, uint8_t *,
+                 uint8_t *);
+  void (*combine4)(const uint8_t *, const uint8_t *, const uint8_t *,
+                   const uint8_t *, uint8_t *, size_t);
+  void (*narrow32_16)(const uint8_t *, size_t, uint8_t *);
+  void (*narrow32_8)(const uint8_t *, size_t, uint8_t *);
+  void (*widen16_32)(const uint8_t *, size_t, uint8_t *);
+  void (*widen8_32)(const uint8_t *, size_t, uint8_t *);
+  void (*bits)(uint8_t *, size_t, const bits_op *);
+} byte_group_kernels;
+
+///////////////////////////////////
+/////////  Scalar Kernels /////////
+///////////////////////////////////
+
+// The scalar kernels also finish the tail of the SIMD kernels, from element i
+
+static void split2_scalar_from(const uint8_t *src, size_t i, size_t n,
+                               uint8_t *dst0, uint8_t *dst1) {
+  for (; i < n; i++) {
+    if (dst0 != NULL) {
+      dst0[i] = src[2 * i];
+    }
+    if (dst1 != NULL) {
+      dst1[i] = src[2 * i + 1];
+    }
+  }
+}
+
+static void combine2_scalar_from(const uint8_t *src0, const uint8_t *src1,
+                                 uint8_t *dst, size_t i, size_t n) {
+  for (; i < n; i++) {
+    dst[2 * i] = src0 != NULL ? src0[i] : 0;
+    dst[2 * i + 1] = src1 != NULL ? src1[i] : 0;
+  }
+}
+
+static void split4_scalar_from(const uint8_t *src, size_t i, size_t n,
+                               uint8_t *dst0, uint8_t *dst1, uint8_t *dst2,
+                               uint8_t *dst3) {
+  for (; i < n; i++) {
+    dst0[i] = src[4 * i];
+    dst1[i] = src[4 * i + 1];
+    dst2[i] = src[4 * i + 2];
+    dst3[i] = src[4 * i + 3];
+  }
+}
+
+static void combine4_scalar_from(const uint8_t *src0, const uint8_t *src1,
+                                 const uint8_t *src2, const uint8_t *src3,
+                                 uint8_t *dst, size_t i, size_t n) {
+  for (; i < n; i++) {
+    dst[4 * i] = src0[i];
+    dst[4 * i + 1] = src1[i];
+    dst[4 * i + 2] = src2[i];
+    dst[4 * i + 3] = src3[i];
+  }
+}
+
+static void narrow32_16_scalar_from(const uint8_t *src, size_t i, size_t n,
+                                    uint8_t *dst) {
+  for (; i < n; i++) {
+    uint32_t u;
+    memcpy(&u, src + 4 * i, 4);
+    uint16_t v = (uint16_t)u;
+    memcpy(dst + 2 * i, &v, 2);
+  }
+}
+
+static void narrow32_8_scalar_from(const uint8_t *src, size_t i, size_t n,
+                                   uint8_t *dst) {
+  for (; i < n; i++) {
+    uint32_t u;
+    memcpy(&u, src + 4 * i, 4);
+    dst[i] = (uint8_t)u;
+  }
+}
+
+static void widen16_32_scalar_from(const uint8_t *src, size_t i, size_t n,
+                                   uint8_t *dst) {
+  for (; i < n; i++) {
+    uint16_t v;
+    memcpy(&v, src + 2 * i, 2);
+    uint32_t u = v;
+    memcpy(dst + 4 * i, &u, 4);
+  }
+}
+
+static void widen8_32_scalar_from(const uint8_t *src, size_t i, size_t n,
+                                  uint8_t *dst) {
+  for (; i < n; i++) {
+    uint32_t u = src[i];
+    memcpy(dst + 4 * i, &u, 4);
+  }
+}
+
+static void bits_scalar_from(uint8_t *buf, size_t i, size_t n,
+                             const bits_op *op) {
+  for (; i < n; i++) {
+    uint32_t u;
+    memcpy(&u, buf + 4 * i, 4);
+    u = ((u >> op->shr) & op->shrMask) | ((u << op->shl) & op->shlMask) |
+        (u & op->keepMask);
+    memcpy(buf + 4 * i, &u, 4);
+  }
+}
+
+static void split2_scalar(const uint8_t *src, size_t n, uint8_t *dst0,
+                          uint8_t *dst1) {
+  split2_scalar_from(src, 0, n, dst0, dst1);
+}
+
+static void combine2_scalar(const uint8_t *src0, const uint8_t *src1,
+                            uint8_t *dst, size_t n) {
+  combine2_scalar_from(src0, src1, dst, 0, n);
+}
+
+static void split4_scalar(const uint8_t *src, size_t n, uint8_t *dst0,
+                          uint8_t *dst1, uint8_t *dst2, uint8_t *dst3) {
+  split4_scalar_from(src, 0, n, dst0, dst1, dst2, dst3);
+}
+
+static void combine4_scalar(const uint8_t *src0, const uint8_t *src1,
+                            const uint8_t *src2, const uint8_t *src3,
+                            uint8_t *dst, size_t n) {
+  combine4_scalar_from(src0, src1, src2, src3, dst, 0, n);
+}
+
+static void narrow32_16_scalar(const uint8_t *src, size_t n, uint8_t *dst) {
+  narrow32_16_scalar_from(src, 0, n, dst);
+}
+
+static void narrow32_8_scalar(const uint8_t *src, size_t n, uint8_t *dst) {
+  narrow32_8_scalar_from(src, 0, n, dst);
+}
+
+static void widen16_32_scalar(const uint8_t *src, size_t n, uint8_t *dst) {
+  widen16_32_scalar_from(src, 0, n, dst);
+}
+
+static void widen8_32_scalar(const uint8_t *src, size_t n, uint8_t *dst) {
+  widen8_32_scalar_from(src, 0, n, dst);
+}
+
+static void bits_scalar(uint8_t *buf, size_t n, const bits_op *op) {
+  bits_scalar_from(buf, 0, n, op);
+}
+
+static const byte_group_kernels scalar_kernels = {
+    split2_scalar,      combine2_scalar,   split4_scalar,
+    combine4_scalar,    narrow32_16_scalar, narrow32_8_scalar,
+    widen16_32_scalar,  widen8_32_scalar,  bits_scalar,
+};
+
+#ifdef ZIPNN_X86
+
+///////////////////////////////////
+//////////  SSE2 Kernels //////////
+///////////////////////////////////
+
+// SSE2 is part of x86-64, so these kernels need no CPU check
+
+// The low byte of every 32 bit word of a, b, c, d (16 words) in order
+static inline __m128i low_bytes32_sse2(__m128i a, __m128i b, __m128i c,
+                                       __m128i d) {
+  const __m128i mask = _mm_set1_epi32(0xFF);
+  __m128i ab = _mm_packs_epi32(_mm_and_si128(a, mask), _mm_and_si128(b, mask));
+  __m128i cd = _mm_packs_epi32(_mm_and_si128(c, mask), _mm_and_si128(d, mask));
+  return _mm_packus_epi16(ab, cd);
+}
+
+static void split2_sse2(const uint8_t *src, size_t n, uint8_t *dst0,
+                        uint8_t *dst1) {
+  const __m128i mask = _mm_set1_epi16(0xFF);
+  size_t i = 0;
+  for (; i + 16 <= n; i += 16) {
+    __m128i a = _mm_loadu_si128((const __m128i *)(src + 2 * i));
+    __m128i b = _mm_loadu_si128((const __m128i *)(src + 2 * i + 16));
+    if (dst0 != NULL) {
+      _mm_storeu_si128((__m128i *)(dst0 + i),
+                       _mm_packus_epi16(_mm_and_si128(a, mask),
+                                        _mm_and_si128(b, mask)));
+    }
+    if (dst1 != NULL) {
+      _mm_storeu_si128((__m128i *)(dst1 + i),
+                       _mm_packus_epi16(_mm_srli_epi16(a, 8),
+                                        _mm_srli_epi16(b, 8)));
+    }
+  }
+  split2_scalar_from(src, i, n, dst0, dst1);
+}
+
+static void combine2_sse2(const uint8_t *src0, const uint8_t *src1,
+                          uint8_t *dst, size_t n) {
+  const __m128i zero = _mm_setzero_si128();
+  size_t i = 0;
+  for (; i + 16 <= n; i += 16) {
+    __m128i a = src0 != NULL ? _mm_loadu_si128((const __m128i *)(src0 + i))
+                             : zero;
+    __m128i b = src1 != NULL ? _mm_loadu_si128((const __m128i *)(src1 + i))
+                             : zero;
+    _mm_storeu_si128((__m128i *)(dst + 2 * i), _mm_unpacklo_epi8(a, b));
+    _mm_storeu_si128((__m128i *)(dst + 2 * i + 16), _mm_unpackhi_epi8(a, b));
+  }
+  combine2_scalar_from(src0, src1, dst, i, n);
+}
+
+static void split4_sse2(const uint8_t *src, size_t n, uint8_t *dst0,
+                        uint8_t *dst1, uint8_t *dst2, uint8_t *dst3) {
+  size_t i = 0;
+  for (; i + 16 <= n; i += 16) {
+    __m128i a = _mm_loadu_si128((const __m128i *)(src + 4 * i));
+    __m128i b = _mm_loadu_si128((const __m128i *)(src + 4 * i + 16));
+    __m128i c = _mm_loadu_si128((const __m128i *)(src + 4 * i + 32));
+    __m128i d = _mm_loadu_si128((const __m128i *)(src + 4 * i + 48));
+    _mm_storeu_si128((__m128i *)(dst0 + i), low_bytes32_sse2(a, b, c, d));
+    _mm_storeu_si128((__m128i *)(dst1 + i),
+                     low_bytes32_sse2(_mm_srli_epi32(a, 8), _mm_srli_epi32(b, 8),
+                                      _mm_srli_epi32(c, 8),
+                                      _mm_srli_epi32(d, 8)));
+    _mm_storeu_si128(
+        (__m128i *)(dst2 + i),
+        low_bytes32_sse2(_mm_srli_epi32(a, 16), _mm_srli_epi32(b, 16),
+                         _mm_srli_epi32(c, 16), _mm_srli_epi32(d, 16)));
+    _mm_storeu_si128(
+        (__m128i *)(dst3 + i),
+        low_bytes32_sse2(_mm_srli_epi32(a, 24), _mm_srli_epi32(b, 24),
+                         _mm_srli_epi32(c, 24), _mm_srli_epi32(d, 24)));
+  }
+  split4_scalar_from(src, i, n, dst0, dst1, dst2, dst3);
+}
+
+static void combine4_sse2(const uint8_t *src0, const uint8_t *src1,
+                          const uint8_t *src2, const uint8_t *src3,
+                          uint8_t *dst, size_t n) {
+  size_t i = 0;
+  for (; i + 16 <= n; i += 16) {
+    __m128i a = _mm_loadu_si128((const __m128i *)(src0 + i));
+    __m128i b = _mm_loadu_si128((const __m128i *)(src1 + i));
+    __m128i c = _mm_loadu_si128((const __m128i *)(src2 + i));
+    __m128i d = _mm_loadu_si128((const __m128i *)(src3 + i));
+    __m128i abLo = _mm_unpacklo_epi8(a, b), abHi = _mm_unpackhi_epi8(a, b);
+    __m128i cdLo = _mm_unpacklo_epi8(c, d), cdHi = _mm_unpackhi_epi8(c, d);
+    uint8_t *out = dst + 4 * i;
+    _mm_storeu_si128((__m128i *)out, _mm_unpacklo_epi16(abLo, cdLo));
+    _mm_storeu_si128((__m128i *)(out + 16), _mm_unpackhi_epi16(abLo, cdLo));
+    _mm_storeu_si128((__m128i *)(out + 32), _mm_unpacklo_epi16(abHi, cdHi));
+    _mm_storeu_si128((__m128i *)(out + 48), _mm_unpackhi_epi16(abHi, cdHi));
+  }
+  combine4_scalar_from(src0, src1, src2, src3, dst, i, n);
+}
+
+static void narrow32_16_sse2(const uint8_t *src, size_t n, uint8_t *dst) {
+  size_t i = 0;
+  for (; i + 8 <= n; i += 8) {
+    __m128i a = _mm_loadu_si128((const __m128i *)(src + 4 * i));
+    __m128i b = _mm_loadu_si128((const __m128i *)(src + 4 * i + 16));
+    // sign extend the low 16 bits, so the saturating pack keeps them as is
+    a = _mm_srai_epi32(_mm_slli_epi32(a, 16), 16);
+    b = _mm_srai_epi32(_mm_slli_epi32(b, 16), 16);
+    _mm_storeu_si128((__m128i *)(dst + 2 * i), _mm_packs_epi32(a, b));
+  }
+  narrow32_16_scalar_from(src, i, n, dst);
+}
+
+static void narrow32_8_sse2(const uint8_t *src, size_t n, uint8_t *dst) {
+  size_t i = 0;
+  for (; i + 16 <= n; i += 16) {
+    __m128i a = _mm_loadu_si128((const __m128i *)(src + 4 * i));
+    __m128i b = _mm_loadu_si128((const __m128i *)(src + 4 * i + 16));
+    __m128i c = _mm_loadu_si128((const __m128i *)(src + 4 * i + 32));
+    __m128i d = _mm_loadu_si128((const __m128i *)(src + 4 * i + 48));
+    _mm_storeu_si128((__m128i *)(dst + i), low_bytes32_sse2(a, b, c, d));
+  }
+  narrow32_8_scalar_from(src, i, n, dst);
+}
+
+static void widen16_32_sse2(const uint8_t *src, size_t n, uint8_t *dst) {
+  const __m128i zero = _mm_setzero_si128();
+  size_t i = 0;
+  for (; i + 8 <= n; i += 8) {
+    __m128i a = _mm_loadu_si128((const __m128i *)(src + 2 * i));
+    _mm_storeu_si128((__m128i *)(dst + 4 * i), _mm_unpacklo_epi16(a, zero));
+    _mm_storeu_si128((__m128i *)(dst + 4 * i + 16),
+                     _mm_unpackhi_epi16(a, zero));
+  }
+  widen16_32_scalar_from(src, i, n, dst);
+}
+
+static void widen8_32_sse2(const uint8_t *src, size_t n, uint8_t *dst) {
+  const __m128i zero = _mm_setzero_si128();
+  size_t i = 0;
+  for (; i + 16 <= n; i += 16) {
+    __m128i a = _mm_loadu_si128((const __m128i *)(src + i));
+    __m128i lo = _mm_unpacklo_epi8(a, zero), hi = _mm_unpackhi_epi8(a, zero);
+    uint8_t *out = dst + 4 * i;
+    _mm_storeu_si128((__m128i *)out, _mm_unpacklo_epi16(lo, zero));
+    _mm_storeu_si128((__m128i *)(out + 16), _mm_unpackhi_epi16(lo, zero));
+    _mm_storeu_si128((__m128i *)(out + 32), _mm_unpacklo_epi16(hi, zero));
+    _mm_storeu_si128((__m128i *)(out + 48), _mm_unpackhi_epi16(hi, zero));
+  }
+  widen8_32_scalar_from(src, i, n, dst);
+}
+
+static void bits_sse2(uint8_t *buf, size_t n, const bits_op *op) {
+  const __m128i shr = _mm_cvtsi32_si128(op->shr);
+  const __m128i shl = _mm_cvtsi32_si128(op->shl);
+  const __m128i shrMask = _mm_set1_epi32((int)op->shrMask);
+  const __m128i shlMask = _mm_set1_epi32((int)op->shlMask);
+  const __m128i keepMask = _mm_set1_epi32((int)op->keepMask);
+  size_t i = 0;
+  for (; i + 4 <= n; i += 4) {
+    __m128i u = _mm_loadu_si128((const __m128i *)(buf + 4 * i));
+    __m128i r = _mm_or_si128(
+        _mm_or_si128(_mm_and_si128(_mm_srl_epi32(u, shr), shrMask),
+                     _mm_and_si128(_mm_sll_epi32(u, shl), shlMask)),
+        _mm_and_si128(u, keepMask));
+    _mm_storeu_si128((__m128i *)(buf + 4 * i), r);
+  }
+  bits_scalar_from(buf, i, n, op);
+}
+
+static const byte_group_kernels sse2_kernels = {
+    split2_sse2,      combine2_sse2,    split4_sse2,
+    combine4_sse2,    narrow32_16_sse2, narrow32_8_sse2,
+    widen16_32_sse2,  widen8_32_sse2,   bits_sse2,
+};
+
+///////////////////////////////////
+//////////  AVX2 Kernels //////////
+///////////////////////////////////
+
+// The packs and unpacks of AVX2 work on each 128 bit lane, so the results
+// are permuted back to the order of the elements
+
+// The low byte of every 32 bit word of a, b, c, d (32 words) in order
+ZIPNN_AVX2 static inline __m256i low_bytes32_avx2(__m256i a, __m256i b,
+                                                  __m256i c, __m256i d) {
+  const __m256i mask = _mm256_set1_epi32(0xFF);
+  const __m256i order = _mm256_setr_epi32(0, 4, 1, 5, 2, 6, 3, 7);
+  __m256i ab =
+      _mm256_packs_epi32(_mm256_and_si256(a, mask), _mm256_and_si256(b, mask));
+  __m256i cd =
+      _mm256_packs_epi32(_mm256_and_si256(c, mask), _mm256_and_si256(d, mask));
+  return _mm256_permutevar8x32_epi32(_mm256_packus_epi16(ab, cd), order);
+}
+
+ZIPNN_AVX2 static void split2_avx2(const uint8_t *src, size_t n,
+                                   uint8_t *dst0, uint8_t *dst1) {
+  const __m256i mask = _mm256_set1_epi16(0xFF);
+  size_t i = 0;
+  for (; i + 32 <= n; i += 32) {
+    __m256i a = _mm256_loadu_si256((const __m256i *)(src + 2 * i));
+    __m256i b = _mm256_loadu_si256((const __m256i *)(src + 2 * i + 32));
+    if (dst0 != NULL) {
+      __m256i even = _mm256_packus_epi16(_mm256_and_si256(a, mask),
+                                         _mm256_and_si256(b, mask));
+      _mm256_storeu_si256((__m256i *)(dst0 + i),
+                          _mm256_permute4x64_epi64(even, 0xD8));
+    }
+    if (dst1 != NULL) {
+      __m256i odd = _mm256_packus_epi16(_mm256_srli_epi16(a, 8),
+                                        _mm256_srli_epi16(b, 8));
+      _mm256_storeu_si256((__m256i *)(dst1 + i),
+                          _mm256_permute4x64_epi64(odd, 0xD8));
+    }
+  }
+  split2_scalar_from(src, i, n, dst0, dst1);
+}
+
+ZIPNN_AVX2 static void combine2_avx2(const uint8_t *src0, const uint8_t *src1,
+                                     uint8_t *dst, size_t n) {
+  const __m256i zero = _mm256_setzero_si256();
+  size_t i = 0;
+  for (; i + 32 <= n; i += 32) {
+    __m256i a = src0 != NULL
+                    ? _mm256_loadu_si256((const __m256i *)(src0 + i))
+                    : zero;
+    __m256i b = src1 != NULL
+                    ? _mm256_loadu_si256((const __m256i *)(src1 + i))
+                    : zero;
+    a = _mm256_permute4x64_epi64(a, 0xD8);
+    b = _mm256_permute4x64_epi64(b, 0xD8);
+    _mm256_storeu_si256((__m256i *)(dst + 2 * i), _mm256_unpacklo_epi8(a, b));
+    _mm256_storeu_si256((__m256i *)(dst + 2 * i + 32),
+                        _mm256_unpackhi_epi8(a, b));
+  }
+  combine2_scalar_from(src0, src1, dst, i, n);
+}
+
+ZIPNN_AVX2 static void split4_avx2(const uint8_t *src, size_t n,
+                                   uint8_t *dst0, uint8_t *dst1,
+                                   uint8_t *dst2, uint8_t *dst3) {
+  size_t i = 0;
+  for (; i + 32 <= n; i += 32) {
+    __m256i a = _mm256_loadu_si256((const __m256i *)(src + 4 * i));
+    __m256i b = _mm256_loadu_si256((const __m256i *)(src + 4 * i + 32));
+    __m256i c = _mm256_loadu_si256((const __m256i *)(src + 4 * i + 64));
+    __m256i d = _mm256_loadu_si256((const __m256i *)(src + 4 * i + 96));
+    _mm256_storeu_si256((__m256i *)(dst0 + i), low_bytes32_avx2(a, b, c, d));
+    _mm256_storeu_si256(
+        (__m256i *)(dst1 + i),
+        low_bytes32_avx2(_mm256_srli_epi32(a, 8), _mm256_srli_epi32(b, 8),
+                         _mm256_srli_epi32(c, 8), _mm256_srli_epi32(d, 8)));
+    _mm256_storeu_si256(
+        (__m256i *)(dst2 + i),
+        low_bytes32_avx2(_mm256_srli_epi32(a, 16), _mm256_srli_epi32(b, 16),
+                         _mm256_srli_epi32(c, 16), _mm256_srli_epi32(d, 16)));
+    _mm256_storeu_si256(
+        (__m256i *)(dst3 + i),
+        low_bytes32_avx2(_mm256_srli_epi32(a, 24), _mm256_srli_epi32(b, 24),
+                         _mm256_srli_epi32(c, 24), _mm256_srli_epi32(d, 24)));
+  }
+  split4_scalar_from(src, i, n, dst0, dst1, dst2, dst3);
+}
+
+ZIPNN_AVX2 static void combine4_avx2(const uint8_t *src0, const uint8_t *src1,
+                                     const uint8_t *src2, const uint8_t *src3,
+                                     uint8_t *dst, size_t n) {
+  size_t i = 0;
+  for (; i + 32 <= n; i += 32) {
+    __m256i a = _mm256_loadu_si256((const __m256i *)(src0 + i));
+    __m256i b = _mm256_loadu_si256((const __m256i *)(src1 + i));
+    __m256i c = _mm256_loadu_si256((const __m256i *)(src2 + i));
+    __m256i d = _mm256_loadu_si256((const __m256i *)(src3 + i));
+    __m256i abLo = _mm256_unpacklo_epi8(a, b), abHi = _mm256_unpackhi_epi8(a, b);
+    __m256i cdLo = _mm256_unpacklo_epi8(c, d), cdHi = _mm256_unpackhi_epi8(c, d);
+    // words [0-3 | 16-19], [4-7 | 20-23], [8-11 | 24-27], [12-15 | 28-31]
+    __m256i w0 = _mm256_unpacklo_epi16(abLo, cdLo);
+    __m256i w1 = _mm256_unpackhi_epi16(abLo, cdLo);
+    __m256i w2 = _mm256_unpacklo_epi16(abHi, cdHi);
+    __m256i w3 = _mm256_unpackhi_epi16(abHi, cdHi);
+    uint8_t *out = dst + 4 * i;
+    _mm256_storeu_si256((__m256i *)out, _mm256_permute2x128_si256(w0, w1, 0x20));
+    _mm256_storeu_si256((__m256i *)(out + 32),
+                        _mm256_permute2x128_si256(w2, w3, 0x20));
+    _mm256_storeu_si256((__m256i *)(out + 64),
+                        _mm256_permute2x128_si256(w0, w1, 0x31));
+    _mm256_storeu_si256((__m256i *)(out + 96),
+                        _mm256_permute2x128_si256(w2, w3, 0x31));
+  }
+  combine4_scalar_from(src0, src1, src2, src3, dst, i, n);
+}
+
+ZIPNN_AVX2 static void narrow32_16_avx2(const uint8_t *src, size_t n,
+                                        uint8_t *dst) {
+  size_t i = 0;
+  for (; i + 16 <= n; i += 16) {
+    __m256i a = _mm256_loadu_si256((const __m256i *)(src + 4 * i));
+    __m256i b = _mm256_loadu_si256((const __m256i *)(src + 4 * i + 32));
+    // sign extend the low 16 bits, so the saturating pack keeps them as is
+    a = _mm256_srai_epi32(_mm256_slli_epi32(a, 16), 16);
+    b = _mm256_srai_epi32(_mm256_slli_epi32(b, 16), 16);
+    _mm256_storeu_si256(
+        (__m256i *)(dst + 2 * i),
+        _mm256_permute4x64_epi64(_mm256_packs_epi32(a, b), 0xD8));
+  }
+  narrow32_16_scalar_from(src, i, n, dst);
+}
+
+ZIPNN_AVX2 static void narrow32_8_avx2(const uint8_t *src, size_t n,
+                                       uint8_t *dst) {
+  size_t i = 0;
+  for (; i + 32 <= n; i += 32) {
+    __m256i a = _mm256_loadu_si256((const __m256i *)(src + 4 * i));
+    __m256i b = _mm256_loadu_si256((const __m256i *)(src + 4 * i + 32));
+    __m256i c = _mm256_loadu_si256((const __m256i *)(src + 4 * i + 64));
+    __m256i d = _mm256_loadu_si256((const __m256i *)(src + 4 * i + 96));
+    _mm256_storeu_si256((__m256i *)(dst + i), low_bytes32_avx2(a, b, c, d));
+  }
+  narrow32_8_scalar_from(src, i, n, dst);
+}
+
+ZIPNN_AVX2 static void widen16_32_avx2(const uint8_t *src, size_t n,
+                                       uint8_t *dst) {
+  size_t i = 0;
+  for (; i + 8 <= n; i += 8) {
+    __m128i a = _mm_loadu_si128((const __m128i *)(src + 2 * i));
+    _mm256_storeu_si256((__m256i *)(dst + 4 * i), _mm256_cvtepu16_epi32(a));
+  }
+  widen16_32_scalar_from(src, i, n, dst);
+}
+
+ZIPNN_AVX2 static void widen8_32_avx2(const uint8_t *src, size_t n,
+                                      uint8_t *dst) {
+  size_t i = 0;
+  for (; i + 8 <= n; i += 8) {
+    __m128i a = _mm_loadl_epi64((const __m128i *)(src + i));
+    _mm256_storeu_si256((__m256i *)(dst + 4 * i), _mm256_cvtepu8_epi32(a));
+  }
+  widen8_32_scalar_from(src, i, n, dst);
+}
+
+ZIPNN_AVX2 static void bits_avx2(uint8_t *buf, size_t n, const bits_op *op) {
+  const __m128i shr = _mm_cvtsi32_si128(op->shr);
+  const __m128i shl = _mm_cvtsi32_si128(op->shl);
+  const __m256i shrMask = _mm256_set1_epi32((int)op->shrMask);
+  const __m256i shlMask = _mm256_set1_epi32((int)op->shlMask);
+  const __m256i keepMask = _mm256_set1_epi32((int)op->keepMask);
+  size_t i = 0;
+  for (; i + 8 <= n; i += 8) {
+    __m256i u = _mm256_loadu_si256((const __m256i *)(buf + 4 * i));
+    __m256i r = _mm256_or_si256(
+        _mm256_or_si256(_mm256_and_si256(_mm256_srl_epi32(u, shr), shrMask),
+                        _mm256_and_si256(_mm256_sll_epi32(u, shl), shlMask)),
+        _mm256_and_si256(u, keepMask));
+    _mm256_storeu_si256((__m256i *)(buf + 4 * i), r);
+  }
+  bits_scalar_from(buf, i, n, op);
+}
+
+static const byte_group_kernels avx2_kernels = {
+    split2_avx2,      combine2_avx2,    split4_avx2,
+    combine4_avx2,    narrow32_16_avx2, narrow32_8_avx2,
+    widen16_32_avx2,  widen8_32_avx2,   bits_avx2,
+};
+
+#endif // ZIPNN_X86
+
+#ifdef ZIPNN_ARM
+
+///////////////////////////////////
+//////////  NEON Kernels //////////
+///////////////////////////////////
+
+// NEON is part of aarch64, so these kernels need no CPU check
+
+static void split2_neon(const uint8_t *src, size_t n, uint8_t *dst0,
+                        uint8_t *dst1) {
+  size_t i = 0;
+  for (; i + 16 <= n; i += 16) {
+    uint8x16x2_t v = vld2q_u8(src + 2 * i);
+    if (dst0 != NULL) {
+      vst1q_u8(dst0 + i, v.val[0]);
+    }
+    if (dst1 != NULL) {
+      vst1q_u8(dst1 + i, v.val[1]);
+    }
+  }
+  split2_scalar_from(src, i, n, dst0, dst1);
+}
+
+static void combine2_neon(const uint8_t *src0, const uint8_t *src1,
+                          uint8_t *dst, size_t n) {
+  const uint8x16_t zero = vdupq_n_u8(0);
+  size_t i = 0;
+  for (; i + 16 <= n; i += 16) {
+    uint8x16x2_t v;
+    v.val[0] = src0 != NULL ? vld1q_u8(src0 + i) : zero;
+    v.val[1] = src1 != NULL ? vld1q_u8(src1 + i) : zero;
+    vst2q_u8(dst + 2 * i, v);
+  }
+  combine2_scalar_from(src0, src1, dst, i, n);
+}
+
+static void split4_neon(const uint8_t *src, size_t n, uint8_t *dst0,
+                        uint8_t *dst1, uint8_t *dst2, uint8_t *dst3) {
+  size_t i = 0;
+  for (; i + 16 <= n; i += 16) {
+    uint8x16x4_t v = vld4q_u8(src + 4 * i);
+    vst1q_u8(dst0 + i, v.val[0]);
+    vst1q_u8(dst1 + i, v.val[1]);
+    vst1q_u8(dst2 + i, v.val[2]);
+    vst1q_u8(dst3 + i, v.val[3]);
+  }
+  split4_scalar_from(src, i, n, dst0, dst1, dst2, dst3);
+}
+
+static void combine4_neon(const uint8_t *src0, const uint8_t *src1,
+                          const uint8_t *src2, const uint8_t *src3,
+                          uint8_t *dst, size_t n) {
+  size_t i = 0;
+  for (; i + 16 <= n; i += 16) {
+    uint8x16x4_t v;
+    v.val[0] = vld1q_u8(src0 + i);
+    v.val[1] = vld1q_u8(src1 + i);
+    v.val[2] = vld1q_u8(src2 + i);
+    v.val[3] = vld1q_u8(src3 + i);
+    vst4q_u8(dst + 4 * i, v);
+  }
+  combine4_scalar_from(src0, src1, src2, src3, dst, i, n);
+}
+
+static void narrow32_16_neon(const uint8_t *src, size_t n, uint8_t *dst) {
+  size_t i = 0;
+  for (; i + 8 <= n; i += 8) {
+    uint16x4_t lo = vmovn_u32(vreinterpretq_u32_u8(vld1q_u8(src + 4 * i)));
+    uint16x4_t hi =
+        vmovn_u32(vreinterpretq_u32_u8(vld1q_u8(src + 4 * i + 16)));
+    vst1q_u8(dst + 2 * i, vreinterpretq_u8_u16(vcombine_u16(lo, hi)));
+  }
+  narrow32_16_scalar_from(src, i, n, dst);
+}
+
+static void narrow32_8_neon(const uint8_t *src, size_t n, uint8_t *dst) {
+  size_t i = 0;
+  for (; i + 8 <= n; i += 8) {
+    uint16x4_t lo = vmovn_u32(vreinterpretq_u32_u8(vld1q_u8(src + 4 * i)));
+    uint16x4_t hi =
+        vmovn_u32(vreinterpretq_u32_u8(vld1q_u8(src + 4 * i + 16)));
+    vst1_u8(dst + i, vmovn_u16(vcombine_u16(lo, hi)));
+  }
+  narrow32_8_scalar_from(src, i, n, dst);
+}
+
+static void widen16_32_neon(const uint8_t *src, size_t n, uint8_t *dst) {
+  size_t i = 0;
+  for (; i + 8 <= n; i += 8) {
+    uint16x8_t v = vreinterpretq_u16_u8(vld1q_u8(src + 2 * i));
+    vst1q_u8(dst + 4 * i, vreinterpretq_u8_u32(vmovl_u16(vget_low_u16(v))));
+    vst1q_u8(dst + 4 * i + 16,
+             vreinterpretq_u8_u32(vmovl_u16(vget_high_u16(v))));
+  }
+  widen16_32_scalar_from(src, i, n, dst);
+}
+
+static void widen8_32_neon(const uint8_t *src, size_t n, uint8_t *dst) {
+  size_t i = 0;
+  for (; i + 8 <= n; i += 8) {
+    uint16x8_t v = vmovl_u8(vld1_u8(src + i));
+    vst1q_u8(dst + 4 * i, vreinterpretq_u8_u32(vmovl_u16(vget_low_u16(v))));
+    vst1q_u8(dst + 4 * i + 16,
+             vreinterpretq_u8_u32(vmovl_u16(vget_high_u16(v))));
+  }
+  widen8_32_scalar_from(src, i, n, dst);
+}
+
+static void bits_neon(uint8_t *buf, size_t n, const bits_op *op) {
+  const int32x4_t shr = vdupq_n_s32(-op->shr); // negative is a right shift
+  const int32x4_t shl = vdupq_n_s32(op->shl);
+  const uint32x4_t shrMask = vdupq_n_u32(op->shrMask);
+  const uint32x4_t shlMask = vdupq_n_u32(op->shlMask);
+  const uint32x4_t keepMask = vdupq_n_u32(op->keepMask);
+  size_t i = 0;
+  for (; i + 4 <= n; i += 4) {
+    uint32x4_t u = vreinterpretq_u32_u8(vld1q_u8(buf + 4 * i));
+    uint32x4_t r = vorrq_u32(vorrq_u32(vandq_u32(vshlq_u32(u, shr), shrMask),
+                                       vandq_u32(vshlq_u32(u, shl), shlMask)),
+                             vandq_u32(u, keepMask));
+    vst1q_u8(buf + 4 * i, vreinterpretq_u8_u32(r));
+  }
+  bits_scalar_from(buf, i, n, op);
+}
+
+static const byte_group_kernels neon_kernels = {
+    split2_neon,      combine2_neon,    split4_neon,
+    combine4_neon,    narrow32_16_neon, narrow32_8_neon,
+    widen16_32_neon,  widen8_32_neon,   bits_neon,
+};
+
+#endif // ZIPNN_ARM
+
+///////////////////////////////////
+////////////  Dispatch ////////////
+///////////////////////////////////
+
+static const byte_group_kernels *kernels = &scalar_kernels;
+static int simdLevel = ZIPNN_SIMD_SCALAR;
+
+static const char *const LEVEL_NAMES[] = {"scalar", "sse2", "avx2", "neon"};
+
+// The kernels of a level, NULL if the CPU doesn't support it
+static const byte_group_kernels *level_kernels(int level) {
+  switch (level) {
+  case ZIPNN_SIMD_SCALAR:
+    return &scalar_kernels;
+#ifdef ZIPNN_X86
+  case ZIPNN_SIMD_SSE2:
+    return &sse2_kernels;
+  case ZIPNN_SIMD_AVX2:
+    __builtin_cpu_init();
+    return __builtin_cpu_supports("avx2") ? &avx2_kernels : NULL;
+#endif
+#ifdef ZIPNN_ARM
+  case ZIPNN_SIMD_NEON:
+    return &neon_kernels;
+#endif
+  default:
+    return NULL;
+  }
+}
+
+void zipnn_byte_group_init(void) {
+  const char *forced = getenv("ZIPNN_SIMD");
+  if (forced != NULL &&
+      zipnn_set_simd_level(zipnn_simd_level_from_name(forced)) == 0) {
+    return;
+  }
+  const int best[] = {ZIPNN_SIMD_AVX2, ZIPNN_SIMD_SSE2, ZIPNN_SIMD_NEON};
+  for (size_t i = 0; i < sizeof(best) / sizeof(best[0]); i++) {
+    if (zipnn_set_simd_level(best[i]) == 0) {
+      return;
+    }
+  }
+  zipnn_set_simd_level(ZIPNN_SIMD_SCALAR);
+}
+
+int zipnn_simd_level(void) { return simdLevel; }
+
+const char *zipnn_simd_level_name(int level) {
+  if (level < 0 || level >= (int)(sizeof(LEVEL_NAMES) / sizeof(LEVEL_NAMES[0])))
+    return NULL;
+  return LEVEL_NAMES[level];
+}
+
+int zipnn_simd_level_from_name(const char *name) {
+  for (int level = 0;
+       level < (int)(sizeof(LEVEL_NAMES) / sizeof(LEVEL_NAMES[0])); level++) {
+    if (strcmp(name, LEVEL_NAMES[level]) == 0)
+      return level;
+  }
+  return -1;
+}
+
+int zipnn_set_simd_level(int level) {
+  const byte_group_kernels *k = level_kernels(level);
+  if (k == NULL) {
+    return -1;
+  }
+  kernels = k;
+  simdLevel = level;
+  return 0;
+}
+
+void zipnn_split2(const uint8_t *src, size_t n, uint8_t *dst0, uint8_t *dst1) {
+  kernels->split2(src, n, dst0, dst1);
+}
+
+void zipnn_combine2(const uint8_t *src0, const uint8_t *src1, uint8_t *dst,
+                    size_t n) {
+  kernels->combine2(src0, src1, dst, n);
+}
+
+void zipnn_split4(const uint8_t *src, size_t n, uint8_t *dst0, uint8_t *dst1,
+                  uint8_t *dst2, uint8_t *dst3) {
+  kernels->split4(src, n, dst0, dst1, dst2, dst3);
+}
+
+void zipnn_combine4(const uint8_t *src0, const uint8_t *src1,
+                    const uint8_t *src2, const uint8_t *src3, uint8_t *dst,
+                    size_t n) {
+  kernels->combine4(src0, src1, src2, src3, dst, n);
+}
+
+void zipnn_narrow32_16(const uint8_t *src, size_t n, uint8_t *dst) {
+  kernels->narrow32_16(src, n, dst);
+}
+
+void zipnn_narrow32_8(const uint8_t *src, size_t n, uint8_t *dst) {
+  kernels->narrow32_8(src, n, dst);
+}
+
+void zipnn_widen16_32(const uint8_t *src, size_t n, uint8_t *dst) {
+  kernels->widen16_32(src, n, dst);
+}
+
+void zipnn_widen8_32(const uint8_t *src, size_t n, uint8_t *dst) {
+  kernels->widen8_32(src, n, dst);
+}
+
+void zipnn_reorder_bits16(uint8_t *buf, size_t n) {
+  kernels->bits(buf, n, &REORDER_BITS16);
+}
+
+void zipnn_revert_bits16(uint8_t *buf, size_t n) {
+  kernels->bits(buf, n, &REVERT_BITS16);
+}
+
+void zipnn_reorder_bits32(uint8_t *buf, size_t n) {
+  kernels->bits(buf, n, &REORDER_BITS32);
+}
+
+void zipnn_revert_bits32(uint8_t *buf, size_t n) {
+  kernels->bits(buf, n, &REVERT_BITS32);
+}
+
+void zipnn_reorder_bits8(uint8_t *buf, size_t n, int e5m2) {
+  kernels->bits(buf, n, e5m2 ? &REORDER_BITS8_E5M2 : &REORDER_BITS8_E4M3);
+  kernels->bits(buf, n, &SWAP_NIBBLES16);
+}
+
+void zipnn_revert_bits8(uint8_t *buf, size_t n, int e5m2) {
+  kernels->bits(buf, n, &SWAP_NIBBLES16);
+  kernels->bits(buf, n, e5m2 ? &REVERT_BITS8_E5M2 : &REVERT_BITS8_E4M3);
+}
+
+///////////////////////////////////
+/////////////  Delta //////////////
+///////////////////////////////////
+
+// Plain loops over the whole buffer, the compiler vectorizes them at -O3 for
+// every level so they don't need kernels of their own. The elements are read
+// with memcpy since the buffers don't need to be aligned.
+
+void zipnn_delta(uint8_t *buf, const uint8_t *base, size_t n, int delta,
+                 int elemSize) {
+  size_t i = 0;
+  if (delta == ZIPNN_DELTA_XOR) {
+    for (; i < n; i++) {
+      buf[i] ^= base[i];
+    }
+    return;
+  }
+  if (delta != ZIPNN_DELTA_SUB) {
+    return;
+  }
+  if (elemSize == 8) {
+    for (; i + 8 <= n; i += 8) {
+      uint64_t a, b;
+      memcpy(&a, buf + i, 8);
+      memcpy(&b, base + i, 8);
+      a -= b;
+      memcpy(buf + i, &a, 8);
+    }
+  } else if (elemSize == 4) {
+    for (; i + 4 <= n; i += 4) {
+      uint32_t a, b;
+      memcpy(&a, buf + i, 4);
+      memcpy(&b, base + i, 4);
+      a -= b;
+      memcpy(buf + i, &a, 4);
+    }
+  } else if (elemSize == 2) {
+    for (; i + 2 <= n; i += 2) {
+      uint16_t a, b;
+      memcpy(&a, buf + i, 2);
+      memcpy(&b, base + i, 2);
+      a -= b;
+      memcpy(buf + i, &a, 2);
+    }
+  }
+  for (; i < n; i++) { // 1 byte elements, and the tail
+    buf[i] -= base[i];
+  }
+}
+
+void zipnn_undelta(uint8_t *buf, const uint8_t *base, size_t n, int delta,
+                   int elemSize) {
+  size_t i = 0;
+  if (delta == ZIPNN_DELTA_XOR) {
+    zipnn_delta(buf, base, n, delta, elemSize);
+    return;
+  }
+  if (delta != ZIPNN_DELTA_SUB) {
+    return;
+  }
+  if (elemSize == 8) {
+    for (; i + 8 <= n; i += 8) {
+      uint64_t a, b;
+      memcpy(&a, buf + i, 8);
+      memcpy(&b, base + i, 8);
+      a += b;
+      memcpy(buf + i, &a, 8);
+    }
+  } else if (elemSize == 4) {
+    for (; i + 4 <= n; i += 4) {
+      uint32_t a, b;
+      memcpy(&a, buf + i, 4);
+      memcpy(&b, base + i, 4);
+      a += b;
+      memcpy(buf + i, &a, 4);
+    }
+  } else if (elemSize == 2) {
+    for (; i + 2 <= n; i += 2) {
+      uint16_t a, b;
+      memcpy(&a, buf + i, 2);
+      memcpy(&b, base + i, 2);
+      a += b;
+      memcpy(buf + i, &a, 2);
+    }
+  }
+  for (; i < n; i++) {
+    buf[i] += base[i];
+  }
+}
+
+///////////////////////////////////
+////////////  Zigzag //////////////
+///////////////////////////////////
+
+// Plain loops like the delta. The sign is moved to the LSB, so the high bytes
+// of small negative integers are zeros like the ones of small positive ones.
+
+void zipnn_zigzag(uint8_t *buf, size_t n, int elemSize) {
+  size_t i = 0;
+  if (elemSize == 4) {
+    for (; i + 4 <= n; i += 4) {
+      uint32_t a;
+      memcpy(&a, buf + i, 4);
+      a = (a << 1) ^ (uint32_t)-(a >> 31);
+      memcpy(buf + i, &a, 4);
+    }
+  } else if (elemSize == 2) {
+    for (; i + 2 <= n; i += 2) {
+      uint16_t a;
+      memcpy(&a, buf + i, 2);
+      a = (uint16_t)((a << 1) ^ -(a >> 15));
+      memcpy(buf + i, &a, 2);
+    }
+  }
+}
+
+void zipnn_unzigzag(uint8_t *buf, size_t n, int elemSize) {
+  size_t i = 0;
+  if (elemSize == 4) {
+    for (; i + 4 <= n; i += 4) {
+      uint32_t a;
+      memcpy(&a, buf + i, 4);
+      a = (a >> 1) ^ (uint32_t)-(a & 1);
+      memcpy(buf + i, &a, 4);
+    }
+  } else if (elemSize == 2) {
+    for (; i + 2 <= n; i += 2) {
+      uint16_t a;
+      memcpy(&a, buf + i, 2);
+      a = (uint16_t)((a >> 1) ^ -(a & 1));
+      memcpy(buf + i, &a, 2);
+    }
+  }
+}
+
+///////////////////////////////////
+////////////  64 bit //////////////
+///////////////////////////////////
+
+// Plain loops like the delta, float64 is not common enough for kernels of its
+// own. The sign bit is moved after the 11 bits of the exponent, like
+// zipnn_reorder_bits32 does for float32.
+
+#define BITS64_SIGN 0x8000000000000000ULL
+#define BITS64_EXPONENT 0x7FF0000000000000ULL
+#define BITS64_MANTISSA 0x000FFFFFFFFFFFFFULL
+
+void zipnn_split8(const uint8_t *src, size_t n, uint8_t *const dst[8]) {
+  for (size_t i = 0; i < n; i++) {
+    for (int b = 0; b < 8; b++) {
+      dst[b][i] = src[i * 8 + b];
+    }
+  }
+}
+
+void zipnn_combine8(const uint8_t *const src[8], uint8_t *dst, size_t n) {
+  for (size_t i = 0; i < n; i++) {
+    for (int b = 0; b < 8; b++) {
+      dst[i * 8 + b] = src[b][i];
+    }
+  }
+}
+
+void zipnn_reorder_bits64(uint8_t *buf, size_t n) {
+  for (size_t i = 0; i < n; i++) {
+    uint64_t a;
+    memcpy(&a, buf + i * 8, 8);
+    a = ((a & BITS64_EXPONENT) << 1) | ((a & BITS64_SIGN) >> 11) |
+        (a & BITS64_MANTISSA);
+    memcpy(buf + i * 8, &a, 8);
+  }
+}
+
+void zipnn_revert_bits64(uint8_t *buf, size_t n) {
+  for (size_t i = 0; i < n; i++) {
+    uint64_t a;
+    memcpy(&a, buf + i * 8, 8);
+    a = ((a >> 1) & BITS64_EXPONENT) | ((a << 11) & BITS64_SIGN) |
+        (a & BITS64_MANTISSA);
+    memcpy(buf + i * 8, &a, 8);
+  }
+}
+
+///////////////////////////////////
+//////////  Bitshuffle ////////////
+///////////////////////////////////
+
+// Every 8 bytes are a matrix of 8x8 bits, it is transposed with the three
+// swaps of Hacker's Delight (transpose8), which is its own inverse. A plain
+// loop over 64 bit words, the compiler vectorizes it at -O3.
+
+static inline uint64_t transpose8x8(uint64_t x) {
+  uint64_t t;
+  t = (x ^ (x >> 7)) & 0x00AA00AA00AA00AAULL;
+  x = x ^ t ^ (t << 7);
+  t = (x ^ (x >> 14)) & 0x0000CCCC0000CCCCULL;
+  x = x ^ t ^ (t << 14);
+  t = (x ^ (x >> 28)) & 0x00000000F0F0F0F0ULL;
+  x = x ^ t ^ (t << 28);
+  return x;
+}
+
+void zipnn_bitshuffle(const uint8_t *src, size_t n, uint8_t *dst) {
+  size_t planeLen = n / 8;
+  for (size_t j = 0; j < planeLen; j++) {
+    uint64_t x;
+    memcpy(&x, src + j * 8, 8);
+    x = transpose8x8(x);
+    for (int k = 0; k < 8; k++) {
+      dst[k * planeLen + j] = (uint8_t)(x >> (8 * k));
+    }
+  }
+  memcpy(dst + planeLen * 8, src + planeLen * 8, n - planeLen * 8);
+}
+
+void zipnn_bitunshuffle(const uint8_t *src, size_t n, uint8_t *dst) {
+  size_t planeLen = n / 8;
+  for (size_t j = 0; j < planeLen; j++) {
+    uint64_t x = 0;
+    for (int k = 0; k < 8; k++) {
+      x |= (uint64_t)src[k * planeLen + j] << (8 * k);
+    }
+    x = transpose8x8(x);
+    memcpy(dst + j * 8, &x, 8);
+  }
+  memcpy(dst + planeLen * 8, src + planeLen * 8, n - planeLen * 8);
+}
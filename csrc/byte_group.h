@@ -0,0 +1,100 @@
+#ifndef ZIPNN_BYTE_GROUP_H
+#define ZIPNN_BYTE_GROUP_H
+
+#include <stddef.h>
+#include <stdint.h>
+
+// Byte grouping kernels. Every kernel has a scalar version and SIMD versions
+// (SSE2/AVX2 on x86-64, NEON on aarch64) that produce the same output, the
+// best one the CPU supports is chosen at runtime.
+// n is the number of elements (16 or 32 bits), the buffers don't need to be
+// aligned and must not overlap.
+
+enum {
+  ZIPNN_SIMD_SCALAR = 0,
+  ZIPNN_SIMD_SSE2 = 1,
+  ZIPNN_SIMD_AVX2 = 2,
+  ZIPNN_SIMD_NEON = 3,
+};
+
+// Chooses the kernels, the environment variable ZIPNN_SIMD (scalar, sse2,
+// avx2, neon) can force a level that the CPU supports.
+void zipnn_byte_group_init(void);
+
+// Current level and its name
+int zipnn_simd_level(void);
+const char *zipnn_simd_level_name(int level);
+// Returns 0, or -1 if the level is unknown or not supported by the CPU
+int zipnn_set_simd_level(int level);
+int zipnn_simd_level_from_name(const char *name);
+
+// 16 bit elements <-> 2 groups, a NULL dst skips the group and a NULL src
+// combines zeros
+void zipnn_split2(const uint8_t *src, size_t n, uint8_t *dst0, uint8_t *dst1);
+void zipnn_combine2(const uint8_t *src0, const uint8_t *src1, uint8_t *dst,
+                    size_t n);
+
+// 32 bit elements <-> 4 groups
+void zipnn_split4(const uint8_t *src, size_t n, uint8_t *dst0, uint8_t *dst1,
+                  uint8_t *dst2, uint8_t *dst3);
+void zipnn_combine4(const uint8_t *src0, const uint8_t *src1,
+                    const uint8_t *src2, const uint8_t *src3, uint8_t *dst,
+                    size_t n);
+
+// 32 bit elements <-> their 2 (or 1) low bytes
+void zipnn_narrow32_16(const uint8_t *src, size_t n, uint8_t *dst);
+void zipnn_narrow32_8(const uint8_t *src, size_t n, uint8_t *dst);
+void zipnn_widen16_32(const uint8_t *src, size_t n, uint8_t *dst);
+void zipnn_widen8_32(const uint8_t *src, size_t n, uint8_t *dst);
+
+// Bit ordering of n 32 bit words in place - the exponent is moved before the
+// sign bit of every bfloat16/float16 pair (bits16) or float32 (bits32)
+void zipnn_reorder_bits16(uint8_t *buf, size_t n);
+void zipnn_revert_bits16(uint8_t *buf, size_t n);
+void zipnn_reorder_bits32(uint8_t *buf, size_t n);
+void zipnn_revert_bits32(uint8_t *buf, size_t n);
+
+// Bit ordering of n 32 bit words (4 float8) in place - the exponent is moved
+// before the sign bit of every float8, and the nibbles of every pair are
+// regrouped so the low byte holds the sign and mantissa bits and the high
+// byte the exponents (of float8_e5m2 without its LSB, which stays in the low
+// byte). e5m2 - float8_e5m2, otherwise float8_e4m3fn
+void zipnn_reorder_bits8(uint8_t *buf, size_t n, int e5m2);
+void zipnn_revert_bits8(uint8_t *buf, size_t n, int e5m2);
+
+// Delta of n bytes against a base of the same length, in place. XOR of every
+// byte, or the difference of every elemSize (1, 2, 4 or 8) bytes little endian
+// unsigned element, modulo its width. undelta reverts it with the same base.
+enum {
+  ZIPNN_DELTA_NONE = 0,
+  ZIPNN_DELTA_XOR = 1,
+  ZIPNN_DELTA_SUB = 2,
+};
+
+void zipnn_delta(uint8_t *buf, const uint8_t *base, size_t n, int delta,
+                 int elemSize);
+void zipnn_undelta(uint8_t *buf, const uint8_t *base, size_t n, int delta,
+                   int elemSize);
+
+// Zigzag of the elemSize (2 or 4) bytes little endian signed integers of n
+// bytes in place, (x << 1) ^ (x >> (bits - 1)), and back. Used as bits_mode
+// 4 of the split and combine functions.
+void zipnn_zigzag(uint8_t *buf, size_t n, int elemSize);
+void zipnn_unzigzag(uint8_t *buf, size_t n, int elemSize);
+
+// 64 bit elements <-> 8 groups (plain loops without SIMD versions)
+void zipnn_split8(const uint8_t *src, size_t n, uint8_t *const dst[8]);
+void zipnn_combine8(const uint8_t *const src[8], uint8_t *dst, size_t n);
+
+// Bit ordering of n float64 in place - the exponent is moved before the sign
+// bit
+void zipnn_reorder_bits64(uint8_t *buf, size_t n);
+void zipnn_revert_bits64(uint8_t *buf, size_t n);
+
+// Bit planes of n bytes: plane k (n / 8 bytes) has bit k of every byte, so
+// a byte group whose high bits are mostly the same gets runs of equal bytes.
+// The last n % 8 bytes are copied as is. unshuffle reverts it.
+void zipnn_bitshuffle(const uint8_t *src, size_t n, uint8_t *dst);
+void zipnn_bitunshuffle(const uint8_t *src, size_t n, uint8_t *dst);
+
+#endif // ZIPNN_BYTE_GROUP_H
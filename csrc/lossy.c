@@ -0,0 +1,157 @@
+#include "lossy.h"
+#include <math.h>
+#include <string.h>
+
+// Plain loops like the delta, the compiler vectorizes what it can. The
+// elements are read with memcpy since the buffers don't need to be aligned.
+
+static inline float bf16_to_float(uint16_t h) {
+  uint32_t u = (uint32_t)h << 16;
+  float f;
+  memcpy(&f, &u, 4);
+  return f;
+}
+
+static inline uint16_t float_to_bf16(float f) {
+  uint32_t u;
+  memcpy(&u, &f, 4);
+  u += 0x7FFF + ((u >> 16) & 1); // round to nearest even, f is finite
+  return (uint16_t)(u >> 16);
+}
+
+static inline float f16_to_float(uint16_t h) {
+  uint32_t sign = (uint32_t)(h & 0x8000) << 16;
+  uint32_t exp = (h >> 10) & 0x1F, man = h & 0x3FF;
+  uint32_t u;
+  float f;
+  if (exp == 0x1F) {
+    u = sign | 0x7F800000 | (man << 13);
+  } else if (exp != 0) {
+    u = sign | ((exp + 112) << 23) | (man << 13);
+  } else { // zero or subnormal, man * 2^-24
+    f = (float)man * 5.9604644775390625e-8f;
+    memcpy(&u, &f, 4);
+    u |= sign;
+  }
+  memcpy(&f, &u, 4);
+  return f;
+}
+
+static inline uint16_t float_to_f16(float f) {
+  uint32_t u;
+  memcpy(&u, &f, 4);
+  uint16_t sign = (u >> 16) & 0x8000;
+  u &= 0x7FFFFFFF;
+  if (u >= 0x47800000) { // 2^16 and above, Inf and NaN
+    return sign | (u > 0x7F800000 ? 0x7E00 : 0x7C00);
+  }
+  if (u < 0x38800000) { // below 2^-14 - subnormal, round(|f| * 2^24)
+    float a;
+    memcpy(&a, &u, 4);
+    return sign | (uint16_t)rintf(a * 16777216.0f);
+  }
+  u += 0xFFF + ((u >> 13) & 1); // round to nearest even of 10 bits
+  return sign | (uint16_t)((u - (112u << 23)) >> 13);
+}
+
+// Rounds the mantissa of x (expMask - its exponent bits) to nearest even
+// without its low drop bits
+static inline uint32_t round_mantissa(uint32_t x, uint32_t expMask,
+                                      int drop) {
+  if ((x & expMask) == expMask) { // Inf/NaN
+    return x;
+  }
+  uint32_t mask = (1u << drop) - 1;
+  uint32_t r = (x + (mask >> 1) + ((x >> drop) & 1)) & ~mask;
+  if ((r & expMask) == expMask) { // rounded up to Inf
+    r = x & ~mask;
+  }
+  return r;
+}
+
+static void truncate_mantissa32(uint8_t *buf, size_t n, int keep) {
+  int drop = 23 - keep;
+  if (keep < 0 || drop <= 0) {
+    return;
+  }
+  for (size_t i = 0; i < n; i++) {
+    uint32_t x;
+    memcpy(&x, buf + 4 * i, 4);
+    x = round_mantissa(x, 0x7F800000, drop);
+    memcpy(buf + 4 * i, &x, 4);
+  }
+}
+
+static void truncate_mantissa16(uint8_t *buf, size_t n, int keep,
+                                int format) {
+  int bits = format == ZIPNN_LOSSY_FLOAT16 ? 10 : 7;
+  uint32_t expMask = format == ZIPNN_LOSSY_FLOAT16 ? 0x7C00 : 0x7F80;
+  int drop = bits - keep;
+  if (keep < 0 || drop <= 0) {
+    return;
+  }
+  for (size_t i = 0; i < n; i++) {
+    uint16_t x;
+    memcpy(&x, buf + 2 * i, 2);
+    x = (uint16_t)round_mantissa(x, expMask, drop);
+    memcpy(buf + 2 * i, &x, 2);
+  }
+}
+
+void zipnn_lossy(uint8_t *buf, size_t len, int lossy, int factor,
+                 int format) {
+  if (lossy == ZIPNN_LOSSY_MANTISSA) {
+    if (format == ZIPNN_LOSSY_FLOAT32) {
+      truncate_mantissa32(buf, len / 4, factor);
+    } else {
+      truncate_mantissa16(buf, len / 2, factor, format);
+    }
+    return;
+  }
+  if (lossy != ZIPNN_LOSSY_INTEGER) {
+    return;
+  }
+  float scale = ldexpf(1.0f, factor);
+  if (format == ZIPNN_LOSSY_FLOAT32) {
+    for (size_t i = 0; i < len / 4; i++) {
+      float f;
+      memcpy(&f, buf + 4 * i, 4);
+      int32_t q = (int32_t)rintf(f * scale);
+      memcpy(buf + 4 * i, &q, 4);
+    }
+  } else {
+    for (size_t i = 0; i < len / 2; i++) {
+      uint16_t h;
+      memcpy(&h, buf + 2 * i, 2);
+      float f = format == ZIPNN_LOSSY_FLOAT16 ? f16_to_float(h)
+                                              : bf16_to_float(h);
+      int16_t q = (int16_t)rintf(f * scale);
+      memcpy(buf + 2 * i, &q, 2);
+    }
+  }
+}
+
+void zipnn_unlossy(uint8_t *buf, size_t len, int lossy, int factor,
+                   int format) {
+  if (lossy != ZIPNN_LOSSY_INTEGER) {
+    return;
+  }
+  float inv = ldexpf(1.0f, -factor);
+  if (format == ZIPNN_LOSSY_FLOAT32) {
+    for (size_t i = 0; i < len / 4; i++) {
+      int32_t q;
+      memcpy(&q, buf + 4 * i, 4);
+      float f = (float)q * inv;
+      memcpy(buf + 4 * i, &f, 4);
+    }
+  } else {
+    for (size_t i = 0; i < len / 2; i++) {
+      int16_t q;
+      memcpy(&q, buf + 2 * i, 2);
+      float f = (float)q * inv;
+      uint16_t h =
+          format == ZIPNN_LOSSY_FLOAT16 ? float_to_f16(f) : float_to_bf16(f);
+      memcpy(buf + 2 * i, &h, 2);
+    }
+  }
+}
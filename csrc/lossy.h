@@ -0,0 +1,35 @@
+#ifndef ZIPNN_LOSSY_H
+#define ZIPNN_LOSSY_H
+
+#include <stddef.h>
+#include <stdint.h>
+
+// Near lossless compression of floats, done in place on every chunk before
+// it is split to byte groups, and reverted after the chunk is combined.
+// The types are the same values as EnumLossy.
+
+enum {
+  ZIPNN_LOSSY_NONE = 0,
+  // Fixed point - every float x is replaced by the integer of the same width
+  // round(x * 2^factor), the caller checks that they fit. Reverted to
+  // q / 2^factor in the float format.
+  ZIPNN_LOSSY_INTEGER = 1,
+  // The mantissa is rounded (to nearest even) to its factor high bits and
+  // the rest are zeros. There is nothing to revert. Inf/NaN are kept, and a
+  // float isn't rounded up to Inf.
+  ZIPNN_LOSSY_MANTISSA = 3,
+};
+
+// The float formats
+enum {
+  ZIPNN_LOSSY_FLOAT32 = 0,
+  ZIPNN_LOSSY_BFLOAT16 = 1,
+  ZIPNN_LOSSY_FLOAT16 = 2,
+};
+
+// len is in bytes, a whole number of elements of the format
+void zipnn_lossy(uint8_t *buf, size_t len, int lossy, int factor, int format);
+void zipnn_unlossy(uint8_t *buf, size_t len, int lossy, int factor,
+                   int format);
+
+#endif // ZIPNN_LOSSY_H
@@ -0,0 +1,90 @@
+#include "parallel.h"
+#include <pthread.h>
+#include <stdlib.h>
+#include <unistd.h>
+
+typedef struct {
+  size_t numTasks;
+  zipnn_task_fn fn;
+  void *ctx;
+  size_t nextTask; // shared, taken with __atomic_fetch_add
+  int error;       // shared, first error wins
+} pool_state;
+
+typedef struct {
+  pool_state *state;
+  int worker;
+} worker_arg;
+
+static void run_tasks(pool_state *state, int worker) {
+  for (;;) {
+    if (__atomic_load_n(&state->error, __ATOMIC_ACQUIRE) != 0) {
+      return;
+    }
+    size_t task = __atomic_fetch_add(&state->nextTask, 1, __ATOMIC_RELAXED);
+    if (task >= state->numTasks) {
+      return;
+    }
+    int ret = state->fn(state->ctx, task, worker);
+    if (ret != 0) {
+      int expected = 0;
+      __atomic_compare_exchange_n(&state->error, &expected, ret, 0,
+                                  __ATOMIC_RELEASE, __ATOMIC_RELAXED);
+      return;
+    }
+  }
+}
+
+static void *worker_main(void *arg) {
+  worker_arg *warg = (worker_arg *)arg;
+  run_tasks(warg->state, warg->worker);
+  return NULL;
+}
+
+int zipnn_num_workers(int threads, size_t numTasks) {
+  long workers = threads;
+  if (workers <= 0) {
+    workers = sysconf(_SC_NPROCESSORS_ONLN);
+    if (workers <= 0) {
+      workers = 1;
+    }
+  }
+  if ((size_t)workers > numTasks) {
+    workers = (long)numTasks;
+  }
+  return workers > 0 ? (int)workers : 1;
+}
+
+int zipnn_parallel_for(size_t numTasks, int numWorkers, zipnn_task_fn fn,
+                       void *ctx) {
+  pool_state state = {numTasks, fn, ctx, 0, 0};
+
+  if (numWorkers <= 1 || numTasks <= 1) {
+    run_tasks(&state, 0);
+    return state.error;
+  }
+
+  pthread_t *tids = malloc(sizeof(pthread_t) * (numWorkers - 1));
+  worker_arg *args = malloc(sizeof(worker_arg) * (numWorkers - 1));
+  int started = 0;
+  if (tids != NULL && args != NULL) {
+    for (int w = 1; w < numWorkers; w++) {
+      args[started].state = &state;
+      args[started].worker = w;
+      if (pthread_create(&tids[started], NULL, worker_main, &args[started]) !=
+          0) {
+        break; // the threads we already have (and this one) do the rest
+      }
+      started++;
+    }
+  }
+
+  run_tasks(&state, 0);
+
+  for (int t = 0; t < started; t++) {
+    pthread_join(tids[t], NULL);
+  }
+  free(tids);
+  free(args);
+  return state.error;
+}
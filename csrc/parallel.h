@@ -0,0 +1,22 @@
+#ifndef ZIPNN_PARALLEL_H
+#define ZIPNN_PARALLEL_H
+
+#include <stddef.h>
+
+// A task gets the shared context, the task index and the worker index
+// (0 <= worker < numWorkers) so it can use per-worker scratch buffers.
+// Returning non-zero stops the remaining tasks and is reported back.
+typedef int (*zipnn_task_fn)(void *ctx, size_t task, int worker);
+
+// Number of workers to use for numTasks tasks.
+// threads <= 0 - decide according to the number of online CPUs
+int zipnn_num_workers(int threads, size_t numTasks);
+
+// Run fn on tasks [0, numTasks) using numWorkers threads (the calling thread
+// is worker 0). Must be called without touching Python objects from fn, so it
+// is safe to call it between Py_BEGIN_ALLOW_THREADS/Py_END_ALLOW_THREADS.
+// Returns 0 on success or the first non-zero value returned by a task.
+int zipnn_parallel_for(size_t numTasks, int numWorkers, zipnn_task_fn fn,
+                       void *ctx);
+
+#endif // ZIPNN_PARALLEL_H
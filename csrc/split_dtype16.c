@@ -1,8 +1,16 @@
 #define PY_SSIZE_T_CLEAN
+#define HUF_STATIC_LINKING_ONLY
+#include "byte_group.h"
+#include "fse.h"
+#include "hist.h"
 #include "huf.h"
+#include "lossy.h"
+#include "parallel.h"
 #include "split_dtype_functions.h"
+#include "stats.h"
 #include <Python.h>
 #include <assert.h>
+#include <math.h>
 #include <stdint.h>
 #include <time.h>
 
@@ -10,79 +18,63 @@
 /// Split Helper Functions ///////
 //////////////////////////////////
 
-// Reordering function for float bits
-static uint32_t reorder_float_bits(float number) {
-  union {
-    float f;
-    uint32_t u;
-  } value = {.f = number};
-
-  uint32_t sign = (value.u >> 8) & 0x800080;
-  uint32_t exponent = (value.u << 1) & 0xFF00FF00;
-  uint32_t mantissa = (value.u) & 0x7F007F;
-  return exponent | sign | mantissa;
-}
-
 // Helper function to reorder all floats in a bytearray
-static void reorder_all_floats(u_int8_t *src, Py_ssize_t len) {
-  uint32_t *uint_array = (uint32_t *)src;
-  Py_ssize_t num_floats = len / sizeof(uint32_t);
-  for (Py_ssize_t i = 0; i < num_floats; i++) {
-    uint_array[i] = reorder_float_bits(*(float *)&uint_array[i]);
+static void reorder_all_floats(u_int8_t *src, Py_ssize_t len, int bits_mode) {
+  if (bits_mode == 4) {
+    zipnn_zigzag(src, len, 2);
+  } else if (bits_mode == 1) {
+    zipnn_reorder_bits16(src, len / sizeof(uint32_t));
+  } else {
+    zipnn_reorder_bits8(src, len / sizeof(uint32_t), bits_mode == 3);
   }
 }
 
 // Helper function to split a bytearray into groups
+// times (optional) - the stage times of the chunk, NULL to not time it
 static int split_bytearray(u_int8_t *src, Py_ssize_t len, u_int8_t **buffers,
                            int bits_mode, int bytes_mode, int is_review,
-                           int threads) {
-  if (bits_mode == 1) {  // reoreder exponent
-    reorder_all_floats(src, len);
+                           int threads, double *times) {
+  double start = times ? zipnn_now() : 0;
+  if (bits_mode != 0) {  // reoreder exponent
+    reorder_all_floats(src, len, bits_mode);
+  }
+  if (times) {
+    double now = zipnn_now();
+    times[ZIPNN_STAGE_BIT_REORDER] += now - start;
+    start = now;
   }
 
   Py_ssize_t half_len = len / 2;
   switch (bytes_mode) {
   case 10:  // 2b01_010 - Byte Group to two different groups
-    buffers[0] = PyMem_Malloc(half_len);
-    buffers[1] = PyMem_Malloc(half_len);
+    buffers[0] = malloc(half_len);
+    buffers[1] = malloc(half_len);
 
     if (buffers[0] == NULL || buffers[1] == NULL) {
-      PyMem_Free(buffers[0]);
-      PyMem_Free(buffers[1]);
+      free(buffers[0]);
+      free(buffers[1]);
       return -1;
     }
 
-    u_int8_t *dst0 = buffers[0];
-    u_int8_t *dst1 = buffers[1];
-
-    for (Py_ssize_t i = 0; i < len; i += 2) {
-      *dst0++ = src[i];
-      *dst1++ = src[i + 1];
-    }
+    zipnn_split2(src, half_len, buffers[0], buffers[1]);
     break;
 
   case 8:  // 4b1000 - Truncate MSByte
            // We are refering to the MSBbyte as little endian, thus we omit buf2
   case 1:  // 4b1000 - Truncate LSByte
     // We are refering to the LSByte  as a little endian, thus we omit buf1
-    buffers[0] = PyMem_Malloc(half_len);
+    buffers[0] = malloc(half_len);
     buffers[1] = NULL;
 
     if (buffers[0] == NULL) {
-      PyMem_Free(buffers[0]);
+      free(buffers[0]);
       return -1;
     }
 
-    dst0 = buffers[0];
-
     if (bytes_mode == 1) {
-      for (Py_ssize_t i = 0; i < len; i += 2) {
-        *dst0++ = src[i];
-      }
+      zipnn_split2(src, half_len, buffers[0], NULL);
     } else {
-      for (Py_ssize_t i = 0; i < len; i += 2) {
-        *dst0++ = src[i + 1];
-      }
+      zipnn_split2(src, half_len, NULL, buffers[0]);
     }
     break;
 
@@ -90,6 +82,9 @@ static int split_bytearray(u_int8_t *src, Py_ssize_t len, u_int8_t **buffers,
     // we are not support this splitting bytes_mode
     return -1;
   }
+  if (times) {
+    times[ZIPNN_STAGE_BYTE_SPLIT] += zipnn_now() - start;
+  }
   return 0;
 }
 
@@ -97,43 +92,28 @@ static int split_bytearray(u_int8_t *src, Py_ssize_t len, u_int8_t **buffers,
 /////////  Combine Functions //////
 ///////////////////////////////////
 
-// Reordering function for float bits
-static uint32_t revert_float_bits(float number) {
-  union {
-    float f;
-    uint32_t u;
-  } value = {.f = number};
-
-  uint32_t sign = (value.u << 8) & 0x80008000;
-  uint32_t exponent = (value.u >> 1) & 0x7F807F80;
-  uint32_t mantissa = (value.u) & 0x7F007F;
-  return sign | exponent | mantissa;
-}
-
 // Helper function to reorder all floats in a bytearray
-static void revert_all_floats(u_int8_t *src, Py_ssize_t len) {
-  uint32_t *uint_array = (uint32_t *)src;
-  Py_ssize_t num_floats = len / sizeof(uint32_t);
-  for (Py_ssize_t i = 0; i < num_floats; i++) {
-    uint_array[i] = revert_float_bits(*(float *)&uint_array[i]);
+static void revert_all_floats(u_int8_t *src, Py_ssize_t len, int bits_mode) {
+  if (bits_mode == 4) {
+    zipnn_unzigzag(src, len, 2);
+  } else if (bits_mode == 1) {
+    zipnn_revert_bits16(src, len / sizeof(uint32_t));
+  } else {
+    zipnn_revert_bits8(src, len / sizeof(uint32_t), bits_mode == 3);
   }
 }
 
 // Helper function to combine four buffers into a single bytearray
+// times (optional) - the stage times of the chunk, NULL to not time it
 static int combine_buffers(u_int8_t *buf1, u_int8_t *buf2, u_int8_t *combinePtr,
                            Py_ssize_t half_len, int bits_mode, int bytes_mode,
-                           int threads) {
+                           int threads, double *times) {
   Py_ssize_t total_len = half_len * 2;
-
-  u_int8_t *dst;
-  dst = combinePtr;
+  double start = times ? zipnn_now() : 0;
 
   switch (bytes_mode) {
   case 10: // 2b01_010 - Byte Group to two different groups
-    for (Py_ssize_t i = 0; i < half_len; i++) {
-      *dst++ = buf1[i];
-      *dst++ = buf2[i];
-    }
+    zipnn_combine2(buf1, buf2, combinePtr, half_len);
     break;
 
   case 8: // 4b1000 - Truncate MSByte
@@ -142,15 +122,9 @@ static int combine_buffers(u_int8_t *buf1, u_int8_t *buf2, u_int8_t *combinePtr,
           // We are refering to the LSByte as a little endian, thus we omit buf1
 
     if (bytes_mode == 8) {
-      for (Py_ssize_t i = 0; i < half_len; i++) {
-        *dst++ = 0;
-        *dst++ = buf1[i];
-      }
+      zipnn_combine2(NULL, buf1, combinePtr, half_len);
     } else {
-      for (Py_ssize_t i = 0; i < half_len; i++) {
-        *dst++ = buf1[i];
-        *dst++ = 0;
-      }
+      zipnn_combine2(buf1, NULL, combinePtr, half_len);
     }
     break;
 
@@ -158,30 +132,48 @@ static int combine_buffers(u_int8_t *buf1, u_int8_t *buf2, u_int8_t *combinePtr,
     // we are not supporting this splitting bytes_mode
     return -1;
   }
-  // printf("combinePtr %zu\n ",combinePtr);
-  // printf("dst %zu\n ", dst);
+  if (times) {
+    double now = zipnn_now();
+    times[ZIPNN_STAGE_BYTE_SPLIT] += now - start;
+    start = now;
+  }
   //  Revert the reordering of all floats if needed
-  if (bits_mode == 1) {
-    revert_all_floats(combinePtr, total_len);
+  if (bits_mode != 0) {
+    revert_all_floats(combinePtr, total_len, bits_mode);
+  }
+  if (times) {
+    times[ZIPNN_STAGE_BIT_REORDER] += zipnn_now() - start;
   }
   return 0;
 }
 
+// The type of a compressed chunk
+enum {
+  CHUNK_RAW = 0,        // not compressed
+  CHUNK_HUF = 1,        // Huffman, with its own table
+  CHUNK_HUF_SHARED = 2, // Huffman, with the shared table of its buffer
+  CHUNK_FSE = 3,        // FSE (tANS), with its own table
+};
+
+// The serialized Huffman table is at most 1 + 128 bytes
+#define SHARED_TABLE_MAX_LEN 256
+
 ///////////// helper function to prepare the split data
 //////////////////////////////////////
+// All the per chunk arrays are flat, [b * numChunks + c] is buffer b of chunk c
 u_int8_t *prepare_split_results(size_t header_len, size_t numBuf,
                                 size_t numChunks, u_int8_t *header,
-                                u_int8_t *compressedData[numBuf][numChunks],
-                                uint32_t compChunksSize[numBuf][numChunks],
-                                u_int8_t compChunksType[numBuf][numChunks],
-                                size_t cumulativeChunksSize[numBuf][numChunks],
+                                u_int8_t **compressedData,
+                                uint32_t *compChunksSize,
+                                u_int8_t *compChunksType,
+                                size_t *cumulativeChunksSize,
                                 size_t *totalCompressedSize,
+                                u_int8_t sharedTables[][SHARED_TABLE_MAX_LEN],
+                                size_t *sharedTablesLen,
                                 size_t *resBufSize) {
   *resBufSize = header_len;
-  size_t compChunksTypeLen =
-      numBuf * numChunks * (sizeof(compChunksType[numBuf][numChunks]));
-  size_t cumulativeChunksSizeLen =
-      numBuf * numChunks * (sizeof(cumulativeChunksSize[numBuf][numChunks]));
+  size_t compChunksTypeLen = numBuf * numChunks * sizeof(u_int8_t);
+  size_t cumulativeChunksSizeLen = numBuf * numChunks * sizeof(size_t);
   *resBufSize += compChunksTypeLen;
   *resBufSize += cumulativeChunksSizeLen;
   for (size_t b = 0; b < numBuf; b++) {
@@ -196,7 +188,6 @@ u_int8_t *prepare_split_results(size_t header_len, size_t numBuf,
     PyErr_SetString(
         PyExc_MemoryError,
         "Failed to allocate memory for result buffer in split function");
-    PyMem_Free(resultBuf);
     return NULL;
   }
 
@@ -209,25 +200,462 @@ u_int8_t *prepare_split_results(size_t header_len, size_t numBuf,
   memcpy(resultBuf + offset, cumulativeChunksSize, cumulativeChunksSizeLen);
   offset += cumulativeChunksSizeLen;
 
-  for (uint32_t b = 0; b < numBuf; b++) {
-    for (uint32_t c = 0; c < numChunks; c++) {
-      memcpy(resultBuf + offset, compressedData[b][c], compChunksSize[b][c]);
-      // printf("\n\n resultBuf + offset %zu\n\n\n ", resultBuf + offset);
-      offset += compChunksSize[b][c];
+  for (size_t b = 0; b < numBuf; b++) {
+    memcpy(resultBuf + offset, sharedTables[b], sharedTablesLen[b]);
+    offset += sharedTablesLen[b];
+    for (size_t c = 0; c < numChunks; c++) {
+      memcpy(resultBuf + offset, compressedData[b * numChunks + c],
+             compChunksSize[b * numChunks + c]);
+      offset += compChunksSize[b * numChunks + c];
     }
   }
 
   return resultBuf;
 }
 
+///////////////////////////////////
+/////////  Split Threads //////////
+///////////////////////////////////
+
+// Shared state of the split workers, each task is one bgChunk.
+// Every chunk writes only to its own slots, so the result does not depend on
+// the number of threads.
+typedef struct {
+  u_int8_t *src;
+  size_t srcLen;
+  const u_int8_t *base; // NULL - no delta
+  int delta;
+  int deltaSize;
+  int lossy; // ZIPNN_LOSSY_* of lossy.h
+  int lossyFactor;
+  int lossyFormat;
+  size_t bgChunkSize;
+  size_t numChunks;
+  size_t firstChunk; // tasks are chunks [firstChunk, firstChunk + numTasks)
+  uint32_t numBuf;
+  int bits_mode;
+  int bytes_mode;
+  int is_redata;
+  float compThreshold;
+  u_int8_t isCompress[2];   // per buffer - 0 to store the chunk as is
+  u_int8_t isFse[2];        // per buffer - compressed with FSE, not Huffman
+  int doSplit;              // the tasks split their chunks
+  int doCompress;           // the tasks compress their chunks
+  unsigned *counts;         // [c * numBuf + b][256] - histograms of the
+                            // chunks that the shared tables are built from
+  HUF_CElt *sharedCTable[2]; // per buffer - NULL if there is no shared table
+  double sharedCost[2];      // per buffer - bytes per symbol of the first
+                             // chunks with the shared table
+  u_int8_t **buffers;       // [c * numBuf + b] - the byte groups
+  u_int8_t **compressedData; // [b * numChunks + c]
+  uint32_t *compChunksSize;  // [b * numChunks + c]
+  uint32_t *unCompChunksSize; // [c]
+  u_int8_t *compChunksType;  // [b * numChunks + c]
+  double *times;             // [c * ZIPNN_NUM_STAGES + stage] - NULL if the
+                             // stages aren't timed
+  u_int8_t *skipped;         // [b * numChunks + c] - 1 if the chunk wasn't
+                             // compressed at all, NULL if not counted
+} split_ctx;
+
+// Compresses a chunk with the shared table of its buffer (CHUNK_HUF_SHARED),
+// or with its own table exactly like HUF_compress (CHUNK_HUF) when the shared
+// table can't encode the chunk or is estimated to be worse - the
+// distribution of the chunk drifted.
+// sharedCost is the bytes per symbol of the shared table on the chunks it was
+// built from, if the chunk costs about the same its own table isn't built.
+// Returns the compressed size like HUF_compress, 0 if not compressible.
+static size_t huf_compress_chunk(u_int8_t *dst, size_t dstCapacity,
+                                 const u_int8_t *src, size_t srcSize,
+                                 const HUF_CElt *shared, double sharedCost,
+                                 u_int8_t *chunkType) {
+  *chunkType = CHUNK_HUF;
+  if (shared == NULL) {
+    return HUF_compress(dst, dstCapacity, src, srcSize);
+  }
+  unsigned count[HUF_SYMBOLVALUE_MAX + 1];
+  unsigned ownTable[HUF_CTABLE_SIZE_U32(HUF_SYMBOLVALUE_MAX)];
+  unsigned wksp[HUF_WORKSPACE_SIZE_U32];
+  HUF_CElt *own = (HUF_CElt *)ownTable;
+  unsigned maxSymbolValue = HUF_SYMBOLVALUE_MAX;
+
+  // The same heuristics as HUF_compress
+  size_t largest = HIST_count_wksp(count, &maxSymbolValue, src, srcSize, wksp,
+                                   sizeof(wksp));
+  if (HIST_isError(largest)) {
+    return largest;
+  }
+  if (largest == srcSize) { // RLE
+    dst[0] = src[0];
+    return 1;
+  }
+  if (largest <= (srcSize >> 7) + 4) {
+    return 0;
+  }
+  int useShared = 0;
+  if (HUF_validateCTable(shared, count, maxSymbolValue)) {
+    size_t sharedSize =
+        HUF_estimateCompressedSize(shared, count, maxSymbolValue);
+    useShared = sharedSize <= srcSize * sharedCost * 1.02 + 8;
+  }
+  const HUF_CElt *table = shared;
+  size_t tableLen = 0;
+  if (!useShared) {
+    unsigned huffLog =
+        HUF_optimalTableLog(HUF_TABLELOG_DEFAULT, srcSize, maxSymbolValue);
+    size_t maxBits = HUF_buildCTable_wksp(own, count, maxSymbolValue,
+                                          huffLog, wksp, sizeof(wksp));
+    if (HUF_isError(maxBits)) {
+      return maxBits;
+    }
+    size_t hSize = HUF_writeCTable(dst, dstCapacity, own, maxSymbolValue,
+                                   (unsigned)maxBits);
+    if (HUF_isError(hSize)) {
+      return hSize;
+    }
+    // The same choice as HUF_compress4X_repeat
+    if (HUF_validateCTable(shared, count, maxSymbolValue) &&
+        (HUF_estimateCompressedSize(shared, count, maxSymbolValue) <=
+             hSize + HUF_estimateCompressedSize(own, count, maxSymbolValue) ||
+         hSize + 12 >= srcSize)) {
+      useShared = 1;
+    } else if (hSize + 12 >= srcSize) {
+      return 0;
+    } else {
+      table = own;
+      tableLen = hSize;
+    }
+  }
+  if (useShared) {
+    *chunkType = CHUNK_HUF_SHARED;
+  }
+  size_t cSize = HUF_compress4X_usingCTable(
+      dst + tableLen, dstCapacity - tableLen, src, srcSize, table);
+  if (HUF_isError(cSize) || cSize == 0) {
+    return cSize;
+  }
+  if (tableLen + cSize >= srcSize - 1) {
+    return 0;
+  }
+  return tableLen + cSize;
+}
+
+// Compresses a chunk with FSE (CHUNK_FSE). FSE_decompress can't decompress a
+// chunk of a single repeated byte, so like Huffman it is stored as that byte.
+// Returns the compressed size like HUF_compress, 0 if not compressible.
+static size_t fse_compress_chunk(u_int8_t *dst, size_t dstCapacity,
+                                 const u_int8_t *src, size_t srcSize) {
+  size_t compSize = FSE_compress(dst, dstCapacity, src, srcSize);
+  if (compSize == 1) { // RLE
+    dst[0] = src[0];
+  }
+  return compSize;
+}
+
+// Decompresses a chunk of fse_compress_chunk, returns the decompressed size
+// or an FSE error code.
+static size_t fse_decompress_chunk(u_int8_t *dst, size_t dstSize,
+                                   const u_int8_t *src, size_t srcSize) {
+  if (srcSize == 1) { // RLE
+    memset(dst, src[0], dstSize);
+    return dstSize;
+  }
+  return FSE_decompress(dst, dstSize, src, srcSize);
+}
+
+// Builds the shared table of a buffer from the histograms of chunks
+// [0, numChunks), and writes it to dst.
+// Returns the table, or NULL if the buffer has less than two symbols.
+static HUF_CElt *build_shared_table(split_ctx *ctx, uint32_t b,
+                                    size_t numChunks, u_int8_t *dst,
+                                    size_t *dstLen) {
+  uint64_t total[HUF_SYMBOLVALUE_MAX + 1] = {0};
+  unsigned count[HUF_SYMBOLVALUE_MAX + 1];
+  unsigned wksp[HUF_WORKSPACE_SIZE_U32];
+  uint64_t sum = 0;
+  unsigned maxSymbolValue = 0, numSymbols = 0;
+
+  for (size_t c = 0; c < numChunks; c++) {
+    const unsigned *chunkCount =
+        &ctx->counts[(c * ctx->numBuf + b) * (HUF_SYMBOLVALUE_MAX + 1)];
+    for (unsigned s = 0; s <= HUF_SYMBOLVALUE_MAX; s++) {
+      total[s] += chunkCount[s];
+    }
+  }
+  for (unsigned s = 0; s <= HUF_SYMBOLVALUE_MAX; s++) {
+    sum += total[s];
+    if (total[s] != 0) {
+      maxSymbolValue = s;
+      numSymbols++;
+    }
+  }
+  if (numSymbols < 2) {
+    return NULL;
+  }
+  // The counts are summed in 32 bits while the tree is built
+  unsigned shift = 0;
+  uint64_t scaledSum = 0;
+  while ((sum >> shift) > (1u << 30)) {
+    shift++;
+  }
+  for (unsigned s = 0; s <= maxSymbolValue; s++) {
+    count[s] = (unsigned)(total[s] >> shift);
+    if (total[s] != 0 && count[s] == 0) {
+      count[s] = 1;
+    }
+    scaledSum += count[s];
+  }
+
+  HUF_CElt *table = calloc(1, HUF_CTABLE_SIZE(HUF_SYMBOLVALUE_MAX));
+  if (table == NULL) {
+    return NULL;
+  }
+  unsigned huffLog = HUF_optimalTableLog(
+      HUF_TABLELOG_DEFAULT, ctx->bgChunkSize / ctx->numBuf, maxSymbolValue);
+  size_t maxBits = HUF_buildCTable_wksp(table, count, maxSymbolValue, huffLog,
+                                        wksp, sizeof(wksp));
+  if (HUF_isError(maxBits)) {
+    free(table);
+    return NULL;
+  }
+  *dstLen = HUF_writeCTable(dst, SHARED_TABLE_MAX_LEN, table, maxSymbolValue,
+                            (unsigned)maxBits);
+  if (HUF_isError(*dstLen)) {
+    free(table);
+    return NULL;
+  }
+  ctx->sharedCost[b] =
+      (double)HUF_estimateCompressedSize(table, count, maxSymbolValue) /
+      scaledSum;
+  return table;
+}
+
+static int split_chunk_task(void *arg, size_t task, int worker) {
+  (void)worker;
+  split_ctx *ctx = (split_ctx *)arg;
+  size_t c = ctx->firstChunk + task;
+  size_t offset = c * ctx->bgChunkSize;
+  size_t curBgChunkSize = (ctx->srcLen - offset > ctx->bgChunkSize)
+                              ? ctx->bgChunkSize
+                              : (ctx->srcLen - offset);
+  size_t curCompChunkSize = curBgChunkSize / ctx->numBuf;
+  u_int8_t **buffers = &ctx->buffers[c * ctx->numBuf];
+  double *times = ctx->times ? &ctx->times[c * ZIPNN_NUM_STAGES] : NULL;
+  double start;
+
+  if (ctx->doSplit) {
+    ctx->unCompChunksSize[c] = curCompChunkSize;
+    // The lossy conversion and the delta are done on the chunk before its
+    // bits are reordered, while it is in the cache
+    if (ctx->lossy != ZIPNN_LOSSY_NONE) {
+      start = times ? zipnn_now() : 0;
+      zipnn_lossy(ctx->src + offset, curBgChunkSize, ctx->lossy,
+                  ctx->lossyFactor, ctx->lossyFormat);
+      if (times) {
+        times[ZIPNN_STAGE_LOSSY] += zipnn_now() - start;
+      }
+    }
+    if (ctx->base != NULL) {
+      start = times ? zipnn_now() : 0;
+      zipnn_delta(ctx->src + offset, ctx->base + offset, curBgChunkSize,
+                  ctx->delta, ctx->deltaSize);
+      if (times) {
+        times[ZIPNN_STAGE_DELTA] += zipnn_now() - start;
+      }
+    }
+    // Byte Grouping + Byte Ordering
+    if (split_bytearray(ctx->src + offset, curBgChunkSize, buffers,
+                        ctx->bits_mode, ctx->bytes_mode, ctx->is_redata, 1,
+                        times) != 0) {
+      return -1;
+    }
+    // Histograms of the first chunks to build the shared tables from
+    if (!ctx->doCompress && ctx->counts != NULL) {
+      start = times ? zipnn_now() : 0;
+      for (uint32_t b = 0; b < ctx->numBuf; b++) {
+        unsigned maxSymbolValue = HUF_SYMBOLVALUE_MAX;
+        unsigned *count =
+            &ctx->counts[(c * ctx->numBuf + b) * (HUF_SYMBOLVALUE_MAX + 1)];
+        if (buffers[b] != NULL && ctx->isCompress[b] && !ctx->isFse[b] &&
+            curCompChunkSize > 0) {
+          HIST_count(count, &maxSymbolValue, buffers[b], curCompChunkSize);
+        }
+      }
+      if (times) {
+        times[ZIPNN_STAGE_ENTROPY] += zipnn_now() - start;
+      }
+    }
+  }
+  if (!ctx->doCompress) {
+    return 0;
+  }
+
+  // Compression on each Buf
+  start = times ? zipnn_now() : 0;
+  for (uint32_t b = 0; b < ctx->numBuf; b++) {
+    size_t idx = b * ctx->numChunks + c;
+    ctx->compressedData[idx] = NULL;
+    ctx->compChunksSize[idx] = 0;
+    ctx->compChunksType[idx] = CHUNK_RAW;
+    if (buffers[b] == NULL) {
+      continue;
+    }
+    if (ctx->skipped) {
+      ctx->skipped[idx] = !ctx->isCompress[b];
+    }
+
+    if (ctx->isCompress[b]) {
+      u_int8_t *dst = malloc(ctx->bgChunkSize);
+      if (dst == NULL) {
+        return -1;
+      }
+      u_int8_t chunkType = CHUNK_FSE;
+      size_t compSize;
+      if (ctx->isFse[b]) {
+        compSize = fse_compress_chunk(dst, ctx->bgChunkSize, buffers[b],
+                                      curCompChunkSize);
+      } else {
+        compSize = huf_compress_chunk(dst, ctx->bgChunkSize, buffers[b],
+                                      curCompChunkSize, ctx->sharedCTable[b],
+                                      ctx->sharedCost[b], &chunkType);
+      }
+      if (!HUF_isError(compSize) && compSize != 0 &&
+          ((uint32_t)compSize < ctx->unCompChunksSize[c] * ctx->compThreshold)) {
+        ctx->compChunksSize[idx] = compSize;
+        ctx->compChunksType[idx] = chunkType; // Compress with Huffman or FSE
+        ctx->compressedData[idx] = dst;
+        continue;
+      }
+      free(dst);
+    }
+    // the buffer was not compressed
+    ctx->compChunksSize[idx] = ctx->unCompChunksSize[c];
+    ctx->compChunksType[idx] = CHUNK_RAW; // not compressed
+    ctx->compressedData[idx] = buffers[b];
+  }
+  if (times) {
+    times[ZIPNN_STAGE_ENTROPY] += zipnn_now() - start;
+  }
+  return 0;
+}
+
+static void free_split_ctx(split_ctx *ctx) {
+  if (ctx->buffers != NULL) {
+    for (size_t i = 0; i < ctx->numChunks * ctx->numBuf; i++) {
+      free(ctx->buffers[i]);
+    }
+  }
+  if (ctx->compressedData != NULL && ctx->compChunksType != NULL) {
+    for (size_t i = 0; i < ctx->numChunks * ctx->numBuf; i++) {
+      if (ctx->compChunksType[i] != CHUNK_RAW) {
+        free(ctx->compressedData[i]);
+      }
+    }
+  }
+  for (uint32_t b = 0; b < ctx->numBuf; b++) {
+    free(ctx->sharedCTable[b]);
+  }
+  PyMem_Free(ctx->counts);
+  PyMem_Free(ctx->buffers);
+  PyMem_Free(ctx->compressedData);
+  PyMem_Free(ctx->compChunksSize);
+  PyMem_Free(ctx->unCompChunksSize);
+  PyMem_Free(ctx->compChunksType);
+  PyMem_Free(ctx->times);
+  PyMem_Free(ctx->skipped);
+}
+
+// Sets the counters of every buffer in stats: bytes_in (the byte group),
+// bytes_out (its stored size, with the shared table), chunks, chunks_raw
+// (compressed but stored as is since they didn't pass the threshold) and
+// chunks_skipped (stored as is without trying, since their buffer didn't pass
+// the threshold or isn't compressed).
+static int split_stats(PyObject *stats, split_ctx *ctx,
+                       size_t *totalCompressedSize) {
+  size_t bytesIn[2] = {0, 0}, chunks[2] = {0, 0};
+  size_t chunksRaw[2] = {0, 0}, chunksSkipped[2] = {0, 0};
+  for (uint32_t b = 0; b < ctx->numBuf; b++) {
+    for (size_t c = 0; c < ctx->numChunks; c++) {
+      size_t idx = b * ctx->numChunks + c;
+      if (ctx->buffers[c * ctx->numBuf + b] == NULL) {
+        continue;
+      }
+      bytesIn[b] += ctx->unCompChunksSize[c];
+      chunks[b]++;
+      if (ctx->compChunksType[idx] == CHUNK_RAW) {
+        if (ctx->skipped[idx]) {
+          chunksSkipped[b]++;
+        } else {
+          chunksRaw[b]++;
+        }
+      }
+    }
+  }
+  if (zipnn_stats_set_list(stats, "bytes_in", bytesIn, ctx->numBuf) != 0 ||
+      zipnn_stats_set_list(stats, "bytes_out", totalCompressedSize,
+                           ctx->numBuf) != 0 ||
+      zipnn_stats_set_list(stats, "chunks", chunks, ctx->numBuf) != 0 ||
+      zipnn_stats_set_list(stats, "chunks_raw", chunksRaw, ctx->numBuf) != 0 ||
+      zipnn_stats_set_list(stats, "chunks_skipped", chunksSkipped,
+                           ctx->numBuf) != 0) {
+    return -1;
+  }
+  return zipnn_stats_add_times(stats, ctx->times, ctx->numChunks);
+}
+
 /////////////////////////////////////////////////////////////
 //////////////// Python callable Functions /////////////////
 /////////////////////////////////////////////////////////////
 
+// See split_dtype_functions.h
+int zipnn_delta_arg(const Py_buffer *base, size_t len, int delta) {
+  if (base->obj == NULL) {
+    return 0;
+  }
+  if ((size_t)base->len != len) {
+    PyErr_SetString(PyExc_ValueError,
+                    "The delta base must be as long as the data");
+    return -1;
+  }
+  if (delta != ZIPNN_DELTA_XOR && delta != ZIPNN_DELTA_SUB) {
+    PyErr_SetString(PyExc_ValueError, "Unsupported delta type");
+    return -1;
+  }
+  return 0;
+}
+
+// See split_dtype_functions.h
+int zipnn_lossy_arg(int lossy, int factor, int format, int elemSize) {
+  if (lossy == ZIPNN_LOSSY_NONE) {
+    return 0;
+  }
+  if (lossy != ZIPNN_LOSSY_INTEGER && lossy != ZIPNN_LOSSY_MANTISSA) {
+    PyErr_SetString(PyExc_ValueError, "Unsupported lossy type");
+    return -1;
+  }
+  int formatSize = format == ZIPNN_LOSSY_FLOAT32 ? 4 : 2;
+  if ((format != ZIPNN_LOSSY_FLOAT32 && format != ZIPNN_LOSSY_BFLOAT16 &&
+       format != ZIPNN_LOSSY_FLOAT16) ||
+      formatSize != elemSize) {
+    PyErr_SetString(PyExc_ValueError, "Unsupported lossy format");
+    return -1;
+  }
+  if (factor < 0 || factor > 31) {
+    PyErr_SetString(PyExc_ValueError, "The lossy factor must be 0 to 31");
+    return -1;
+  }
+  return 0;
+}
+
 // Python callable function to split a bytearray into four buffers
 // bits_mode:
 //     0 - no ordering of the bits
 //     1 - reorder of the exponent (eponent, sign_bit, mantissa)
+//     2, 3 - the data is pairs of float8_e4m3fn (2) or float8_e5m2 (3),
+//     the exponent of every float8 is reordered and the nibbles of every pair
+//     are regrouped, so with bytes_mode 10 the first buffer is the sign and
+//     mantissa bits and the second one the exponents (see
+//     zipnn_reorder_bits8)
+//     4 - the data is int16, the sign is moved to the LSB (see zipnn_zigzag)
 // bytes_mode:
 //     [we are refering to the bytes order as first 2bits refer to the MSByte
 //     and the second two bits to the LSByte] 2b [MSB Byte],2b[LSB Byte] 0 -
@@ -238,302 +666,1148 @@ u_int8_t *prepare_split_results(size_t header_len, size_t numBuf,
 //     Even if you have the Byte mode, you can change it if needed.
 //     0 - No review, take the bit_mode and byte_mode
 //     1 - the finction can change the Bytes_mode
-
-PyObject *py_split_dtype16(PyObject *self, PyObject *args) {
+// threads:
+//     Number of threads, each one takes a different bgChunk.
+//     0 - decide according to the number of CPUs.
+//     The output is the same for any number of threads.
+// shared_table (optional, default 1):
+//     1 - build one Huffman table per buffer from the first chunks (the ones
+//     the threshold is checked on) and store it once, the chunks use it
+//     unless their own table is better.
+//     0 - every chunk has its own table.
+// compress_groups (optional, default 3):
+//     Bit b set - compress buffer b with Huffman, otherwise all its chunks
+//     are stored as is without trying to compress them.
+// fse_groups (optional keyword, default 0):
+//     Bit b set - compress buffer b with FSE (tANS) instead of Huffman, if it
+//     is in compress_groups. Its chunks have their own tables.
+// stats (optional keyword, default None):
+//     A dict to add the stage times and the counters of every buffer to, see
+//     stats.h and split_stats.
+// base, delta, delta_size (optional keywords, default None, 0, 2):
+//     A buffer of the same length as data to take the delta against before
+//     the bits are reordered, delta is ZIPNN_DELTA_XOR or ZIPNN_DELTA_SUB on
+//     elements of delta_size bytes (see zipnn_delta). Like the bits, the
+//     delta is done in place on data.
+// lossy, lossy_factor, lossy_format (optional keywords, default 0, 0, 1):
+//     A lossy conversion of the floats of every chunk before its delta is
+//     taken, lossy is ZIPNN_LOSSY_INTEGER or ZIPNN_LOSSY_MANTISSA with the
+//     factor bits, on floats of lossy_format (see lossy.h). It is done in
+//     place on data as well.
+
+PyObject *py_split_dtype16(PyObject *self, PyObject *args, PyObject *kwargs) {
+  static char *kwlist[] = {"header",        "data",
+                           "bits_mode",     "bytes_mode",
+                           "is_review",     "chunk_size",
+                           "threshold",     "check_th_after_percent",
+                           "threads",       "shared_table",
+                           "compress_groups", "stats",
+                           "base",          "delta",
+                           "delta_size",    "lossy",
+                           "lossy_factor",  "lossy_format",
+                           "fse_groups",    NULL};
   const uint32_t numBuf = 2;
   Py_buffer header, data;
+  Py_buffer base = {.buf = NULL, .obj = NULL};
   int bits_mode, bytes_mode, is_redata, checkThAfterPercent, threads;
+  int sharedTable = 1;
+  int compressGroups = 0x3;
+  int fseGroups = 0;
+  int delta = ZIPNN_DELTA_NONE, deltaSize = 2;
+  int lossy = ZIPNN_LOSSY_NONE, lossyFactor = 0;
+  int lossyFormat = ZIPNN_LOSSY_BFLOAT16;
   size_t bgChunkSize;
   float compThreshold;
-  // u_int8_t isPrint = 0;
-  // clock_t startTime, endTime, startBGTime, endBGTime;
-  // startTime = clock();
-
-  if (!PyArg_ParseTuple(args, "y*y*iiinfii", &header, &data, &bits_mode,
-                        &bytes_mode, &is_redata, &bgChunkSize, &compThreshold,
-                        &checkThAfterPercent, &threads)) {
+  PyObject *statsArg = NULL, *stats;
+
+  if (!PyArg_ParseTupleAndKeywords(
+          args, kwargs, "y*y*iiinfii|ii$Oy*iiiiii", kwlist, &header, &data,
+          &bits_mode, &bytes_mode, &is_redata, &bgChunkSize, &compThreshold,
+          &checkThAfterPercent, &threads, &sharedTable, &compressGroups,
+          &statsArg, &base, &delta, &deltaSize, &lossy, &lossyFactor,
+          &lossyFormat, &fseGroups)) {
+    return NULL;
+  }
+  if (zipnn_stats_arg(statsArg, &stats) != 0 ||
+      zipnn_delta_arg(&base, data.len, delta) != 0 ||
+      zipnn_lossy_arg(lossy, lossyFactor, lossyFormat, 2) != 0) {
+    PyBuffer_Release(&base);
+    PyBuffer_Release(&header);
+    PyBuffer_Release(&data);
     return NULL;
   }
 
   // Byte Group per chunk, Compress per bufChunk
   size_t numChunks = (data.len + bgChunkSize - 1) / bgChunkSize;
-  u_int8_t *buffers[numChunks][numBuf];
-  size_t curChunk = 0;
-
-  u_int8_t *compressedData[numBuf][numChunks];
-  uint32_t compChunksSize[numBuf][numChunks];
-  uint32_t unCompChunksSize[numChunks];
+  size_t numSlots = numChunks * numBuf;
+  split_ctx ctx = {.src = data.buf,
+                   .srcLen = data.len,
+                   .base = base.buf,
+                   .delta = delta,
+                   .deltaSize = deltaSize,
+                   .lossy = lossy,
+                   .lossyFactor = lossyFactor,
+                   .lossyFormat = lossyFormat,
+                   .bgChunkSize = bgChunkSize,
+                   .numChunks = numChunks,
+                   .numBuf = numBuf,
+                   .bits_mode = bits_mode,
+                   .bytes_mode = bytes_mode,
+                   .is_redata = is_redata,
+                   .compThreshold = compThreshold,
+                   .isCompress = {compressGroups & 1, (compressGroups >> 1) & 1},
+                   .isFse = {fseGroups & 1, (fseGroups >> 1) & 1}};
+  ctx.buffers = PyMem_Calloc(numSlots + 1, sizeof(u_int8_t *));
+  ctx.compressedData = PyMem_Calloc(numSlots + 1, sizeof(u_int8_t *));
+  ctx.compChunksSize = PyMem_Calloc(numSlots + 1, sizeof(uint32_t));
+  ctx.unCompChunksSize = PyMem_Calloc(numChunks + 1, sizeof(uint32_t));
+  ctx.compChunksType = PyMem_Calloc(numSlots + 1, sizeof(u_int8_t));
+  size_t *cumulativeChunksSize = PyMem_Calloc(numSlots + 1, sizeof(size_t));
+  if (stats) {
+    ctx.times = PyMem_Calloc(numChunks * ZIPNN_NUM_STAGES + 1, sizeof(double));
+    ctx.skipped = PyMem_Calloc(numSlots + 1, sizeof(u_int8_t));
+  }
+  double mainTimes[ZIPNN_NUM_STAGES] = {0}; // the stages of this thread
+  double start;
   size_t totalCompressedSize[] = {0, 0};
   size_t totalUnCompressedSize[] = {0, 0};
-  u_int8_t compChunksType[numBuf][numChunks];
-  size_t cumulativeChunksSize[numBuf][numChunks];
-  u_int8_t isThCheck[] = {0, 0};
   u_int8_t noNeedToCompress[] = {0, 0};
+  u_int8_t sharedTables[2][SHARED_TABLE_MAX_LEN];
+  size_t sharedTablesLen[] = {0, 0};
   uint32_t checkCompTh =
       (uint32_t)ceil((double)numChunks / checkThAfterPercent);
-  // if (isPrint) {
-  //     startBGTime = clock();
-  //  }
+  if (checkCompTh > numChunks) {
+    checkCompTh = numChunks;
+  }
+  // A shared table is worth it only if there is more than one chunk
+  if (sharedTable && numChunks > 1) {
+    ctx.counts = PyMem_Calloc(checkCompTh * numBuf * (HUF_SYMBOLVALUE_MAX + 1),
+                              sizeof(unsigned));
+    if (ctx.counts == NULL) {
+      sharedTable = 0;
+    }
+  } else {
+    sharedTable = 0;
+  }
 
-  /////////// start multi Threading - Each chunk to different thread
-  //////////////////
-  for (size_t offset = 0; offset < (size_t)data.len; offset += bgChunkSize) {
-    size_t curBgChunkSize =
-        (data.len - offset > bgChunkSize) ? bgChunkSize : (data.len - offset);
-
-    //    printf ("offset %zu\n", offset);
-    size_t curCompChunkSize = curBgChunkSize / numBuf;
-    unCompChunksSize[curChunk] = curCompChunkSize;
-    // Byte Grouping + Byte Ordering
+  if (!ctx.buffers || !ctx.compressedData || !ctx.compChunksSize ||
+      !ctx.unCompChunksSize || !ctx.compChunksType || !cumulativeChunksSize ||
+      (stats && (!ctx.times || !ctx.skipped))) {
+    free_split_ctx(&ctx);
+    PyMem_Free(cumulativeChunksSize);
+    PyBuffer_Release(&header);
+    PyBuffer_Release(&data);
+    PyBuffer_Release(&base);
+    return PyErr_NoMemory();
+  }
 
-    if (split_bytearray(data.buf + offset, curBgChunkSize, buffers[curChunk],
-                        bits_mode, bytes_mode, is_redata, threads) != 0) {
-      PyBuffer_Release(&data);
-      PyErr_SetString(PyExc_MemoryError, "Failed to allocate memory");
-      return NULL;
+  /////////// start multi Threading - Each chunk to different thread
+  // The threshold is checked only from chunk checkCompTh, so the first
+  // chunks are always compressed. After them we know which buffers are worth
+  // compressing, and the rest of the chunks run without the GIL as well.
+  // With a shared table, the first chunks are split first, their histograms
+  // build the shared table, and then they are compressed.
+  int ret;
+  Py_BEGIN_ALLOW_THREADS;
+  ctx.firstChunk = 0;
+  ctx.doSplit = 1;
+  ctx.doCompress = !sharedTable;
+  ret = zipnn_parallel_for(checkCompTh,
+                           zipnn_num_workers(threads, checkCompTh),
+                           split_chunk_task, &ctx);
+  if (ret == 0 && sharedTable) {
+    start = stats ? zipnn_now() : 0;
+    for (uint32_t b = 0; b < numBuf; b++) {
+      if (ctx.isCompress[b] && !ctx.isFse[b]) {
+        ctx.sharedCTable[b] = build_shared_table(&ctx, b, checkCompTh,
+                                                 sharedTables[b],
+                                                 &sharedTablesLen[b]);
+      }
     }
-    //    if (isPrint) {
-    //      endBGTime = clock();
-    //      bgTime = (double)(endBGTime - startBGTime) / CLOCKS_PER_SEC;
-    //    }
-    // Compression on each Buf
-
+    if (stats) {
+      mainTimes[ZIPNN_STAGE_ENTROPY] += zipnn_now() - start;
+    }
+    ctx.doSplit = 0;
+    ctx.doCompress = 1;
+    ret = zipnn_parallel_for(checkCompTh,
+                             zipnn_num_workers(threads, checkCompTh),
+                             split_chunk_task, &ctx);
+    ctx.doSplit = 1;
+  }
+  if (ret == 0) {
     for (uint32_t b = 0; b < numBuf; b++) {
-      if (isThCheck[b] == 0 &&
-          curChunk >=
-              checkCompTh) {  // check that we really need to compress this buf
-        if (totalCompressedSize[b] * 1.0 >
-            totalUnCompressedSize[b] * compThreshold) {
-          isThCheck[b] = 1;
-          noNeedToCompress[b] = 1;
-        }
+      for (size_t c = 0; c < checkCompTh; c++) {
+        totalCompressedSize[b] += ctx.compChunksSize[b * numChunks + c];
+        totalUnCompressedSize[b] += ctx.unCompChunksSize[c];
       }
-
-      compressedData[b][curChunk] = PyMem_Malloc(bgChunkSize);
-      if (!compressedData[b][curChunk]) {
-        PyErr_SetString(PyExc_MemoryError, "Failed to allocate memory");
-        for (uint32_t j = 0; j < numBuf; j++) {
-          for (uint32_t c = 0; c < curChunk - 1; c++) {
-            PyMem_Free(compressedData[j][c]);
-          }
-          for (uint32_t j = 0; j < b; j++) {
-            PyMem_Free(compressedData[j][curChunk]);
-          }
-        }
-        return NULL;
+      if (checkCompTh < numChunks &&
+          totalCompressedSize[b] * 1.0 >
+              totalUnCompressedSize[b] * compThreshold) {
+        ctx.isCompress[b] = 0;
       }
+    }
+    ctx.firstChunk = checkCompTh;
+    ret = zipnn_parallel_for(numChunks - checkCompTh,
+                             zipnn_num_workers(threads, numChunks - checkCompTh),
+                             split_chunk_task, &ctx);
+  }
+  Py_END_ALLOW_THREADS;
+  ////////////// The end of multi Threading part 1
 
-      if (buffers[curChunk][b] != NULL) {
-        if (noNeedToCompress[b] == 0) {
-          compChunksSize[b][curChunk] =
-              HUF_compress(compressedData[b][curChunk], bgChunkSize,
-                           buffers[curChunk][b], curCompChunkSize);
-        } else {
-          compChunksSize[b][curChunk] = 0;
-        }
+  if (ret != 0) {
+    free_split_ctx(&ctx);
+    PyMem_Free(cumulativeChunksSize);
+    PyBuffer_Release(&header);
+    PyBuffer_Release(&data);
+    PyBuffer_Release(&base);
+    PyErr_SetString(PyExc_MemoryError, "Failed to allocate memory");
+    return NULL;
+  }
 
-        if (compChunksSize[b][curChunk] != 0 &&
-            (compChunksSize[b][curChunk] <
-             unCompChunksSize[curChunk] * compThreshold)) {
-          compChunksType[b][curChunk] = 1;  // Compress with Huffman
-        } else {                            // the buffer was not compressed
-          PyMem_Free(compressedData[b][curChunk]);
-          compChunksSize[b][curChunk] = unCompChunksSize[curChunk];
-          compChunksType[b][curChunk] = 0;  // not compressed
-          compressedData[b][curChunk] = buffers[curChunk][b];
-        }
-        totalCompressedSize[b] += compChunksSize[b][curChunk];
-        totalUnCompressedSize[b] += unCompChunksSize[curChunk];
-        cumulativeChunksSize[b][curChunk] = totalCompressedSize[b];
+  // Replay the threshold check in the chunks order - once the compression
+  // ratio of a buffer passes the threshold, the rest of its chunks are kept
+  // uncompressed.
+  for (uint32_t b = 0; b < numBuf; b++) {
+    totalCompressedSize[b] = 0;
+    totalUnCompressedSize[b] = 0;
+    for (size_t c = 0; c < numChunks; c++) {
+      size_t idx = b * numChunks + c;
+      if (ctx.buffers[c * numBuf + b] == NULL) {
+        continue;
       }
+      if (noNeedToCompress[b] == 0 && c >= checkCompTh &&
+          totalCompressedSize[b] * 1.0 >
+              totalUnCompressedSize[b] * compThreshold) {
+        noNeedToCompress[b] = 1;
+      }
+      if (noNeedToCompress[b] == 1 && ctx.skipped) {
+        ctx.skipped[idx] = 1;
+      }
+      if (noNeedToCompress[b] == 1 && ctx.compChunksType[idx] != CHUNK_RAW) {
+        free(ctx.compressedData[idx]);
+        ctx.compChunksSize[idx] = ctx.unCompChunksSize[c];
+        ctx.compChunksType[idx] = CHUNK_RAW; // not compressed
+        ctx.compressedData[idx] = ctx.buffers[c * numBuf + b];
+      }
+      totalCompressedSize[b] += ctx.compChunksSize[idx];
+      totalUnCompressedSize[b] += ctx.unCompChunksSize[c];
+    }
+  }
 
-    }  // end for loop -> compression
-    curChunk++;
-  }  // end for loop - chunk
-  ////////////// The end of multi Threading part 1
-  /////////////////////////////////
-
-  // endTime = clock();
-  // double compressTime = (double)(endTime - startTime) / CLOCKS_PER_SEC;
+  // The shared table of a buffer is stored once before its chunks, if any
+  // chunk uses it, and the cumulative sizes include it
+  for (uint32_t b = 0; b < numBuf; b++) {
+    int used = 0;
+    for (size_t c = 0; c < numChunks; c++) {
+      used |= ctx.compChunksType[b * numChunks + c] == CHUNK_HUF_SHARED;
+    }
+    if (!used) {
+      sharedTablesLen[b] = 0;
+    }
+    totalCompressedSize[b] = sharedTablesLen[b];
+    for (size_t c = 0; c < numChunks; c++) {
+      size_t idx = b * numChunks + c;
+      if (ctx.buffers[c * numBuf + b] != NULL) {
+        totalCompressedSize[b] += ctx.compChunksSize[idx];
+      }
+      cumulativeChunksSize[idx] = totalCompressedSize[b];
+    }
+  }
 
-  PyObject *result;
+  PyObject *result = NULL;
   u_int8_t *resultBuf;
   size_t resBufSize;
 
+  start = stats ? zipnn_now() : 0;
   resultBuf = prepare_split_results(
-      header.len, numBuf, numChunks, header.buf, compressedData, compChunksSize,
-      compChunksType, cumulativeChunksSize, totalCompressedSize, &resBufSize);
-  if (resultBuf == NULL) {
-    // Free all Mallocs
-    // print Error
-    return NULL;
+      header.len, numBuf, numChunks, header.buf, ctx.compressedData,
+      ctx.compChunksSize, ctx.compChunksType, cumulativeChunksSize,
+      totalCompressedSize, sharedTables, sharedTablesLen, &resBufSize);
+  if (resultBuf != NULL) {
+    result = Py_BuildValue("y#", resultBuf, resBufSize);
+    PyMem_Free(resultBuf);
   }
+  if (stats && result != NULL) {
+    mainTimes[ZIPNN_STAGE_ASSEMBLY] += zipnn_now() - start;
+    if (split_stats(stats, &ctx, totalCompressedSize) != 0 ||
+        zipnn_stats_add_times(stats, mainTimes, 1) != 0) {
+      Py_CLEAR(result);
+    }
+  }
+
+  free_split_ctx(&ctx);
+  PyMem_Free(cumulativeChunksSize);
+  PyBuffer_Release(&header);
+  PyBuffer_Release(&data);
+  PyBuffer_Release(&base);
+  return result;
+}
 
-  result = Py_BuildValue("y#", resultBuf, resBufSize);
+///////////////////////////////////
+/////////  Combine Threads ////////
+///////////////////////////////////
 
-  // Freeing compressedData array
-  for (uint32_t c = 0; c < numChunks; c++) {
-    for (uint32_t b = 0; b < numBuf; b++) {
-      if (buffers[c][b] != NULL) {
-        PyMem_Free(buffers[c][b]);
+// Shared state of the combine workers, each task is one bgChunk that is
+// written directly to its place in resultBuf.
+typedef struct {
+  uint32_t numBuf;
+  size_t numChunks;
+  size_t bgChunkSize;
+  int bits_mode;
+  int bytes_mode;
+  u_int8_t *compChunksType;    // [b * numChunks + c]
+  size_t *compChunksPos;       // [b * numChunks + c] - offset in the buffer
+  size_t *compChunksLen;       // [b * numChunks + c]
+  u_int8_t *ptrCompressData[2];
+  HUF_DTable *sharedDTable[2]; // per buffer - NULL if there is no shared table
+  size_t *decompLen;           // [c]
+  u_int8_t **scratch;          // [worker * numBuf + b] - huffman output
+  u_int8_t *resultBuf;
+  const u_int8_t *base;        // origSize bytes, NULL - no delta
+  int delta;
+  int deltaSize;
+  int lossy;                   // ZIPNN_LOSSY_* of lossy.h
+  int lossyFactor;
+  int lossyFormat;
+  double *times;               // [c * ZIPNN_NUM_STAGES + stage] - NULL if the
+                               // stages aren't timed
+} combine_ctx;
+
+enum { COMBINE_ERR_CORRUPT = -2, COMBINE_ERR_MODE = -3 };
+
+static int combine_chunk_task(void *arg, size_t c, int worker) {
+  combine_ctx *ctx = (combine_ctx *)arg;
+  u_int8_t *deCompressedData[2] = {NULL, NULL};
+  double *times = ctx->times ? &ctx->times[c * ZIPNN_NUM_STAGES] : NULL;
+  double start = times ? zipnn_now() : 0;
+
+  // decompress
+  for (uint32_t b = 0; b < ctx->numBuf; b++) {
+    size_t idx = b * ctx->numChunks + c;
+    u_int8_t *src = ctx->ptrCompressData[b] + ctx->compChunksPos[idx];
+    if (ctx->compChunksType[idx] == CHUNK_RAW) { // No Need to compression
+      deCompressedData[b] = src;
+    } else { // decompress using Huffman or FSE
+      deCompressedData[b] = ctx->scratch[worker * ctx->numBuf + b];
+      size_t decompressedSize;
+      if (ctx->compChunksType[idx] == CHUNK_FSE) {
+        decompressedSize = fse_decompress_chunk(deCompressedData[b],
+                                                ctx->decompLen[c], src,
+                                                ctx->compChunksLen[idx]);
+      } else if (ctx->compChunksType[idx] == CHUNK_HUF_SHARED) {
+        decompressedSize = HUF_decompress4X_usingDTable(
+            deCompressedData[b], ctx->decompLen[c], src,
+            ctx->compChunksLen[idx], ctx->sharedDTable[b]);
+      } else {
+        decompressedSize = HUF_decompress(deCompressedData[b],
+                                          ctx->decompLen[c], src,
+                                          ctx->compChunksLen[idx]);
+      }
+      if (HUF_isError(decompressedSize) ||
+          decompressedSize != ctx->decompLen[c]) {
+        return COMBINE_ERR_CORRUPT;
       }
     }
   }
+  if (times) {
+    times[ZIPNN_STAGE_ENTROPY] += zipnn_now() - start;
+  }
 
-  for (uint32_t c = 0; c < numChunks; c++) {
-    for (uint32_t b = 0; b < numBuf; b++) {
-      if (compChunksType[b][c] == 1) {
-        PyMem_Free(compressedData[b][c]);
-      }
+  // Combine
+  u_int8_t *combinePtr = ctx->resultBuf + ctx->bgChunkSize * c;
+  if (combine_buffers(deCompressedData[0], deCompressedData[1], combinePtr,
+                      ctx->decompLen[c], ctx->bits_mode, ctx->bytes_mode, 1,
+                      times) != 0) {
+    return COMBINE_ERR_MODE;
+  }
+  // The delta is reverted while the chunk is still in the cache
+  if (ctx->base != NULL) {
+    start = times ? zipnn_now() : 0;
+    zipnn_undelta(combinePtr, ctx->base + ctx->bgChunkSize * c,
+                  ctx->decompLen[c] * ctx->numBuf, ctx->delta,
+                  ctx->deltaSize);
+    if (times) {
+      times[ZIPNN_STAGE_DELTA] += zipnn_now() - start;
     }
   }
-  PyBuffer_Release(&header);
-  PyBuffer_Release(&data);
-  PyMem_Free(resultBuf);
-  return result;
+  if (ctx->lossy != ZIPNN_LOSSY_NONE) {
+    start = times ? zipnn_now() : 0;
+    zipnn_unlossy(combinePtr, ctx->decompLen[c] * ctx->numBuf, ctx->lossy,
+                  ctx->lossyFactor, ctx->lossyFormat);
+    if (times) {
+      times[ZIPNN_STAGE_LOSSY] += zipnn_now() - start;
+    }
+  }
+  return 0;
 }
 
 // Python callable function to combine four buffers into a single bytearray
-PyObject *py_combine_dtype16(PyObject *self, PyObject *args) {
+// threads:
+//     Number of threads, each one decompresses and combines a different
+//     bgChunk straight into the result. 0 - decide according to the number
+//     of CPUs.
+// out (optional):
+//     A writable buffer of at least origSize bytes to decompress into, then
+//     the number of bytes written is returned instead of a new bytearray.
+// stats (optional keyword, default None):
+//     A dict to add the stage times and the counters of every buffer to:
+//     bytes_in (its compressed size), bytes_out, chunks and chunks_raw.
+// base, delta, delta_size (optional keywords, default None, 0, 2):
+//     The base of original_size bytes the data was split with, its delta is
+//     reverted after every chunk is combined.
+// lossy, lossy_factor, lossy_format (optional keywords, default 0, 0, 1):
+//     The lossy conversion the data was split with, reverted after the delta
+//     (see zipnn_unlossy).
+PyObject *py_combine_dtype16(PyObject *self, PyObject *args,
+                             PyObject *kwargs) {
+  static char *kwlist[] = {"data",       "bits_mode",     "bytes_mode",
+                           "chunk_size", "original_size", "threads",
+                           "out",        "stats",         "base",
+                           "delta",      "delta_size",    "lossy",
+                           "lossy_factor", "lossy_format", NULL};
   Py_buffer data;
+  Py_buffer out = {.buf = NULL, .obj = NULL};
+  Py_buffer base = {.buf = NULL, .obj = NULL};
 
   int bits_mode, bytes_mode, threads;
-  uint32_t numBuf = 2;
+  int delta = ZIPNN_DELTA_NONE, deltaSize = 2;
+  int lossy = ZIPNN_LOSSY_NONE, lossyFactor = 0;
+  int lossyFormat = ZIPNN_LOSSY_BFLOAT16;
+  const uint32_t numBuf = 2;
   size_t bgChunkSize, origSize;
+  PyObject *statsArg = NULL, *stats;
 
-  if (!PyArg_ParseTuple(args, "y*iinni", &data, &bits_mode, &bytes_mode,
-                        &bgChunkSize, &origSize, &threads)) {
+  if (!PyArg_ParseTupleAndKeywords(
+          args, kwargs, "y*iinni|w*$Oy*iiiii", kwlist, &data, &bits_mode,
+          &bytes_mode, &bgChunkSize, &origSize, &threads, &out, &statsArg,
+          &base, &delta, &deltaSize, &lossy, &lossyFactor, &lossyFormat)) {
+    return NULL;
+  }
+  if (zipnn_stats_arg(statsArg, &stats) != 0 ||
+      zipnn_delta_arg(&base, origSize, delta) != 0 ||
+      zipnn_lossy_arg(lossy, lossyFactor, lossyFormat, 2) != 0) {
+    PyBuffer_Release(&base);
+    PyBuffer_Release(&out);
+    PyBuffer_Release(&data);
+    return NULL;
+  }
+  if (out.obj != NULL && (size_t)out.len < origSize) {
+    PyBuffer_Release(&base);
+    PyBuffer_Release(&out);
+    PyBuffer_Release(&data);
+    PyErr_SetString(PyExc_ValueError,
+                    "The output buffer is smaller than the decompressed data");
     return NULL;
   }
 
   size_t numChunks = (origSize + bgChunkSize - 1) / bgChunkSize;
-  uint32_t compChunkSize = bgChunkSize / numBuf;
+  size_t numSlots = numChunks * numBuf;
+  size_t compChunkSize = bgChunkSize / numBuf;
+  size_t tableLen = numSlots * (sizeof(u_int8_t) + sizeof(size_t));
+
+  if ((size_t)data.len < tableLen) {
+    PyBuffer_Release(&base);
+    PyBuffer_Release(&out);
+    PyBuffer_Release(&data);
+    PyErr_SetString(PyExc_ValueError,
+                    "Compressed data is shorter than its chunks table");
+    return NULL;
+  }
 
   u_int8_t *ptrChunksType = (u_int8_t *)data.buf;
-  size_t *ptrChunksCumulative = (size_t *)(ptrChunksType + numBuf * numChunks);
-  u_int8_t *ptrCompressData[numBuf];
-  ptrCompressData[0] = (u_int8_t *)(ptrChunksCumulative + numBuf * numChunks);
-  size_t cumulativeChunksSize[numBuf][numChunks];
-  uint32_t compChunksType[numBuf][numChunks];
-  size_t compCumulativeChunksPos[numBuf][numChunks + 1];
-  size_t CompChunksLen[numBuf][numChunks];
-  u_int8_t *resultBuf = NULL;
-  u_int8_t *deCompressedData[numBuf][numChunks];
-  size_t decompLen[numChunks];
-  // clock_t startTime, endTime;
-  // startTime = clock();
+  u_int8_t *ptrChunksCumulative = ptrChunksType + numSlots;
+  int numWorkers = zipnn_num_workers(threads, numChunks);
+  combine_ctx ctx = {.numBuf = numBuf,
+                     .numChunks = numChunks,
+                     .bgChunkSize = bgChunkSize,
+                     .bits_mode = bits_mode,
+                     .bytes_mode = bytes_mode,
+                     .base = base.buf,
+                     .delta = delta,
+                     .deltaSize = deltaSize,
+                     .lossy = lossy,
+                     .lossyFactor = lossyFactor,
+                     .lossyFormat = lossyFormat,
+                     .compChunksType = ptrChunksType};
+  ctx.compChunksPos = PyMem_Calloc(numSlots + 1, sizeof(size_t));
+  ctx.compChunksLen = PyMem_Calloc(numSlots + 1, sizeof(size_t));
+  ctx.decompLen = PyMem_Calloc(numChunks + 1, sizeof(size_t));
+  ctx.scratch = PyMem_Calloc(numWorkers * numBuf, sizeof(u_int8_t *));
+  if (stats) {
+    ctx.times = PyMem_Calloc(numChunks * ZIPNN_NUM_STAGES + 1, sizeof(double));
+  }
+  PyObject *resultObj = NULL;
+  PyObject *py_result = NULL;
+  size_t bufLens[2] = {0, 0};
+
+  if (!ctx.compChunksPos || !ctx.compChunksLen || !ctx.decompLen ||
+      !ctx.scratch || (stats && !ctx.times)) {
+    PyErr_NoMemory();
+    goto done;
+  }
 
   // Preparation for decompression
-  compCumulativeChunksPos[0][0] = 0;
-  compCumulativeChunksPos[1][0] = 0;
+  size_t bufStart = 0;
+  for (uint32_t b = 0; b < numBuf; b++) {
+    size_t prev = 0;
+    ctx.ptrCompressData[b] = ptrChunksType + tableLen + bufStart;
+    for (size_t c = 0; c < numChunks; c++) {
+      if (ptrChunksType[b * numChunks + c] == CHUNK_HUF_SHARED) {
+        // The shared table of the buffer is before its chunks
+        size_t bufLen;
+        memcpy(&bufLen,
+               ptrChunksCumulative + (b * numChunks + numChunks - 1) *
+                                         sizeof(size_t),
+               sizeof(size_t));
+        if (tableLen + bufStart + bufLen > (size_t)data.len) {
+          PyErr_SetString(PyExc_ValueError,
+                          "Compressed data is shorter than its chunks table");
+          goto done;
+        }
+        ctx.sharedDTable[b] =
+            PyMem_Malloc(HUF_DTABLE_SIZE(HUF_TABLELOG_MAX) * sizeof(HUF_DTable));
+        if (ctx.sharedDTable[b] == NULL) {
+          PyErr_NoMemory();
+          goto done;
+        }
+        unsigned wksp[HUF_DECOMPRESS_WORKSPACE_SIZE_U32];
+        ctx.sharedDTable[b][0] = (HUF_DTable)(HUF_TABLELOG_MAX)*0x01000001;
+        prev = HUF_readDTableX2_wksp(ctx.sharedDTable[b],
+                                     ctx.ptrCompressData[b], bufLen, wksp,
+                                     sizeof(wksp));
+        if (HUF_isError(prev)) {
+          PyErr_SetString(PyExc_ValueError,
+                          "Huffman table is corrupted in Decompression function");
+          goto done;
+        }
+        break;
+      }
+    }
+    for (size_t c = 0; c < numChunks; c++) {
+      size_t idx = b * numChunks + c;
+      size_t cumulative;
+      memcpy(&cumulative, ptrChunksCumulative + idx * sizeof(size_t),
+             sizeof(size_t));
+      if (ptrChunksType[idx] > CHUNK_FSE) {
+        PyErr_SetString(
+            PyExc_ValueError,
+            "Compress Type is not correct in Decompression function");
+        goto done;
+      }
+      if (cumulative < prev) {
+        PyErr_SetString(PyExc_ValueError,
+                        "Compressed chunks table is corrupted");
+        goto done;
+      }
+      ctx.compChunksPos[idx] = prev;
+      ctx.compChunksLen[idx] = cumulative - prev;
+      prev = cumulative;
+    }
+    bufLens[b] = prev;
+    bufStart += prev;
+  }
+  if (tableLen + bufStart > (size_t)data.len) {
+    PyErr_SetString(PyExc_ValueError,
+                    "Compressed data is shorter than its chunks table");
+    goto done;
+  }
 
+  for (size_t c = 0; c < numChunks; c++) {
+    if (c < numChunks - 1) {
+      ctx.decompLen[c] = compChunkSize;
+    } else {
+      ctx.decompLen[c] =
+          (size_t)(origSize / numBuf - compChunkSize * (numChunks - 1));
+    }
+  }
   for (uint32_t b = 0; b < numBuf; b++) {
-    for (uint32_t c = 0; c < numChunks; c++) {
-      compChunksType[b][c] = (*ptrChunksType++);
-      cumulativeChunksSize[b][c] = (*ptrChunksCumulative++);
+    for (size_t c = 0; c < numChunks; c++) {
+      size_t idx = b * numChunks + c;
+      // with truncation (bytes_mode 8/1) the second buffer is empty
+      if (ptrChunksType[idx] == CHUNK_RAW && (b == 0 || bytes_mode == 10) &&
+          ctx.compChunksLen[idx] != ctx.decompLen[c]) {
+        PyErr_SetString(PyExc_ValueError,
+                        "Compressed chunks table is corrupted");
+        goto done;
+      }
     }
   }
 
-  for (uint32_t c = 0; c < numChunks; c++) {
-    for (uint32_t b = 0; b < numBuf; b++) {
-      compCumulativeChunksPos[b][c + 1] = cumulativeChunksSize[b][c];
-      CompChunksLen[b][c] =
-          compCumulativeChunksPos[b][c + 1] - compCumulativeChunksPos[b][c];
+  for (int w = 0; w < numWorkers * (int)numBuf; w++) {
+    ctx.scratch[w] = malloc(compChunkSize);
+    if (ctx.scratch[w] == NULL) {
+      PyErr_NoMemory();
+      goto done;
     }
   }
 
-  for (size_t c = 0; c < numChunks; c++) {
-    for (uint32_t b = 0; b < numBuf; b++) {
-      if (compChunksType[b][c] == 0) { // no compression is needed
-      } else {
-        if (compChunksType[b][c] == 1) { // open with Huffman compression
-        } else {
-          PyErr_SetString(
-              PyExc_MemoryError,
-              "Compress Type is not correct in Decompression function");
-          return NULL;
-        }
+  // Decompress straight into the output, the caller's buffer or a new
+  // bytearray
+  if (out.obj != NULL) {
+    ctx.resultBuf = out.buf;
+  } else {
+    resultObj = PyByteArray_FromStringAndSize(NULL, origSize);
+    if (resultObj == NULL) {
+      goto done;
+    }
+    ctx.resultBuf = (u_int8_t *)PyByteArray_AS_STRING(resultObj);
+  }
+
+  ////////////// Multi threading /////////////////////////////
+  int ret;
+  Py_BEGIN_ALLOW_THREADS;
+  ret = zipnn_parallel_for(numChunks, numWorkers, combine_chunk_task, &ctx);
+  Py_END_ALLOW_THREADS;
+  ////////////// Finish Multi threading /////////////////////////////
+
+  if (ret == COMBINE_ERR_CORRUPT) {
+    PyErr_SetString(PyExc_ValueError,
+                    "Huffman decompression failed, the data is corrupted");
+    goto done;
+  } else if (ret != 0) {
+    PyErr_SetString(PyExc_ValueError, "Unsupported bytes_mode in combine");
+    goto done;
+  }
+
+  if (stats) {
+    // with truncation (bytes_mode 8/1) there is only the first buffer
+    uint32_t usedBuf = bytes_mode == 10 ? numBuf : 1;
+    size_t bytesOut[2] = {0, 0}, chunks[2] = {0, 0}, chunksRaw[2] = {0, 0};
+    for (uint32_t b = 0; b < usedBuf; b++) {
+      for (size_t c = 0; c < numChunks; c++) {
+        bytesOut[b] += ctx.decompLen[c];
+        chunks[b]++;
+        chunksRaw[b] += ptrChunksType[b * numChunks + c] == CHUNK_RAW;
       }
     }
+    if (zipnn_stats_set_list(stats, "bytes_in", bufLens, usedBuf) != 0 ||
+        zipnn_stats_set_list(stats, "bytes_out", bytesOut, usedBuf) != 0 ||
+        zipnn_stats_set_list(stats, "chunks", chunks, usedBuf) != 0 ||
+        zipnn_stats_set_list(stats, "chunks_raw", chunksRaw, usedBuf) != 0 ||
+        zipnn_stats_add_times(stats, ctx.times, numChunks) != 0) {
+      goto done;
+    }
   }
 
-  ptrCompressData[1] =
-      ptrCompressData[0] + cumulativeChunksSize[0][numChunks - 1];
-  for (uint32_t c = 0; c < numChunks; c++) {
-    if (c < numChunks - 1) {
-      decompLen[c] = compChunkSize;
-    } else {
-      decompLen[c] =
-          (size_t)(origSize / numBuf - compChunkSize * (numChunks - 1));
+  if (out.obj != NULL) {
+    py_result = PyLong_FromSize_t(origSize);
+  } else {
+    py_result = resultObj;
+    resultObj = NULL;
+  }
+
+done:
+  if (ctx.scratch != NULL) {
+    for (int w = 0; w < numWorkers * (int)numBuf; w++) {
+      free(ctx.scratch[w]);
     }
   }
-  resultBuf = PyMem_Malloc(origSize);
-  if (!resultBuf) {
-    PyErr_SetString(
-        PyExc_MemoryError,
-        "Failed to allocate memory for result buffer in split function");
-    PyMem_Free(resultBuf);
+  PyMem_Free(ctx.scratch);
+  PyMem_Free(ctx.sharedDTable[0]);
+  PyMem_Free(ctx.sharedDTable[1]);
+  PyMem_Free(ctx.compChunksPos);
+  PyMem_Free(ctx.compChunksLen);
+  PyMem_Free(ctx.decompLen);
+  PyMem_Free(ctx.times);
+  Py_XDECREF(resultObj);
+  PyBuffer_Release(&base);
+  PyBuffer_Release(&out);
+  PyBuffer_Release(&data);
+  return py_result;
+}
+
+///////////////////////////////////
+/////  Huffman Chunk Functions ////
+///////////////////////////////////
+
+// Python callable function to compress a single chunk with Huffman, for the
+// byte groups that are compressed in Python (float32/uint32 and method AUTO).
+// The chunk is at most HUFFMAN_MAX_CHUNK bytes.
+// Returns the compressed bytes, or None if the chunk is not compressible.
+PyObject *py_huffman_compress(PyObject *self, PyObject *args) {
+  Py_buffer data;
+
+  if (!PyArg_ParseTuple(args, "y*", &data)) {
     return NULL;
   }
+  if ((size_t)data.len > HUF_BLOCKSIZE_MAX) {
+    PyBuffer_Release(&data);
+    PyErr_Format(PyExc_ValueError, "Huffman chunks are limited to %d bytes",
+                 HUF_BLOCKSIZE_MAX);
+    return NULL;
+  }
+
+  size_t dstCapacity = HUF_compressBound(data.len);
+  u_int8_t *dst = PyMem_Malloc(dstCapacity);
+  if (dst == NULL) {
+    PyBuffer_Release(&data);
+    return PyErr_NoMemory();
+  }
+  size_t compSize;
+  Py_BEGIN_ALLOW_THREADS;
+  compSize = HUF_compress(dst, dstCapacity, data.buf, data.len);
+  Py_END_ALLOW_THREADS;
 
-  // endTime = clock();
-  // double decompressTime = (double)(endTime - startTime) / CLOCKS_PER_SEC;
+  PyObject *result;
+  if (HUF_isError(compSize) || compSize == 0) {
+    Py_INCREF(Py_None);
+    result = Py_None;
+  } else {
+    result = PyBytes_FromStringAndSize((const char *)dst, compSize);
+  }
+  PyMem_Free(dst);
+  PyBuffer_Release(&data);
+  return result;
+}
 
-  ////////////// Multi threading /////////////////////////////
+// Python callable function to decompress a chunk of huffman_compress
+// size:
+//     The size of the decompressed chunk.
+PyObject *py_huffman_decompress(PyObject *self, PyObject *args) {
+  Py_buffer data;
+  Py_ssize_t size;
 
-  for (size_t c = 0; c < numChunks; c++) {
-    // decompress
-    for (uint32_t b = 0; b < numBuf; b++) {
-      if (compChunksType[b][c] == 0) {  // No Need to compression
-        deCompressedData[b][c] =
-            ptrCompressData[b] + compCumulativeChunksPos[b][c];
-      } else if (compChunksType[b][c] == 1) {  // decompress using Huffman
-        deCompressedData[b][c] = PyMem_Malloc(decompLen[c]);
-        if (deCompressedData[b][c] == NULL) {
-          PyErr_SetString(
-              PyExc_MemoryError,
-              "Failed to allocate memory - Function during decompression");
-          free(deCompressedData[b][c]);
-          return NULL;
-        }
-        size_t decompressedSize = HUF_decompress(
-            deCompressedData[b][c], decompLen[c],
-            (void *)(ptrCompressData[b] + compCumulativeChunksPos[b][c]),
-            CompChunksLen[b][c]);
-
-        if (HUF_isError(decompressedSize)) {
-          HUF_getErrorName(decompressedSize);
-          return 0;
-        }
+  if (!PyArg_ParseTuple(args, "y*n", &data, &size)) {
+    return NULL;
+  }
+  if (size <= 0 || (size_t)size > HUF_BLOCKSIZE_MAX) {
+    PyBuffer_Release(&data);
+    PyErr_Format(PyExc_ValueError, "Huffman chunks are limited to %d bytes",
+                 HUF_BLOCKSIZE_MAX);
+    return NULL;
+  }
 
-        if (decompressedSize != decompLen[c]) {
-          return 0;
-        }
-      }
+  PyObject *result = PyBytes_FromStringAndSize(NULL, size);
+  if (result == NULL) {
+    PyBuffer_Release(&data);
+    return NULL;
+  }
+  size_t decompressedSize;
+  Py_BEGIN_ALLOW_THREADS;
+  decompressedSize =
+      HUF_decompress(PyBytes_AS_STRING(result), size, data.buf, data.len);
+  Py_END_ALLOW_THREADS;
+  PyBuffer_Release(&data);
+
+  if (HUF_isError(decompressedSize) || decompressedSize != (size_t)size) {
+    Py_DECREF(result);
+    PyErr_SetString(PyExc_ValueError,
+                    "Huffman decompression failed, the data is corrupted");
+    return NULL;
+  }
+  return result;
+}
+
+// Python callable function to compress a chunk with FSE (tANS), like
+// huffman_compress it returns None if the chunk is not compressible
+PyObject *py_fse_compress(PyObject *self, PyObject *args) {
+  Py_buffer data;
+
+  if (!PyArg_ParseTuple(args, "y*", &data)) {
+    return NULL;
+  }
+
+  size_t dstCapacity = FSE_compressBound(data.len);
+  u_int8_t *dst = PyMem_Malloc(dstCapacity);
+  if (dst == NULL) {
+    PyBuffer_Release(&data);
+    return PyErr_NoMemory();
+  }
+  size_t compSize;
+  Py_BEGIN_ALLOW_THREADS;
+  compSize = fse_compress_chunk(dst, dstCapacity, data.buf, data.len);
+  Py_END_ALLOW_THREADS;
+
+  PyObject *result;
+  if (FSE_isError(compSize) || compSize == 0) {
+    Py_INCREF(Py_None);
+    result = Py_None;
+  } else {
+    result = PyBytes_FromStringAndSize((const char *)dst, compSize);
+  }
+  PyMem_Free(dst);
+  PyBuffer_Release(&data);
+  return result;
+}
+
+// Python callable function to decompress a chunk of fse_compress
+// size:
+//     The size of the decompressed chunk.
+PyObject *py_fse_decompress(PyObject *self, PyObject *args) {
+  Py_buffer data;
+  Py_ssize_t size;
+
+  if (!PyArg_ParseTuple(args, "y*n", &data, &size)) {
+    return NULL;
+  }
+  if (size <= 0 || data.len == 0) {
+    PyBuffer_Release(&data);
+    PyErr_SetString(PyExc_ValueError,
+                    "FSE decompression failed, the data is corrupted");
+    return NULL;
+  }
+
+  PyObject *result = PyBytes_FromStringAndSize(NULL, size);
+  if (result == NULL) {
+    PyBuffer_Release(&data);
+    return NULL;
+  }
+  size_t decompressedSize;
+  Py_BEGIN_ALLOW_THREADS;
+  decompressedSize = fse_decompress_chunk(
+      (u_int8_t *)PyBytes_AS_STRING(result), size, data.buf, data.len);
+  Py_END_ALLOW_THREADS;
+  PyBuffer_Release(&data);
+
+  if (FSE_isError(decompressedSize) || decompressedSize != (size_t)size) {
+    Py_DECREF(result);
+    PyErr_SetString(PyExc_ValueError,
+                    "FSE decompression failed, the data is corrupted");
+    return NULL;
+  }
+  return result;
+}
+
+///////////////////////////////////
+/////  Byte Groups Functions //////
+///////////////////////////////////
+
+// The byte groups are split and combined in blocks, each one by a different
+// thread
+#define GROUPS_BLOCK_SIZE (64 * 1024)
+
+typedef struct {
+  u_int8_t *data;      // the elements, len bytes
+  size_t len;
+  u_int8_t *groups[2]; // len / 2 bytes each, groups[1] is NULL with truncation
+  int bits_mode;
+  int bytes_mode;
+  const u_int8_t *base; // len bytes, NULL - no delta
+  int delta;
+  int deltaSize;
+  int lossy;            // ZIPNN_LOSSY_* of lossy.h
+  int lossyFactor;
+  int lossyFormat;
+  double *times;       // [task * ZIPNN_NUM_STAGES + stage] - NULL if the
+                       // stages aren't timed
+} groups16_ctx;
+
+static int split_groups_task(void *arg, size_t task, int worker) {
+  (void)worker;
+  groups16_ctx *ctx = (groups16_ctx *)arg;
+  size_t offset = task * GROUPS_BLOCK_SIZE;
+  size_t len = (ctx->len - offset > GROUPS_BLOCK_SIZE) ? GROUPS_BLOCK_SIZE
+                                                        : (ctx->len - offset);
+  u_int8_t *src = ctx->data + offset;
+  u_int8_t *scratch = NULL;
+  double *times = ctx->times ? &ctx->times[task * ZIPNN_NUM_STAGES] : NULL;
+  double start = times ? zipnn_now() : 0;
+  // the input is converted, reordered and its delta is taken in a copy
+  if (ctx->bits_mode != 0 || ctx->base != NULL ||
+      ctx->lossy != ZIPNN_LOSSY_NONE) {
+    scratch = malloc(len);
+    if (scratch == NULL) {
+      return -1;
+    }
+    memcpy(scratch, src, len);
+    src = scratch;
+  }
+  if (ctx->lossy != ZIPNN_LOSSY_NONE) {
+    zipnn_lossy(scratch, len, ctx->lossy, ctx->lossyFactor, ctx->lossyFormat);
+    if (times) {
+      double now = zipnn_now();
+      times[ZIPNN_STAGE_LOSSY] += now - start;
+      start = now;
+    }
+  }
+  if (ctx->base != NULL) {
+    zipnn_delta(scratch, ctx->base + offset, len, ctx->delta, ctx->deltaSize);
+    if (times) {
+      double now = zipnn_now();
+      times[ZIPNN_STAGE_DELTA] += now - start;
+      start = now;
+    }
+  }
+  if (ctx->bits_mode != 0) {
+    reorder_all_floats(scratch, len, ctx->bits_mode);
+  }
+  if (times) {
+    double now = zipnn_now();
+    times[ZIPNN_STAGE_BIT_REORDER] += now - start;
+    start = now;
+  }
+  u_int8_t *dst0 = ctx->groups[0] + offset / 2;
+  if (ctx->bytes_mode == 10) {
+    zipnn_split2(src, len / 2, dst0, ctx->groups[1] + offset / 2);
+  } else if (ctx->bytes_mode == 1) {
+    zipnn_split2(src, len / 2, dst0, NULL);
+  } else {
+    zipnn_split2(src, len / 2, NULL, dst0);
+  }
+  if (times) {
+    times[ZIPNN_STAGE_BYTE_SPLIT] += zipnn_now() - start;
+  }
+  free(scratch);
+  return 0;
+}
+
+static int combine_groups_task(void *arg, size_t task, int worker) {
+  (void)worker;
+  groups16_ctx *ctx = (groups16_ctx *)arg;
+  size_t offset = task * GROUPS_BLOCK_SIZE;
+  size_t len = (ctx->len - offset > GROUPS_BLOCK_SIZE) ? GROUPS_BLOCK_SIZE
+                                                        : (ctx->len - offset);
+  double *times = ctx->times ? &ctx->times[task * ZIPNN_NUM_STAGES] : NULL;
+  if (combine_buffers(ctx->groups[0] + offset / 2,
+                      ctx->groups[1] ? ctx->groups[1] + offset / 2 : NULL,
+                      ctx->data + offset, len / 2, ctx->bits_mode,
+                      ctx->bytes_mode, 1, times) != 0) {
+    return -1;
+  }
+  if (ctx->base != NULL) {
+    double start = times ? zipnn_now() : 0;
+    zipnn_undelta(ctx->data + offset, ctx->base + offset, len, ctx->delta,
+                  ctx->deltaSize);
+    if (times) {
+      times[ZIPNN_STAGE_DELTA] += zipnn_now() - start;
     }
+  }
+  if (ctx->lossy != ZIPNN_LOSSY_NONE) {
+    double start = times ? zipnn_now() : 0;
+    zipnn_unlossy(ctx->data + offset, len, ctx->lossy, ctx->lossyFactor,
+                  ctx->lossyFormat);
+    if (times) {
+      times[ZIPNN_STAGE_LOSSY] += zipnn_now() - start;
+    }
+  }
+  return 0;
+}
+
+// Python callable function to split a bytearray into its byte groups without
+// compressing them, like split_dtype16 does before the compression of every
+// chunk. Unlike split_dtype16 the input is not modified.
+// Returns a tuple of the two groups, the second is None if bytes_mode
+// truncates a byte.
+// stats (optional keyword, default None):
+//     A dict to add the stage times to.
+// base, delta, delta_size (optional keywords, default None, 0, 2):
+//     The delta against a base like in split_dtype16.
+// lossy, lossy_factor, lossy_format (optional keywords, default 0, 0, 1):
+//     The lossy conversion like in split_dtype16.
+PyObject *py_split_groups16(PyObject *self, PyObject *args, PyObject *kwargs) {
+  static char *kwlist[] = {"data",  "bits_mode", "bytes_mode",
+                           "threads", "stats",   "base",
+                           "delta", "delta_size", "lossy",
+                           "lossy_factor", "lossy_format", NULL};
+  Py_buffer data;
+  Py_buffer base = {.buf = NULL, .obj = NULL};
+  int bits_mode, bytes_mode, threads;
+  int delta = ZIPNN_DELTA_NONE, deltaSize = 2;
+  int lossy = ZIPNN_LOSSY_NONE, lossyFactor = 0;
+  int lossyFormat = ZIPNN_LOSSY_BFLOAT16;
+  PyObject *statsArg = NULL, *stats;
+
+  if (!PyArg_ParseTupleAndKeywords(args, kwargs, "y*iii|$Oy*iiiii", kwlist,
+                                   &data, &bits_mode, &bytes_mode, &threads,
+                                   &statsArg, &base, &delta, &deltaSize,
+                                   &lossy, &lossyFactor, &lossyFormat)) {
+    return NULL;
+  }
+  if (zipnn_stats_arg(statsArg, &stats) != 0 ||
+      zipnn_delta_arg(&base, data.len, delta) != 0 ||
+      zipnn_lossy_arg(lossy, lossyFactor, lossyFormat, 2) != 0) {
+    PyBuffer_Release(&base);
+    PyBuffer_Release(&data);
+    return NULL;
+  }
+  if (bytes_mode != 10 && bytes_mode != 8 && bytes_mode != 1) {
+    PyBuffer_Release(&data);
+    PyBuffer_Release(&base);
+    PyErr_SetString(PyExc_ValueError, "Unsupported bytes_mode in split");
+    return NULL;
+  }
+  if (data.len % 2 != 0) {
+    PyBuffer_Release(&data);
+    PyBuffer_Release(&base);
+    PyErr_SetString(PyExc_ValueError,
+                    "The data is not a whole number of 16 bit elements");
+    return NULL;
+  }
 
-    // Combine
-    u_int8_t *combinePtr = resultBuf + bgChunkSize * c;
-    if (combine_buffers(deCompressedData[0][c], deCompressedData[1][c],
-                        combinePtr, decompLen[c], bits_mode, bytes_mode,
-                        threads) != 0) {
-      return NULL;
+  size_t halfLen = data.len / 2;
+  size_t numBlocks = (data.len + GROUPS_BLOCK_SIZE - 1) / GROUPS_BLOCK_SIZE;
+  double *times = NULL;
+  if (stats) {
+    times = PyMem_Calloc(numBlocks * ZIPNN_NUM_STAGES + 1, sizeof(double));
+    if (times == NULL) {
+      PyBuffer_Release(&data);
+      PyBuffer_Release(&base);
+      return PyErr_NoMemory();
     }
   }
-  ////////////// Finish Multi threading /////////////////////////////
+  PyObject *group0 = PyBytes_FromStringAndSize(NULL, halfLen);
+  PyObject *group1 = Py_None;
+  if (bytes_mode == 10) {
+    group1 = PyBytes_FromStringAndSize(NULL, halfLen);
+  } else {
+    Py_INCREF(Py_None);
+  }
+  if (group0 == NULL || group1 == NULL) {
+    Py_XDECREF(group0);
+    Py_XDECREF(group1);
+    PyMem_Free(times);
+    PyBuffer_Release(&data);
+    PyBuffer_Release(&base);
+    return NULL;
+  }
+  groups16_ctx ctx = {
+      .data = data.buf,
+      .len = data.len,
+      .groups = {(u_int8_t *)PyBytes_AS_STRING(group0),
+                 bytes_mode == 10 ? (u_int8_t *)PyBytes_AS_STRING(group1)
+                                  : NULL},
+      .bits_mode = bits_mode,
+      .bytes_mode = bytes_mode,
+      .base = base.buf,
+      .delta = delta,
+      .deltaSize = deltaSize,
+      .lossy = lossy,
+      .lossyFactor = lossyFactor,
+      .lossyFormat = lossyFormat,
+      .times = times};
+  int ret;
+  Py_BEGIN_ALLOW_THREADS;
+  ret = zipnn_parallel_for(numBlocks, zipnn_num_workers(threads, numBlocks),
+                           split_groups_task, &ctx);
+  Py_END_ALLOW_THREADS;
+  PyBuffer_Release(&data);
+  PyBuffer_Release(&base);
 
-  PyObject *py_result =
-      PyByteArray_FromStringAndSize((const char *)resultBuf, origSize);
+  if (ret != 0) {
+    PyErr_NoMemory();
+  } else if (stats) {
+    ret = zipnn_stats_add_times(stats, times, numBlocks);
+  }
+  PyMem_Free(times);
+  if (ret != 0) {
+    Py_DECREF(group0);
+    Py_DECREF(group1);
+    return NULL;
+  }
+  return Py_BuildValue("(NN)", group0, group1);
+}
 
-  for (size_t c = 0; c < numChunks; c++) {
-    for (uint32_t b = 0; b < numBuf; b++) {
-      if (compChunksType[b][c] > 0) {
-        free(deCompressedData[b][c]);
-      }
+// Python callable function to combine the byte groups of split_groups16
+// buf2 is empty if bytes_mode truncates a byte.
+// out (optional):
+//     A writable buffer of at least 2 * len(buf1) bytes to combine into, then
+//     the number of bytes written is returned instead of a new bytearray.
+// stats (optional keyword, default None):
+//     A dict to add the stage times to.
+// base, delta, delta_size (optional keywords, default None, 0, 2):
+//     The base the data was split with, its delta is reverted after the
+//     groups of every block are combined.
+// lossy, lossy_factor, lossy_format (optional keywords, default 0, 0, 1):
+//     The lossy conversion the data was split with, reverted after the delta.
+PyObject *py_combine_groups16(PyObject *self, PyObject *args,
+                              PyObject *kwargs) {
+  static char *kwlist[] = {"buf1",    "buf2", "bits_mode", "bytes_mode",
+                           "threads", "out",  "stats",     "base",
+                           "delta",   "delta_size",        "lossy",
+                           "lossy_factor", "lossy_format", NULL};
+  Py_buffer buf1, buf2;
+  Py_buffer out = {.buf = NULL, .obj = NULL};
+  Py_buffer base = {.buf = NULL, .obj = NULL};
+  int bits_mode, bytes_mode, threads;
+  int delta = ZIPNN_DELTA_NONE, deltaSize = 2;
+  int lossy = ZIPNN_LOSSY_NONE, lossyFactor = 0;
+  int lossyFormat = ZIPNN_LOSSY_BFLOAT16;
+  PyObject *statsArg = NULL, *stats = NULL;
+
+  if (!PyArg_ParseTupleAndKeywords(args, kwargs, "y*y*iii|w*$Oy*iiiii",
+                                   kwlist, &buf1, &buf2, &bits_mode,
+                                   &bytes_mode, &threads, &out, &statsArg,
+                                   &base, &delta, &deltaSize, &lossy,
+                                   &lossyFactor, &lossyFormat)) {
+    return NULL;
+  }
+
+  PyObject *py_result = NULL;
+  PyObject *resultObj = NULL;
+  double *times = NULL;
+  size_t totalLen = buf1.len * 2;
+  size_t numBlocks = (totalLen + GROUPS_BLOCK_SIZE - 1) / GROUPS_BLOCK_SIZE;
+  if (zipnn_stats_arg(statsArg, &stats) != 0 ||
+      zipnn_delta_arg(&base, totalLen, delta) != 0 ||
+      zipnn_lossy_arg(lossy, lossyFactor, lossyFormat, 2) != 0) {
+    goto done;
+  }
+  if (stats) {
+    times = PyMem_Calloc(numBlocks * ZIPNN_NUM_STAGES + 1, sizeof(double));
+    if (times == NULL) {
+      PyErr_NoMemory();
+      goto done;
     }
   }
+  if (bytes_mode != 10 && bytes_mode != 8 && bytes_mode != 1) {
+    PyErr_SetString(PyExc_ValueError, "Unsupported bytes_mode in combine");
+    goto done;
+  }
+  if ((bytes_mode == 10) != (buf2.len != 0) ||
+      (bytes_mode == 10 && buf2.len != buf1.len)) {
+    PyErr_SetString(PyExc_ValueError,
+                    "The byte groups don't match the bytes_mode");
+    goto done;
+  }
+  if (out.obj != NULL && (size_t)out.len < totalLen) {
+    PyErr_SetString(PyExc_ValueError,
+                    "The output buffer is smaller than the decompressed data");
+    goto done;
+  }
 
-  PyMem_Free(resultBuf);
-  PyBuffer_Release(&data);
+  u_int8_t *resultBuf;
+  if (out.obj != NULL) {
+    resultBuf = out.buf;
+  } else {
+    resultObj = PyByteArray_FromStringAndSize(NULL, totalLen);
+    if (resultObj == NULL) {
+      goto done;
+    }
+    resultBuf = (u_int8_t *)PyByteArray_AS_STRING(resultObj);
+  }
+  groups16_ctx ctx = {.data = resultBuf,
+                      .len = totalLen,
+                      .groups = {buf1.buf, bytes_mode == 10 ? buf2.buf : NULL},
+                      .bits_mode = bits_mode,
+                      .bytes_mode = bytes_mode,
+                      .base = base.buf,
+                      .delta = delta,
+                      .deltaSize = deltaSize,
+                      .lossy = lossy,
+                      .lossyFactor = lossyFactor,
+                      .lossyFormat = lossyFormat,
+                      .times = times};
+  Py_BEGIN_ALLOW_THREADS;
+  zipnn_parallel_for(numBlocks, zipnn_num_workers(threads, numBlocks),
+                     combine_groups_task, &ctx);
+  Py_END_ALLOW_THREADS;
+  if (stats && zipnn_stats_add_times(stats, times, numBlocks) != 0) {
+    goto done;
+  }
+
+  if (out.obj != NULL) {
+    py_result = PyLong_FromSize_t(totalLen);
+  } else {
+    py_result = resultObj;
+    resultObj = NULL;
+  }
+
+done:
+  PyMem_Free(times);
+  Py_XDECREF(resultObj);
+  PyBuffer_Release(&out);
+  PyBuffer_Release(&buf1);
+  PyBuffer_Release(&buf2);
+  PyBuffer_Release(&base);
   return py_result;
 }
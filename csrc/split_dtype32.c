@@ -1,39 +1,38 @@
 #define PY_SSIZE_T_CLEAN
+#include "byte_group.h"
+#include "lossy.h"
 #include "split_dtype_functions.h"
+#include "stats.h"
 #include <Python.h>
 #include <stdint.h>
-#include <time.h>
 
 ///////////////////////////////////
 /// Review Helpe Funcation  //////
 //////////////////////////////////
 
-// Helper function ithat count zero bytes
-static void count_zero_bytes(const u_int8_t *src, Py_ssize_t len,
-                             Py_ssize_t *msb_zeros, Py_ssize_t *mid_high,
-                             Py_ssize_t *mid_low, Py_ssize_t *lsb_zeros) {
-  Py_ssize_t num_uint32 =
-      len /
-      sizeof(
-          uint32_t);  // Calculate how many uint32_t elements are in the buffer
-  uint32_t *uint32_array =
-      (uint32_t *)src;  // Cast the byte buffer to a uint32_t array
-
-  *msb_zeros = 0;
-  *mid_high = 0;
-  *mid_low = 0;
-  *lsb_zeros = 0;
-
-  for (Py_ssize_t i = 0; i < num_uint32; i++) {
-    uint32_t value = uint32_array[i];
-    if (((value >> 24) & 0xFF) == 0)
-      (*msb_zeros)++;
-    if (((value >> 16) & 0xFF) == 0)
-      (*mid_high)++;
-    if (((value >> 8) & 0xFF00) == 0)
-      (*mid_low)++;
-    if ((value & 0xFF) == 0)
-      (*lsb_zeros)++;
+// Helper function that counts the zero bytes of elements of elemSize (2, 4
+// or 8) bytes: zeros[b] is the number of elements whose byte b (little
+// endian, LSB first) is zero. zigzag - count the bytes of the zigzag of the
+// signed elements (see zipnn_zigzag) without changing src.
+static void count_zero_bytes(const u_int8_t *src, Py_ssize_t len, int elemSize,
+                             int zigzag, Py_ssize_t *zeros) {
+  Py_ssize_t num = len / elemSize;
+  int bits = elemSize * 8;
+  uint64_t mask = elemSize == 8 ? UINT64_MAX : ((uint64_t)1 << bits) - 1;
+
+  for (int b = 0; b < elemSize; b++) {
+    zeros[b] = 0;
+  }
+  for (Py_ssize_t i = 0; i < num; i++) {
+    uint64_t value = 0;
+    memcpy(&value, src + i * elemSize, elemSize);
+    if (zigzag) {
+      uint64_t sign = (value >> (bits - 1)) & 1;
+      value = ((value << 1) ^ (0 - sign)) & mask;
+    }
+    for (int b = 0; b < elemSize; b++) {
+      zeros[b] += ((value >> (8 * b)) & 0xFF) == 0;
+    }
   }
 }
 
@@ -41,26 +40,9 @@ static void count_zero_bytes(const u_int8_t *src, Py_ssize_t len,
 /// Split Helper Functions ///////
 //////////////////////////////////
 
-// Reordering function for float bits
-static uint32_t reorder_float_bits(float number) {
-  union {
-    float f;
-    uint32_t u;
-  } value = {.f = number};
-
-  uint32_t sign = (value.u >> 8) & 0x800000;
-  uint32_t exponent = (value.u << 1) & 0xFF000000;
-  uint32_t mantissa = (value.u) & 0x7FFFFF;
-  return exponent | sign | mantissa;
-}
-
 // Helper function to reorder all floats in a bytearray
 static void reorder_all_floats(u_int8_t *src, Py_ssize_t len) {
-  uint32_t *uint_array = (uint32_t *)src;
-  Py_ssize_t num_floats = len / sizeof(uint32_t);
-  for (Py_ssize_t i = 0; i < num_floats; i++) {
-    uint_array[i] = reorder_float_bits(*(float *)&uint_array[i]);
-  }
+  zipnn_reorder_bits32(src, len / sizeof(uint32_t));
 }
 
 static int allocate_4buffers(u_int8_t **buf1, u_int8_t **buf2, u_int8_t **buf3,
@@ -97,14 +79,7 @@ static int handle_split_mode_220(u_int8_t *src, Py_ssize_t total_len,
                         *buf4_len) != 0)
     return -1;
 
-  u_int8_t *dst1 = *buf1, *dst2 = *buf2, *dst3 = *buf3, *dst4 = *buf4;
-
-  for (Py_ssize_t i = 0; i < total_len; i += 4) {
-    *dst1++ = src[i];
-    *dst2++ = src[i + 1];
-    *dst3++ = src[i + 2];
-    *dst4++ = src[i + 3];
-  }
+  zipnn_split4(src, q_len, *buf1, *buf2, *buf3, *buf4);
   return 0;
 }
 
@@ -149,15 +124,7 @@ static int handle_split_mode_9(u_int8_t *src, Py_ssize_t total_len,
                         *buf4_len) != 0)
     return -1;
 
-  uint32_t *src_uint32 = (uint32_t *)src;
-  uint16_t *dst_uint16 = (uint16_t *)*buf1;
-
-  Py_ssize_t num_uint32 = total_len / sizeof(uint32_t);
-
-  for (Py_ssize_t i = 0; i < num_uint32; i++) {
-    dst_uint16[i] = (uint16_t)src_uint32[i];
-  }
-
+  zipnn_narrow32_16(src, total_len / sizeof(uint32_t), *buf1);
   return 0;
 }
 
@@ -176,40 +143,28 @@ static int handle_split_mode_1(u_int8_t *src, Py_ssize_t total_len,
                         *buf4_len) != 0)
     return -1;
 
-  uint32_t *src_uint32 = (uint32_t *)src;
-  u_int8_t *dst_uint8 = (u_int8_t *)*buf1;
-
-  Py_ssize_t num_uint32 = total_len / sizeof(uint32_t);
-
-  for (Py_ssize_t i = 0; i < num_uint32; i++) {
-    dst_uint8[i] = (u_int8_t)src_uint32[i];
-  }
-
+  zipnn_narrow32_8(src, total_len / sizeof(uint32_t), *buf1);
   return 0;
 }
 
 // Helper function to split a bytearray into four buffers
+// times (optional) - the stage times, NULL to not time them
 static int split_dtype32(u_int8_t *src, Py_ssize_t total_len, u_int8_t **buf1,
                          u_int8_t **buf2, u_int8_t **buf3, u_int8_t **buf4,
                          Py_ssize_t *buf1_len, Py_ssize_t *buf2_len,
                          Py_ssize_t *buf3_len, Py_ssize_t *buf4_len,
                          int bits_mode, int bytes_mode, int is_review,
-                         int threads) {
+                         int threads, double *times) {
+  double start = times ? zipnn_now() : 0;
   if (bits_mode == 1) {  // reoreder exponent
     reorder_all_floats(src, total_len);
+  } else if (bits_mode == 4) {
+    zipnn_zigzag(src, total_len, 4);
   }
-
-  if (is_review == 1) {
-    clock_t start, end;
-    double cpu_time_used;
-    Py_ssize_t msb_zeros, mid_high, mid_low, low;
-    start = clock();
-    count_zero_bytes(src, total_len, &msb_zeros, &mid_high, &mid_low, &low);
-
-    end = clock();  // End the timer
-    cpu_time_used = ((double)(end - start)) / CLOCKS_PER_SEC;
-    printf("msb_zeros %zd mid_high %zd mid_low %zd low %zd time in sec %f \n",
-           msb_zeros, mid_high, mid_low, low, cpu_time_used);
+  if (times) {
+    double now = zipnn_now();
+    times[ZIPNN_STAGE_BIT_REORDER] += now - start;
+    start = now;
   }
 
   switch (bytes_mode) {
@@ -242,6 +197,9 @@ static int split_dtype32(u_int8_t *src, Py_ssize_t total_len, u_int8_t **buf1,
     // we are not supportin this splitting bytes_mode
     return -1;
   }
+  if (times) {
+    times[ZIPNN_STAGE_BYTE_SPLIT] += zipnn_now() - start;
+  }
   return 0;
 }
 
@@ -249,171 +207,144 @@ static int split_dtype32(u_int8_t *src, Py_ssize_t total_len, u_int8_t **buf1,
 /////////  Combine Functions //////
 ///////////////////////////////////
 
-// Reordering function for float bits
-static uint32_t revert_float_bits(float number) {
-  union {
-    float f;
-    uint32_t u;
-  } value = {.f = number};
-
-  uint32_t sign = (value.u << 8) & 0x80000000;
-  uint32_t exponent = (value.u >> 1) & 0x7F800000;
-  uint32_t mantissa = (value.u) & 0x7FFFFF;
-  return sign | exponent | mantissa;
-}
-
 // Helper function to reorder all floats in a bytearray
 static void revert_all_floats(u_int8_t *src, Py_ssize_t len) {
-  uint32_t *uint_array = (uint32_t *)src;
-  Py_ssize_t num_floats = len / sizeof(uint32_t);
-  for (Py_ssize_t i = 0; i < num_floats; i++) {
-    uint_array[i] = revert_float_bits(*(float *)&uint_array[i]);
-  }
+  zipnn_revert_bits32(src, len / sizeof(uint32_t));
 }
 
-static int allocate_buffer(u_int8_t **result, Py_ssize_t total_len) {
-  *result = PyMem_Malloc(total_len);
-  if (*result == NULL) {
-    PyErr_SetString(PyExc_MemoryError, "Failed to allocate memory");
+// Length of the combined buffer according to the bytes_mode, -1 if the
+// bytes_mode is not supported
+static Py_ssize_t combine_dtype32_len(Py_ssize_t buf1_len, int bytes_mode) {
+  switch (bytes_mode) {
+  case 220:
+    return buf1_len * 4;
+  case 41:
+    return buf1_len / 3 * 4;
+  case 9:
+    return buf1_len * 2;
+  case 1:
+    return buf1_len * 4;
+  default:
     return -1;
   }
-  return 0;
 }
 
-static int handle_combine_mode_220(u_int8_t **result, Py_ssize_t *total_len,
-                                   u_int8_t *buf1, u_int8_t *buf2, u_int8_t *buf3,
-                                   u_int8_t *buf4, Py_ssize_t buf1_len,
-                                   Py_ssize_t buf2_len, Py_ssize_t buf3_len,
-                                   Py_ssize_t buf4_len) {
-  *total_len = buf1_len * 4;
-  if (allocate_buffer(result, *total_len) != 0)
-    return -1;
-
-  u_int8_t *dst = *result;
-  Py_ssize_t q_len = *total_len / 4;
-
-  Py_ssize_t j = 0;
-  for (Py_ssize_t i = 0; i < q_len; i++) {
-    dst[j++] = buf1[i];
-    dst[j++] = buf2[i];
-    dst[j++] = buf3[i];
-    dst[j++] = buf4[i];
-  }
-  return 0;
+static void handle_combine_mode_220(u_int8_t *dst, Py_ssize_t total_len,
+                                    u_int8_t *buf1, u_int8_t *buf2,
+                                    u_int8_t *buf3, u_int8_t *buf4) {
+  zipnn_combine4(buf1, buf2, buf3, buf4, dst, total_len / 4);
 }
 
-static int handle_combine_mode_41(u_int8_t **result, Py_ssize_t *total_len,
-                                  u_int8_t *buf1, u_int8_t *buf2, u_int8_t *buf3,
-                                  u_int8_t *buf4, Py_ssize_t buf1_len,
-                                  Py_ssize_t buf2_len, Py_ssize_t buf3_len,
-                                  Py_ssize_t buf4_len) {
-  *total_len = buf1_len / 3 * 4;
-  if (allocate_buffer(result, *total_len) != 0)
-    return -1;
-
-  u_int8_t *dst = *result;
-
+static void handle_combine_mode_41(u_int8_t *dst, Py_ssize_t total_len,
+                                   u_int8_t *buf1) {
   Py_ssize_t i = 0;
-  for (Py_ssize_t j = 0; j < *total_len; j += 4) {
+  for (Py_ssize_t j = 0; j < total_len; j += 4) {
     dst[j] = buf1[i++];
     dst[j + 1] = buf1[i++];
     dst[j + 2] = buf1[i++];
     dst[j + 3] = 0;
   }
-  return 0;
 }
 
-static int handle_combine_mode_9(u_int8_t **result, Py_ssize_t *total_len,
-                                 u_int8_t *buf1, u_int8_t *buf2, u_int8_t *buf3,
-                                 u_int8_t *buf4, Py_ssize_t buf1_len,
-                                 Py_ssize_t buf2_len, Py_ssize_t buf3_len,
-                                 Py_ssize_t buf4_len) {
-  *total_len = buf1_len * 2;
-  if (allocate_buffer(result, *total_len) != 0)
-    return -1;
-
-  uint32_t *dst_uint32 = (uint32_t *)*result;
-  uint16_t *src_uint16 = (uint16_t *)buf1;
-
-  Py_ssize_t num_uint32 = *total_len / sizeof(uint32_t);
-
-  for (Py_ssize_t i = 0; i < num_uint32; i++) {
-    dst_uint32[i] = src_uint16[i];
-  }
-
-  return 0;
+static void handle_combine_mode_9(u_int8_t *dst, Py_ssize_t total_len,
+                                  u_int8_t *buf1) {
+  zipnn_widen16_32(buf1, total_len / sizeof(uint32_t), dst);
 }
 
-static int handle_combine_mode_1(u_int8_t **result, Py_ssize_t *total_len,
-                                 u_int8_t *buf1, u_int8_t *buf2, u_int8_t *buf3,
-                                 u_int8_t *buf4, Py_ssize_t buf1_len,
-                                 Py_ssize_t buf2_len, Py_ssize_t buf3_len,
-                                 Py_ssize_t buf4_len) {
-  *total_len = buf1_len * 4;
-  if (allocate_buffer(result, *total_len) != 0)
-    return -1;
-
-  uint32_t *dst_uint32 = (uint32_t *)*result;
-  u_int8_t *src_uint8 = (u_int8_t *)buf1;
-
-  Py_ssize_t num_uint32 = *total_len / sizeof(uint32_t);
-
-  for (Py_ssize_t i = 0; i < num_uint32; i++) {
-    dst_uint32[i] = src_uint8[i];
-  }
-
-  return 0;
+static void handle_combine_mode_1(u_int8_t *dst, Py_ssize_t total_len,
+                                  u_int8_t *buf1) {
+  zipnn_widen8_32(buf1, total_len / sizeof(uint32_t), dst);
 }
 
-// Helper function to combine four buffers into a single bytearray
-static u_int8_t *combine_dtype32(Py_ssize_t *total_len, u_int8_t *buf1,
-                                u_int8_t *buf2, u_int8_t *buf3, u_int8_t *buf4,
-                                Py_ssize_t buf1_len, Py_ssize_t buf2_len,
-                                Py_ssize_t buf3_len, Py_ssize_t buf4_len,
-                                int bytes_mode, int threads) {
-  u_int8_t *result = NULL;
-
+// Helper function to combine four buffers into dst, total_len is the output
+// of combine_dtype32_len
+static int combine_dtype32(u_int8_t *dst, Py_ssize_t total_len, u_int8_t *buf1,
+                           u_int8_t *buf2, u_int8_t *buf3, u_int8_t *buf4,
+                           int bytes_mode, int threads) {
   switch (bytes_mode) {
   case 220:
     // 8b1_10_11_100 [decimal 220] - bytegroup to four groups [1,2,3,4]
-    handle_combine_mode_220(&result, total_len, buf1, buf2, buf3, buf4,
-                            buf1_len, buf2_len, buf3_len, buf4_len);
+    handle_combine_mode_220(dst, total_len, buf1, buf2, buf3, buf4);
     break;
 
   case 41:
     // 8b0_01_01_001 [decimal 41] - truncate the MSB [0,1,1,1]
-    handle_combine_mode_41(&result, total_len, buf1, buf2, buf3, buf4, buf1_len,
-                           buf2_len, buf3_len, buf4_len);
+    handle_combine_mode_41(dst, total_len, buf1);
     break;
 
   case 9:
     //     8b0_00_01_001 [decimal 9] - truncate the MSB+MID_HIGH [0,0,1,1]
-    handle_combine_mode_9(&result, total_len, buf1, buf2, buf3, buf4, buf1_len,
-                          buf2_len, buf3_len, buf4_len);
+    handle_combine_mode_9(dst, total_len, buf1);
     break;
 
   case 1:
     //     8b0_00_00_001 [decimal 1] - truncate the MSB+MID_HIGH+MID_LOW
     //     [0,0,0,1]
-    handle_combine_mode_1(&result, total_len, buf1, buf2, buf3, buf4, buf1_len,
-                          buf2_len, buf3_len, buf4_len);
+    handle_combine_mode_1(dst, total_len, buf1);
     break;
 
   default:
     // we are not supportin this splitting bytes_mode
-    return NULL;
+    return -1;
   }
-  return result;
+  return 0;
 }
 
 /////////////////////////////////////////////////////////////
 //////////////// Python callable Functions /////////////////
 /////////////////////////////////////////////////////////////
 
+// Python callable function that counts the zero bytes of the elements of data,
+// to choose the bytes_mode that truncates the bytes that are zero in all of
+// them.
+// elem_size:
+//     2, 4 or 8 - the elements are little endian integers of elem_size bytes.
+// bits_mode (optional, default 0):
+//     4 - count the bytes of the zigzag of the signed elements, like bits_mode
+//     4 of split_dtype16/split_dtype32.
+// Returns a tuple of elem_size counts, the number of elements whose byte b
+// (LSB first) is zero.
+PyObject *py_count_zero_bytes(PyObject *self, PyObject *args,
+                              PyObject *kwargs) {
+  static char *kwlist[] = {"data", "elem_size", "bits_mode", NULL};
+  Py_buffer data;
+  int elemSize, bits_mode = 0;
+  Py_ssize_t zeros[8];
+
+  if (!PyArg_ParseTupleAndKeywords(args, kwargs, "y*i|i", kwlist, &data,
+                                   &elemSize, &bits_mode)) {
+    return NULL;
+  }
+  if (elemSize != 2 && elemSize != 4 && elemSize != 8) {
+    PyBuffer_Release(&data);
+    PyErr_SetString(PyExc_ValueError, "elem_size must be 2, 4 or 8");
+    return NULL;
+  }
+  Py_BEGIN_ALLOW_THREADS;
+  count_zero_bytes(data.buf, data.len, elemSize, bits_mode == 4, zeros);
+  Py_END_ALLOW_THREADS;
+  PyBuffer_Release(&data);
+
+  PyObject *result = PyTuple_New(elemSize);
+  if (result == NULL) {
+    return NULL;
+  }
+  for (int b = 0; b < elemSize; b++) {
+    PyObject *count = PyLong_FromSsize_t(zeros[b]);
+    if (count == NULL) {
+      Py_DECREF(result);
+      return NULL;
+    }
+    PyTuple_SET_ITEM(result, b, count);
+  }
+  return result;
+}
+
 // Python callable function to split a bytearray into four buffers
 // bits_mode:
 //     0 - no ordering of the bits
 //     1 - reorder of the exponent (eponent, sign_bit, mantissa)
+//     4 - the data is int32, the sign is moved to the LSB (see zipnn_zigzag)
 // bytes_mode:
 //     [we are refering to the bytes order as first 2bits refer to the MSByte
 //     and the second two bits to the LSByte] 1b [MSByte],2b[MID-HIGH Byte],
@@ -438,28 +369,90 @@ static u_int8_t *combine_dtype32(Py_ssize_t *total_len, u_int8_t *buf1,
 //     Even if you have the Byte mode, you can change it if needed.
 //     0 - No review, take the bit_mode and bytes_mode
 //     1 - the finction can change the Bytes_mode
-
-PyObject *py_split_dtype32(PyObject *self, PyObject *args) {
+// stats (optional keyword, default None):
+//     A dict to add the stage times to, see stats.h.
+// base, delta (optional keywords, default None, 0):
+//     A buffer of the same length as data to take the delta of the 32 bit
+//     elements against before the bits are reordered, delta is
+//     ZIPNN_DELTA_XOR or ZIPNN_DELTA_SUB (see zipnn_delta). Like the bits,
+//     the delta is done in place on data.
+// lossy, lossy_factor (optional keywords, default 0, 0):
+//     A lossy conversion of the float32 elements before their delta is taken,
+//     ZIPNN_LOSSY_INTEGER or ZIPNN_LOSSY_MANTISSA with the factor bits (see
+//     lossy.h). It is done in place on data as well.
+
+PyObject *py_split_dtype32(PyObject *self, PyObject *args, PyObject *kwargs) {
+  static char *kwlist[] = {"data",      "bits_mode", "bytes_mode",
+                           "is_review", "threads",   "stats",
+                           "base",      "delta",     "lossy",
+                           "lossy_factor",           NULL};
   Py_buffer view;
+  Py_buffer base = {.buf = NULL, .obj = NULL};
   int bits_mode, bytes_mode, is_review, threads;
-
-  if (!PyArg_ParseTuple(args, "y*iiii", &view, &bits_mode, &bytes_mode,
-                        &is_review, &threads)) {
+  int delta = ZIPNN_DELTA_NONE;
+  int lossy = ZIPNN_LOSSY_NONE, lossyFactor = 0;
+  PyObject *statsArg = NULL, *stats;
+  double times[ZIPNN_NUM_STAGES] = {0};
+
+  if (!PyArg_ParseTupleAndKeywords(args, kwargs, "y*iiii|$Oy*iii", kwlist,
+                                   &view, &bits_mode, &bytes_mode, &is_review,
+                                   &threads, &statsArg, &base, &delta, &lossy,
+                                   &lossyFactor)) {
+    return NULL;
+  }
+  if (zipnn_stats_arg(statsArg, &stats) != 0 ||
+      zipnn_delta_arg(&base, view.len, delta) != 0 ||
+      zipnn_lossy_arg(lossy, lossyFactor, ZIPNN_LOSSY_FLOAT32, 4) != 0) {
+    PyBuffer_Release(&base);
+    PyBuffer_Release(&view);
     return NULL;
   }
+  if (view.len % 4 != 0) {
+    PyBuffer_Release(&base);
+    PyBuffer_Release(&view);
+    PyErr_SetString(PyExc_ValueError,
+                    "The data is not a whole number of 32 bit elements");
+    return NULL;
+  }
+  if (lossy != ZIPNN_LOSSY_NONE) {
+    double start = stats ? zipnn_now() : 0;
+    Py_BEGIN_ALLOW_THREADS;
+    zipnn_lossy(view.buf, view.len, lossy, lossyFactor, ZIPNN_LOSSY_FLOAT32);
+    Py_END_ALLOW_THREADS;
+    if (stats) {
+      times[ZIPNN_STAGE_LOSSY] += zipnn_now() - start;
+    }
+  }
+  if (base.obj != NULL) {
+    double start = stats ? zipnn_now() : 0;
+    Py_BEGIN_ALLOW_THREADS;
+    zipnn_delta(view.buf, base.buf, view.len, delta, 4);
+    Py_END_ALLOW_THREADS;
+    if (stats) {
+      times[ZIPNN_STAGE_DELTA] += zipnn_now() - start;
+    }
+    PyBuffer_Release(&base);
+  }
 
   u_int8_t *buf1 = NULL, *buf2 = NULL, *buf3 = NULL, *buf4 = NULL;
   Py_ssize_t buf1_len = 0, buf2_len = 0, buf3_len = 0, buf4_len = 0;
   if (split_dtype32(view.buf, view.len, &buf1, &buf2, &buf3, &buf4, &buf1_len,
                     &buf2_len, &buf3_len, &buf4_len, bits_mode, bytes_mode,
-                    is_review, threads) != 0) {
+                    is_review, threads, stats ? times : NULL) != 0) {
     PyBuffer_Release(&view);
     PyErr_SetString(PyExc_MemoryError, "Failed to allocate memory");
     return NULL;
   }
 
+  double start = stats ? zipnn_now() : 0;
   PyObject *result = Py_BuildValue("y#y#y#y#", buf1, buf1_len, buf2, buf2_len,
                                    buf3, buf3_len, buf4, buf4_len);
+  if (stats && result != NULL) {
+    times[ZIPNN_STAGE_ASSEMBLY] += zipnn_now() - start;
+    if (zipnn_stats_add_times(stats, times, 1) != 0) {
+      Py_CLEAR(result);
+    }
+  }
   PyMem_Free(buf1);
   PyMem_Free(buf2);
   PyMem_Free(buf3);
@@ -469,42 +462,129 @@ PyObject *py_split_dtype32(PyObject *self, PyObject *args) {
   return result;
 }
 
-// Python callable function to combine four buffers into a single bytearray
-PyObject *py_combine_dtype32(PyObject *self, PyObject *args) {
+// Python callable function to combine four buffers into a single bytearray,
+// or into the optional writable buffer out (then the number of bytes written
+// is returned)
+// stats (optional keyword, default None):
+//     A dict to add the stage times to, see stats.h.
+// base, delta (optional keywords, default None, 0):
+//     The base the data was split with, its delta is reverted after the bits.
+// lossy, lossy_factor (optional keywords, default 0, 0):
+//     The lossy conversion the data was split with, reverted after the delta.
+PyObject *py_combine_dtype32(PyObject *self, PyObject *args,
+                             PyObject *kwargs) {
+  static char *kwlist[] = {"buf1",      "buf2",       "buf3",    "buf4",
+                           "bits_mode", "bytes_mode", "threads", "out",
+                           "stats",     "base",       "delta",   "lossy",
+                           "lossy_factor",                       NULL};
   Py_buffer view1, view2, view3, view4;
+  Py_buffer out = {.buf = NULL, .obj = NULL};
+  Py_buffer base = {.buf = NULL, .obj = NULL};
   int bits_mode, bytes_mode, threads;
-
-  if (!PyArg_ParseTuple(args, "y*y*y*y*iii", &view1, &view2, &view3, &view4,
-                        &bits_mode, &bytes_mode, &threads)) {
+  int delta = ZIPNN_DELTA_NONE;
+  int lossy = ZIPNN_LOSSY_NONE, lossyFactor = 0;
+  PyObject *resultObj = NULL;
+  PyObject *statsArg = NULL, *stats;
+  double times[ZIPNN_NUM_STAGES] = {0};
+
+  if (!PyArg_ParseTupleAndKeywords(
+          args, kwargs, "y*y*y*y*iii|w*$Oy*iii", kwlist, &view1, &view2,
+          &view3, &view4, &bits_mode, &bytes_mode, &threads, &out, &statsArg,
+          &base, &delta, &lossy, &lossyFactor)) {
     return NULL;
   }
+  Py_ssize_t total_len = combine_dtype32_len(view1.len, bytes_mode);
+  if (zipnn_stats_arg(statsArg, &stats) != 0) {
+    goto cleanup;
+  }
+  if (total_len < 0) {
+    PyErr_SetString(PyExc_ValueError, "Unsupported bytes_mode");
+    goto cleanup;
+  }
+  if (zipnn_delta_arg(&base, total_len, delta) != 0 ||
+      zipnn_lossy_arg(lossy, lossyFactor, ZIPNN_LOSSY_FLOAT32, 4) != 0) {
+    goto cleanup;
+  }
+  if (bytes_mode == 220 &&
+      (view2.len < view1.len || view3.len < view1.len || view4.len < view1.len)) {
+    PyErr_SetString(PyExc_ValueError, "The byte groups have different sizes");
+    goto cleanup;
+  }
 
-  Py_ssize_t total_len = 0;
-  u_int8_t *result =
-      combine_dtype32(&total_len, (u_int8_t *)view1.buf, (u_int8_t *)view2.buf,
-                      (u_int8_t *)view3.buf, (u_int8_t *)view4.buf, view1.len,
-                      view2.len, view3.len, view4.len, bytes_mode, threads);
-
-  if (result == NULL) {
-    PyBuffer_Release(&view1);
-    PyBuffer_Release(&view2);
-    PyBuffer_Release(&view3);
-    PyBuffer_Release(&view4);
-    PyErr_SetString(PyExc_MemoryError, "Failed to allocate memory");
-    return NULL;
+  u_int8_t *dst;
+  if (out.obj != NULL) {
+    if (out.len < total_len) {
+      PyErr_SetString(PyExc_ValueError,
+                      "The output buffer is smaller than the decompressed data");
+      goto cleanup;
+    }
+    dst = (u_int8_t *)out.buf;
+  } else {
+    resultObj = PyByteArray_FromStringAndSize(NULL, total_len);
+    if (resultObj == NULL) {
+      goto cleanup;
+    }
+    dst = (u_int8_t *)PyByteArray_AS_STRING(resultObj);
   }
 
-  // Revert the reordering of all floats if needed
+  Py_BEGIN_ALLOW_THREADS;
+  double start = stats ? zipnn_now() : 0;
+  combine_dtype32(dst, total_len, (u_int8_t *)view1.buf, (u_int8_t *)view2.buf,
+                  (u_int8_t *)view3.buf, (u_int8_t *)view4.buf, bytes_mode,
+                  threads);
+  if (stats) {
+    double now = zipnn_now();
+    times[ZIPNN_STAGE_BYTE_SPLIT] += now - start;
+    start = now;
+  }
+  // Revert the reordering of all floats (or the zigzag of ints) if needed
   if (bits_mode == 1) {
-    revert_all_floats(result, total_len);
+    revert_all_floats(dst, total_len);
+  } else if (bits_mode == 4) {
+    zipnn_unzigzag(dst, total_len, 4);
+  }
+  if (stats) {
+    double now = zipnn_now();
+    times[ZIPNN_STAGE_BIT_REORDER] += now - start;
+    start = now;
+  }
+  if (base.obj != NULL) {
+    zipnn_undelta(dst, base.buf, total_len, delta, 4);
+    if (stats) {
+      double now = zipnn_now();
+      times[ZIPNN_STAGE_DELTA] += now - start;
+      start = now;
+    }
+  }
+  if (lossy != ZIPNN_LOSSY_NONE) {
+    zipnn_unlossy(dst, total_len, lossy, lossyFactor, ZIPNN_LOSSY_FLOAT32);
+    if (stats) {
+      times[ZIPNN_STAGE_LOSSY] += zipnn_now() - start;
+    }
+  }
+  Py_END_ALLOW_THREADS;
+  if (stats && zipnn_stats_add_times(stats, times, 1) != 0) {
+    goto cleanup;
   }
 
-  PyObject *py_result = PyByteArray_FromStringAndSize(result, total_len);
-  PyMem_Free(result);
   PyBuffer_Release(&view1);
   PyBuffer_Release(&view2);
   PyBuffer_Release(&view3);
   PyBuffer_Release(&view4);
+  PyBuffer_Release(&base);
+  if (out.obj != NULL) {
+    PyBuffer_Release(&out);
+    return PyLong_FromSsize_t(total_len);
+  }
+  return resultObj;
 
-  return py_result;
+cleanup:
+  Py_XDECREF(resultObj);
+  PyBuffer_Release(&view1);
+  PyBuffer_Release(&view2);
+  PyBuffer_Release(&view3);
+  PyBuffer_Release(&view4);
+  PyBuffer_Release(&base);
+  PyBuffer_Release(&out);
+  return NULL;
 }
@@ -0,0 +1,332 @@
+#define PY_SSIZE_T_CLEAN
+#include "byte_group.h"
+#include "parallel.h"
+#include "split_dtype_functions.h"
+#include "stats.h"
+#include <Python.h>
+#include <stdint.h>
+#include <stdlib.h>
+#include <string.h>
+
+// The float64 elements are split to 8 byte groups, block by block on the
+// threads. The groups are compressed in chunks in Python, like the ones of
+// split_dtype32.
+
+// Bytes of the elements every task splits or combines, a multiple of 8
+#define BLOCK64_SIZE (64 * 1024)
+
+// bytes_mode of the 8 byte groups [1,2,3,4,5,6,7,8], the only one supported
+#define BYTES_MODE_64 8
+
+typedef struct {
+  u_int8_t *data;       // the elements, len bytes
+  size_t len;
+  u_int8_t *groups[8];  // len / 8 bytes each, LSByte first
+  int bits_mode;
+  const u_int8_t *base; // len bytes, NULL - no delta
+  int delta;
+  double *times;        // [task * ZIPNN_NUM_STAGES + stage] - NULL if the
+                        // stages aren't timed
+} groups64_ctx;
+
+static size_t block_len(const groups64_ctx *ctx, size_t task) {
+  size_t offset = task * BLOCK64_SIZE;
+  return (ctx->len - offset > BLOCK64_SIZE) ? BLOCK64_SIZE
+                                            : (ctx->len - offset);
+}
+
+static int split_groups64_task(void *arg, size_t task, int worker) {
+  (void)worker;
+  groups64_ctx *ctx = (groups64_ctx *)arg;
+  size_t offset = task * BLOCK64_SIZE;
+  size_t len = block_len(ctx, task);
+  u_int8_t *src = ctx->data + offset;
+  u_int8_t *scratch = NULL;
+  double *times = ctx->times ? &ctx->times[task * ZIPNN_NUM_STAGES] : NULL;
+  double start = times ? zipnn_now() : 0;
+  // the delta is taken and the bits are reordered in a copy
+  if (ctx->bits_mode != 0 || ctx->base != NULL) {
+    scratch = malloc(len);
+    if (scratch == NULL) {
+      return -1;
+    }
+    memcpy(scratch, src, len);
+    src = scratch;
+  }
+  if (ctx->base != NULL) {
+    zipnn_delta(scratch, ctx->base + offset, len, ctx->delta, 8);
+    if (times) {
+      double now = zipnn_now();
+      times[ZIPNN_STAGE_DELTA] += now - start;
+      start = now;
+    }
+  }
+  if (ctx->bits_mode == 1) {
+    zipnn_reorder_bits64(scratch, len / 8);
+  }
+  if (times) {
+    double now = zipnn_now();
+    times[ZIPNN_STAGE_BIT_REORDER] += now - start;
+    start = now;
+  }
+  u_int8_t *dst[8];
+  for (int b = 0; b < 8; b++) {
+    dst[b] = ctx->groups[b] + offset / 8;
+  }
+  zipnn_split8(src, len / 8, dst);
+  if (times) {
+    times[ZIPNN_STAGE_BYTE_SPLIT] += zipnn_now() - start;
+  }
+  free(scratch);
+  return 0;
+}
+
+static int combine_groups64_task(void *arg, size_t task, int worker) {
+  (void)worker;
+  groups64_ctx *ctx = (groups64_ctx *)arg;
+  size_t offset = task * BLOCK64_SIZE;
+  size_t len = block_len(ctx, task);
+  u_int8_t *dst = ctx->data + offset;
+  double *times = ctx->times ? &ctx->times[task * ZIPNN_NUM_STAGES] : NULL;
+  double start = times ? zipnn_now() : 0;
+  const u_int8_t *src[8];
+  for (int b = 0; b < 8; b++) {
+    src[b] = ctx->groups[b] + offset / 8;
+  }
+  zipnn_combine8(src, dst, len / 8);
+  if (times) {
+    double now = zipnn_now();
+    times[ZIPNN_STAGE_BYTE_SPLIT] += now - start;
+    start = now;
+  }
+  if (ctx->bits_mode == 1) {
+    zipnn_revert_bits64(dst, len / 8);
+  }
+  if (times) {
+    double now = zipnn_now();
+    times[ZIPNN_STAGE_BIT_REORDER] += now - start;
+    start = now;
+  }
+  if (ctx->base != NULL) {
+    zipnn_undelta(dst, ctx->base + offset, len, ctx->delta, 8);
+    if (times) {
+      times[ZIPNN_STAGE_DELTA] += zipnn_now() - start;
+    }
+  }
+  return 0;
+}
+
+/////////////////////////////////////////////////////////////
+//////////////// Python callable Functions /////////////////
+/////////////////////////////////////////////////////////////
+
+// Python callable function to split float64 data into its 8 byte groups.
+// Unlike split_dtype32 the input is not modified.
+// bits_mode:
+//     0 - no ordering of the bits
+//     1 - reorder of the exponent (exponent, sign_bit, mantissa)
+// bytes_mode:
+//     8 - bytegroup to eight groups [1,2,3,4,5,6,7,8]
+// threads:
+//     Number of threads, each one takes a different block of the data.
+//     0 - decide according to the number of CPUs.
+// stats (optional keyword, default None):
+//     A dict to add the stage times to, see stats.h.
+// base, delta (optional keywords, default None, 0):
+//     A buffer of the same length as data to take the delta of the 64 bit
+//     elements against before the bits are reordered (see zipnn_delta).
+// Returns a tuple of the 8 groups, LSByte first.
+PyObject *py_split_dtype64(PyObject *self, PyObject *args, PyObject *kwargs) {
+  static char *kwlist[] = {"data",  "bits_mode", "bytes_mode", "threads",
+                           "stats", "base",      "delta",      NULL};
+  Py_buffer data;
+  Py_buffer base = {.buf = NULL, .obj = NULL};
+  int bits_mode, bytes_mode, threads;
+  int delta = ZIPNN_DELTA_NONE;
+  PyObject *statsArg = NULL, *stats;
+
+  if (!PyArg_ParseTupleAndKeywords(args, kwargs, "y*iii|$Oy*i", kwlist, &data,
+                                   &bits_mode, &bytes_mode, &threads,
+                                   &statsArg, &base, &delta)) {
+    return NULL;
+  }
+  if (zipnn_stats_arg(statsArg, &stats) != 0 ||
+      zipnn_delta_arg(&base, data.len, delta) != 0) {
+    PyBuffer_Release(&base);
+    PyBuffer_Release(&data);
+    return NULL;
+  }
+  if (bytes_mode != BYTES_MODE_64) {
+    PyBuffer_Release(&data);
+    PyBuffer_Release(&base);
+    PyErr_SetString(PyExc_ValueError, "Unsupported bytes_mode in split");
+    return NULL;
+  }
+  if (data.len % 8 != 0) {
+    PyBuffer_Release(&data);
+    PyBuffer_Release(&base);
+    PyErr_SetString(PyExc_ValueError,
+                    "The data is not a whole number of 64 bit elements");
+    return NULL;
+  }
+
+  size_t numBlocks = (data.len + BLOCK64_SIZE - 1) / BLOCK64_SIZE;
+  double *times = NULL;
+  if (stats) {
+    times = PyMem_Calloc(numBlocks * ZIPNN_NUM_STAGES + 1, sizeof(double));
+    if (times == NULL) {
+      PyBuffer_Release(&data);
+      PyBuffer_Release(&base);
+      return PyErr_NoMemory();
+    }
+  }
+  PyObject *result = PyTuple_New(8);
+  groups64_ctx ctx = {.data = data.buf,
+                      .len = data.len,
+                      .bits_mode = bits_mode,
+                      .base = base.buf,
+                      .delta = delta,
+                      .times = times};
+  int ret = result == NULL ? -1 : 0;
+  for (int b = 0; b < 8 && ret == 0; b++) {
+    PyObject *group = PyBytes_FromStringAndSize(NULL, data.len / 8);
+    if (group == NULL) {
+      ret = -1;
+      break;
+    }
+    PyTuple_SET_ITEM(result, b, group);
+    ctx.groups[b] = (u_int8_t *)PyBytes_AS_STRING(group);
+  }
+  if (ret != 0) {
+    Py_XDECREF(result);
+    PyMem_Free(times);
+    PyBuffer_Release(&data);
+    PyBuffer_Release(&base);
+    return NULL;
+  }
+
+  Py_BEGIN_ALLOW_THREADS;
+  ret = zipnn_parallel_for(numBlocks, zipnn_num_workers(threads, numBlocks),
+                           split_groups64_task, &ctx);
+  Py_END_ALLOW_THREADS;
+  PyBuffer_Release(&data);
+  PyBuffer_Release(&base);
+
+  if (ret != 0) {
+    PyErr_NoMemory();
+  } else if (stats) {
+    ret = zipnn_stats_add_times(stats, times, numBlocks);
+  }
+  PyMem_Free(times);
+  if (ret != 0) {
+    Py_DECREF(result);
+    return NULL;
+  }
+  return result;
+}
+
+// Python callable function to combine the 8 byte groups of split_dtype64 into
+// a single bytearray, or into the optional writable buffer out (then the
+// number of bytes written is returned)
+// stats (optional keyword, default None):
+//     A dict to add the stage times to, see stats.h.
+// base, delta (optional keywords, default None, 0):
+//     The base the data was split with, its delta is reverted after the bits.
+PyObject *py_combine_dtype64(PyObject *self, PyObject *args,
+                             PyObject *kwargs) {
+  static char *kwlist[] = {"buf1",       "buf2",    "buf3", "buf4",
+                           "buf5",       "buf6",    "buf7", "buf8",
+                           "bits_mode",  "bytes_mode",      "threads",
+                           "out",        "stats",   "base", "delta",
+                           NULL};
+  Py_buffer bufs[8];
+  Py_buffer out = {.buf = NULL, .obj = NULL};
+  Py_buffer base = {.buf = NULL, .obj = NULL};
+  int bits_mode, bytes_mode, threads;
+  int delta = ZIPNN_DELTA_NONE;
+  PyObject *statsArg = NULL, *stats = NULL;
+
+  if (!PyArg_ParseTupleAndKeywords(
+          args, kwargs, "y*y*y*y*y*y*y*y*iii|w*$Oy*i", kwlist, &bufs[0],
+          &bufs[1], &bufs[2], &bufs[3], &bufs[4], &bufs[5], &bufs[6],
+          &bufs[7], &bits_mode, &bytes_mode, &threads, &out, &statsArg, &base,
+          &delta)) {
+    return NULL;
+  }
+
+  PyObject *py_result = NULL;
+  PyObject *resultObj = NULL;
+  double *times = NULL;
+  size_t totalLen = bufs[0].len * 8;
+  size_t numBlocks = (totalLen + BLOCK64_SIZE - 1) / BLOCK64_SIZE;
+  if (zipnn_stats_arg(statsArg, &stats) != 0 ||
+      zipnn_delta_arg(&base, totalLen, delta) != 0) {
+    goto done;
+  }
+  if (bytes_mode != BYTES_MODE_64) {
+    PyErr_SetString(PyExc_ValueError, "Unsupported bytes_mode in combine");
+    goto done;
+  }
+  for (int b = 1; b < 8; b++) {
+    if (bufs[b].len != bufs[0].len) {
+      PyErr_SetString(PyExc_ValueError, "The byte groups have different sizes");
+      goto done;
+    }
+  }
+  if (out.obj != NULL && (size_t)out.len < totalLen) {
+    PyErr_SetString(PyExc_ValueError,
+                    "The output buffer is smaller than the decompressed data");
+    goto done;
+  }
+  if (stats) {
+    times = PyMem_Calloc(numBlocks * ZIPNN_NUM_STAGES + 1, sizeof(double));
+    if (times == NULL) {
+      PyErr_NoMemory();
+      goto done;
+    }
+  }
+
+  u_int8_t *resultBuf;
+  if (out.obj != NULL) {
+    resultBuf = out.buf;
+  } else {
+    resultObj = PyByteArray_FromStringAndSize(NULL, totalLen);
+    if (resultObj == NULL) {
+      goto done;
+    }
+    resultBuf = (u_int8_t *)PyByteArray_AS_STRING(resultObj);
+  }
+  groups64_ctx ctx = {.data = resultBuf,
+                      .len = totalLen,
+                      .bits_mode = bits_mode,
+                      .base = base.buf,
+                      .delta = delta,
+                      .times = times};
+  for (int b = 0; b < 8; b++) {
+    ctx.groups[b] = bufs[b].buf;
+  }
+  Py_BEGIN_ALLOW_THREADS;
+  zipnn_parallel_for(numBlocks, zipnn_num_workers(threads, numBlocks),
+                     combine_groups64_task, &ctx);
+  Py_END_ALLOW_THREADS;
+  if (stats && zipnn_stats_add_times(stats, times, numBlocks) != 0) {
+    goto done;
+  }
+
+  if (out.obj != NULL) {
+    py_result = PyLong_FromSize_t(totalLen);
+  } else {
+    py_result = resultObj;
+    resultObj = NULL;
+  }
+
+done:
+  PyMem_Free(times);
+  Py_XDECREF(resultObj);
+  PyBuffer_Release(&out);
+  for (int b = 0; b < 8; b++) {
+    PyBuffer_Release(&bufs[b]);
+  }
+  PyBuffer_Release(&base);
+  return py_result;
+}
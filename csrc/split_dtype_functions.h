@@ -4,9 +4,27 @@
 #include <Python.h>
 
 // Declare the functions
-PyObject *py_split_dtype16(PyObject *self, PyObject *args);
-PyObject *py_combine_dtype16(PyObject *self, PyObject *args);
-PyObject *py_split_dtype32(PyObject *self, PyObject *args);
-PyObject *py_combine_dtype32(PyObject *self, PyObject *args);
+PyObject *py_split_dtype16(PyObject *self, PyObject *args, PyObject *kwargs);
+PyObject *py_combine_dtype16(PyObject *self, PyObject *args, PyObject *kwargs);
+PyObject *py_split_groups16(PyObject *self, PyObject *args, PyObject *kwargs);
+PyObject *py_combine_groups16(PyObject *self, PyObject *args, PyObject *kwargs);
+PyObject *py_huffman_compress(PyObject *self, PyObject *args);
+PyObject *py_huffman_decompress(PyObject *self, PyObject *args);
+PyObject *py_split_dtype32(PyObject *self, PyObject *args, PyObject *kwargs);
+PyObject *py_combine_dtype32(PyObject *self, PyObject *args, PyObject *kwargs);
+PyObject *py_count_zero_bytes(PyObject *self, PyObject *args, PyObject *kwargs);
+PyObject *py_split_dtype64(PyObject *self, PyObject *args, PyObject *kwargs);
+PyObject *py_combine_dtype64(PyObject *self, PyObject *args, PyObject *kwargs);
+
+// Checks the base and delta arguments of a split or combine function: base
+// (if given, obj != NULL) must be len bytes and delta ZIPNN_DELTA_XOR or
+// ZIPNN_DELTA_SUB. Returns 0, or -1 with a Python error set.
+int zipnn_delta_arg(const Py_buffer *base, size_t len, int delta);
+
+// Checks the lossy arguments of a split or combine function: lossy must be
+// ZIPNN_LOSSY_NONE, ZIPNN_LOSSY_INTEGER or ZIPNN_LOSSY_MANTISSA, and the
+// format one of lossy.h that is elemSize bytes. Returns 0, or -1 with a
+// Python error set.
+int zipnn_lossy_arg(int lossy, int factor, int format, int elemSize);
 
 #endif // SPLIT_FUNCTIONS_H
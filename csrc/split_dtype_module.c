@@ -1,22 +1,122 @@
+#include "byte_group.h"
+#include "huf.h"
 #include "split_dtype_functions.h"
 #include <Python.h>
 
 // Declare functions from other source files
-extern PyObject *py_split_dtype16(PyObject *, PyObject *);
-extern PyObject *py_combine_dtype16(PyObject *, PyObject *);
-extern PyObject *py_split_dtype32(PyObject *, PyObject *);
-extern PyObject *py_combine_dtype32(PyObject *, PyObject *);
+extern PyObject *py_split_dtype16(PyObject *, PyObject *, PyObject *);
+extern PyObject *py_combine_dtype16(PyObject *, PyObject *, PyObject *);
+extern PyObject *py_split_groups16(PyObject *, PyObject *, PyObject *);
+extern PyObject *py_combine_groups16(PyObject *, PyObject *, PyObject *);
+extern PyObject *py_huffman_compress(PyObject *, PyObject *);
+extern PyObject *py_huffman_decompress(PyObject *, PyObject *);
+extern PyObject *py_fse_compress(PyObject *, PyObject *);
+extern PyObject *py_fse_decompress(PyObject *, PyObject *);
+extern PyObject *py_split_dtype32(PyObject *, PyObject *, PyObject *);
+extern PyObject *py_combine_dtype32(PyObject *, PyObject *, PyObject *);
+extern PyObject *py_count_zero_bytes(PyObject *, PyObject *, PyObject *);
+extern PyObject *py_split_dtype64(PyObject *, PyObject *, PyObject *);
+extern PyObject *py_combine_dtype64(PyObject *, PyObject *, PyObject *);
+
+// Python callable function that returns the SIMD level of the byte grouping
+// kernels: scalar, sse2, avx2 or neon
+static PyObject *py_get_simd_level(PyObject *self, PyObject *args) {
+  return PyUnicode_FromString(zipnn_simd_level_name(zipnn_simd_level()));
+}
+
+// Python callable function that sets the SIMD level of the byte grouping
+// kernels, all the levels produce the same output
+static PyObject *py_set_simd_level(PyObject *self, PyObject *args) {
+  const char *name;
+  if (!PyArg_ParseTuple(args, "s", &name)) {
+    return NULL;
+  }
+  if (zipnn_set_simd_level(zipnn_simd_level_from_name(name)) != 0) {
+    PyErr_Format(PyExc_ValueError,
+                 "SIMD level %s is not supported on this CPU", name);
+    return NULL;
+  }
+  Py_RETURN_NONE;
+}
+
+// Python callable function that transposes the bit planes of a buffer (see
+// zipnn_bitshuffle), or reverts it if unshuffle. Returns the bytes of the
+// result, of the same length.
+static PyObject *bitshuffle(PyObject *args, int unshuffle) {
+  Py_buffer data;
+  if (!PyArg_ParseTuple(args, "y*", &data)) {
+    return NULL;
+  }
+  PyObject *result = PyBytes_FromStringAndSize(NULL, data.len);
+  if (result == NULL) {
+    PyBuffer_Release(&data);
+    return NULL;
+  }
+  uint8_t *dst = (uint8_t *)PyBytes_AS_STRING(result);
+  Py_BEGIN_ALLOW_THREADS;
+  if (unshuffle) {
+    zipnn_bitunshuffle(data.buf, data.len, dst);
+  } else {
+    zipnn_bitshuffle(data.buf, data.len, dst);
+  }
+  Py_END_ALLOW_THREADS;
+  PyBuffer_Release(&data);
+  return result;
+}
+
+static PyObject *py_bitshuffle(PyObject *self, PyObject *args) {
+  return bitshuffle(args, 0);
+}
+
+static PyObject *py_bitunshuffle(PyObject *self, PyObject *args) {
+  return bitshuffle(args, 1);
+}
 
 // Method definitions
 static PyMethodDef SplitMethods[] = {
-    {"split_dtype16", py_split_dtype16, METH_VARARGS,
+    {"split_dtype16", (PyCFunction)(void (*)(void))py_split_dtype16,
+     METH_VARARGS | METH_KEYWORDS,
      "Split a bytearray into four buffers using dtype16"},
-    {"combine_dtype16", py_combine_dtype16, METH_VARARGS,
+    {"combine_dtype16", (PyCFunction)(void (*)(void))py_combine_dtype16,
+     METH_VARARGS | METH_KEYWORDS,
      "Combine four buffers into a single bytearray using dtype16"},
-    {"split_dtype32", py_split_dtype32, METH_VARARGS,
+    {"split_groups16", (PyCFunction)(void (*)(void))py_split_groups16,
+     METH_VARARGS | METH_KEYWORDS,
+     "Split a bytearray into its byte groups using dtype16, without compression"},
+    {"combine_groups16", (PyCFunction)(void (*)(void))py_combine_groups16,
+     METH_VARARGS | METH_KEYWORDS,
+     "Combine the byte groups of split_groups16 into a single bytearray"},
+    {"huffman_compress", py_huffman_compress, METH_VARARGS,
+     "Compress a chunk with Huffman, None if it is not compressible"},
+    {"huffman_decompress", py_huffman_decompress, METH_VARARGS,
+     "Decompress a chunk of huffman_compress"},
+    {"fse_compress", py_fse_compress, METH_VARARGS,
+     "Compress a chunk with FSE (tANS), None if it is not compressible"},
+    {"fse_decompress", py_fse_decompress, METH_VARARGS,
+     "Decompress a chunk of fse_compress"},
+    {"split_dtype32", (PyCFunction)(void (*)(void))py_split_dtype32,
+     METH_VARARGS | METH_KEYWORDS,
      "Split a bytearray into four buffers using dtype32"},
-    {"combine_dtype32", py_combine_dtype32, METH_VARARGS,
+    {"combine_dtype32", (PyCFunction)(void (*)(void))py_combine_dtype32,
+     METH_VARARGS | METH_KEYWORDS,
      "Combine four buffers into a single bytearray using dtype32"},
+    {"count_zero_bytes", (PyCFunction)(void (*)(void))py_count_zero_bytes,
+     METH_VARARGS | METH_KEYWORDS,
+     "Count the zero bytes of every byte position of integer elements"},
+    {"split_dtype64", (PyCFunction)(void (*)(void))py_split_dtype64,
+     METH_VARARGS | METH_KEYWORDS,
+     "Split a bytearray into eight buffers using dtype64"},
+    {"combine_dtype64", (PyCFunction)(void (*)(void))py_combine_dtype64,
+     METH_VARARGS | METH_KEYWORDS,
+     "Combine eight buffers into a single bytearray using dtype64"},
+    {"bitshuffle", py_bitshuffle, METH_VARARGS,
+     "Transpose the bit planes of a buffer"},
+    {"bitunshuffle", py_bitunshuffle, METH_VARARGS,
+     "Revert the bit planes transpose of bitshuffle"},
+    {"get_simd_level", py_get_simd_level, METH_NOARGS,
+     "Return the SIMD level of the byte grouping kernels"},
+    {"set_simd_level", py_set_simd_level, METH_VARARGS,
+     "Set the SIMD level of the byte grouping kernels"},
     {NULL, NULL, 0, NULL}
 };
 
@@ -30,5 +130,16 @@ static struct PyModuleDef splitmodule = {
 
 // Module initialization function
 PyMODINIT_FUNC PyInit_split_dtype(void) {
-  return PyModule_Create(&splitmodule);
+  zipnn_byte_group_init();
+  PyObject *module = PyModule_Create(&splitmodule);
+  if (module == NULL) {
+    return NULL;
+  }
+  // The largest chunk of huffman_compress
+  if (PyModule_AddIntConstant(module, "HUFFMAN_MAX_CHUNK", HUF_BLOCKSIZE_MAX) !=
+      0) {
+    Py_DECREF(module);
+    return NULL;
+  }
+  return module;
 }
@@ -0,0 +1,70 @@
+#include "stats.h"
+#include <time.h>
+
+static const char *stageNames[ZIPNN_NUM_STAGES] = {
+    "bit_reorder", "byte_split", "entropy", "assembly", "delta", "lossy"};
+
+double zipnn_now(void) {
+  struct timespec ts;
+  clock_gettime(CLOCK_MONOTONIC, &ts);
+  return (double)ts.tv_sec + (double)ts.tv_nsec * 1e-9;
+}
+
+int zipnn_stats_arg(PyObject *arg, PyObject **stats) {
+  *stats = NULL;
+  if (arg == NULL || arg == Py_None) {
+    return 0;
+  }
+  if (!PyDict_Check(arg)) {
+    PyErr_SetString(PyExc_TypeError, "stats must be a dict or None");
+    return -1;
+  }
+  *stats = arg;
+  return 0;
+}
+
+int zipnn_stats_add_times(PyObject *stats, const double *times,
+                          size_t numSlots) {
+  for (int s = 0; s < ZIPNN_NUM_STAGES; s++) {
+    double total = 0;
+    for (size_t i = 0; i < numSlots; i++) {
+      total += times[i * ZIPNN_NUM_STAGES + s];
+    }
+    PyObject *prev = PyDict_GetItemString(stats, stageNames[s]);
+    if (prev != NULL) {
+      total += PyFloat_AsDouble(prev);
+      if (PyErr_Occurred()) {
+        return -1;
+      }
+    }
+    PyObject *value = PyFloat_FromDouble(total);
+    if (value == NULL) {
+      return -1;
+    }
+    int ret = PyDict_SetItemString(stats, stageNames[s], value);
+    Py_DECREF(value);
+    if (ret != 0) {
+      return -1;
+    }
+  }
+  return 0;
+}
+
+int zipnn_stats_set_list(PyObject *stats, const char *key,
+                         const size_t *values, size_t num) {
+  PyObject *list = PyList_New(num);
+  if (list == NULL) {
+    return -1;
+  }
+  for (size_t i = 0; i < num; i++) {
+    PyObject *value = PyLong_FromSize_t(values[i]);
+    if (value == NULL) {
+      Py_DECREF(list);
+      return -1;
+    }
+    PyList_SET_ITEM(list, i, value);
+  }
+  int ret = PyDict_SetItemString(stats, key, list);
+  Py_DECREF(list);
+  return ret;
+}
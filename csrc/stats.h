@@ -0,0 +1,42 @@
+#ifndef ZIPNN_STATS_H
+#define ZIPNN_STATS_H
+
+#include <Python.h>
+#include <stddef.h>
+
+// Opt-in instrumentation of the kernels. A kernel that gets a stats dict
+// times its stages and counts its chunks, without one it doesn't read the
+// clock at all.
+// The stages run on the worker threads, every task adds to its own slot and
+// the slots are summed after the threads are done, so the time of a stage is
+// summed over the threads.
+
+enum {
+  ZIPNN_STAGE_BIT_REORDER = 0, // reordering the bits of the floats, and back
+  ZIPNN_STAGE_BYTE_SPLIT = 1,  // splitting to byte groups, and combining them
+  ZIPNN_STAGE_ENTROPY = 2,     // Huffman compression and decompression
+  ZIPNN_STAGE_ASSEMBLY = 3,    // building the output buffer
+  ZIPNN_STAGE_DELTA = 4,       // the delta against a base, and back
+  ZIPNN_STAGE_LOSSY = 5,       // the lossy conversion of the floats, and back
+  ZIPNN_NUM_STAGES = 6,
+};
+
+// Monotonic time in seconds
+double zipnn_now(void);
+
+// Parses the stats argument of a kernel: NULL for None, otherwise it must be
+// a dict. Returns 0, or -1 with a Python error set.
+int zipnn_stats_arg(PyObject *arg, PyObject **stats);
+
+// Adds the stage times of numSlots slots, times[slot * ZIPNN_NUM_STAGES +
+// stage], to the stage keys of stats ("bit_reorder", "byte_split", "entropy",
+// "assembly", "delta", "lossy"). Returns 0, or -1 with a Python error set.
+int zipnn_stats_add_times(PyObject *stats, const double *times,
+                          size_t numSlots);
+
+// Sets key of stats to a list of the num values (one per byte group).
+// Returns 0, or -1 with a Python error set.
+int zipnn_stats_set_list(PyObject *stats, const char *key,
+                         const size_t *values, size_t num);
+
+#endif // ZIPNN_STATS_H
@@ -56,6 +56,8 @@ def compress_file(
     streaming_chunk_size=1048576,
     delete=False,
     force=False,
+    index=False,
+    safetensors=False,
 ):
     import zipnn
 
@@ -90,16 +92,13 @@ def compress_file(
                 is_streaming=True,
                 streaming_chunk_kb=streaming_chunk_size,
             )
-        file_size_before = 0
-        file_size_after = 0
         start_time = time.time()
-        with open(input_file, "rb") as infile, open(output_file, "wb") as outfile:
-            chunk = infile.read()
-            file_size_before += len(chunk)
-            compressed_chunk = zpn.compress(chunk)
-            if compressed_chunk:
-                file_size_after += len(compressed_chunk)
-                outfile.write(compressed_chunk)
+        if safetensors and input_file.endswith(".safetensors"):
+            with open(input_file, "rb") as infile, open(output_file, "wb") as outfile:
+                file_size_before, file_size_after = zpn.compress_safetensors(infile, outfile)
+        else:
+            # compress_file checks that a --float32 file is whole elements before the output is created
+            file_size_before, file_size_after = zpn.compress_file(input_file, output_file, index=index)
         end_time = time.time() - start_time
         print(f"Compressed {input_file} to {output_file}")
         print(
@@ -139,6 +138,16 @@ if __name__ == "__main__":
         action="store_true",
         help="A flag that forces overwriting when compressing.",
     )
+    parser.add_argument(
+        "--index",
+        action="store_true",
+        help="A flag that appends an index of the chunks, for random access to the compressed file.",
+    )
+    parser.add_argument(
+        "--safetensors",
+        action="store_true",
+        help="A flag that compresses .safetensors files tensor by tensor according to their dtypes.",
+    )
     args = parser.parse_args()
     optional_kwargs = {}
     if args.float32:
@@ -149,6 +158,10 @@ if __name__ == "__main__":
         optional_kwargs["delete"] = args.delete
     if args.force:
         optional_kwargs["force"] = args.force
+    if args.index:
+        optional_kwargs["index"] = args.index
+    if args.safetensors:
+        optional_kwargs["safetensors"] = args.safetensors
 
     check_and_install_zipnn()
     compress_file(args.input_file, **optional_kwargs)
@@ -76,6 +76,7 @@ def compress_files_with_suffix(
     r=False,
     force=False,
     max_processes=1,
+    safetensors=False,
 ):
     import zipnn
 
@@ -157,6 +158,8 @@ def compress_files_with_suffix(
                 streaming_chunk_size,
                 delete,
                 True,
+                False,
+                safetensors,
             ): file
             for file in file_list[:max_processes]
         }
@@ -184,6 +187,8 @@ def compress_files_with_suffix(
                             streaming_chunk_size,
                             delete,
                             True,
+                            False,
+                            safetensors,
                         )
                     ] = next_file
 
@@ -251,6 +256,11 @@ if __name__ == "__main__":
         type=int,
         help="The amount of maximum processes.",
     )
+    parser.add_argument(
+        "--safetensors",
+        action="store_true",
+        help="A flag that compresses .safetensors files tensor by tensor according to their dtypes.",
+    )
     args = parser.parse_args()
     optional_kwargs = {}
     if args.float32:
@@ -272,6 +282,9 @@ if __name__ == "__main__":
             args.max_processes
         )
 
+    if args.safetensors:
+        optional_kwargs["safetensors"] = args.safetensors
+
     check_and_install_zipnn()
     compress_files_with_suffix(
         args.suffix, **optional_kwargs
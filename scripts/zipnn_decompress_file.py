@@ -42,10 +42,7 @@ def decompress_file(input_file, delete=False, force=False):
             zpn = zipnn.ZipNN(is_streaming=True)
 
             with open(input_file, "rb") as infile, open(output_file, "wb") as outfile:
-                d_data = b""
-                chunk = infile.read()
-                d_data += zpn.decompress(chunk)
-                outfile.write(d_data)
+                zpn.decompress_stream(infile, outfile)
                 print(f"Decompressed {input_file} to {output_file}")
 
     else:
@@ -20,6 +20,11 @@ split_dtype_extension = Extension(
         "csrc/split_dtype_module.c",
         "csrc/split_dtype32.c",
         "csrc/split_dtype16.c",
+        "csrc/split_dtype64.c",
+        "csrc/parallel.c",
+        "csrc/stats.c",
+        "csrc/byte_group.c",
+        "csrc/lossy.c",
         "include/FiniteStateEntropy/lib/fse_compress.c",
         "include/FiniteStateEntropy/lib/fse_decompress.c",
         "include/FiniteStateEntropy/lib/huf_compress.c",
@@ -28,13 +33,13 @@ split_dtype_extension = Extension(
         "include/FiniteStateEntropy/lib/hist.c",
     ],
     include_dirs=["include/FiniteStateEntropy/lib/", "csrc/"],
-    extra_compile_args=["-O3", "-Wall", "-Wextra"],
-    extra_link_args=["-O3", "-Wall", "-Wextra"],
+    extra_compile_args=["-O3", "-Wall", "-Wextra", "-pthread"],
+    extra_link_args=["-O3", "-Wall", "-Wextra", "-pthread"],
 )
 
 setup(
     name="zipnn",
-    version="0.3.2",
+    version="0.3.3",
     author="Moshik Hershcovitch",
     author_email="moshik1@gmail.com",
     description="A lossless and near-lossless compression method optimized for numbers/tensors in the Foundation Models environment",
@@ -1,7 +1,18 @@
+import asyncio
+import split_dtype
+import zipnn
 from zipnn import ZipNN
+from zipnn.util_header import EnumCodec, ZIPNN_CODEC_BITSHUFFLE
+from zipnn.util_torch import zipnn_pack_shape
+import numpy as np
 import torch
 import os
+import io
 import copy
+import json
+import struct
+import tempfile
+import time
 
 
 
@@ -67,3 +78,688 @@ def test_byte_torch_streaming():
         compressed_data = zpn_streaming.compress(original_bytes)
         decompressed_data = zpn_streaming.decompress(compressed_data)
         print("Are the original and decompressed byte strings the same [STREAMING BYTES]? ",copy_bytes == decompressed_data)
+
+
+def test_multi_threads_bfloat16():
+    # The compressed output must not depend on the number of threads
+    original_tensor = torch.randn(3 * 1024 * 1024 + 5, dtype=torch.bfloat16) * 0.02
+    original_bytes = original_tensor.view(torch.uint16).numpy().tobytes()
+    compressed_single = ZipNN(threads=1).compress(bytearray(original_bytes))
+    for threads in [2, 4, 0]:
+        zpn = ZipNN(threads=threads)
+        compressed_data = zpn.compress(bytearray(original_bytes))
+        assert compressed_data == compressed_single, f"threads={threads} changed the compressed output"
+        assert zpn.decompress(compressed_data) == original_bytes
+
+
+def test_multi_threads_float32():
+    original_tensor = torch.randn(1024 * 1024 + 2) * 0.02
+    compressed_single = ZipNN(input_format="torch", threads=1).compress(original_tensor)
+    for threads in [3, 0]:
+        zpn = ZipNN(input_format="torch", threads=threads)
+        compressed_data = zpn.compress(original_tensor)
+        assert compressed_data == compressed_single, f"threads={threads} changed the compressed output"
+        assert torch.equal(zpn.decompress(compressed_data), original_tensor)
+
+    # Bytes that aren't whole float32 elements fail instead of losing their last bytes
+    original_bytes = original_tensor.numpy().tobytes()
+    for length in (1, 3, 5, 65535, 1000003, 1000000):
+        for threads in (1, 3):
+            zpn = ZipNN(bytearray_dtype="float32", threads=threads)
+            try:
+                decompressed_data = zpn.decompress(zpn.compress(bytearray(original_bytes[:length])))
+                assert length % 4 == 0, f"compress should fail on {length} bytes"
+                assert decompressed_data == original_bytes[:length]
+            except ValueError:
+                assert length % 4 != 0
+
+
+def test_compress_stream():
+    # compress_stream reads one chunk at a time, the output must be the same as compress
+    original_tensor = torch.randn(3 * 1024 * 1024 + 1, dtype=torch.bfloat16) * 0.02
+    original_bytes = original_tensor.view(torch.uint16).numpy().tobytes() + b"\x01"
+    zpn = ZipNN(is_streaming=True, streaming_chunk_kb=2**20)
+    out_stream = io.BytesIO()
+    original_size, compressed_size = zpn.compress_stream(io.BytesIO(original_bytes), out_stream)
+    assert original_size == len(original_bytes)
+    assert compressed_size == len(out_stream.getvalue())
+    assert out_stream.getvalue() == zpn.compress(bytearray(original_bytes))
+
+    # float32 streams and files that aren't whole elements fail instead of losing their last bytes
+    original_bytes = (torch.randn(250 * 1024 + 1) * 0.02).numpy().tobytes()
+    zpn = ZipNN(is_streaming=True, streaming_chunk_kb=256 * 1024, bytearray_dtype="float32")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for length in (len(original_bytes), len(original_bytes) - 1):
+            data = original_bytes[:length]
+            input_file = os.path.join(tmp_dir, f"{length}.bin")
+            with open(input_file, "wb") as out_file:
+                out_file.write(data)
+            compressed_stream = io.BytesIO()
+            try:
+                zpn.compress_stream(io.BytesIO(data), compressed_stream)
+                decompressed_stream = io.BytesIO()
+                zpn.decompress_stream(io.BytesIO(compressed_stream.getvalue()), decompressed_stream)
+                assert length % 4 == 0, f"compress_stream should fail on {length} bytes"
+                assert decompressed_stream.getvalue() == data
+            except ValueError:
+                assert length % 4 != 0
+            try:
+                zpn.compress_file(input_file, input_file + ".znn")
+                assert length % 4 == 0, f"compress_file should fail on {length} bytes"
+            except ValueError:
+                assert length % 4 != 0
+                assert not os.path.exists(input_file + ".znn")
+
+
+def test_decompress_stream():
+    original_tensor = torch.randn(3 * 1024 * 1024 + 2) * 0.02
+    original_bytes = original_tensor.numpy().tobytes()
+    zpn = ZipNN(is_streaming=True, streaming_chunk_kb=2**20, bytearray_dtype="float32")
+    compressed_data = zpn.compress(bytearray(original_bytes))
+    out_stream = io.BytesIO()
+    compressed_size, decompressed_size = zpn.decompress_stream(io.BytesIO(compressed_data), out_stream)
+    assert compressed_size == len(compressed_data)
+    assert decompressed_size == len(original_bytes)
+    assert out_stream.getvalue() == original_bytes
+
+
+def test_read_range():
+    original_tensor = torch.randn(2 * 1024 * 1024, dtype=torch.bfloat16) * 0.02
+    original_bytes = original_tensor.view(torch.uint16).numpy().tobytes()
+    zpn = ZipNN(is_streaming=True, streaming_chunk_kb=2**18)
+    for index in [False, True]:
+        out_stream = io.BytesIO()
+        zpn.compress_stream(io.BytesIO(original_bytes), out_stream, index=index)
+        compressed_data = out_stream.getvalue()
+        assert zpn.decompress(compressed_data) == original_bytes
+        for offset, length in [(0, 10), (2**18 - 3, 7), (1000, 3 * 2**18), (len(original_bytes) - 5, 100)]:
+            assert zpn.read_range(compressed_data, offset, length) == original_bytes[offset : offset + length]
+            assert zpn.read_range(out_stream, offset, length) == original_bytes[offset : offset + length]
+
+
+def test_decompress_read_file():
+    # The compressed file is memory mapped
+    original_tensor = torch.randn(1024 * 1024, dtype=torch.bfloat16) * 0.02
+    zpn = ZipNN(input_format="torch")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        compressed_file = os.path.join(tmp_dir, "tensor.znn")
+        with open(compressed_file, "wb") as out_file:
+            out_file.write(zpn.compress(original_tensor))
+        assert torch.equal(zpn.decompress_read_file(compressed_file), original_tensor)
+
+
+def test_decompress_into():
+    # Decompress straight into pre-allocated tensors and buffers
+    for dtype in (torch.bfloat16, torch.float16, torch.float32):
+        original_tensor = torch.randn(1024 * 1024, dtype=dtype) * 0.02
+        zpn = ZipNN(input_format="torch")
+        compressed_data = zpn.compress(original_tensor.clone())
+        out = torch.empty_like(original_tensor)
+        assert zpn.decompress_into(compressed_data, out) == original_tensor.numel() * original_tensor.element_size()
+        assert torch.equal(out, original_tensor)
+
+    original_bytes = (torch.randn(1024 * 1024, dtype=torch.bfloat16) * 0.02).view(torch.uint8).numpy().tobytes()
+    zpn = ZipNN(input_format="byte", bytearray_dtype="bfloat16", is_streaming=True, streaming_chunk_kb=256 * 1024)
+    compressed_data = zpn.compress(bytearray(original_bytes))
+    out = bytearray(len(original_bytes))
+    assert zpn.decompress_into(compressed_data, out) == len(original_bytes)
+    assert out == original_bytes
+    try:
+        zpn.decompress_into(compressed_data, bytearray(1024))
+        assert False, "decompress_into should fail on a small buffer"
+    except ValueError:
+        pass
+
+
+def _safetensors_bytes(tensors):
+    # A safetensors file, without depending on the safetensors package
+    dtype_names = {
+        torch.bfloat16: "BF16",
+        torch.float16: "F16",
+        torch.float32: "F32",
+        torch.float64: "F64",
+        torch.float8_e4m3fn: "F8_E4M3",
+        torch.float8_e5m2: "F8_E5M2",
+        torch.int64: "I64",
+    }
+    header = {"__metadata__": {"format": "pt"}}
+    data = bytearray()
+    for name, tensor in tensors.items():
+        tensor_bytes = tensor.contiguous().reshape(-1).view(torch.uint8).numpy().tobytes()
+        header[name] = {"dtype": dtype_names[tensor.dtype], "shape": list(tensor.shape), "data_offsets": [len(data), len(data) + len(tensor_bytes)]}
+        data += tensor_bytes
+    header_bytes = json.dumps(header).encode("utf-8")
+    header_bytes += b" " * (-len(header_bytes) % 8)
+    return struct.pack("<Q", len(header_bytes)) + header_bytes + bytes(data)
+
+
+def test_compress_safetensors():
+    # Every tensor is compressed with the byte grouping of its dtype
+    tensors = {
+        "embed.weight": torch.randn(512, 1024, dtype=torch.bfloat16) * 0.02,
+        "layer.bias": torch.randn(1024, dtype=torch.bfloat16) * 0.02,
+        "norm.weight": torch.randn(256, 1024, dtype=torch.float32),
+        "position_ids": torch.arange(4096),
+        "lm_head.weight": torch.randn(128, 1024, dtype=torch.float16),
+        "mlp.weight": (torch.randn(255, 1023) * 0.02).to(torch.float8_e4m3fn),
+        "value.weight": torch.randn(64, 1024, dtype=torch.float64),
+    }
+    original_data = _safetensors_bytes(tensors)
+    zpn = ZipNN(streaming_chunk_kb=256 * 1024)
+    compressed_stream = io.BytesIO()
+    original_size, compressed_size = zpn.compress_safetensors(io.BytesIO(original_data), compressed_stream)
+    assert original_size == len(original_data)
+    assert compressed_size == len(compressed_stream.getvalue()) < len(original_data)
+
+    st_header, frames, tensors_frames, original_len = zpn.read_safetensors_index(compressed_stream.getvalue())
+    assert original_data.startswith(st_header) and original_len == len(original_data)
+    assert set(tensors_frames) == set(tensors)
+
+    # decompress_stream recognizes the compressed safetensors file
+    decompressed_stream = io.BytesIO()
+    compressed_stream.seek(0)
+    assert zpn.decompress_stream(compressed_stream, decompressed_stream) == (compressed_size, original_size)
+    assert decompressed_stream.getvalue() == original_data
+
+
+def test_safe_open():
+    # Load single tensors and row slices of a compressed safetensors file
+    tensors = {
+        "embed.weight": torch.randn(1024, 512, dtype=torch.bfloat16) * 0.02,
+        "norm.weight": torch.randn(512, dtype=torch.float32),
+        "position_ids": torch.arange(4096),
+        "scale": torch.tensor(0.5, dtype=torch.float16),
+    }
+    zpn = ZipNN(streaming_chunk_kb=128 * 1024)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        compressed_file = os.path.join(tmp_dir, "model.safetensors.znn")
+        with open(compressed_file, "wb") as out_file:
+            zpn.compress_safetensors(io.BytesIO(_safetensors_bytes(tensors)), out_file)
+
+        with zipnn.safe_open(compressed_file, cache_size=2) as safe_file:
+            assert safe_file.keys() == list(tensors)
+            assert safe_file.metadata() == {"format": "pt"}
+            for name, tensor in tensors.items():
+                assert torch.equal(safe_file.get_tensor(name), tensor)
+
+            embed = safe_file.get_slice("embed.weight")
+            assert embed.get_shape() == [1024, 512] and embed.get_dtype() == "BF16"
+            for index in (7, -1, slice(100, 300), slice(0, 1024, 5), (slice(10, 20), slice(3, 9))):
+                assert torch.equal(embed[index], tensors["embed.weight"][index])
+            assert len(safe_file._cache) <= 2
+
+
+def test_parallel_streaming():
+    # The streaming chunks are compressed in parallel, the output is the same as with a single thread
+    original_bytes = (torch.randn(2 * 1024 * 1024, dtype=torch.bfloat16) * 0.02).view(torch.uint8).numpy().tobytes()
+    zpn_serial = ZipNN(is_streaming=True, streaming_chunk_kb=256 * 1024, threads=1)
+    zpn_parallel = ZipNN(is_streaming=True, streaming_chunk_kb=256 * 1024, threads=4)
+    compressed_serial = zpn_serial.compress(bytearray(original_bytes))
+    compressed_parallel = zpn_parallel.compress(bytearray(original_bytes))
+    assert compressed_parallel == compressed_serial
+    assert zpn_parallel.decompress(compressed_parallel) == original_bytes
+
+    compressed_stream = io.BytesIO()
+    assert zpn_parallel.compress_stream(io.BytesIO(original_bytes), compressed_stream) == (len(original_bytes), len(compressed_serial))
+    assert compressed_stream.getvalue() == compressed_serial
+
+
+def test_async():
+    # The async API gives the same results and can be cancelled between chunks
+    original_bytes = (torch.randn(2 * 1024 * 1024, dtype=torch.bfloat16) * 0.02).view(torch.uint8).numpy().tobytes()
+    zpn = ZipNN(is_streaming=True, streaming_chunk_kb=128 * 1024)
+    compressed_data = zpn.compress(bytearray(original_bytes))
+
+    async def run():
+        assert await zpn.compress_async(bytearray(original_bytes)) == compressed_data
+        assert await zpn.decompress_async(compressed_data) == original_bytes
+        compressed_stream = io.BytesIO()
+        await zpn.compress_stream_async(io.BytesIO(original_bytes), compressed_stream)
+        assert compressed_stream.getvalue() == compressed_data
+        decompressed_stream = io.BytesIO()
+        await zpn.decompress_stream_async(io.BytesIO(compressed_data), decompressed_stream)
+        assert decompressed_stream.getvalue() == original_bytes
+
+        decompressed_stream = io.BytesIO()
+        task = asyncio.create_task(zpn.decompress_stream_async(io.BytesIO(compressed_data), decompressed_stream))
+        await asyncio.sleep(0)
+        task.cancel()
+        try:
+            await task
+            assert False, "The task should be cancelled"
+        except asyncio.CancelledError:
+            pass
+        # The executor stops after the chunk it was running
+        assert await zpn.decompress_async(compressed_data) == original_bytes
+        assert len(decompressed_stream.getvalue()) < len(original_bytes)
+
+        # The files are closed only after the chunk that was running when the task was cancelled (slowed down here)
+        read_full = zipnn.zipnn._read_full
+        errors = []
+
+        def slow_read_full(stream, buf):
+            time.sleep(0.05)
+            try:
+                return read_full(stream, buf)
+            except ValueError as error:
+                errors.append(error)
+                raise
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            input_file = os.path.join(tmp_dir, "input.bin")
+            compressed_file = os.path.join(tmp_dir, "input.bin.znn")
+            with open(input_file, "wb") as out_file:
+                out_file.write(original_bytes)
+            with open(compressed_file, "wb") as out_file:
+                out_file.write(compressed_data)
+            zipnn.zipnn._read_full = slow_read_full
+            try:
+                for run_file in (
+                    lambda: zpn.compress_file_async(input_file, os.path.join(tmp_dir, "compressed.znn")),
+                    lambda: zpn.decompress_file_async(compressed_file, os.path.join(tmp_dir, "decompressed.bin")),
+                ):
+                    task = asyncio.create_task(run_file())
+                    await asyncio.sleep(0.01)
+                    task.cancel()
+                    try:
+                        await task
+                        assert False, "The task should be cancelled"
+                    except asyncio.CancelledError:
+                        pass
+                    # Waits for whatever the cancelled task left on the executor
+                    await asyncio.wrap_future(zpn._get_async_executor().submit(lambda: None))
+            finally:
+                zipnn.zipnn._read_full = read_full
+        assert not errors
+        assert await zpn.decompress_async(compressed_data) == original_bytes
+
+    asyncio.run(run())
+
+
+def test_state_dict():
+    # All the tensors of a state_dict are compressed into one container, in parallel
+    state_dict = {
+        "embed.weight": torch.randn(1024, 1024, dtype=torch.bfloat16) * 0.02,
+        "norm.weight": torch.randn(1024, dtype=torch.float32),
+        "lm_head.weight": (torch.randn(256, 512, dtype=torch.float16) * 0.02).t(),
+        "mlp.weight": (torch.randn(255, 1023) * 0.02).to(torch.float8_e5m2),
+        "value.weight": torch.randn(333, 100, dtype=torch.float64),
+        "position_ids": torch.arange(4096),
+        "mask": torch.rand(100) > 0.5,
+        "empty": torch.empty(0, 8),
+    }
+    expected = {name: tensor.clone() for name, tensor in state_dict.items()}
+    for threads in (1, 4):
+        zpn = ZipNN(threads=threads, streaming_chunk_kb=256 * 1024)
+        compressed_data = zpn.compress_state_dict(state_dict)
+        decompressed_state_dict = zpn.decompress_state_dict(compressed_data)
+        assert list(decompressed_state_dict) == list(state_dict)
+        for name, tensor in expected.items():
+            assert decompressed_state_dict[name].dtype == tensor.dtype
+            assert torch.equal(decompressed_state_dict[name], tensor)
+            assert torch.equal(state_dict[name], tensor)
+
+    # The tensors of a container are compressed lossless, also by an instance that is configured for lossy compression
+    zpn = ZipNN(input_format="torch", lossy_compressed_type="integer", lossy_compressed_factor=27)
+    decompressed_state_dict = zpn.decompress_state_dict(zpn.compress_state_dict(state_dict))
+    for name, tensor in expected.items():
+        assert torch.equal(decompressed_state_dict[name], tensor)
+
+
+def test_huffman_shared_table():
+    # The chunks use the shared Huffman table of their byte group, or their own table after a drift
+    drift = [torch.randn(512 * 1024, dtype=torch.bfloat16) * scale for scale in (0.02, 100.0, 1e-6)]
+    for original_tensor in (torch.randn(1024 * 1024, dtype=torch.bfloat16) * 0.02, torch.cat(drift)):
+        original_bytes = original_tensor.view(torch.uint16).numpy().tobytes()
+        for compression_chunk in (4 * 1024, 256 * 1024):
+            compressed_own = ZipNN(compression_chunk=compression_chunk, huffman_shared_table=False).compress(bytearray(original_bytes))
+            for threads in (1, 4):
+                zpn = ZipNN(compression_chunk=compression_chunk, threads=threads)
+                compressed_data = zpn.compress(bytearray(original_bytes))
+                assert zpn.decompress(compressed_data) == original_bytes
+                assert ZipNN(huffman_shared_table=False).decompress(compressed_data) == original_bytes
+                if compression_chunk == 4 * 1024:
+                    assert len(compressed_data) < len(compressed_own)
+
+
+def test_auto_codecs():
+    # Method AUTO chooses the codec of every byte group from samples and stores it after the header
+    weights = torch.randn(1024 * 1024) * 0.02
+    pruned = weights.clone().view(-1, 64)
+    pruned[torch.rand(pruned.shape[0]) < 0.8] = 0
+    cases = [
+        (weights.to(torch.bfloat16), [EnumCodec.RAW, EnumCodec.HUFFMAN]),
+        (pruned.view(-1).to(torch.bfloat16), [EnumCodec.ZSTD, EnumCodec.ZSTD]),
+        (weights, [EnumCodec.RAW, EnumCodec.RAW, EnumCodec.RAW, EnumCodec.HUFFMAN]),
+    ]
+    for original_tensor, expected_codecs in cases:
+        codecs_offset = 32 + len(zipnn_pack_shape(original_tensor.shape))
+        compressed_zstd = ZipNN(input_format="torch", method="zstd").compress(original_tensor)
+        for threads in (1, 4):
+            zpn = ZipNN(input_format="torch", threads=threads)
+            compressed_data = zpn.compress(original_tensor)
+            codecs = [EnumCodec(codec) for codec in compressed_data[codecs_offset : codecs_offset + len(expected_codecs)]]
+            assert codecs == expected_codecs
+            assert len(compressed_data) <= len(compressed_zstd) + len(codecs)
+            assert torch.equal(zpn.decompress(compressed_data), original_tensor)
+
+
+def test_stats():
+    # The stats are collected only when asked for, and don't change the compressed output
+    weights = torch.randn(1024 * 1024) * 0.02
+    cases = [
+        (weights.to(torch.bfloat16), "zstd", 2),
+        (weights.to(torch.bfloat16), "auto", 2),
+        (weights, "zstd", 4),
+        (weights, "auto", 4),
+    ]
+    assert ZipNN().stats is None
+    for original_tensor, method, num_groups in cases:
+        expected = ZipNN(input_format="torch", method=method).compress(original_tensor)
+        zpn = ZipNN(input_format="torch", method=method, threads=2, stats=True)
+        compressed_data = zpn.compress(original_tensor)
+        assert compressed_data == expected
+        assert torch.equal(zpn.decompress(compressed_data), original_tensor)
+
+        stats = zpn.stats.as_dict()
+        for direction in ("compress", "decompress"):
+            assert stats[direction]["frames"] == 1
+            assert len(stats[direction]["groups"]) == num_groups
+            assert all(seconds >= 0 for seconds in stats[direction]["times"].values())
+        compress_stats = stats["compress"]
+        assert compress_stats["bytes_in"] == original_tensor.numel() * original_tensor.element_size()
+        assert compress_stats["bytes_out"] == len(compressed_data)
+        assert sum(group["bytes_in"] for group in compress_stats["groups"]) == compress_stats["bytes_in"]
+        assert sum(group["bytes_out"] for group in compress_stats["groups"]) < len(compressed_data)
+        assert compress_stats["times"]["entropy"] > 0
+        for group, decompress_group in zip(compress_stats["groups"], stats["decompress"]["groups"]):
+            assert group["chunks_raw"] + group["chunks_skipped"] <= group["chunks"]
+            assert group["chunks_raw"] + group["chunks_skipped"] == decompress_group["chunks_raw"]
+            assert (group["bytes_in"], group["bytes_out"]) == (decompress_group["bytes_out"], decompress_group["bytes_in"])
+        # Only the exponent is compressed, method AUTO skips the other byte groups
+        exponent = compress_stats["groups"][-1]
+        assert exponent["bytes_out"] < exponent["bytes_in"] and exponent["chunks_raw"] + exponent["chunks_skipped"] == 0
+        if method == "auto":
+            assert all(group["chunks_skipped"] == group["chunks"] for group in compress_stats["groups"][:-1])
+
+        zpn.stats.reset()
+        assert zpn.stats.compress["frames"] == 0 and not zpn.stats.compress["groups"]
+
+
+def test_float8():
+    # float8 are split to their exponents and their sign and mantissa bits, or kept whole by method AUTO
+    weights = torch.randn(1023, 1025) * 0.02
+    block_scaled = torch.randn(1024 * 1024) * torch.exp(torch.randn(8 * 1024) * 2).repeat_interleave(128)
+    for dtype, bit_reorder in ((torch.float8_e4m3fn, 2), (torch.float8_e5m2, 3)):
+        for original_tensor, auto_bit_reorder in ((weights.to(dtype), 0), (block_scaled.to(dtype), bit_reorder)):
+            original_bytes = original_tensor.view(torch.uint8).numpy().tobytes()
+            compressed_sizes = {}
+            for method in ("zstd", "auto"):
+                for threads in (1, 4):
+                    zpn = ZipNN(input_format="torch", method=method, threads=threads)
+                    compressed_data = zpn.compress(original_tensor)
+                    assert compressed_data[6] == (bit_reorder if method == "zstd" else auto_bit_reorder)
+                    decompressed_tensor = zpn.decompress(compressed_data)
+                    assert decompressed_tensor.dtype == dtype
+                    assert torch.equal(decompressed_tensor.view(torch.uint8), original_tensor.view(torch.uint8))
+                    compressed_sizes[method] = len(compressed_data)
+            # With method AUTO the codecs of the 2 byte groups are stored after the header
+            assert compressed_sizes["auto"] <= compressed_sizes["zstd"] + 2 and compressed_sizes["zstd"] < len(original_bytes)
+
+            # An odd number of float8 bytes, and streaming
+            bytearray_dtype = str(dtype).split(".")[-1]
+            for zpn in (ZipNN(bytearray_dtype=bytearray_dtype), ZipNN(bytearray_dtype=bytearray_dtype, is_streaming=True, streaming_chunk_kb=64 * 1024)):
+                compressed_data = zpn.compress(bytearray(original_bytes))
+                assert zpn.decompress(compressed_data) == original_bytes
+
+
+def test_delta():
+    # A checkpoint compressed as a delta against the previous one
+    torch.manual_seed(0)
+    previous = torch.randn(513, 1025) * 0.02
+    current = previous + torch.randn(513, 1025) * 0.0002
+    for dtype in (torch.bfloat16, torch.float16, torch.float32, torch.float8_e4m3fn):
+        base, tensor = previous.to(dtype), current.to(dtype)
+        plain_size = len(ZipNN(input_format="torch").compress(tensor))
+        for delta_type in ("xor", "sub"):
+            for method, threads in (("auto", 1), ("zstd", 4)):
+                zpn = ZipNN(input_format="torch", method=method, threads=threads, delta_compressed_type=delta_type)
+                compressed_data = zpn.compress_delta(tensor, base)
+                assert compressed_data[9] == (1 if delta_type == "xor" else 2)
+                assert len(compressed_data) < plain_size * 0.9
+                decompressed_tensor = ZipNN(input_format="torch").decompress(compressed_data, delta_second_data=base)
+                assert torch.equal(decompressed_tensor.view(torch.uint8), tensor.view(torch.uint8))
+        try:
+            ZipNN(input_format="torch").decompress(ZipNN(input_format="torch").compress(tensor, delta_second_data=base))
+            assert False, "decompress should fail without the base of a delta"
+        except ValueError:
+            pass
+
+    # Bytes, streaming against a base in a stream and in a compressed file
+    base_bytes = previous.to(torch.bfloat16).view(torch.uint16).numpy().tobytes()[:-2] + b"\x00\x01"
+    data_bytes = current.to(torch.bfloat16).view(torch.uint16).numpy().tobytes()
+    zpn = ZipNN(is_streaming=True, streaming_chunk_kb=64 * 1024, threads=2)
+    compressed_data = zpn.compress(data_bytes, delta_second_data=base_bytes)
+    assert zpn.decompress(compressed_data, delta_second_data=io.BytesIO(base_bytes)) == data_bytes
+    out = bytearray(len(data_bytes))
+    assert zpn.decompress_into(compressed_data, out, delta_second_data=base_bytes) == len(data_bytes) and out == data_bytes
+    with tempfile.TemporaryDirectory() as tmp:
+        base_file = os.path.join(tmp, "base.znn")
+        with open(base_file, "wb") as f:
+            f.write(zpn.compress(bytearray(base_bytes)))
+        compressed_stream = io.BytesIO()
+        zpn.compress_stream(io.BytesIO(data_bytes), compressed_stream, delta_second_data=base_file)
+        assert compressed_stream.getvalue() == compressed_data
+        decompressed_stream = io.BytesIO()
+        zpn.decompress_stream(io.BytesIO(compressed_data), decompressed_stream, delta_second_data=io.BytesIO(base_bytes))
+        assert decompressed_stream.getvalue() == data_bytes
+    try:
+        zpn.compress(data_bytes, delta_second_data=base_bytes[:-2])
+        assert False, "compress should fail on a base of a different length"
+    except ValueError:
+        pass
+
+
+def test_lossy():
+    # Fixed point and mantissa rounding, every value within the error bound of its bits
+    torch.manual_seed(0)
+    weights = torch.randn(513, 1025) * 0.02
+    for dtype in (torch.float32, torch.bfloat16, torch.float16):
+        tensor = weights.to(dtype)
+        plain_size = len(ZipNN(input_format="torch").compress(tensor))
+        for lossy_type, factor, is_int in (("integer", 12, 1), ("mantissa", 3, 0)):
+            for method, threads in (("auto", 1), ("zstd", 4)):
+                zpn = ZipNN(input_format="torch", method=method, threads=threads, lossy_compressed_type=lossy_type, lossy_compressed_factor=factor)
+                compressed_data = zpn.compress(tensor)
+                assert list(compressed_data[10:13]) == [1 if lossy_type == "integer" else 3, factor, is_int]
+                assert len(compressed_data) < plain_size
+                decompressed_tensor = ZipNN(input_format="torch").decompress(compressed_data)
+                assert decompressed_tensor.dtype == dtype and decompressed_tensor.shape == tensor.shape
+                error = (decompressed_tensor.float() - tensor.float()).abs()
+                if lossy_type == "integer":
+                    bound = 2.0 ** -(factor + 1) + tensor.float().abs() * torch.finfo(dtype).eps
+                else:
+                    bound = tensor.float().abs() * 2.0 ** -(factor + 1) + torch.finfo(dtype).smallest_normal
+                assert torch.all(error <= bound)
+
+    # Values that don't fit the fixed point integers are compressed lossless
+    tensor = torch.randn(1000) * 100
+    compressed_data = ZipNN(input_format="torch", lossy_compressed_type="integer", lossy_compressed_factor=27).compress(tensor)
+    assert list(compressed_data[10:13]) == [1, 27, 0]
+    assert torch.equal(ZipNN(input_format="torch").decompress(compressed_data), tensor)
+    try:
+        ZipNN(input_format="torch", lossy_compressed_type="mantissa").compress(tensor.to(torch.float8_e4m3fn))
+        assert False, "lossy compression of float8 should fail"
+    except ValueError:
+        pass
+
+
+def test_integers():
+    # Every integer width of torch and NumPy, the zero MSBytes (of the zigzag of signed values) are truncated
+    rng = np.random.default_rng(0)
+    cases = (
+        (np.int8, -100, 100, 255),
+        (np.uint8, 0, 200, 255),
+        (np.int16, -100, 100, 1),
+        (np.int16, -30000, 30000, 10),
+        (np.uint16, 0, 60000, 10),
+        (np.int32, -3, 3, 1),
+        (np.int32, -30000, 30000, 9),
+        (np.uint32, 0, 1 << 20, 41),
+        (np.int32, -(1 << 31), (1 << 31) - 1, 220),
+        (np.int64, -(1 << 20), 1 << 20, 41),
+        (np.uint64, 0, 100, 1),
+        (np.int64, -(1 << 40), 1 << 40, 255),
+    )
+    for dtype, low, high, byte_reorder in cases:
+        array = rng.integers(low, high, size=(257, 129), dtype=dtype, endpoint=True)
+        formats = ("numpy", "torch") if dtype not in (np.uint16, np.uint32, np.uint64) else ("numpy",)
+        for input_format in formats:
+            for method, threads in (("auto", 1), ("zstd", 4)):
+                data = torch.from_numpy(array.copy()) if input_format == "torch" else array.copy()
+                zpn = ZipNN(input_format=input_format, method=method, threads=threads)
+                compressed_data = zpn.compress(data)
+                assert compressed_data[5] == byte_reorder
+                if byte_reorder in (1, 9, 41):
+                    # At least one byte of every element was truncated
+                    assert len(compressed_data) < array.nbytes * 3 // 4
+                decompressed_data = zpn.decompress(compressed_data)
+                if input_format == "torch":
+                    assert torch.equal(decompressed_data, data)
+                else:
+                    assert decompressed_data.dtype == array.dtype and np.array_equal(decompressed_data, array)
+                out = np.empty_like(array)
+                assert zpn.decompress_into(compressed_data, out) == array.nbytes
+                assert np.array_equal(out, array)
+
+    try:
+        ZipNN(input_format="numpy").compress(np.zeros(10, dtype=np.bool_))
+        assert False, "compression of bool should fail"
+    except ValueError:
+        pass
+
+
+def test_float64():
+    # float64 is split to 8 byte groups, the low mantissa bytes are stored without compressing them
+    torch.manual_seed(0)
+    original_tensor = torch.randn(1025, 513, dtype=torch.float64) * 0.02
+    original_tensor[0, :4] = torch.tensor([float("inf"), float("-inf"), float("nan"), -0.0], dtype=torch.float64)
+    for method, threads in (("auto", 1), ("zstd", 4)):
+        for input_format in ("torch", "numpy"):
+            data = original_tensor if input_format == "torch" else original_tensor.numpy()
+            zpn = ZipNN(input_format=input_format, method=method, threads=threads)
+            compressed_data = zpn.compress(data)
+            assert compressed_data[5] == 8 and len(compressed_data) < original_tensor.numel() * 8
+            decompressed_data = zpn.decompress(compressed_data)
+            if input_format == "torch":
+                assert torch.equal(decompressed_data.view(torch.int64), original_tensor.view(torch.int64))
+            else:
+                assert np.array_equal(decompressed_data.view(np.int64), data.view(np.int64))
+            out = torch.empty_like(original_tensor)
+            assert zpn.decompress_into(compressed_data, out) == original_tensor.numel() * 8
+            assert torch.equal(out.view(torch.int64), original_tensor.view(torch.int64))
+
+    # Bytes, streaming and a delta against a close base
+    original_bytes = original_tensor.numpy().tobytes()
+    zpn = ZipNN(bytearray_dtype="float64", is_streaming=True, streaming_chunk_kb=1024 * 1024)
+    assert zpn.decompress(zpn.compress(bytearray(original_bytes))) == original_bytes
+    base = original_tensor + torch.randn_like(original_tensor) * 1e-9
+    zpn = ZipNN(input_format="torch")
+    compressed_delta = zpn.compress_delta(original_tensor, base)
+    assert len(compressed_delta) < len(zpn.compress(original_tensor))
+    decompressed_tensor = zpn.decompress(compressed_delta, delta_second_data=base)
+    assert torch.equal(decompressed_tensor.view(torch.int64), original_tensor.view(torch.int64))
+
+
+def test_simd_levels():
+    # The SIMD kernels of the byte grouping must give the same output as the scalar ones
+    data = {
+        "bfloat16": bytearray((torch.randn(1024 * 1024 + 7, dtype=torch.bfloat16) * 0.02).view(torch.uint16).numpy().tobytes()),
+        "float32": bytearray((torch.randn(256 * 1024 + 3) * 0.02).numpy().tobytes()),
+        "float8_e4m3fn": bytearray((torch.randn(1024 * 1024 + 7) * 0.02).to(torch.float8_e4m3fn).view(torch.uint8).numpy().tobytes()),
+        "float8_e5m2": bytearray((torch.randn(1024 * 1024 + 7) * 0.02).to(torch.float8_e5m2).view(torch.uint8).numpy().tobytes()),
+        "uint32": torch.randint(0, 1 << 16, (256 * 1024 + 3,), dtype=torch.int64).numpy().astype("uint32"),
+    }
+
+    def make_zipnn(dtype):
+        if dtype == "uint32":
+            return ZipNN(input_format="numpy")
+        if dtype.startswith("float8"):
+            # Method AUTO may keep the float8 whole, the fields are split with the other methods
+            return ZipNN(bytearray_dtype=dtype, method="zstd")
+        return ZipNN(bytearray_dtype=dtype)
+
+    default_level = split_dtype.get_simd_level()
+    try:
+        split_dtype.set_simd_level("scalar")
+        expected = {dtype: make_zipnn(dtype).compress(copy.copy(original)) for dtype, original in data.items()}
+        for level in ("sse2", "avx2", "neon"):
+            try:
+                split_dtype.set_simd_level(level)
+            except ValueError:
+                continue
+            for dtype, original in data.items():
+                zpn = make_zipnn(dtype)
+                compressed_data = zpn.compress(copy.copy(original))
+                assert compressed_data == expected[dtype], f"{level} changed the compressed output of {dtype}"
+                decompressed_data = zpn.decompress(compressed_data)
+                if dtype == "uint32":
+                    assert (decompressed_data == original).all()
+                else:
+                    assert decompressed_data == original
+    finally:
+        split_dtype.set_simd_level(default_level)
+
+
+def test_bitshuffle():
+    # The bit planes are transposed only for the byte groups where it is smaller, and always decompressed back
+    data = bytes(range(256)) * 40 + b"\x07" * 9
+    assert split_dtype.bitunshuffle(split_dtype.bitshuffle(data)) == data
+    assert split_dtype.bitshuffle(b"\x01" * 8) == b"\xff" + b"\x00" * 7
+
+    for dtype in (torch.bfloat16, torch.float16, torch.float32):
+        original_tensor = (torch.randn(256 * 1024) * 0.02).to(dtype)
+        original_tensor[::3] = 0
+        zpn = ZipNN(input_format="torch", bitshuffle=True)
+        compressed_data = zpn.compress(original_tensor)
+        assert torch.equal(zpn.decompress(compressed_data), original_tensor)
+        out = torch.empty_like(original_tensor)
+        zpn.decompress_into(compressed_data, out)
+        assert torch.equal(out, original_tensor)
+
+    # Block pruned weights: runs of zeros (of both signs) between blocks of weights
+    weights = torch.randn(1024 * 1024) * 0.02
+    pruned = weights * (torch.rand(weights.numel() // 64) >= 0.8).repeat_interleave(64)
+    original_bytes = pruned.to(torch.bfloat16).view(torch.uint8).numpy().tobytes()
+    zpn = ZipNN(bytearray_dtype="bfloat16", bitshuffle=True)
+    compressed_data = zpn.compress(bytearray(original_bytes))
+    assert any(codec & ZIPNN_CODEC_BITSHUFFLE for codec in compressed_data[32:34])
+    assert len(compressed_data) < len(ZipNN(bytearray_dtype="bfloat16").compress(bytearray(original_bytes)))
+    assert zpn.decompress(compressed_data) == original_bytes
+
+
+def test_fse():
+    # Method AUTO chooses FSE for the byte groups of a skewed distribution, where Huffman wastes a fraction of a bit per symbol
+    data = bytes([0] * 60000 + [1] * 3000 + list(range(256)) * 8)
+    assert split_dtype.fse_decompress(split_dtype.fse_compress(data), len(data)) == data
+    assert split_dtype.fse_decompress(split_dtype.fse_compress(b"\x05" * 1000), 1000) == b"\x05" * 1000
+    assert split_dtype.fse_compress(bytes(range(256))) is None
+    assert len(split_dtype.fse_compress(data)) < len(split_dtype.huffman_compress(data))
+
+    weights = torch.randn(1024 * 1024) * 0.02
+    pruned = torch.where(weights.abs() < weights.abs().quantile(0.9), torch.zeros_like(weights), weights)
+    # The byte groups of bfloat16/float16 are compressed in C (chunk type 3), of float32 in chunks in Python
+    for dtype in (torch.bfloat16, torch.float16, torch.float32):
+        original_tensor = pruned.to(dtype)
+        codecs_offset = 32 + len(zipnn_pack_shape(original_tensor.shape))
+        expected = None
+        for threads in (1, 4):
+            zpn = ZipNN(input_format="torch", threads=threads)
+            compressed_data = zpn.compress(original_tensor)
+            assert EnumCodec.FSE.value in compressed_data[codecs_offset : codecs_offset + original_tensor.element_size()]
+            assert expected is None or compressed_data == expected
+            expected = compressed_data
+            assert torch.equal(zpn.decompress(compressed_data), original_tensor)
+            out = torch.empty_like(original_tensor)
+            zpn.decompress_into(compressed_data, out)
+            assert torch.equal(out, original_tensor)
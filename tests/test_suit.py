@@ -2,7 +2,32 @@
 
 import unittest
 from test_one_model import test_compression_decompression_float
-from simple_tests import test_byte_torch_streaming
+from simple_tests import (
+    test_byte_torch_streaming,
+    test_multi_threads_bfloat16,
+    test_multi_threads_float32,
+    test_compress_stream,
+    test_decompress_stream,
+    test_read_range,
+    test_decompress_read_file,
+    test_decompress_into,
+    test_compress_safetensors,
+    test_safe_open,
+    test_parallel_streaming,
+    test_async,
+    test_state_dict,
+    test_huffman_shared_table,
+    test_auto_codecs,
+    test_stats,
+    test_float8,
+    test_delta,
+    test_lossy,
+    test_integers,
+    test_float64,
+    test_simd_levels,
+    test_bitshuffle,
+    test_fse,
+)
 
 class TestSuite(unittest.TestCase):
 
@@ -11,6 +36,75 @@ class TestSuite(unittest.TestCase):
 
     def test_byte_torch_streaming(self):
         test_byte_torch_streaming()
+
+    def test_multi_threads_bfloat16(self):
+        test_multi_threads_bfloat16()
+
+    def test_multi_threads_float32(self):
+        test_multi_threads_float32()
+
+    def test_compress_stream(self):
+        test_compress_stream()
+
+    def test_decompress_stream(self):
+        test_decompress_stream()
+
+    def test_read_range(self):
+        test_read_range()
+
+    def test_decompress_read_file(self):
+        test_decompress_read_file()
+
+    def test_decompress_into(self):
+        test_decompress_into()
+
+    def test_compress_safetensors(self):
+        test_compress_safetensors()
+
+    def test_safe_open(self):
+        test_safe_open()
+
+    def test_parallel_streaming(self):
+        test_parallel_streaming()
+
+    def test_async(self):
+        test_async()
+
+    def test_state_dict(self):
+        test_state_dict()
+
+    def test_huffman_shared_table(self):
+        test_huffman_shared_table()
+
+    def test_auto_codecs(self):
+        test_auto_codecs()
+
+    def test_stats(self):
+        test_stats()
+
+    def test_float8(self):
+        test_float8()
+
+    def test_delta(self):
+        test_delta()
+
+    def test_lossy(self):
+        test_lossy()
+
+    def test_integers(self):
+        test_integers()
+
+    def test_float64(self):
+        test_float64()
+
+    def test_simd_levels(self):
+        test_simd_levels()
+
+    def test_bitshuffle(self):
+        test_bitshuffle()
+
+    def test_fse(self):
+        test_fse()
     
 
 
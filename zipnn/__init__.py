@@ -1 +1,2 @@
 from .zipnn import ZipNN
+from .zipnn_safetensors import safe_open
@@ -32,9 +32,11 @@ class EnumFormat(Enum):
 
 
 class EnumLossy(Enum):
+    # The same values as ZIPNN_LOSSY_* of the C code
     NONE = 0
-    INTEGER = 1
+    INTEGER = 1  # Fixed point, round(x * 2^factor) as an integer of the same width
     UNSIGN = 2
+    MANTISSA = 3  # The mantissa rounded to its factor high bits
 
     @classmethod
     def _missing_(cls, value):
@@ -44,6 +46,36 @@ class EnumLossy(Enum):
                 return cls.__members__[value]
 
 
+class EnumDelta(Enum):
+    # Delta against a base (e.g. the previous checkpoint), the same values as ZIPNN_DELTA_* of the C code
+    NONE = 0
+    XOR = 1  # XOR of the bytes
+    SUB = 2  # Difference of the elements as unsigned integers
+
+    @classmethod
+    def _missing_(cls, value):
+        if isinstance(value, str):
+            value = value.upper()
+            if value in cls.__members__:
+                return cls.__members__[value]
+
+
+class EnumCodec(Enum):
+    # Codec of a frame in a container (a compressed safetensors file or state_dict),
+    # or of a byte group that method AUTO chose a codec for
+    RAW = 0  # Stored as is
+    ZIPNN = 1  # A ZipNN chunk with byte grouping according to the dtype
+    ZSTD = 2  # Compressed with zstd, without byte grouping
+    HUFFMAN = 3  # Compressed with Huffman
+    LZ4 = 4  # Compressed with LZ4
+    FSE = 5  # Compressed with FSE (tANS)
+
+
+# A flag of the codec of a byte group of method AUTO: the bit planes of every chunk were transposed (split_dtype.bitshuffle)
+# before it was compressed with the codec. The chunks that are stored as is aren't transposed.
+ZIPNN_CODEC_BITSHUFFLE = 0x80
+
+
 def bools_to_bitmask(bools) -> bytes:
     """
     Constructs a bitmask by setting bits corresponding to the indices of True values in a list of booleans,
@@ -0,0 +1,84 @@
+# util for the ZipNN streaming index
+import struct
+
+# Index block, appended after the last chunk of a stream:
+# [0:1] 2 Bytes [ZX]
+# [2:4] 3 Bytes [Versions]
+# [8-15] = number of chunks
+# [16-23] = total original size
+# [24-31] = index block size (the same place as the compressed size of a chunk header)
+# Then for every chunk 16 Bytes: [compressed offset, original offset]
+# Trailer 16 Bytes: [index block size, ZNNINDEX]
+ZIPNN_INDEX_ID = b"ZX"
+ZIPNN_INDEX_MAGIC = b"ZNNINDEX"
+ZIPNN_INDEX_HEADER_LEN = 32
+ZIPNN_INDEX_TRAILER_LEN = 16
+
+
+def zipnn_pack_index(entries, original_len, version):
+    """
+    Packs the index block of a stream of compressed chunks.
+
+    Parameters
+    -------------------------------------
+    entries: list of tuples
+            (compressed offset, original offset) of every chunk.
+
+    original_len: int
+            Total original size of the stream.
+
+    version: tuple
+            (major, minor, tiny) version of ZipNN.
+
+    Returns
+    -------------------------------------
+    Byte data of the index block.
+    """
+    block_len = ZIPNN_INDEX_HEADER_LEN + 16 * len(entries) + ZIPNN_INDEX_TRAILER_LEN
+    block = bytearray(ZIPNN_INDEX_HEADER_LEN)
+    block[0:2] = ZIPNN_INDEX_ID
+    block[2:5] = bytes(version)
+    block[8:32] = struct.pack("<QQQ", len(entries), original_len, block_len)
+    for comp_offset, original_offset in entries:
+        block.extend(struct.pack("<QQ", comp_offset, original_offset))
+    block.extend(struct.pack("<Q", block_len))
+    block.extend(ZIPNN_INDEX_MAGIC)
+    return bytes(block)
+
+
+def zipnn_unpack_index_trailer(trailer):
+    """
+    Returns the size of the index block from the last 16 bytes of a stream, or 0 if the stream has no index.
+    """
+    if len(trailer) != ZIPNN_INDEX_TRAILER_LEN or bytes(trailer[8:16]) != ZIPNN_INDEX_MAGIC:
+        return 0
+    return struct.unpack("<Q", trailer[0:8])[0]
+
+
+def zipnn_unpack_index(block):
+    """
+    Unpacks an index block.
+
+    Parameters
+    -------------------------------------
+    block: byte
+            The index block, including its header and trailer.
+
+    Returns
+    -------------------------------------
+    A list of (compressed offset, original offset) of every chunk, and the total original size.
+    """
+    if not zipnn_is_index_header(block):
+        raise ValueError("Index block should start with ZX")
+    num_entries, original_len, block_len = struct.unpack("<QQQ", block[8:32])
+    if block_len != len(block) or block_len != ZIPNN_INDEX_HEADER_LEN + 16 * num_entries + ZIPNN_INDEX_TRAILER_LEN:
+        raise ValueError("The index block is corrupted")
+    entries = list(struct.iter_unpack("<QQ", block[ZIPNN_INDEX_HEADER_LEN : ZIPNN_INDEX_HEADER_LEN + 16 * num_entries]))
+    return entries, original_len
+
+
+def zipnn_is_index_header(header):
+    """
+    Returns True if the header is the header of an index block and not of a compressed chunk.
+    """
+    return bytes(header[0:2]) == ZIPNN_INDEX_ID
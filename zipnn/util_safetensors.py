@@ -0,0 +1,162 @@
+# util for the ZipNN safetensors format
+import json
+import struct
+
+# A compressed safetensors file:
+# Header 32 Bytes:
+# [0:1] 2 Bytes [ZS]
+# [2:4] 3 Bytes [Versions]
+# [8-15] = size of the safetensors header (the 8 bytes length and the JSON)
+# [24-31] = header size, including the safetensors header that follows it
+# The safetensors header, stored raw.
+# The frames, every frame is a run of tensors of the same dtype (up to streaming_chunk_kb).
+# The index JSON: {"original_len": original file size,
+#                  "frames": [[codec (EnumCodec), compressed offset, compressed size, data offset, data size], ...],
+#                  "tensors": {name: [first frame, number of frames], ...}}
+#   The data offsets are in the data section of the safetensors file, like the data_offsets of the tensors.
+# Trailer 16 Bytes: [index size, ZNNSAFET]
+ZIPNN_SAFETENSORS_ID = b"ZS"
+ZIPNN_SAFETENSORS_MAGIC = b"ZNNSAFET"
+ZIPNN_SAFETENSORS_HEADER_LEN = 32
+ZIPNN_SAFETENSORS_TRAILER_LEN = 16
+
+# safetensors dtype -> bytearray_dtype of ZipNN, the other dtypes are compressed with zstd
+ZIPNN_SAFETENSORS_DTYPES = {
+    "BF16": "bfloat16",
+    "F16": "float16",
+    "F32": "float32",
+    "F64": "float64",
+    "F8_E4M3": "float8_e4m3fn",
+    "F8_E5M2": "float8_e5m2",
+}
+
+
+def zipnn_parse_safetensors_header(st_header):
+    """
+    Parses the header of a safetensors file.
+
+    Parameters
+    -------------------------------------
+    st_header: byte
+            The safetensors header, the 8 bytes length and the JSON.
+
+    Returns
+    -------------------------------------
+    A dict of name -> (dtype, shape, begin, end) of every tensor, the offsets are in the data section.
+    """
+    if len(st_header) < 8 or struct.unpack("<Q", st_header[0:8])[0] != len(st_header) - 8:
+        raise ValueError("The safetensors header is corrupted")
+    tensors = {}
+    for name, info in json.loads(bytes(st_header[8:])).items():
+        if name == "__metadata__":
+            continue
+        begin, end = info["data_offsets"]
+        tensors[name] = (info["dtype"], info["shape"], begin, end)
+    return tensors
+
+
+def zipnn_safetensors_segments(tensors, chunk_size):
+    """
+    Splits the data section of a safetensors file into segments to compress.
+    Consecutive tensors of the same dtype are joined into a segment up to chunk_size, larger tensors are split.
+
+    Parameters
+    -------------------------------------
+    tensors: dict
+            The output of zipnn_parse_safetensors_header.
+
+    chunk_size: int
+            Maximal size of a segment.
+
+    Returns
+    -------------------------------------
+    A list of [begin, end, dtype] of every segment, dtype is None for the bytes between tensors.
+    """
+    segments = []
+    cursor = 0
+    for dtype, _, begin, end in sorted(tensors.values(), key=lambda tensor: tensor[2]):
+        if begin < cursor:
+            raise ValueError("The tensors of the safetensors file overlap")
+        if begin > cursor:
+            segments.append([cursor, begin, None])
+        for start in range(begin, end, chunk_size):
+            stop = min(start + chunk_size, end)
+            last = segments[-1] if segments else None
+            if last is not None and last[2] == dtype and last[1] == start and stop - last[0] <= chunk_size:
+                last[1] = stop
+            else:
+                segments.append([start, stop, dtype])
+        cursor = end
+    return segments
+
+
+def zipnn_pack_safetensors_header(st_header_len, version):
+    """
+    Packs the 32 bytes header of a compressed safetensors file.
+    """
+    header = bytearray(ZIPNN_SAFETENSORS_HEADER_LEN)
+    header[0:2] = ZIPNN_SAFETENSORS_ID
+    header[2:5] = bytes(version)
+    header[8:16] = struct.pack("<Q", st_header_len)
+    header[24:32] = struct.pack("<Q", ZIPNN_SAFETENSORS_HEADER_LEN + st_header_len)
+    return bytes(header)
+
+
+def zipnn_unpack_safetensors_header(header):
+    """
+    Returns the size of the safetensors header from the header of a compressed safetensors file.
+    """
+    if not zipnn_is_safetensors_header(header):
+        raise ValueError("Compressed safetensors file should start with ZS")
+    st_header_len = struct.unpack("<Q", header[8:16])[0]
+    if struct.unpack("<Q", header[24:32])[0] != ZIPNN_SAFETENSORS_HEADER_LEN + st_header_len:
+        raise ValueError("The compressed safetensors header is corrupted")
+    return st_header_len
+
+
+def zipnn_pack_safetensors_index(frames, tensors, original_len):
+    """
+    Packs the index of a compressed safetensors file and its trailer.
+
+    Parameters
+    -------------------------------------
+    frames: list
+            [codec, compressed offset, compressed size, data offset, data size] of every frame.
+
+    tensors: dict
+            name -> [first frame, number of frames] of every tensor.
+
+    original_len: int
+            Size of the safetensors file.
+
+    Returns
+    -------------------------------------
+    Byte data of the index and the trailer.
+    """
+    index = json.dumps({"original_len": original_len, "frames": frames, "tensors": tensors}, separators=(",", ":")).encode("utf-8")
+    return index + struct.pack("<Q", len(index)) + ZIPNN_SAFETENSORS_MAGIC
+
+
+def zipnn_unpack_safetensors_trailer(trailer):
+    """
+    Returns the size of the index from the last 16 bytes of a compressed safetensors file.
+    """
+    if len(trailer) != ZIPNN_SAFETENSORS_TRAILER_LEN or bytes(trailer[8:16]) != ZIPNN_SAFETENSORS_MAGIC:
+        raise ValueError("The compressed safetensors file has no index")
+    return struct.unpack("<Q", trailer[0:8])[0]
+
+
+def zipnn_unpack_safetensors_index(index):
+    """
+    Unpacks the index of a compressed safetensors file, returns the frames, the tensors and the original file size
+    (see zipnn_pack_safetensors_index).
+    """
+    index = json.loads(bytes(index))
+    return index["frames"], index["tensors"], index["original_len"]
+
+
+def zipnn_is_safetensors_header(header):
+    """
+    Returns True if the header is the header of a compressed safetensors file and not of a compressed chunk.
+    """
+    return bytes(header[0:2]) == ZIPNN_SAFETENSORS_ID
@@ -0,0 +1,74 @@
+# util for the ZipNN state_dict container
+import json
+import struct
+
+# A compressed state_dict:
+# Header 32 Bytes:
+# [0:1] 2 Bytes [ZD]
+# [2:4] 3 Bytes [Versions]
+# [8-15] = number of tensors
+# [16-23] = size of the table
+# [24-31] = header size, including the table that follows it (the offset of the frames)
+# The table JSON: {name: [dtype, shape, [[codec (EnumCodec), offset, compressed size, original size], ...]], ...}
+#   The offsets are from the end of the table, every tensor is compressed in frames of up to streaming_chunk_kb bytes.
+# The frames.
+ZIPNN_STATE_DICT_ID = b"ZD"
+ZIPNN_STATE_DICT_HEADER_LEN = 32
+
+# torch dtype name -> bytearray_dtype of ZipNN, the other dtypes are compressed with zstd
+ZIPNN_STATE_DICT_DTYPES = {
+    "bfloat16": "bfloat16",
+    "float16": "float16",
+    "float32": "float32",
+    "float64": "float64",
+    "float8_e4m3fn": "float8_e4m3fn",
+    "float8_e5m2": "float8_e5m2",
+}
+
+
+def zipnn_pack_state_dict_header(table, version):
+    """
+    Packs the header and the table of a compressed state_dict.
+
+    Parameters
+    -------------------------------------
+    table: dict
+            name -> [dtype, shape, frames] of every tensor.
+
+    version: tuple
+            (major, minor, tiny) version of ZipNN.
+
+    Returns
+    -------------------------------------
+    Byte data of the header and the table.
+    """
+    table_bytes = json.dumps(table, separators=(",", ":")).encode("utf-8")
+    header = bytearray(ZIPNN_STATE_DICT_HEADER_LEN)
+    header[0:2] = ZIPNN_STATE_DICT_ID
+    header[2:5] = bytes(version)
+    header[8:32] = struct.pack("<QQQ", len(table), len(table_bytes), ZIPNN_STATE_DICT_HEADER_LEN + len(table_bytes))
+    return bytes(header) + table_bytes
+
+
+def zipnn_unpack_state_dict_header(data):
+    """
+    Unpacks the header and the table of a compressed state_dict.
+
+    Parameters
+    -------------------------------------
+    data: byte
+            The compressed state_dict.
+
+    Returns
+    -------------------------------------
+    The table and the offset of the frames.
+    """
+    if len(data) < ZIPNN_STATE_DICT_HEADER_LEN or bytes(data[0:2]) != ZIPNN_STATE_DICT_ID:
+        raise ValueError("Compressed state_dict should start with ZD")
+    num_tensors, table_len, frames_offset = struct.unpack("<QQQ", data[8:32])
+    if frames_offset != ZIPNN_STATE_DICT_HEADER_LEN + table_len or len(data) < frames_offset:
+        raise ValueError("The compressed state_dict is corrupted")
+    table = json.loads(bytes(data[ZIPNN_STATE_DICT_HEADER_LEN:frames_offset]))
+    if len(table) != num_tensors:
+        raise ValueError("The compressed state_dict is corrupted")
+    return table, frames_offset
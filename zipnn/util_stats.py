@@ -0,0 +1,108 @@
+# util for the ZipNN stats
+import copy
+import threading
+
+# The stages of a compression or a decompression:
+# planning - method AUTO sampling the byte groups and choosing their codecs (compression only).
+# convert - a torch tensor or a numpy array to bytes (compression only).
+# lossy - the lossy conversion of the floats, or reverting it (only with lossy_compressed_type).
+# delta - taking the delta against a base, or reverting it (only with a base, see ZipNN.compress_delta).
+# bit_reorder - reordering the bits of the floats, or reverting it.
+# byte_split - splitting the data to byte groups, or combining them back.
+# entropy - compressing or decompressing the chunks of the byte groups.
+# assembly - building the compressed output from the header, the chunks table and the chunks.
+ZIPNN_STATS_STAGES = ("planning", "convert", "lossy", "delta", "bit_reorder", "byte_split", "entropy", "assembly")
+
+# The counters of every byte group
+ZIPNN_STATS_COUNTERS = ("bytes_in", "bytes_out", "chunks", "chunks_raw", "chunks_skipped")
+
+
+def _new_direction():
+    return {
+        "frames": 0,
+        "bytes_in": 0,
+        "bytes_out": 0,
+        "times": dict.fromkeys(ZIPNN_STATS_STAGES, 0.0),
+        "groups": [],
+    }
+
+
+class ZipNNStats:
+    """
+    Per stage timings and counters of a ZipNN instance, collected only if it was created with stats=True.
+    They are summed over all the compressions (stats.compress) and the decompressions (stats.decompress) until reset().
+
+    Each of them is a dict:
+    frames - the number of compressed frames (a streaming chunk or a tensor is one frame).
+    bytes_in, bytes_out - the size of the input and the output of all the frames.
+    times - seconds per stage (see ZIPNN_STATS_STAGES). The chunks are processed on threads, and the time of a stage
+            is summed over the threads, so with threads > 1 it may be longer than the wall time.
+    groups - a dict of counters for every byte group, by the index of the group in its frame:
+            bytes_in, bytes_out - the size of the group before and after the compression (or the other way around).
+            chunks - the number of chunks of the group.
+            chunks_raw - chunks that were stored as is, since their compression didn't pass the compression_threshold.
+            chunks_skipped - chunks that were stored as is without compressing them, since their group didn't pass the
+                             compression_threshold after check_th_after_percent of the chunks, or method AUTO chose not to
+                             compress it. Decompression can't tell them apart, so it counts both as chunks_raw.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """
+        Zeros all the timings and counters.
+        """
+        with self._lock:
+            self.compress = _new_direction()
+            self.decompress = _new_direction()
+
+    def as_dict(self):
+        """
+        Returns a copy of the stats, as a dict of compress and decompress.
+        """
+        with self._lock:
+            return copy.deepcopy({"compress": self.compress, "decompress": self.decompress})
+
+    def _add(self, direction, frame, bytes_in=0, bytes_out=0, frames=1):
+        """
+        Adds the stats of a frame.
+
+        Parameters
+        -------------------------------------
+        direction: string
+                'compress' or 'decompress'.
+
+        frame: dict
+                Seconds of the stages (by their names in ZIPNN_STATS_STAGES), and a list of every counter of
+                ZIPNN_STATS_COUNTERS with a value for every byte group. The split_dtype functions fill the same keys.
+
+        bytes_in, bytes_out: int
+                The size of the input and the output of the frame.
+
+        frames: int
+                The number of frames, 0 to add only stage times to the frame that is added next.
+        """
+        with self._lock:
+            stats = getattr(self, direction)
+            stats["frames"] += frames
+            stats["bytes_in"] += bytes_in
+            stats["bytes_out"] += bytes_out
+            for stage in ZIPNN_STATS_STAGES:
+                stats["times"][stage] += frame.get(stage, 0.0)
+            for counter in ZIPNN_STATS_COUNTERS:
+                for b, value in enumerate(frame.get(counter, ())):
+                    while len(stats["groups"]) <= b:
+                        stats["groups"].append(dict.fromkeys(ZIPNN_STATS_COUNTERS, 0))
+                    stats["groups"][b][counter] += value
+
+    def __repr__(self):
+        lines = []
+        for direction, stats in self.as_dict().items():
+            times = ", ".join(f"{stage} {seconds * 1000:.2f}ms" for stage, seconds in stats["times"].items() if seconds)
+            lines.append(f"{direction}: {stats['frames']} frames, {stats['bytes_in']} -> {stats['bytes_out']} bytes; {times}")
+            for b, group in enumerate(stats["groups"]):
+                counters = ", ".join(f"{counter} {value}" for counter, value in group.items())
+                lines.append(f"  group {b}: {counters}")
+        return "\n".join(lines)
@@ -6,63 +6,6 @@ import numpy as np
 from zipnn.util_header import EnumFormat
 
 
-@torch.jit.script
-def zipnn_multiply_if_max_below(tensor: torch.Tensor, max_val: float, multiplier: float, dtype: int):
-    """
-    TorchScript function to modify tensor if needed for lossy compression.
-
-    Parameters
-    -------------------------------------
-    tensor: torch.Tensor
-            Torch tensor data.
-
-    max_val: float
-            Max value variable used to deicde if torch should be modified.
-
-    multiplier: float
-            Tensor multiplier for modification.
-
-    dtype: int
-            Torch tensor data type.
-
-    Returns
-    -------------------------------------
-    Tensor data, and a flag value is_int if it was modified or not.
-    """
-    is_int = False
-    if tensor.abs().max().item() < max_val:
-        new_tensor = tensor * multiplier
-        new_tensor = new_tensor.to(dtype)
-        is_int = True
-        return new_tensor, is_int
-    return tensor, is_int
-
-
-@torch.jit.script
-def zipnn_divide_int(tensor: torch.Tensor, divisor: float):
-    """
-    TorchScript function to modify tensor back to original, if it was modified in lossy compression.
-
-    Parameters
-    -------------------------------------
-    tensor: torch.Tensor
-            Torch tensor data.
-
-    is_int: bool
-            If true, tensor was modified in compression.
-
-    divisor: float
-            Tensor multiplier for modification.
-
-    Returns
-    -------------------------------------
-    Decompressed tensor data.
-    """
-    tensor = tensor.to(torch.float32)
-    tensor /= divisor
-    return tensor
-
-
 def zipnn_get_dtype_bits(dtype):
     """
     Retrieves dtype of tensor.
@@ -165,7 +108,7 @@ def zipnn_is_floating_point(data_format_value, data, bytearray_dtype):
     if data_format_value == EnumFormat.NUMPY.value:
         return np.issubdtype(data.dtype, np.floating)
     if data_format_value == EnumFormat.BYTE.value:
-        return bytearray_dtype in ("float64", "float32", "float16", "bfloat16")
+        return bytearray_dtype in ("float64", "float32", "float16", "bfloat16", "float8_e4m3fn", "float8_e5m2")
 
 
 from enum import Enum
@@ -220,7 +163,10 @@ class ZipNNDtypeEnum(Enum):
     def from_dtype(cls, dtype):
         if isinstance(dtype, str):
             dtype = dtype.lower()
-        for member in cls:
-            if dtype == member.torch_dtype or dtype == member.numpy_dtype or dtype == member.python_dtype or dtype == member.dtype_str:
-                return member
+        # A numpy dtype is also equal to the names and the python types of its aliases (e.g. int64 to "int" and int,
+        # and float64 to None), so they are matched only if no member has the dtype itself
+        for attr in ("torch_dtype", "numpy_dtype", "dtype_str", "python_dtype"):
+            for member in cls:
+                if getattr(member, attr) is not None and dtype == getattr(member, attr):
+                    return member
         return cls.NONE
@@ -1,21 +1,200 @@
 import time
 import os
+import asyncio
 import math
+import threading
+import bisect
+import mmap
+import contextlib
+import collections
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import torch
 import zstandard as zstd
-from zipnn.util_header import EnumMethod, EnumFormat, EnumLossy
+from zipnn.util_header import EnumMethod, EnumFormat, EnumLossy, EnumCodec, EnumDelta, ZIPNN_CODEC_BITSHUFFLE
+from zipnn.util_index import (
+    ZIPNN_INDEX_TRAILER_LEN,
+    zipnn_pack_index,
+    zipnn_unpack_index,
+    zipnn_unpack_index_trailer,
+    zipnn_is_index_header,
+)
+from zipnn.util_safetensors import (
+    ZIPNN_SAFETENSORS_HEADER_LEN,
+    ZIPNN_SAFETENSORS_TRAILER_LEN,
+    ZIPNN_SAFETENSORS_DTYPES,
+    zipnn_parse_safetensors_header,
+    zipnn_safetensors_segments,
+    zipnn_pack_safetensors_header,
+    zipnn_unpack_safetensors_header,
+    zipnn_pack_safetensors_index,
+    zipnn_unpack_safetensors_trailer,
+    zipnn_unpack_safetensors_index,
+    zipnn_is_safetensors_header,
+)
+from zipnn.util_state_dict import (
+    ZIPNN_STATE_DICT_DTYPES,
+    zipnn_pack_state_dict_header,
+    zipnn_unpack_state_dict_header,
+)
+from zipnn.util_stats import ZipNNStats
 import split_dtype
 from zipnn.util_torch import (
     ZipNNDtypeEnum,
-    zipnn_multiply_if_max_below,
     zipnn_get_dtype_bits,
-    zipnn_divide_int,
     zipnn_pack_shape,
     zipnn_unpack_shape,
     zipnn_is_floating_point,
 )
 
+# Method AUTO samples up to AUTO_SAMPLE_CHUNKS chunks of every byte group (the first AUTO_SAMPLE_LEN bytes of each one),
+# and chooses the fastest codec whose compressed size is within AUTO_SIZE_TOLERANCE of the smallest one.
+AUTO_SAMPLE_CHUNKS = 4
+AUTO_SAMPLE_LEN = 64 * 1024
+AUTO_SIZE_TOLERANCE = 0.02
+# The candidate codecs of AUTO, from the fastest to decompress to the slowest
+AUTO_CODECS = (EnumCodec.LZ4, EnumCodec.HUFFMAN, EnumCodec.ZSTD, EnumCodec.FSE)
+# The codecs of the byte groups that split_dtype16 compresses in C, the others are compressed in chunks in Python
+_DTYPE16_CODECS = (EnumCodec.RAW.value, EnumCodec.HUFFMAN.value, EnumCodec.FSE.value)
+
+# The numpy dtype of every integer dtype code, they are byte grouped with their zero MSBytes truncated (see ZipNN._plan_integer)
+_INTEGER_DTYPES = {
+    member.code: np.dtype(member.numpy_dtype)
+    for member in ZipNNDtypeEnum
+    if member.numpy_dtype is not None and np.issubdtype(member.numpy_dtype, np.integer)
+}
+
+
+def _read_full(stream, buf):
+    """
+    Reads from stream until buf is full or the stream ends, and returns the number of bytes read.
+    """
+    mv = memoryview(buf)
+    total = 0
+    readinto = getattr(stream, "readinto", None)
+    while total < len(buf):
+        if readinto is not None:
+            n = readinto(mv[total:])
+        else:
+            data = stream.read(len(buf) - total)
+            n = len(data)
+            mv[total : total + n] = data
+        if not n:
+            break
+        total += n
+    return total
+
+
+@contextlib.contextmanager
+def _mmap_file(filename):
+    """
+    Maps a file read-only and yields a memoryview of it, the pages are shared with other processes that map the same file.
+    """
+    with open(filename, "rb") as in_file_handler:
+        if os.fstat(in_file_handler.fileno()).st_size == 0:
+            yield memoryview(b"")
+            return
+        mm = mmap.mmap(in_file_handler.fileno(), 0, access=mmap.ACCESS_READ)
+        mv = memoryview(mm)
+        try:
+            yield mv
+        finally:
+            mv.release()
+            try:
+                mm.close()
+            except BufferError:
+                # Views of the map are still referenced (e.g. by a traceback), it is unmapped when they are released
+                pass
+
+
+def _source_len(source):
+    """
+    Returns the size of a seekable binary stream or of a bytes-like object.
+    """
+    if hasattr(source, "seek"):
+        return source.seek(0, os.SEEK_END)
+    return memoryview(source).nbytes
+
+
+def _source_read(source, offset, size):
+    """
+    Reads size bytes from offset of a seekable binary stream or of a bytes-like object.
+    """
+    if hasattr(source, "seek"):
+        source.seek(offset)
+        buf = bytearray(size)
+        return memoryview(buf)[: _read_full(source, buf)]
+    return memoryview(source).cast("B")[offset : offset + size]
+
+
+def _import_lz4():
+    """
+    Imports LZ4 for method AUTO, which uses it only if it is installed. Returns False if it isn't.
+    """
+    global lz4
+    try:
+        import lz4.frame
+    except ImportError:
+        return False
+    return True
+
+
+def _run_steps(steps):
+    """
+    Runs a steps generator to the end and returns its return value.
+    The long operations (like compress_stream) are written as generators that yield after every chunk, so the same code
+    runs synchronously here and one chunk at a time on an executor in the async API, which can stop between chunks.
+    """
+    while True:
+        try:
+            next(steps)
+        except StopIteration as stop:
+            return stop.value
+
+
+def _next_step(steps):
+    """
+    Runs one step of a steps generator, returns (True, return value) when it is done and (False, None) otherwise.
+    """
+    try:
+        next(steps)
+    except StopIteration as stop:
+        return True, stop.value
+    return False, None
+
+
+@contextlib.contextmanager
+def _timed(frame_stats, stage):
+    """
+    Adds the time of the block to the stage in frame_stats (see ZipNNStats), nothing is timed if frame_stats is None.
+    """
+    if frame_stats is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        frame_stats[stage] = frame_stats.get(stage, 0.0) + time.perf_counter() - start
+
+
+def _writable_view(out):
+    """
+    Returns a writable byte memoryview of a bytearray, a numpy array, a CPU torch tensor or any writable buffer.
+    """
+    if isinstance(out, torch.Tensor):
+        if out.device.type != "cpu":
+            raise ValueError("The output tensor must be on the CPU")
+        if not out.is_contiguous():
+            raise ValueError("The output tensor must be contiguous")
+        out = out.reshape(-1).view(torch.uint8).numpy()
+    mv = memoryview(out)
+    if mv.readonly:
+        raise ValueError("The output buffer must be writable")
+    if not mv.c_contiguous:
+        raise ValueError("The output buffer must be contiguous")
+    return mv.cast("B")
+
 
 class ZipNN:
 
@@ -41,6 +220,9 @@ class ZipNN:
         decompressed_file: str = None,
         zstd_level: int = 3,
         lz4_compression_level: int = 0,
+        huffman_shared_table: bool = True,
+        bitshuffle: bool = False,
+        stats: bool = False,
     ):
         """
          Zipnn class is used to compress and decompress data in byte, file, and Torch tensor formats.
@@ -51,7 +233,8 @@ class ZipNN:
          -------------------------------------
          method: string
                  Chosen compression method. The options are: ‘zstd’/’ZSTD’, 'huffman'/'HUFFMAN' ‘lz4’/’LZ4’, ‘snappy’/’SNAPPY’.
-                 Default is ‘AUTO’, which choose the best compression method automatically.
+                 Default is ‘AUTO’, which samples a few chunks of every byte group and chooses its codec:
+                 Huffman, zstd, LZ4 (if installed) or no compression.
 
          input_format: string
                  The type of the input, the same will be for the output.
@@ -60,7 +243,7 @@ class ZipNN:
 
 
          bytearray_dtype: string,
-                 Chosen dtype for bytearray: The options are: ‘float32’, ‘uint32’, ‘uint16', 'bfloat16', 'float16'
+                 Chosen dtype for bytearray: The options are: 'float64', ‘float32’, ‘uint32’, ‘uint16', 'bfloat16', 'float16'
                  Default is ‘float32’.
 
          is_monotonic : bool,
@@ -69,7 +252,8 @@ class ZipNN:
 
          threads: int
                  The maximum threads for th ecompression and the byte/bit reorder.
-                 If 0, the code decide according to the dataset len.
+                 If 0, the code decide according to the number of CPUs.
+                 With is_streaming, the streaming chunks are compressed in parallel (up to 2*threads chunks in flight).
                  Default is 1
 
          compression_threshold: float
@@ -102,19 +286,21 @@ class ZipNN:
                  Defualt is 0 [Auto decision]
 
         delta_compressed_type: string
-               NOT IMPLEMENTED YET.
-               Type for delta compression.
-               Options are 'byte', 'file'.
-               Default is "0" (NOT IMPLEMENTED YET).
+               Type of the delta against a base, when compress gets one (delta_second_data, e.g. the previous checkpoint).
+               'xor' - XOR of the bytes, 'sub' - difference of the elements as unsigned integers.
+               Only relevant for float data, the delta is taken per chunk before the byte grouping.
+               Default is 0 - 'xor' when there is a base.
 
          lossy_compressed_type: string
-                 Type for lossy compression.
-                 Supporting only 'integer' ('unsigned' in the future).
-                 Only relevant if compression is lossy.
-                 Default is "0" (NOT IMPLEMENTED YET).
+                 Type for lossy compression, only for torch float32/bfloat16/float16 tensors.
+                 'integer' - fixed point, every float x is stored as the integer of the same width round(x * 2^lossy_compressed_factor).
+                             If the largest value doesn't fit, the tensor is compressed lossless.
+                 'mantissa' - the mantissa is rounded to its lossy_compressed_factor high bits.
+                 The conversion is done in C on every chunk before its byte grouping, and reverted after the chunk is combined.
+                 Default is 0 - lossless.
 
          lossy_compressed_factor: int
-                 Compression factor for lossy compression.
+                 The bits of lossy compression: the fraction bits of 'integer', the mantissa bits that are kept with 'mantissa'.
                  Only relevant if compression is lossy.
                  Default is 27.
 
@@ -158,6 +344,22 @@ class ZipNN:
                  Only relevant if method is ‘lz4’.
                  Deafult is 0.
 
+         huffman_shared_table: bool
+                 Build one Huffman table per byte group from the first chunks and store it once,
+                 every chunk uses it unless its own table is better.
+                 Only relevant for bfloat16/float16.
+                 Default is True.
+
+         bitshuffle: bool
+                 Method AUTO also tries to transpose the bit planes of the chunks of every byte group before compressing them,
+                 and keeps it for the groups where it is smaller. Helps the groups of few distinct values (exponents, sparse data).
+                 Default is False.
+
+         stats: bool
+                 Collect the time of every stage and the counters of every byte group into self.stats (a ZipNNStats),
+                 summed over all the calls until self.stats.reset(). Nothing is measured if False.
+                 Default is False.
+
          Returns
          -------------------------------------
          ZipNN class instance supporting a specific compression and decompression based on the input given.
@@ -174,7 +376,7 @@ class ZipNN:
         self.byte_reorder = byte_reorder
         self.reorder_signbit = reorder_signbit
 
-        self.delta_compressed_type = delta_compressed_type
+        self.delta_compressed_type = EnumDelta.NONE if delta_compressed_type is None else EnumDelta(delta_compressed_type)
         self.lossy_compressed_type = EnumLossy.NONE if lossy_compressed_type is None else EnumLossy(lossy_compressed_type)
         self.lossy_compressed_factor = lossy_compressed_factor
 
@@ -200,10 +402,17 @@ class ZipNN:
         self.decompressed_file = decompressed_file
 
         self.lz4_compression_level = lz4_compression_level
+        self.huffman_shared_table = huffman_shared_table
+        self.bitshuffle = bitshuffle
+        self.stats = ZipNNStats() if stats else None
 
         self._version_major = 0
         self._version_minor = 3
-        self._version_tiny = 2
+        self._version_tiny = 3
+        self._zstd_level = zstd_level
+        self._executor = None
+        self._async_executor = None
+        self._thread_local = threading.local()
         self._import_dependencies(zstd_level)
 
         self.header_length = 32
@@ -277,14 +486,14 @@ class ZipNN:
     # [2:4] 3 Bytes [Versions]
     # [5] 1 Byte [byte_reorder]
     # [6] 1 Byte [bit_reorder]
-    # [9] 1 Byte [delta compression]
-    # [8] 1 Byte [method]
-    # [9] 1 Byte [format]
+    # [7] 1 Byte [method]
+    # [8] 1 Byte [format]
+    # [9] 1 Byte [delta compression - EnumDelta]
     # [10] 1 Byte [lossy_compress_type]
     # [11] 1 Byte [lossy_compress_factor]
     # [12] 1 Byte [lossy_is_int]
-    # [13] 1 Byte [Compression Chunk]
-    # [14] 1 Byte [is_streaming, streaming_chunk_kb]
+    # [13] 1 Byte [is_streaming, streaming_chunk_kb]
+    # [14] 1 Byte [Compression Chunk]
     # [15] = self.dtype
     # [16-23] = original size
     # [24-32] = compressed file size
@@ -304,6 +513,12 @@ class ZipNN:
         self._header[11] = lossy_factor
         self._header[12] = lossy_is_int
 
+    def _update_header_delta(self, delta_type):
+        """
+        Updates header with the type of the delta against a base (EnumDelta).
+        """
+        self._header[9] = delta_type.value
+
     def _update_header_original_len(self, original_len):
         original_bytes_len = (original_len).to_bytes(8, byteorder="little")
         self._header[16:24] = original_bytes_len
@@ -367,10 +582,8 @@ class ZipNN:
         #        self._header[6] = bit_reorder
         self._header[7] = self.method
         self._header[8] = self.input_format
-        self._header[9] = 0 if self.delta_compressed_type is None else self.delta_compressed_type
-        #        self._header[10] = self.lossy_compressed_type
-        #        self._header[11] = self.lossy_compressed_factor
-        #        self._header[12] = self._lossy_is_int
+        self._header[9] = EnumDelta.NONE.value
+        self._update_header_lossy(EnumLossy.NONE, 0, 0)
         if self.is_streaming:  # MSB is streaming, unsigned & is stremaing
             self._header[13] = 128 + int(math.log(self.streaming_chunk_kb, 2))
         else:
@@ -402,9 +615,9 @@ class ZipNN:
         self._bit_reorder = int(header[6])
         self.method = int(header[7])
         self.input_format = int(header[8])
-        self.delta_compressed_type = int(header[9])
-        self.lossy_compressed_type = int(header[10])
-        self.lossy_compressed_factor = int(header[11])
+        self._delta_type = int(header[9])
+        self._lossy_type = int(header[10])
+        self._lossy_factor = int(header[11])
         self._lossy_is_int = int(header[12])
         streaming_vals = int(header[13])
         if streaming_vals > 127:
@@ -436,10 +649,10 @@ class ZipNN:
                 The data to compress. It’s type can be one of the following options: ‘byte’, ‘torch’, ‘file’. If file, enter filename.
                 Default is None.
 
-        delta_second_data: string
-                If compression is delta compression,then second data is needed. It's type options are ‘byte’, ‘torch’, ‘file’.
-                If file, enter filename.
-                Default is None.
+        delta_second_data: torch.Tensor, numpy array, bytes, seekable binary stream or string
+                The base to compress data as a delta against (see compress_delta), of the same size and dtype as data.
+                A string is the path of a compressed file of the base.
+                Default is None - no delta.
 
         compress_cpu_gpu: string
                 Compression will be done by choice, in the CPU or GPU.
@@ -459,29 +672,393 @@ class ZipNN:
         (depends on the type of the data compressed), which will be the compressed file,
         in the format chosen in the ZipNN class instance configuration.
         """
-        if len(data) % 2 != 0:
-            data += b'\x00'
+        return _run_steps(self._compress_steps(data, lossy_compressed_type, lossy_compressed_factor, delta_second_data))
+
+    def _compress_steps(self, data, lossy_compressed_type=None, lossy_compressed_factor=None, delta_second_data=None):
+        """
+        compress as a steps generator, it yields after every streaming chunk and returns the compressed data (see _run_steps).
+        """
+        base = self._delta_base(delta_second_data)
         if self.is_streaming and self.input_format == EnumFormat.BYTE.value:
             mv_data = memoryview(data)
             CHUNK_SIZE = self.streaming_chunk_kb
+            chunks = (mv_data[offset : offset + CHUNK_SIZE] for offset in range(0, len(data), CHUNK_SIZE))
+            bases = None
+            if base is not None:
+                if _source_len(base) != len(data):
+                    raise ValueError("The delta base must be as long as the data")
+                bases = (_source_read(base, offset, CHUNK_SIZE) for offset in range(0, len(data), CHUNK_SIZE))
             # Compression into bytearray
             compressed_buffer = bytearray()
-            remaining_bytes = len(data)
-            offset = 0
-
-            while remaining_bytes > 0:
-                chunk_size = min(CHUNK_SIZE, remaining_bytes)
-                chunk = mv_data[offset : offset + chunk_size]
-                compressed_chunk = self.compress_torch_numpy_byte(chunk, lossy_compressed_type, lossy_compressed_factor)
+            for _, compressed_chunk in self._compress_frames(chunks, lossy_compressed_type, lossy_compressed_factor, bases):
                 if compressed_chunk:
                     compressed_buffer.extend(compressed_chunk)
-                offset += chunk_size
-                remaining_bytes -= chunk_size
+                yield
             return compressed_buffer
         else:
-            #        if self.delta_compressed_type is not None:
-            #            return self.compress_delta(data, delta_second_data, lossy_compressed_type, lossy_compressed_factor)
-            return self.compress_torch_numpy_byte(data, lossy_compressed_type, lossy_compressed_factor)
+            return self.compress_torch_numpy_byte(data, lossy_compressed_type, lossy_compressed_factor, base)
+
+    def compress_stream(self, in_stream, out_stream, index=False, delta_second_data=None):
+        """
+        Compresses a stream of bytes chunk by chunk, with bounded memory.
+        Reads streaming_chunk_kb bytes at a time, compresses them and writes the compressed chunk to out_stream,
+        so only one chunk is held in memory. The output is the same as compress(data) with is_streaming=True.
+
+        Parameters
+        -------------------------------------
+        in_stream: file-like object
+                Binary stream to read the data from (supports read or readinto).
+
+        out_stream: file-like object
+                Binary stream to write the compressed chunks to.
+
+        index: bool
+                Append an index block after the last chunk, for random access with read_range.
+                Default is False.
+
+        delta_second_data: seekable binary stream, bytes or string
+                The base to compress the stream as a delta against (see compress_delta), it is read chunk by chunk
+                along with in_stream. A string is the path of a compressed file of the base, which is decompressed to memory.
+                Default is None - no delta.
+
+        Returns
+        -------------------------------------
+        A tuple of the number of bytes read and the number of bytes written.
+        """
+        return _run_steps(self._compress_stream_steps(in_stream, out_stream, index, delta_second_data))
+
+    def _compress_stream_steps(self, in_stream, out_stream, index=False, delta_second_data=None):
+        """
+        compress_stream as a steps generator, it yields after every chunk (see _run_steps).
+        """
+        if not self.is_streaming or self.input_format != EnumFormat.BYTE.value:
+            raise ValueError("compress_stream requires is_streaming=True and input_format='byte'")
+
+        original_size = 0
+        compressed_size = 0
+        original_offset = 0
+        entries = []
+        base = self._delta_base(delta_second_data)
+
+        def read_chunks():
+            nonlocal original_size
+            while True:
+                chunk = bytearray(self.streaming_chunk_kb)
+                chunk_size = _read_full(in_stream, chunk)
+                if chunk_size == 0:
+                    return
+                original_size += chunk_size
+                del chunk[chunk_size:]
+                yield chunk
+                if chunk_size < self.streaming_chunk_kb:
+                    return
+
+        def read_bases():
+            # The base of every chunk, read when its chunk is read
+            offset = 0
+            while True:
+                yield _source_read(base, offset, self.streaming_chunk_kb)
+                offset += self.streaming_chunk_kb
+
+        bases = None if base is None else read_bases()
+        for chunk_len, compressed_chunk in self._compress_frames(read_chunks(), bases=bases):
+            entries.append((compressed_size, original_offset))
+            out_stream.write(compressed_chunk)
+            original_offset += chunk_len
+            compressed_size += len(compressed_chunk)
+            yield
+        if index:
+            index_block = zipnn_pack_index(entries, original_offset, (self._version_major, self._version_minor, self._version_tiny))
+            out_stream.write(index_block)
+            compressed_size += len(index_block)
+        return original_size, compressed_size
+
+    def compress_file(self, input_file=None, compressed_file=None, index=False, delta_second_data=None):
+        """
+        Compresses a file to a compressed file with bounded memory, see compress_stream.
+
+        Parameters
+        -------------------------------------
+        input_file: string
+                Path to the file to compress.
+                Default is the input_file of the ZipNN instance.
+
+        compressed_file: string
+                Path to the compressed file.
+                Default is the compressed_file of the ZipNN instance.
+
+        index: bool
+                Append an index block for random access with read_range.
+                Default is False.
+
+        delta_second_data: seekable binary stream, bytes or string
+                The base to compress the file as a delta against, see compress_stream.
+                Default is None - no delta.
+
+        Returns
+        -------------------------------------
+        A tuple of the original size and the compressed size.
+        """
+        input_file = self.use_var(input_file, self.input_file)
+        compressed_file = self.use_var(compressed_file, self.compressed_file)
+        if not os.path.exists(input_file):
+            raise FileNotFoundError(f"The file at {input_file} was not found.")
+        self._check_file_elements(input_file)
+        with open(input_file, "rb") as in_file_handler, open(compressed_file, "wb") as out_file_handler:
+            return self.compress_stream(in_file_handler, out_file_handler, index=index, delta_second_data=delta_second_data)
+
+    def _check_file_elements(self, input_file):
+        """
+        Raises ValueError if the file isn't a whole number of elements of bytearray_dtype, before the compressed file is
+        created. Bytes of 32 and 64 bit dtypes can't be split otherwise (16 bit ones are padded).
+        """
+        element_size = {"float32": 4, "float": 4, "float64": 8}.get(self.bytearray_dtype)
+        if element_size is not None and os.path.getsize(input_file) % element_size:
+            raise ValueError(f"The file at {input_file} is not a whole number of {self.bytearray_dtype} elements.")
+
+    def compress_safetensors(self, in_stream, out_stream):
+        """
+        Compresses a safetensors file tensor by tensor, with the byte grouping of the dtype of every tensor.
+        The safetensors header is stored raw, consecutive tensors of the same dtype are compressed together in frames of
+        up to streaming_chunk_kb bytes, and dtypes without byte grouping are compressed with zstd.
+        An index of the frames of every tensor is appended, so single tensors can be decompressed (see read_safetensors_index).
+
+        Parameters
+        -------------------------------------
+        in_stream: file-like object
+                Binary stream to read the safetensors file from (supports read or readinto).
+
+        out_stream: file-like object
+                Binary stream to write the compressed file to.
+
+        Returns
+        -------------------------------------
+        A tuple of the number of bytes read and the number of bytes written.
+        """
+        length_bytes = bytearray(8)
+        if _read_full(in_stream, length_bytes) < 8:
+            raise ValueError("The safetensors file is truncated")
+        st_header = length_bytes + bytearray(int.from_bytes(length_bytes, byteorder="little"))
+        if _read_full(in_stream, memoryview(st_header)[8:]) < len(st_header) - 8:
+            raise ValueError("The safetensors file is truncated")
+        tensors = zipnn_parse_safetensors_header(st_header)
+        segments = zipnn_safetensors_segments(tensors, self.streaming_chunk_kb)
+
+        header = zipnn_pack_safetensors_header(len(st_header), (self._version_major, self._version_minor, self._version_tiny))
+        out_stream.write(header)
+        out_stream.write(st_header)
+        compressed_size = len(header) + len(st_header)
+        frames = []
+        buf = bytearray(self.streaming_chunk_kb)
+
+        def write_frame(begin, data, dtype):
+            nonlocal compressed_size
+            codec, frame = self._compress_typed_frame(data, ZIPNN_SAFETENSORS_DTYPES.get(dtype))
+            out_stream.write(frame)
+            frames.append([codec, compressed_size, len(frame), begin, len(data)])
+            compressed_size += len(frame)
+
+        for begin, end, dtype in segments:
+            data = memoryview(buf)[: end - begin]
+            if _read_full(in_stream, data) < len(data):
+                raise ValueError("The safetensors file is truncated")
+            write_frame(begin, data, dtype)
+        # The bytes after the last tensor
+        data_len = segments[-1][1] if segments else 0
+        while True:
+            size = _read_full(in_stream, buf)
+            if size == 0:
+                break
+            write_frame(data_len, memoryview(buf)[:size], None)
+            data_len += size
+
+        starts = [frame[3] for frame in frames]
+        tensors_frames = {}
+        for name, (_, _, begin, end) in tensors.items():
+            first = bisect.bisect_right(starts, begin) - 1
+            tensors_frames[name] = [first, bisect.bisect_left(starts, end) - first if end > begin else 0]
+        index = zipnn_pack_safetensors_index(frames, tensors_frames, len(st_header) + data_len)
+        out_stream.write(index)
+        compressed_size += len(index)
+        return len(st_header) + data_len, compressed_size
+
+    def compress_state_dict(self, state_dict):
+        """
+        Compresses all the tensors of a state_dict into a single container with a table of the tensors.
+        Every tensor is split to frames of up to streaming_chunk_kb bytes, compressed with the byte grouping of its dtype
+        (other dtypes are compressed with zstd), and the frames of all the tensors are compressed together on the thread pool.
+
+        Parameters
+        -------------------------------------
+        state_dict: dict
+                name -> torch.Tensor.
+
+        Returns
+        -------------------------------------
+        Byte data of the compressed state_dict.
+        """
+        frame_size = self.streaming_chunk_kb
+        tensors = []
+        jobs = []
+        for name, tensor in state_dict.items():
+            if not isinstance(tensor, torch.Tensor):
+                raise ValueError(f"The value of {name} is not a torch.Tensor")
+            tensor = tensor.detach().cpu().contiguous()
+            dtype = str(tensor.dtype).split(".")[-1]
+            mv = memoryview(tensor.reshape(-1).view(torch.uint8).numpy())
+            bytearray_dtype = ZIPNN_STATE_DICT_DTYPES.get(dtype)
+            frames = [(mv[offset : offset + frame_size], bytearray_dtype) for offset in range(0, len(mv), frame_size)]
+            tensors.append((name, dtype, list(tensor.shape), len(frames)))
+            jobs.extend(frames)
+
+        def compress_job(job):
+            data, bytearray_dtype = job
+            if bytearray_dtype is not None:
+                # The byte grouping reorders the data in place, so it works on a copy and not on the tensor
+                data = bytearray(data)
+            return len(data), self._compress_typed_frame(data, bytearray_dtype, threads=1)
+
+        results = iter(self._map_jobs(compress_job, jobs))
+        table = {}
+        frames_data = []
+        offset = 0
+        for name, dtype, shape, num_frames in tensors:
+            frames = []
+            for _ in range(num_frames):
+                original_len, (codec, frame) = next(results)
+                frames.append([codec, offset, len(frame), original_len])
+                frames_data.append(frame)
+                offset += len(frame)
+            table[name] = [dtype, shape, frames]
+        header = zipnn_pack_state_dict_header(table, (self._version_major, self._version_minor, self._version_tiny))
+        return b"".join([header] + frames_data)
+
+    def _compress_frames(self, chunks, lossy_compressed_type=None, lossy_compressed_factor=None, bases=None):
+        """
+        Compresses streaming chunks, every chunk is compressed to an independent frame with its own header.
+        With more than one thread the chunks are compressed concurrently on the thread pool, each thread with its own
+        ZipNN instance, and at most 2 * threads chunks are in flight, so the memory is bounded by the window and not by the input.
+
+        Parameters
+        -------------------------------------
+        chunks: iterable of bytes
+                The chunks to compress, they are read lazily as the window moves.
+
+        bases: iterable of bytes
+                The delta base of every chunk, read along with its chunk.
+                Default is None - no delta.
+
+        Returns
+        -------------------------------------
+        Yields the length of every chunk and its compressed frame, in the order of the chunks.
+        """
+        frames = zip(chunks, bases) if bases is not None else ((chunk, None) for chunk in chunks)
+        workers = self._num_workers()
+        if workers == 1:
+            for chunk, base in frames:
+                yield len(chunk), self.compress_torch_numpy_byte(chunk, lossy_compressed_type, lossy_compressed_factor, base)
+            return
+
+        def compress_frame(chunk, base):
+            local = self._thread_local
+            if not hasattr(local, "zipnn"):
+                # The frames are compressed in parallel, so the chunks of a frame are compressed serially
+                local.zipnn = self._clone(threads=1)
+            return len(chunk), local.zipnn.compress_torch_numpy_byte(chunk, lossy_compressed_type, lossy_compressed_factor, base)
+
+        executor = self._get_executor()
+        in_flight = collections.deque()
+        try:
+            for chunk, base in frames:
+                if len(in_flight) >= 2 * workers:
+                    yield in_flight.popleft().result()
+                in_flight.append(executor.submit(compress_frame, chunk, base))
+            while in_flight:
+                yield in_flight.popleft().result()
+        finally:
+            for future in in_flight:
+                future.cancel()
+
+    def _clone(self, **kwargs):
+        """
+        Returns a new ZipNN instance with the configuration of this one, kwargs override the configuration.
+        The compression state (the header) isn't shared, so the clone can compress concurrently with this instance.
+        """
+        config = dict(
+            method=EnumMethod(self.method).name,
+            input_format=EnumFormat(self.input_format).name,
+            bytearray_dtype=self.bytearray_dtype,
+            is_monotonic=self.is_monotonic,
+            threads=self.threads,
+            compression_threshold=self.compression_threshold,
+            check_th_after_percent=self.check_th_after_percent,
+            byte_reorder=self.byte_reorder,
+            reorder_signbit=self.reorder_signbit,
+            delta_compressed_type=self.delta_compressed_type,
+            lossy_compressed_type=self.lossy_compressed_type,
+            lossy_compressed_factor=self.lossy_compressed_factor,
+            compression_chunk=self.compression_chunk,
+            is_streaming=self.is_streaming,
+            streaming_chunk_kb=self.streaming_chunk_kb,
+            zstd_level=self._zstd_level,
+            lz4_compression_level=self.lz4_compression_level,
+            huffman_shared_table=self.huffman_shared_table,
+            bitshuffle=self.bitshuffle,
+        )
+        config.update(kwargs)
+        clone = ZipNN(**config)
+        # The clones add to the stats of this instance
+        clone.stats = self.stats
+        return clone
+
+    def _byte_zipnn(self, bytearray_dtype="bfloat16", threads=None):
+        """
+        Returns a ZipNN instance of the calling thread with the configuration of this one for bytes of bytearray_dtype,
+        without streaming. Used to compress and decompress the frames of containers without changing the state of this instance.
+        The frames are lossless and without a delta, whatever this instance is configured for.
+        """
+        local = self._thread_local
+        if not hasattr(local, "byte_zipnns"):
+            local.byte_zipnns = {}
+        threads = self.threads if threads is None else threads
+        if (bytearray_dtype, threads) not in local.byte_zipnns:
+            local.byte_zipnns[(bytearray_dtype, threads)] = self._clone(
+                input_format="byte",
+                bytearray_dtype=bytearray_dtype,
+                is_streaming=False,
+                threads=threads,
+                lossy_compressed_type=None,
+                delta_compressed_type=None,
+            )
+        return local.byte_zipnns[(bytearray_dtype, threads)]
+
+    def _compress_typed_frame(self, data, bytearray_dtype, threads=None):
+        """
+        Compresses a frame of bytes of bytearray_dtype with byte grouping, or with zstd if bytearray_dtype is None,
+        and returns the codec (EnumCodec) and the frame. data is reordered in place by the byte grouping.
+        """
+        if bytearray_dtype is not None:
+            return EnumCodec.ZIPNN.value, self._byte_zipnn(bytearray_dtype, threads).compress_torch_numpy_byte(data)
+        frame = self._thread_codecs().zstd_compress.compress(data)
+        if len(frame) < len(data):
+            return EnumCodec.ZSTD.value, frame
+        return EnumCodec.RAW.value, data
+
+    def _decompress_typed_frame(self, codec, data, data_len, threads=None):
+        """
+        Decompresses a frame of _compress_typed_frame.
+        """
+        if codec == EnumCodec.RAW.value:
+            ba_decom = data
+        elif codec == EnumCodec.ZIPNN.value:
+            ba_decom = self._byte_zipnn(threads=threads).decompress_bin(data)
+        elif codec == EnumCodec.ZSTD.value:
+            ba_decom = self._thread_codecs().zstd_decompress.decompress(data)
+        else:
+            raise ValueError(f"Unsupported codec {codec}")
+        if len(ba_decom) != data_len:
+            raise ValueError("The frame is corrupted")
+        return ba_decom
 
     def compress_method(self, data: bytes):
         """
@@ -506,8 +1083,247 @@ class ZipNN:
             return snappy.compress(data)
         raise ValueError(f"Unsupported method {self.method}")
 
+    def _num_workers(self):
+        """
+        Returns the number of workers for the chunk jobs, threads=0 means one per CPU.
+        """
+        if self.threads > 0:
+            return self.threads
+        return os.cpu_count() or 1
+
+    def _get_executor(self):
+        """
+        Returns the thread pool of this instance, it is created on first use.
+        """
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self._num_workers())
+        return self._executor
+
+    def _map_jobs(self, func, jobs):
+        """
+        Runs func on every job and yields the results in the jobs order.
+        The codecs release the GIL, so with more than one thread the jobs run in parallel on the thread pool.
+        """
+        if self._num_workers() == 1 or len(jobs) < 2:
+            return map(func, jobs)
+        return self._get_executor().map(func, jobs)
+
+    def _thread_codecs(self):
+        """
+        Returns the zstd compressor and decompressor of the calling thread (zstd contexts can't be shared between threads).
+        """
+        local = self._thread_local
+        if not hasattr(local, "zstd_compress"):
+            local.zstd_compress = zstd.ZstdCompressor(level=self._zstd_level)
+            local.zstd_decompress = zstd.ZstdDecompressor()
+        return local
+
+    def _compress_chunk(self, data):
+        """
+        Thread safe compress_method for a single chunk.
+        """
+        if self.method == EnumMethod.ZSTD.value or self.method == EnumMethod.AUTO.value:
+            return self._thread_codecs().zstd_compress.compress(data)
+        return self.compress_method(data)
+
+    def _compress_codec(self, codec, data):
+        """
+        Thread safe compression of a single chunk with an EnumCodec that method AUTO chose, None if it isn't compressible.
+        With the ZIPNN_CODEC_BITSHUFFLE flag, the bit planes of the chunk are transposed before it is compressed.
+        """
+        if codec & ZIPNN_CODEC_BITSHUFFLE:
+            data = split_dtype.bitshuffle(data)
+            codec &= ~ZIPNN_CODEC_BITSHUFFLE
+        if codec == EnumCodec.HUFFMAN.value:
+            return split_dtype.huffman_compress(data)
+        if codec == EnumCodec.ZSTD.value:
+            return self._thread_codecs().zstd_compress.compress(data)
+        if codec == EnumCodec.LZ4.value:
+            return lz4.frame.compress(data)
+        if codec == EnumCodec.FSE.value:
+            return split_dtype.fse_compress(data)
+        raise ValueError(f"Unsupported codec {codec}")
+
+    def _sample_chunks(self, num_chunks):
+        """
+        Returns the indexes of the chunks that method AUTO samples, spread evenly over the data.
+        As many chunks as the compression_threshold is checked on are sampled, up to AUTO_SAMPLE_CHUNKS.
+        """
+        num_samples = min(AUTO_SAMPLE_CHUNKS, math.ceil(num_chunks / self.check_th_after_percent))
+        return sorted({s * num_chunks // num_samples for s in range(num_samples)})
+
+    def _plan_codecs(self, samples, chunk_size):
+        """
+        Chooses the codec of every byte group for method AUTO, by compressing the samples of the group with every candidate.
+        A byte group that doesn't pass the compression_threshold with any codec is stored as is, without compressing it.
+        Otherwise the fastest codec to decompress whose size is within AUTO_SIZE_TOLERANCE of the smallest is chosen,
+        so an exponent group gets Huffman unless zstd or LZ4 is clearly smaller (runs, e.g. the zeros of pruned weights),
+        or FSE is (a skewed distribution, where Huffman wastes the fraction of a bit per symbol).
+        The speed is the fixed order of AUTO_CODECS and not measured, so the output doesn't depend on the machine load.
+        With bitshuffle, every codec is also tried on the transposed bit planes (ZIPNN_CODEC_BITSHUFFLE), after all the
+        codecs without it, since the transpose costs time on both sides.
+
+        Parameters
+        -------------------------------------
+        samples: list of lists of bytes
+                The samples of every byte group.
+
+        chunk_size: int
+                The size of a chunk of a byte group, Huffman is a candidate only up to split_dtype.HUFFMAN_MAX_CHUNK.
+
+        Returns
+        -------------------------------------
+        A list with the codec of every byte group (an EnumCodec value, maybe with ZIPNN_CODEC_BITSHUFFLE),
+        and the size of all the samples with these codecs.
+        """
+        candidates = [codec.value for codec in AUTO_CODECS if codec != EnumCodec.LZ4 or _import_lz4()]
+        if chunk_size > split_dtype.HUFFMAN_MAX_CHUNK:
+            candidates.remove(EnumCodec.HUFFMAN.value)
+        if self.bitshuffle:
+            candidates += [codec | ZIPNN_CODEC_BITSHUFFLE for codec in candidates]
+        jobs = [(b, codec, sample) for b, group_samples in enumerate(samples) for codec in candidates for sample in group_samples]
+        results = self._map_jobs(lambda job: self._compress_codec(job[1], job[2]), jobs)
+        sizes = [dict.fromkeys(candidates, 0) for _ in samples]
+        for (b, codec, sample), comp in zip(jobs, results):
+            sizes[b][codec] += len(sample) if comp is None else min(len(comp), len(sample))
+
+        codecs = []
+        planned_size = 0
+        for b, group_samples in enumerate(samples):
+            total = sum(len(sample) for sample in group_samples)
+            smallest = min(sizes[b].values(), default=total)
+            codec = EnumCodec.RAW.value
+            if total > 0 and smallest <= total * self.compression_threshold:
+                codec = next(c for c in candidates if sizes[b][c] <= smallest * (1 + AUTO_SIZE_TOLERANCE))
+            codecs.append(codec)
+            planned_size += total if codec == EnumCodec.RAW.value else sizes[b][codec]
+        return codecs, planned_size
+
+    def _compress_chunks(self, groups, codecs=None, frame_stats=None):
+        """
+        Compresses byte groups chunk by chunk, using the same layout as split_dtype16:
+        the chunks types [num_buf][num_chunks], the cumulative compressed sizes [num_buf][num_chunks] (uint64),
+        and then the chunks of every byte group.
+        Each chunk is compress_chunk / num_buf bytes of a byte group, and the chunks are compressed in parallel.
+        After check_th_after_percent of the chunks, a byte group that doesn't pass the compression_threshold
+        is saved without compression.
+
+        Parameters
+        -------------------------------------
+        groups: list of bytes
+                The byte groups, all of them with the same length.
+
+        codecs: list of int
+                The EnumCodec of every byte group that method AUTO chose, the chunks of a RAW group aren't compressed.
+                Default is None, to compress with the method.
+
+        frame_stats: dict
+                The stats of the frame to add the entropy time and the counters of the byte groups to (see ZipNNStats).
+                Default is None.
+
+        Returns
+        -------------------------------------
+        The chunks types (bytes), the cumulative chunks sizes (bytes) and a list with the chunks data.
+        """
+        num_buf = len(groups)
+        chunk_size = self.compression_chunk // max(num_buf, 1)
+        num_chunks = (len(groups[0]) + chunk_size - 1) // chunk_size if groups else 0
+        chunks = []
+        for group in groups:
+            mv = memoryview(group)
+            chunks.append([mv[c * chunk_size : (c + 1) * chunk_size] for c in range(num_chunks)])
+        check_th = min(math.ceil(num_chunks / self.check_th_after_percent), num_chunks)
+        comp = [[None] * num_chunks for _ in range(num_buf)]
+        tried = [[False] * num_chunks for _ in range(num_buf)]
+
+        def compress_job(job):
+            b, c = job
+            if codecs is None:
+                return self._compress_chunk(chunks[b][c])
+            return self._compress_codec(codecs[b], chunks[b][c])
+
+        def timed_compress_job(job):
+            start = time.perf_counter()
+            return compress_job(job), time.perf_counter() - start
+
+        def compress_jobs(jobs):
+            if frame_stats is None:
+                results = self._map_jobs(compress_job, jobs)
+            else:
+                # Every job is timed on its thread, like the chunks of split_dtype16
+                timed_results = list(self._map_jobs(timed_compress_job, jobs))
+                results = [bg_comp for bg_comp, _ in timed_results]
+                frame_stats["entropy"] = frame_stats.get("entropy", 0.0) + sum(seconds for _, seconds in timed_results)
+            for (b, c), bg_comp in zip(jobs, results):
+                comp[b][c] = bg_comp
+                tried[b][c] = True
+
+        def stored_len(b, c):
+            bg_comp = comp[b][c]
+            if bg_comp is not None and len(bg_comp) < len(chunks[b][c]) * self.compression_threshold:
+                return len(bg_comp)
+            return len(chunks[b][c])
+
+        # The first chunks are always compressed, then only byte groups that pass the threshold
+        compressed_groups = [b for b in range(num_buf) if codecs is None or codecs[b] != EnumCodec.RAW.value]
+        compress_jobs([(b, c) for b in compressed_groups for c in range(check_th)])
+        jobs = []
+        for b in compressed_groups:
+            total_comp = sum(stored_len(b, c) for c in range(check_th))
+            total_uncomp = sum(len(chunks[b][c]) for c in range(check_th))
+            if check_th == num_chunks or total_comp <= total_uncomp * self.compression_threshold:
+                jobs.extend((b, c) for c in range(check_th, num_chunks))
+        compress_jobs(jobs)
+
+        chunks_type = bytearray(num_buf * num_chunks)
+        chunks_cumulative = np.zeros(num_buf * num_chunks, dtype="<u8")
+        chunks_data = []
+        counters = {counter: [0] * num_buf for counter in ("bytes_out", "chunks_raw", "chunks_skipped")}
+        for b in range(num_buf):
+            total_comp = 0
+            total_uncomp = 0
+            no_need_to_compress = False
+            for c in range(num_chunks):
+                # The same check as in split_dtype16, from chunk check_th on
+                if not no_need_to_compress and c >= check_th and total_comp > total_uncomp * self.compression_threshold:
+                    no_need_to_compress = True
+                if not no_need_to_compress and stored_len(b, c) < len(chunks[b][c]):
+                    chunks_type[b * num_chunks + c] = 1
+                    chunks_data.append(comp[b][c])
+                else:
+                    chunks_data.append(chunks[b][c])
+                    counters["chunks_skipped" if no_need_to_compress or not tried[b][c] else "chunks_raw"][b] += 1
+                total_comp += len(chunks_data[-1])
+                total_uncomp += len(chunks[b][c])
+                chunks_cumulative[b * num_chunks + c] = total_comp
+            counters["bytes_out"][b] = total_comp
+        if frame_stats is not None:
+            frame_stats.update(counters, bytes_in=[len(group) for group in groups], chunks=[num_chunks] * num_buf)
+        return bytes(chunks_type), chunks_cumulative.tobytes(), chunks_data
+
+    def _sample_dtype16(self, ba, bit_reorder, byte_reorder, split_kwargs=None):
+        """
+        Returns the samples of the byte groups of 16 bit data for method AUTO, the sampled chunks are split into their byte groups.
+        With split_kwargs (see _delta_kwargs and _lossy_kwargs) the samples are of the lossy data and the delta against the base.
+        """
+        samples = [[], []]
+        sample_len = min(self.compression_chunk, 2 * AUTO_SAMPLE_LEN)
+        mv = memoryview(ba).cast("B")
+        for c in self._sample_chunks((len(mv) + self.compression_chunk - 1) // self.compression_chunk):
+            begin = c * self.compression_chunk
+            sample = mv[begin : begin + sample_len]
+            sample = sample[: len(sample) // 2 * 2]
+            kwargs = dict(split_kwargs or {})
+            if "base" in kwargs:
+                kwargs["base"] = memoryview(kwargs["base"]).cast("B")[begin : begin + len(sample)]
+            groups = split_dtype.split_groups16(sample, bit_reorder, byte_reorder, 1, **kwargs)
+            for b, group in enumerate(groups):
+                if group is not None:
+                    samples[b].append(group)
+        return samples[: 2 if byte_reorder == 10 else 1]
+
     def compress_bin(
-        self, ba: bytes, bit_reorder: int, byte_reorder: int, is_review: int, is_float: int, dtype_size: int, shape, skip_split: bool
+        self, ba: bytes, bit_reorder: int, byte_reorder: int, is_review: int, is_float: int, dtype_size: int, shape, skip_split: bool, base=None
     ):
         """
         Compresses byte data.
@@ -517,104 +1333,130 @@ class ZipNN:
         ba: byte
                 Byte data to compress.
 
+        base: byte
+                The base to take the delta of ba against (of the type in the header), as long as ba.
+                Default is None - no delta.
+
         Returns
         -------------------------------------
         Returns a byte array of the header, data, and some metadata.
         """
-        compress_bin_time = time.time()
-        is_print = 0
+        frame_stats = None if self.stats is None else {}
+        original_len = len(ba)
 
         if (self.byte_reorder == 0b1_01_01_001 and dtype_size == 32) or (self.byte_reorder == 0b0_00_01_001 and dtype_size == 16):
             # one group
-            stime = time.time()
-            ba_comp = self._header + self.compress_method(ba)
+            with _timed(frame_stats, "entropy"):
+                ba_comp = self._header + self.compress_method(ba)
             if self.input_format == EnumFormat.BYTE.value:
                 self._update_header_comp_len(len(ba_comp))
-                return b"".join([self._header] + [ba_comp])
+                ba_comp = b"".join([self._header] + [ba_comp])
         else:
-            stime = time.time()
-            bg_ret = []
-            bg_len = []
-            buf_is_comp = []
-
-            if dtype_size == 32:
-                start_time = time.time()
-
-                if skip_split == 0:
-                    buf1, buf2, buf3, buf4 = split_dtype.split_dtype32(ba, bit_reorder, byte_reorder, is_review, self.threads)
+            if dtype_size in (32, 64):
+                if dtype_size == 64:
+                    bufs = split_dtype.split_dtype64(
+                        ba, bit_reorder, byte_reorder, self.threads, stats=frame_stats, **self._delta_kwargs(base, self._header[15])
+                    )
+                    groups = list(bufs) if original_len else []
+                elif skip_split == 0:
+                    bufs = split_dtype.split_dtype32(
+                        ba,
+                        bit_reorder,
+                        byte_reorder,
+                        is_review,
+                        self.threads,
+                        stats=frame_stats,
+                        **self._delta_kwargs(base, self._header[15]),
+                        **self._lossy_kwargs(self._header[15]),
+                    )
+                    groups = [b for b in bufs if b is not None]
                 else:
-                    buf1 = ba
-                    buf2 = None
-                    buf3 = None
-                    buf4 = None
-
-                if is_print:
-                    print("reorder ", time.time() - start_time)
-                stime = time.time()
-                for b in buf1, buf2, buf3, buf4:
-                    if b is None:
-                        continue
-                    start_time = time.time()
-                    bg_comp = self.compress_method(b)
-
-                    if len(bg_comp) / (len(b)) < self.compression_threshold:
-                        # Save this byte group compressed
-                        buf_is_comp.append((1).to_bytes(1, byteorder="little"))
-                        bg_len.append(len(bg_comp).to_bytes(length=8, byteorder="little"))
-                        bg_ret.append(bg_comp)
-                        if is_print:
-                            print(f"We compress this byte: {len(bg_comp)/len(b)} time {time.time()-stime}")
+                    groups = [ba]
+
+                codecs = None
+                if self.method == EnumMethod.AUTO.value and not groups:
+                    # Empty data, the codecs of the byte groups are still stored
+                    codecs = [EnumCodec.RAW.value] * len(bufs)
+                elif self.method == EnumMethod.AUTO.value:
+                    with _timed(frame_stats, "planning"):
+                        chunk_size = self.compression_chunk // len(groups)
+                        sample_len = min(chunk_size, AUTO_SAMPLE_LEN)
+                        sample_chunks = self._sample_chunks((len(groups[0]) + chunk_size - 1) // chunk_size)
+                        samples = [[memoryview(group)[c * chunk_size : c * chunk_size + sample_len] for c in sample_chunks] for group in groups]
+                        codecs, _ = self._plan_codecs(samples, chunk_size)
+                chunks_type, chunks_cumulative, chunks_data = self._compress_chunks(groups, codecs, frame_stats)
+                with _timed(frame_stats, "assembly"):
+                    self._update_header_original_len(len(ba))
+                    if self.input_format in (EnumFormat.TORCH.value, EnumFormat.NUMPY.value):
+                        shape_bytes = zipnn_pack_shape(shape)
                     else:
-                        if is_print:
-                            print(f"We did't compress this byte: {len(bg_comp)/len(b)} time {time.time()-stime}")
-                        # Save the byte group not compressed
-                        buf_is_comp.append((0).to_bytes(1, byteorder="little"))
-                        bg_len.append(len(b).to_bytes(length=8, byteorder="little"))
-                        bg_ret.append(b)
-            if self.input_format in (EnumFormat.TORCH.value, EnumFormat.NUMPY.value):
-                shape_bytes = zipnn_pack_shape(shape)
-                #
-                total_length = len(shape_bytes)
-                total_length += sum(len(buf) for buf in buf_is_comp)
-                total_length += sum(len(bg) for bg in bg_len)
-                total_length += sum(len(ret) for ret in bg_ret)
-                self._update_header_comp_len(total_length)
-                #
-                ba_comp = b"".join([self._header] + [shape_bytes] + buf_is_comp + bg_len + bg_ret)
-            else:
-                #
-                total_length = sum(len(buf) for buf in buf_is_comp)
-                total_length += sum(len(bg) for bg in bg_len)
-                total_length += sum(len(ret) for ret in bg_ret)
-                self._update_header_comp_len(total_length)
-                #
-                ba_comp = b"".join([self._header] + buf_is_comp + bg_len + bg_ret)
+                        shape_bytes = b""
+                    # With method AUTO, the codec of every byte group is after the shape
+                    codecs_bytes = b"" if codecs is None else bytes(codecs)
+                    #
+                    total_length = len(shape_bytes) + len(codecs_bytes) + len(chunks_type) + len(chunks_cumulative)
+                    total_length += sum(len(chunk) for chunk in chunks_data)
+                    self._update_header_comp_len(total_length)
+                    #
+                    ba_comp = b"".join([self._header, shape_bytes, codecs_bytes, chunks_type, chunks_cumulative] + chunks_data)
 
             if dtype_size == 16:
-                if is_print:
-                    start_time = time.time()
-                self._update_header_original_len(len(ba))
+                self._update_header_original_len(original_len)
+                if original_len % 2:
+                    # The bytes are split in pairs, an odd length (of float8) is padded with a zero byte that isn't decompressed
+                    ba = bytes(ba) + b"\x00"
+                    base = None if base is None else bytes(base) + b"\x00"
+                split_kwargs = dict(self._delta_kwargs(base, self._header[15]), **self._lossy_kwargs(self._header[15]))
                 if self.input_format in (EnumFormat.TORCH.value, EnumFormat.NUMPY.value):
                     self._update_data_shape(shape)
-                python_header = self._header + self._ext_header
-                ba_comp = split_dtype.split_dtype16(
-                    python_header,
-                    ba,
-                    bit_reorder,
-                    byte_reorder,
-                    is_review,
-                    self.compression_chunk,
-                    self.compression_threshold,
-                    self.check_th_after_percent,
-                    self.threads,
-                )
-                if is_print:
-                    print("aggregate output bin ", time.time() - start_time)
-        if is_print:
-            print("total compression ", time.time() - stime)
-            print(f"len ba-comp {len(ba_comp)}")
-            print(f"len ba {len(ba)}")
-            print("compress_bin_time ", time.time() - compress_bin_time)
+                codecs = None
+                if self.method == EnumMethod.AUTO.value:
+                    with _timed(frame_stats, "planning"):
+                        codecs, planned_size = self._plan_codecs(
+                            self._sample_dtype16(ba, bit_reorder, byte_reorder, split_kwargs), self.compression_chunk // 2
+                        )
+                        if bit_reorder in (2, 3):
+                            # Splitting the fields of float8 helps when the magnitudes of neighbours are close (e.g. block scaled),
+                            # but independent weights compress better as whole float8 bytes, the smaller of the two is kept
+                            whole_codecs, whole_size = self._plan_codecs(
+                                self._sample_dtype16(ba, 0, byte_reorder, split_kwargs), self.compression_chunk // 2
+                            )
+                            if whole_size < planned_size:
+                                codecs = whole_codecs
+                                bit_reorder = 0
+                                self._update_header_dtype(byte_reorder=byte_reorder, bit_reorder=bit_reorder, dtype_code=self._header[15])
+                if codecs is None or all(codec in _DTYPE16_CODECS for codec in codecs):
+                    # Huffman, FSE and raw byte groups are split and compressed together in C
+                    python_header = self._header + self._ext_header + (b"" if codecs is None else bytes(codecs))
+                    compress_groups = 0b11 if codecs is None else sum(1 << b for b, codec in enumerate(codecs) if codec != EnumCodec.RAW.value)
+                    fse_groups = 0 if codecs is None else sum(1 << b for b, codec in enumerate(codecs) if codec == EnumCodec.FSE.value)
+                    ba_comp = split_dtype.split_dtype16(
+                        python_header,
+                        ba,
+                        bit_reorder,
+                        byte_reorder,
+                        is_review,
+                        self.compression_chunk,
+                        self.compression_threshold,
+                        self.check_th_after_percent,
+                        self.threads,
+                        int(self.huffman_shared_table),
+                        compress_groups,
+                        stats=frame_stats,
+                        fse_groups=fse_groups,
+                        **split_kwargs,
+                    )
+                else:
+                    groups = split_dtype.split_groups16(ba, bit_reorder, byte_reorder, self.threads, stats=frame_stats, **split_kwargs)
+                    groups = [group for group in groups if group is not None]
+                    chunks_type, chunks_cumulative, chunks_data = self._compress_chunks(groups, codecs, frame_stats)
+                    with _timed(frame_stats, "assembly"):
+                        total_length = len(self._ext_header) + len(codecs) + len(chunks_type) + len(chunks_cumulative)
+                        total_length += sum(len(chunk) for chunk in chunks_data)
+                        self._update_header_comp_len(total_length)
+                        ba_comp = b"".join([self._header, self._ext_header, bytes(codecs), chunks_type, chunks_cumulative] + chunks_data)
+        if frame_stats is not None:
+            self.stats._add("compress", frame_stats, original_len, len(ba_comp))
         return ba_comp
 
     #    def prepare_file(self, filename: str):
@@ -653,7 +1495,7 @@ class ZipNN:
 
     #        return (ba_comp)
 
-    def compress_torch_numpy_byte(self, data, lossy_compressed_type=None, lossy_compressed_factor=None):
+    def compress_torch_numpy_byte(self, data, lossy_compressed_type=None, lossy_compressed_factor=None, delta_second_data=None):
         """
         Compresses torch.
 
@@ -670,19 +1512,24 @@ class ZipNN:
                 ZipNN attribute lossy_compressed_factor.
                 Default is None.
 
+        delta_second_data: torch.Tensor, numpy array, bytes, seekable binary stream or string
+                The base to compress data as a delta against, see compress.
+                Default is None.
+
         Returns
         -------------------------------------
         Byte array of compressed data.
         """
-        is_print = 0
         is_review = 0
         bit_reorder = 0
         skip_split = 0
-        # lossy_type = self.use_var(lossy_compressed_type, self.lossy_compressed_type)
-        # lossy_type = EnumLossy.NONE if lossy_type is None else lossy_type
-        # if lossy_type is not EnumLossy.NONE:
-        #    lossy_factor = self.use_var(lossy_compressed_factor, self.lossy_compressed_factor)
-        #    lossy_compress = self.lossy_compress(data, lossy_type, lossy_factor)
+        lossy_type = EnumLossy(self.use_var(lossy_compressed_type, self.lossy_compressed_type))
+        lossy_factor = self.use_var(lossy_compressed_factor, self.lossy_compressed_factor)
+        lossy_is_int = 0
+        if lossy_type != EnumLossy.NONE:
+            lossy_is_int = self._check_lossy(data, lossy_type, lossy_factor)
+        else:
+            lossy_factor = 0
 
         if self.input_format == EnumFormat.BYTE.value:
             dtype_enum = ZipNNDtypeEnum.from_dtype(self.bytearray_dtype).code
@@ -697,6 +1544,9 @@ class ZipNN:
             if dtype_enum in (ZipNNDtypeEnum.FLOAT32.code, ZipNNDtypeEnum.FLOAT.code):
                 byte_reorder = 220  # 8b1_10_11_100
                 dtype_size = 32
+            elif dtype_enum == ZipNNDtypeEnum.FLOAT64.code:
+                byte_reorder = 8  # eight byte groups
+                dtype_size = 64
             #            elif (dtype_enum == ZipNNDtypeEnum.BFLOAT16.code):
             elif dtype_enum == ZipNNDtypeEnum.BFLOAT16.code:
                 byte_reorder = 10  # 8b01_010
@@ -707,44 +1557,54 @@ class ZipNN:
                 bit_reorder = 0
                 byte_reorder = 10  # 8b01_010
                 dtype_size = 16
+            elif dtype_enum in (ZipNNDtypeEnum.FLOAT8_E4M3FN.code, ZipNNDtypeEnum.FLOAT8_E5M2.code):
+                # Pairs of float8 are split to their exponents and their sign and mantissa bits
+                bit_reorder = 2 if dtype_enum == ZipNNDtypeEnum.FLOAT8_E4M3FN.code else 3
+                byte_reorder = 10  # 8b01_010
+                dtype_size = 16
+                if self.input_format == EnumFormat.TORCH.value:
+                    data = data.view(torch.uint8)
             else:
-                raise ValueError("Support only torch.dtype float32/bfloat16/float16")
+                raise ValueError("Support only torch.dtype float64/float32/bfloat16/float16/float8_e4m3fn/float8_e5m2")
+        elif dtype_enum in _INTEGER_DTYPES and self.input_format != EnumFormat.BYTE.value:
+            data, byte_reorder, bit_reorder, dtype_size, skip_split = self._plan_integer(data, dtype_enum)
         else:
-            if dtype_enum == ZipNNDtypeEnum.UINT32.code and self.input_format == EnumFormat.NUMPY.value:
-                max_val = np.max(data)
-                dtype_size = 32
-                if max_val < 256:  # truncate 3 bytes
-                    byte_reorder = 1  # 8b0_00_00_001
-                elif max_val < 65536:  # truncate 2 bytes
-                    # It is faster to work with change the format to uint16 then to truncate out c implememtation
-                    data = data.astype(np.uint16)
-                    skip_split = 1  # use vanilla compression method
-                    byte_reorder = 9  # 8b0_00_01_001
-                elif max_val < 16777216:  # truncate 1 bytes
-                    byte_reorder = 41  # 8b0_01_01_001
-                else:  # not truncate anything use vanilla compression method
-                    skip_split = 1  # use vanilla compression method
-                    byte_reorder = 255  # all one
-            else:
-                raise ValueError("Support only uint32 with NumPy format")
+            raise ValueError("Support only float64/float32/bfloat16/float16/float8_e4m3fn/float8_e5m2 and integers with torch or NumPy format")
+        if lossy_is_int:
+            # The fixed point values are integers, there is no exponent to reorder
+            bit_reorder = 0
 
         self._update_header_dtype(byte_reorder=byte_reorder, bit_reorder=bit_reorder, dtype_code=dtype_enum)
+        self._update_header_lossy(lossy_type, lossy_factor, lossy_is_int)
 
-        is_review = 0
-
-        start_time = time.time()
+        base = self._delta_base(delta_second_data)
+        delta_type = EnumDelta.NONE
+        if base is not None:
+            if not is_float:
+                raise ValueError("Delta compression supports only float data")
+            delta_type = EnumDelta.XOR if self.delta_compressed_type == EnumDelta.NONE else self.delta_compressed_type
+        self._update_header_delta(delta_type)
 
-        if self.input_format == EnumFormat.TORCH.value:
-            ba = data.numpy().tobytes()
-        elif self.input_format == EnumFormat.NUMPY.value:
-            ba = data.tobytes()
-        elif self.input_format == EnumFormat.BYTE.value:
-            ba = data
-        else:
-            raise ValueError("Unsupported input_format")
+        is_review = 0
 
-        if is_print:
-            print("torch_func", time.time() - start_time)
+        convert_stats = None if self.stats is None else {}
+        with _timed(convert_stats, "convert"):
+            if self.input_format == EnumFormat.TORCH.value and torch.is_tensor(data):
+                ba = data.numpy().tobytes()
+            elif self.input_format in (EnumFormat.TORCH.value, EnumFormat.NUMPY.value):
+                # The integers of a torch tensor were converted to a numpy array by _plan_integer
+                ba = data.tobytes()
+            elif self.input_format == EnumFormat.BYTE.value:
+                # The delta is taken in place, the bytes of the caller are kept for the next delta against them
+                ba = data if base is None else bytearray(data)
+            else:
+                raise ValueError("Unsupported input_format")
+            if base is not None:
+                if _source_len(base) != len(ba):
+                    raise ValueError("The delta base must be as long as the data")
+                base = _source_read(base, 0, len(ba))
+        if convert_stats is not None:
+            self.stats._add("compress", convert_stats, frames=0)
 
         return self.compress_bin(
             ba=ba,
@@ -755,18 +1615,65 @@ class ZipNN:
             dtype_size=dtype_size,
             shape=shape,
             skip_split=skip_split,
+            base=base,
         )
 
-    def lossy_compress(self, data, lossy_type, lossy_factor):
+    def _plan_integer(self, data, dtype_code):
         """
-        Handles lossy compression.
+        Chooses the byte grouping of integer data, the MSBytes that are zero in all the elements are truncated.
+        The signed integers are zigzagged in C (bit_reorder 4), so small negative values have zero MSBytes too.
 
         Parameters
         -------------------------------------
-        data:
-                Data to compress.
+        data: torch.Tensor or numpy array
+                The integers to compress.
+
+        dtype_code: int
+                The ZipNNDtypeEnum code of data.
+
+        Returns
+        -------------------------------------
+        The data as a contiguous numpy array, byte_reorder, bit_reorder, dtype_size and skip_split:
+        8 bit integers aren't split, 16 bit integers are split to two byte groups or truncated to the LSByte,
+        32 bit integers are split to byte groups with the zero MSBytes truncated, and 64 bit integers whose values fit in 32 bits
+        are narrowed to 32 bits and split like them (the dtype in the header stays 64 bit), otherwise they aren't split.
+        """
+        if torch.is_tensor(data):
+            data = data.numpy()
+        data = np.ascontiguousarray(data)
+        numpy_dtype = _INTEGER_DTYPES[dtype_code]
+        bit_reorder = 4 if numpy_dtype.kind == "i" else 0
+        if numpy_dtype.itemsize == 1:
+            return data, 255, 0, 32, 1
+        zeros = split_dtype.count_zero_bytes(data, numpy_dtype.itemsize, bit_reorder)
+        if numpy_dtype.itemsize == 2:
+            return data, 1 if zeros[1] == data.size else 10, bit_reorder, 16, 0
+        if numpy_dtype.itemsize == 8:
+            if any(count != data.size for count in zeros[4:]):
+                return data, 255, 0, 32, 1
+            data = data.astype(np.int32 if numpy_dtype.kind == "i" else np.uint32)
+            zeros = zeros[:4]
+        if zeros[3] != data.size:
+            byte_reorder = 220  # 8b1_10_11_100
+        elif zeros[2] != data.size:
+            byte_reorder = 41  # 8b0_01_01_001 truncate 1 byte
+        elif zeros[1] != data.size:
+            byte_reorder = 9  # 8b0_00_01_001 truncate 2 bytes
+        else:
+            byte_reorder = 1  # 8b0_00_00_001 truncate 3 bytes
+        return data, byte_reorder, bit_reorder, 32, 0
+
+    def _check_lossy(self, data, lossy_type, lossy_factor):
+        """
+        Checks that data can be compressed with lossy_type, the conversion itself is done in C with the byte grouping of every chunk
+        (see _lossy_kwargs).
 
-        lossy_type: string
+        Parameters
+        -------------------------------------
+        data: torch.Tensor
+                Torch data to compress.
+
+        lossy_type: EnumLossy
                 ZipNN attribute lossy_compressed_type.
 
         lossy_factor: int
@@ -774,49 +1681,116 @@ class ZipNN:
 
         Returns
         -------------------------------------
-        Data after lossy compression.
+        lossy_is_int - 1 if the fixed point values of 'integer' fit in the integers of the width of data, otherwise 0 and data is
+        compressed lossless.
         """
-        lossy_is_int = False
-        if lossy_type == EnumLossy.INTEGER:
-            bit_size, lossy_compressed_dtype = zipnn_get_dtype_bits(data.dtype)
-            multiplier = 2**lossy_factor
-            max_val = bit_size - 1 - lossy_factor
-            data, lossy_is_int = zipnn_multiply_if_max_below(data, max_val, multiplier, lossy_compressed_dtype)
-            self._update_header_lossy(lossy_type, lossy_factor, lossy_is_int)
-
-        elif lossy_type == EnumLossy.UNSIGN:
+        if self.input_format != EnumFormat.TORCH.value:
+            raise ValueError("When use lossy compression the input have to be torch.tensor")
+        if data.dtype not in (torch.float32, torch.bfloat16, torch.float16):
+            raise ValueError("Lossy compression supports only torch.dtype float32/bfloat16/float16")
+        if not 0 <= lossy_factor < 32:
+            raise ValueError("lossy_compressed_factor must be 0 to 31")
+        if lossy_type == EnumLossy.MANTISSA:
+            return 0
+        if lossy_type == EnumLossy.UNSIGN:
             raise ValueError('lossy_compressed_type is "unsign" -> not implemented yet')
-        else:
+        if lossy_type != EnumLossy.INTEGER:
             raise ValueError(f"Unsupported lossy_compressed_type {lossy_type}")
-
-        return data
-
-    def compress_delta(self, delta_second_data, lossy_compressed_type, lossy_compressed_factor):
+        if data.numel() == 0:
+            return 1
+        # The range is checked without a converted copy of the tensor, Inf and NaN don't fit
+        low, high = (value.item() for value in torch.aminmax(data))
+        if not (math.isfinite(low) and math.isfinite(high)):
+            return 0
+        bit_size, _ = zipnn_get_dtype_bits(data.dtype)
+        return int(max(-low, high) * 2**lossy_factor < 2 ** (bit_size - 1) - 1)
+
+    def _lossy_kwargs(self, dtype_code, header=None):
+        """
+        Returns the keyword arguments of the split_dtype functions for the lossy compression of data of dtype_code,
+        as recorded in header (default - the header of this instance). No arguments if the data is lossless.
+        """
+        header = self._header if header is None else header
+        lossy_type = header[10]
+        if lossy_type == EnumLossy.NONE.value or (lossy_type == EnumLossy.INTEGER.value and not header[12]):
+            return {}
+        kwargs = {"lossy": lossy_type, "lossy_factor": header[11]}
+        if dtype_code == ZipNNDtypeEnum.BFLOAT16.code:
+            kwargs["lossy_format"] = 1
+        elif dtype_code in (ZipNNDtypeEnum.FLOAT16.code, ZipNNDtypeEnum.HALF.code):
+            kwargs["lossy_format"] = 2
+        return kwargs
+
+    def compress_delta(self, data, delta_second_data, lossy_compressed_type=None, lossy_compressed_factor=None):
         """
-        Handles delta compression.
+        Compresses data as a delta against a base, e.g. a checkpoint against the previous checkpoint.
+        Most of the bits of the weights don't change between close checkpoints, so the delta (see delta_compressed_type)
+        is mostly zeros, and its byte groups compress much better than the data itself.
+        The delta is taken per chunk in the byte grouping, and decompression reverts it per chunk, so decompress needs
+        the same base (its delta_second_data).
 
         Parameters
         -------------------------------------
-        delta_second_data: string
-                Type of second data for the delta compression.
+        data: torch.Tensor, numpy array or bytes
+                The data to compress, of float dtype.
 
-        lossy_type: string
+        delta_second_data: torch.Tensor, numpy array, bytes, seekable binary stream or string
+                The base, of the same size and dtype as data. A string is the path of a compressed file of the base.
+
+        lossy_compressed_type: string
                 ZipNN attribute lossy_compressed_type.
+                Default is None.
 
-        lossy_factor: int
+        lossy_compressed_factor: int
                 ZipNN attribute lossy_compressed_factor.
+                Default is None.
 
         Returns
         -------------------------------------
-        Data after lossy compression.
+        The compressed data, like compress.
         """
-        raise ImportError("Not implemented Yet")
+        if delta_second_data is None:
+            raise ValueError("compress_delta needs a base (delta_second_data)")
+        return _run_steps(self._compress_steps(data, lossy_compressed_type, lossy_compressed_factor, delta_second_data))
+
+    def _delta_base(self, delta_second_data):
+        """
+        Returns the base of a delta as bytes, or as a seekable binary stream to read it chunk by chunk (see _source_read).
+        None if there is no base.
+        A string is the path of a compressed file of the base, it is decompressed without changing the state of this instance.
+        """
+        if delta_second_data is None:
+            return None
+        if isinstance(delta_second_data, (str, os.PathLike)):
+            base_zipnn = self._clone(input_format="byte", is_streaming=False, lossy_compressed_type=EnumLossy.NONE)
+            delta_second_data = base_zipnn.decompress_read_file(os.fspath(delta_second_data))
+        if isinstance(delta_second_data, torch.Tensor):
+            return delta_second_data.detach().cpu().contiguous().reshape(-1).view(torch.uint8).numpy()
+        if isinstance(delta_second_data, np.ndarray):
+            return np.ascontiguousarray(delta_second_data).reshape(-1).view(np.uint8)
+        if hasattr(delta_second_data, "seek"):
+            return delta_second_data
+        return memoryview(delta_second_data).cast("B")
+
+    def _delta_kwargs(self, base, dtype_code, delta_type=None):
+        """
+        Returns the keyword arguments of the split_dtype functions for the delta against base of data of dtype_code,
+        of delta_type (default - the type in the header). No arguments if there is no base.
+        """
+        if base is None:
+            return {}
+        kwargs = {"base": base, "delta": self._header[9] if delta_type is None else delta_type}
+        if dtype_code in (ZipNNDtypeEnum.FLOAT8_E4M3FN.code, ZipNNDtypeEnum.FLOAT8_E5M2.code):
+            kwargs["delta_size"] = 1
+        elif dtype_code not in (ZipNNDtypeEnum.FLOAT32.code, ZipNNDtypeEnum.FLOAT.code, ZipNNDtypeEnum.FLOAT64.code):
+            kwargs["delta_size"] = 2
+        return kwargs
 
     #################
     # decompression #
     #################
 
-    def decompress(self, data, decompress_cpu_gpu="cpu"):
+    def decompress(self, data, decompress_cpu_gpu="cpu", delta_second_data=None):
         """
         Decompress is the ZipNN function used for decompression.
 
@@ -830,11 +1804,23 @@ class ZipNN:
             Compression will be done by choice, in the CPU or GPU.
             Default is cpu.
 
+        delta_second_data: torch.Tensor, numpy array, bytes, seekable binary stream or string
+            The base the data was compressed as a delta against (see compress_delta), needed only for such data.
+            The base of every streaming chunk is read along with the chunk.
+            Default is None.
+
         Returns
         -------------------------------------
         Returns the output of decompress_bin or decompress_read_file (depends on the type of the data compressed),
         which will be the compressed file, in the format chosen in the ZipNN class instance configuration.
         """
+        return _run_steps(self._decompress_steps(data, delta_second_data))
+
+    def _decompress_steps(self, data, delta_second_data=None):
+        """
+        decompress as a steps generator, it yields after every streaming chunk and returns the decompressed data (see _run_steps).
+        """
+        base = self._delta_base(delta_second_data)
         mv_data = memoryview(data)
         comp_chunk_size = mv_data[13]  # 0 if no streaming > 127
         if self.input_format == EnumFormat.BYTE.value and comp_chunk_size > 127:
@@ -844,14 +1830,404 @@ class ZipNN:
 
             while offset < compressed_length:
                 header = mv_data[offset : offset + 32]
+                if zipnn_is_index_header(header):
+                    break
                 mid_chunk_len = int.from_bytes(header[24:32], byteorder="little") - 32
                 chunk = mv_data[offset : offset + mid_chunk_len + 32]
-                decompressed_chunk = self.decompress_bin(chunk)
+                decompressed_chunk = self.decompress_bin(chunk, base=self._frame_base(base, header, len(decompressed_buffer)))
                 if decompressed_chunk:
                     decompressed_buffer.extend(decompressed_chunk)
                 offset += mid_chunk_len + 32
+                yield
             return decompressed_buffer
-        return self.decompress_bin(data)
+        return self.decompress_bin(data, base=base)
+
+    def _frame_base(self, base, header, offset):
+        """
+        Returns the delta base of a streaming frame (by the original length in its header) that starts at offset, or None.
+        """
+        if base is None or not header[9]:
+            return None
+        return _source_read(base, offset, int.from_bytes(header[16:24], byteorder="little"))
+
+    def decompress_into(self, data, out, delta_second_data=None):
+        """
+        Decompresses data directly into a pre-allocated buffer, so the decompressed data isn't allocated and copied.
+
+        Parameters
+        -------------------------------------
+        data: byte
+                The compressed data, a single chunk or a stream of chunks.
+
+        out: bytearray, numpy.ndarray, torch.Tensor or any writable buffer
+                The buffer to write the decompressed bytes to, it must be contiguous and at least as large as the decompressed data.
+                A torch.Tensor must be on the CPU (it may be pinned).
+
+        delta_second_data: torch.Tensor, numpy array, bytes, seekable binary stream or string
+                The base the data was compressed as a delta against, see decompress.
+                Default is None.
+
+        Returns
+        -------------------------------------
+        The number of bytes written to out.
+        """
+        base = self._delta_base(delta_second_data)
+        dst = _writable_view(out)
+        mv_data = memoryview(data)
+        comp_chunk_size = mv_data[13]  # 0 if no streaming > 127
+        if self.input_format == EnumFormat.BYTE.value and comp_chunk_size > 127:
+            offset = 0
+            written = 0
+            while offset < len(mv_data):
+                header = mv_data[offset : offset + 32]
+                if zipnn_is_index_header(header):
+                    break
+                chunk_len = int.from_bytes(header[24:32], byteorder="little")
+                chunk_base = self._frame_base(base, header, written)
+                written += self._decompress_chunk_into(mv_data[offset : offset + chunk_len], dst[written:], chunk_base)
+                offset += chunk_len
+            return written
+        return self._decompress_chunk_into(mv_data, dst, base)
+
+    def _decompress_chunk_into(self, data, dst, base=None):
+        """
+        Decompresses a single chunk into the byte memoryview dst, and returns the number of bytes written.
+        The byte groups are combined directly into dst, other layouts are decompressed and copied.
+        """
+        result = self.decompress_bin(data, out=dst, base=base)
+        if isinstance(result, int):
+            return result
+        if isinstance(result, torch.Tensor):
+            # An empty tensor may have any strides, it can't be viewed as bytes
+            result = result.reshape(-1).view(torch.uint8).numpy() if result.numel() else b""
+        src = memoryview(result).cast("B")
+        if len(src) > len(dst):
+            raise ValueError("The output buffer is smaller than the decompressed data")
+        dst[: len(src)] = src
+        return len(src)
+
+    def decompress_stream(self, in_stream, out_stream, delta_second_data=None):
+        """
+        Decompresses a stream of compressed chunks chunk by chunk, with bounded memory.
+        Reads the 32 bytes header of every chunk, reads the rest of the chunk, decompresses it and writes it to out_stream,
+        so only one chunk is held in memory.
+
+        Parameters
+        -------------------------------------
+        in_stream: file-like object
+                Binary stream to read the compressed chunks from (supports read or readinto).
+
+        out_stream: file-like object
+                Binary stream to write the decompressed data to.
+
+        delta_second_data: seekable binary stream, bytes or string
+                The base the stream was compressed as a delta against (see compress_stream),
+                the base of every chunk is read along with the chunk.
+                Default is None.
+
+        Returns
+        -------------------------------------
+        A tuple of the number of bytes read and the number of bytes written.
+        """
+        return _run_steps(self._decompress_stream_steps(in_stream, out_stream, delta_second_data))
+
+    def _decompress_stream_steps(self, in_stream, out_stream, delta_second_data=None):
+        """
+        decompress_stream as a steps generator, it yields after every chunk (see _run_steps).
+        """
+        base = self._delta_base(delta_second_data)
+        buf = bytearray(self.header_length)
+        compressed_size = 0
+        decompressed_size = 0
+        while True:
+            header_size = _read_full(in_stream, memoryview(buf)[: self.header_length])
+            if header_size == 0:
+                break
+            if header_size < self.header_length:
+                raise ValueError("The compressed stream is truncated")
+            if zipnn_is_index_header(buf):
+                break
+            if compressed_size == 0 and zipnn_is_safetensors_header(buf):
+                in_stream.seek(-header_size, os.SEEK_CUR)
+                return (yield from self._decompress_safetensors_steps(in_stream, out_stream))
+            chunk_len = int.from_bytes(buf[24:32], byteorder="little")
+            if chunk_len < self.header_length:
+                raise ValueError("The compressed stream is corrupted")
+            if len(buf) < chunk_len:
+                buf.extend(bytes(chunk_len - len(buf)))
+            chunk = memoryview(buf)[:chunk_len]
+            if _read_full(in_stream, chunk[self.header_length :]) < chunk_len - self.header_length:
+                raise ValueError("The compressed stream is truncated")
+            decompressed_chunk = self.decompress_bin(chunk, base=self._frame_base(base, chunk, decompressed_size))
+            out_stream.write(decompressed_chunk)
+            compressed_size += chunk_len
+            decompressed_size += len(decompressed_chunk)
+            del chunk, decompressed_chunk
+            yield
+        return compressed_size, decompressed_size
+
+    def decompress_file(self, compressed_file=None, decompressed_file=None, delta_second_data=None):
+        """
+        Decompresses a compressed file to a file with bounded memory, see decompress_stream.
+
+        Parameters
+        -------------------------------------
+        compressed_file: string
+                Path to the compressed file.
+                Default is the compressed_file of the ZipNN instance.
+
+        decompressed_file: string
+                Path to the decompressed file.
+                Default is the decompressed_file of the ZipNN instance.
+
+        delta_second_data: seekable binary stream, bytes or string
+                The base the file was compressed as a delta against, see decompress_stream.
+                Default is None.
+
+        Returns
+        -------------------------------------
+        A tuple of the compressed size and the decompressed size.
+        """
+        compressed_file = self.use_var(compressed_file, self.compressed_file)
+        decompressed_file = self.use_var(decompressed_file, self.decompressed_file)
+        if not os.path.exists(compressed_file):
+            raise FileNotFoundError(f"The file at {compressed_file} was not found.")
+        with open(compressed_file, "rb") as in_file_handler, open(decompressed_file, "wb") as out_file_handler:
+            return self.decompress_stream(in_file_handler, out_file_handler, delta_second_data)
+
+    def decompress_safetensors(self, in_stream, out_stream):
+        """
+        Decompresses a compressed safetensors file (see compress_safetensors) frame by frame.
+
+        Parameters
+        -------------------------------------
+        in_stream: file-like object
+                Seekable binary stream of the compressed file.
+
+        out_stream: file-like object
+                Binary stream to write the safetensors file to.
+
+        Returns
+        -------------------------------------
+        A tuple of the compressed size and the decompressed size.
+        """
+        return _run_steps(self._decompress_safetensors_steps(in_stream, out_stream))
+
+    def _decompress_safetensors_steps(self, in_stream, out_stream):
+        """
+        decompress_safetensors as a steps generator, it yields after every frame (see _run_steps).
+        """
+        start = in_stream.tell()
+        st_header, frames, _, original_len = self._read_safetensors_index(in_stream, start)
+        out_stream.write(st_header)
+        decompressed_size = len(st_header)
+        for frame in frames:
+            data = self._decompress_safetensors_frame(in_stream, frame, start)
+            out_stream.write(data)
+            decompressed_size += len(data)
+            yield
+        if decompressed_size != original_len:
+            raise ValueError("The compressed safetensors file is corrupted")
+        return _source_len(in_stream) - start, decompressed_size
+
+    def read_safetensors_index(self, source):
+        """
+        Reads the safetensors header and the index of a compressed safetensors file.
+
+        Parameters
+        -------------------------------------
+        source: string, seekable file-like object or bytes-like object
+                The compressed safetensors file, a path is memory mapped.
+
+        Returns
+        -------------------------------------
+        A tuple of the raw safetensors header (bytes), the frames, the tensors (see zipnn_pack_safetensors_index)
+        and the size of the safetensors file.
+        """
+        if isinstance(source, (str, os.PathLike)):
+            with _mmap_file(source) as mv:
+                return self._read_safetensors_index(mv, 0)
+        return self._read_safetensors_index(source, 0)
+
+    def _read_safetensors_index(self, source, start):
+        """
+        read_safetensors_index of a compressed safetensors file that starts at offset start of source.
+        """
+        source_len = _source_len(source) - start
+        header = _source_read(source, start, ZIPNN_SAFETENSORS_HEADER_LEN)
+        if len(header) < ZIPNN_SAFETENSORS_HEADER_LEN:
+            raise ValueError("The compressed safetensors file is truncated")
+        st_header_len = zipnn_unpack_safetensors_header(header)
+        st_header = bytes(_source_read(source, start + ZIPNN_SAFETENSORS_HEADER_LEN, st_header_len))
+        index_len = zipnn_unpack_safetensors_trailer(
+            _source_read(source, start + source_len - ZIPNN_SAFETENSORS_TRAILER_LEN, ZIPNN_SAFETENSORS_TRAILER_LEN)
+        )
+        index_offset = source_len - ZIPNN_SAFETENSORS_TRAILER_LEN - index_len
+        if len(st_header) < st_header_len or index_offset < ZIPNN_SAFETENSORS_HEADER_LEN + st_header_len:
+            raise ValueError("The compressed safetensors file is corrupted")
+        frames, tensors, original_len = zipnn_unpack_safetensors_index(_source_read(source, start + index_offset, index_len))
+        return st_header, frames, tensors, original_len
+
+    def _decompress_safetensors_frame(self, source, frame, start=0):
+        """
+        Decompresses a frame of a compressed safetensors file that starts at offset start of source.
+        """
+        codec, comp_offset, comp_len, _, data_len = frame
+        data = _source_read(source, start + comp_offset, comp_len)
+        if len(data) < comp_len:
+            raise ValueError("The compressed safetensors file is truncated")
+        return self._decompress_typed_frame(codec, data, data_len)
+
+    def decompress_state_dict(self, data):
+        """
+        Decompresses a state_dict compressed with compress_state_dict, the frames of all the tensors are decompressed
+        in parallel on the thread pool, directly into the tensors.
+
+        Parameters
+        -------------------------------------
+        data: byte
+                The compressed state_dict.
+
+        Returns
+        -------------------------------------
+        A dict of name -> torch.Tensor, in the order of the compressed state_dict.
+        """
+        return dict(self.iter_decompress_state_dict(data))
+
+    def iter_decompress_state_dict(self, data):
+        """
+        Decompresses a state_dict compressed with compress_state_dict, and yields every tensor as soon as it is ready.
+
+        Parameters
+        -------------------------------------
+        data: byte
+                The compressed state_dict.
+
+        Returns
+        -------------------------------------
+        Yields the name and the torch.Tensor of every tensor, in the order of the compressed state_dict.
+        """
+        mv = memoryview(data)
+        table, frames_offset = zipnn_unpack_state_dict_header(mv)
+        tensors = []
+        jobs = []
+        for name, (dtype, shape, frames) in table.items():
+            tensor = torch.empty(shape, dtype=getattr(torch, dtype))
+            dst = _writable_view(tensor)
+            original_offset = 0
+            for codec, offset, comp_len, original_len in frames:
+                frame = mv[frames_offset + offset : frames_offset + offset + comp_len]
+                if len(frame) < comp_len:
+                    raise ValueError("The compressed state_dict is truncated")
+                jobs.append((codec, frame, dst[original_offset : original_offset + original_len]))
+                original_offset += original_len
+            if original_offset != len(dst):
+                raise ValueError("The compressed state_dict is corrupted")
+            tensors.append((name, tensor, len(frames)))
+
+        def decompress_job(job):
+            codec, frame, dst = job
+            if codec == EnumCodec.ZIPNN.value:
+                written = self._byte_zipnn(threads=1).decompress_into(frame, dst)
+            else:
+                ba_decom = self._decompress_typed_frame(codec, frame, len(dst))
+                dst[:] = ba_decom
+                written = len(ba_decom)
+            if written != len(dst):
+                raise ValueError("The compressed state_dict is corrupted")
+
+        results = iter(self._map_jobs(decompress_job, jobs))
+        for name, tensor, num_frames in tensors:
+            for _ in range(num_frames):
+                next(results)
+            yield name, tensor
+
+    def read_index(self, source):
+        """
+        Reads the offsets of the compressed chunks of a stream.
+        Uses the index block if the stream has one, otherwise walks over the chunk headers.
+
+        Parameters
+        -------------------------------------
+        source: string, seekable file-like object or bytes-like object
+                The compressed stream, a path is memory mapped.
+
+        Returns
+        -------------------------------------
+        A list of (compressed offset, original offset) of every chunk, and the total original size.
+        """
+        if isinstance(source, (str, os.PathLike)):
+            with _mmap_file(source) as mv:
+                return self.read_index(mv)
+
+        source_len = _source_len(source)
+        if source_len >= ZIPNN_INDEX_TRAILER_LEN:
+            index_len = zipnn_unpack_index_trailer(_source_read(source, source_len - ZIPNN_INDEX_TRAILER_LEN, ZIPNN_INDEX_TRAILER_LEN))
+            if 0 < index_len <= source_len:
+                return zipnn_unpack_index(_source_read(source, source_len - index_len, index_len))
+
+        entries = []
+        offset = 0
+        original_offset = 0
+        while offset + self.header_length <= source_len:
+            header = _source_read(source, offset, self.header_length)
+            if zipnn_is_index_header(header):
+                break
+            if header[0:2].tobytes() != b"ZN":
+                raise ValueError("Header should start with ZN")
+            chunk_len = int.from_bytes(header[24:32], byteorder="little")
+            entries.append((offset, original_offset))
+            if tuple(header[2:5]) < (0, 3, 3) and header[15] in (ZipNNDtypeEnum.FLOAT32.code, ZipNNDtypeEnum.FLOAT.code):
+                # Before 0.3.3 the original size of float32 wasn't saved in the header
+                original_offset += len(self.decompress_bin(_source_read(source, offset, chunk_len)))
+            else:
+                original_offset += int.from_bytes(header[16:24], byteorder="little")
+            offset += chunk_len
+        return entries, original_offset
+
+    def read_range(self, source, offset, length, index=None):
+        """
+        Decompresses a range of the original data, only the chunks that cover the range are decompressed.
+
+        Parameters
+        -------------------------------------
+        source: string, seekable file-like object or bytes-like object
+                The compressed stream, a path is memory mapped.
+
+        offset: int
+                Offset of the range in the original data.
+
+        length: int
+                Length of the range, it is cut at the end of the data.
+
+        index: tuple
+                The output of read_index, to avoid reading the index again for every range.
+                Default is None.
+
+        Returns
+        -------------------------------------
+        Byte array of the range.
+        """
+        if offset < 0 or length < 0:
+            raise ValueError("offset and length must be non-negative")
+        if isinstance(source, (str, os.PathLike)):
+            with _mmap_file(source) as mv:
+                return self.read_range(mv, offset, length, index)
+        entries, original_len = index if index is not None else self.read_index(source)
+        end = min(offset + length, original_len)
+        ba_range = bytearray()
+        if offset >= end:
+            return ba_range
+
+        first = bisect.bisect_right([original_offset for _, original_offset in entries], offset) - 1
+        for comp_offset, original_offset in entries[first:]:
+            if original_offset >= end:
+                break
+            header = _source_read(source, comp_offset, self.header_length)
+            chunk = _source_read(source, comp_offset, int.from_bytes(header[24:32], byteorder="little"))
+            decompressed_chunk = self.decompress_bin(chunk)
+            ba_range += memoryview(decompressed_chunk)[max(offset - original_offset, 0) : end - original_offset]
+        return ba_range
 
     def decompress_method(self, data):
         """
@@ -874,32 +2250,141 @@ class ZipNN:
             return snappy.decompress(data)
         raise ValueError(f"Unsupported method {self.method}")
 
-    def decompress_lossy(self, tensor, original_dtype):
+    def _decompress_chunk(self, data):
+        """
+        Thread safe decompress_method for a single chunk.
+        """
+        if self.method == EnumMethod.ZSTD.value or self.method == EnumMethod.AUTO.value:
+            return self._thread_codecs().zstd_decompress.decompress(data)
+        return self.decompress_method(data)
+
+    def _decompress_codec(self, codec, data, size):
+        """
+        Thread safe decompression of a single chunk of size bytes, that was compressed with an EnumCodec of method AUTO.
+        """
+        if codec & ZIPNN_CODEC_BITSHUFFLE:
+            return split_dtype.bitunshuffle(self._decompress_codec(codec & ~ZIPNN_CODEC_BITSHUFFLE, data, size))
+        if codec == EnumCodec.HUFFMAN.value:
+            return split_dtype.huffman_decompress(data, size)
+        if codec == EnumCodec.ZSTD.value:
+            return self._thread_codecs().zstd_decompress.decompress(data)
+        if codec == EnumCodec.LZ4.value:
+            return lz4.frame.decompress(data)
+        if codec == EnumCodec.FSE.value:
+            return split_dtype.fse_decompress(data, size)
+        raise ValueError(f"Unsupported codec {codec}")
+
+    def _read_codecs(self, mv, num_groups):
+        """
+        Reads the codecs of the byte groups that method AUTO chose, from the start of mv.
+        """
+        if len(mv) < num_groups:
+            raise ValueError("The compressed data is corrupted")
+        codecs = list(mv[:num_groups])
+        for codec in codecs:
+            if codec == EnumCodec.RAW.value | ZIPNN_CODEC_BITSHUFFLE or (codec & ~ZIPNN_CODEC_BITSHUFFLE) not in (
+                EnumCodec.RAW.value,
+                EnumCodec.ZSTD.value,
+                EnumCodec.HUFFMAN.value,
+                EnumCodec.LZ4.value,
+                EnumCodec.FSE.value,
+            ):
+                raise ValueError(f"Unsupported codec {codec}")
+        if any(codec & ~ZIPNN_CODEC_BITSHUFFLE == EnumCodec.LZ4.value for codec in codecs) and not _import_lz4():
+            raise ImportError("LZ4 library is not installed. Please install it to decompress this data.")
+        return codecs
+
+    def _dtype_group_lens(self, skip_combine):
         """
-        Handles lossy decompression.
+        Returns the length of every byte group of a 32 or 64 bit dtype, according to the byte_reorder from the header.
+        """
+        if skip_combine:
+            return [self.original_len]
+        if self.dtype == ZipNNDtypeEnum.FLOAT64.code:
+            return [self.original_len // 8] * 8
+        if self._byte_reorder == 220:  # 8b1_10_11_100
+            return [self.original_len // 4] * 4
+        if self._byte_reorder == 41:  # 8b0_01_01_001
+            return [self.original_len // 4 * 3]
+        if self._byte_reorder == 9:  # 8b0_00_01_001
+            return [self.original_len // 2]
+        if self._byte_reorder == 1:  # 8b0_00_00_001
+            return [self.original_len // 4]
+        raise ValueError(f"Unsupported byte_reorder {self._byte_reorder}")
+
+    def _decompress_chunks(self, mv, group_lens, codecs=None, frame_stats=None):
+        """
+        Decompresses byte groups that were compressed with _compress_chunks, the chunks are decompressed in parallel.
 
         Parameters
         -------------------------------------
-        tensor: torch.Tensor
-                The tensor data to decompress.
+        mv: memoryview
+                The compressed data after the header.
+
+        group_lens: list of int
+                The length of every byte group.
 
-        original_dtype: string
-                Original dtype value of the tensor.
+        codecs: list of int
+                The EnumCodec of every byte group that method AUTO chose.
+                Default is None, the chunks were compressed with the method.
+
+        frame_stats: dict
+                The stats of the frame to add the entropy time and the counters of the byte groups to (see ZipNNStats).
+                Default is None.
 
         Returns
         -------------------------------------
-        Tensor data after lossy decompression.
+        A list with a bytearray for every byte group.
         """
-        if self._lossy_is_int == 0:  # no need to transfer to integer from float
-            tensor = tensor.view(original_dtype)
-            return tensor
-        # transfer from integer to float
-        bit_size, int_dtype = zipnn_get_dtype_bits(original_dtype)
-        tensor = tensor.view(int_dtype)
-        lossy_factor = self.lossy_compressed_factor
-        divisor = 2**lossy_factor
-        decompress_tensor = zipnn_divide_int(tensor, divisor)
-        return decompress_tensor
+        num_buf = len(group_lens)
+        chunk_size = self.compression_chunk // num_buf
+        num_chunks = (group_lens[0] + chunk_size - 1) // chunk_size
+        table_len = num_buf * num_chunks
+        chunks_type = mv[:table_len]
+        chunks_cumulative = np.frombuffer(mv, dtype="<u8", count=table_len, offset=table_len)
+        groups = [bytearray(group_len) for group_len in group_lens]
+        groups_mv = [memoryview(group) for group in groups]
+
+        jobs = []
+        offset = table_len * 9
+        counters = {counter: [0] * num_buf for counter in ("bytes_in", "chunks_raw")}
+        for b in range(num_buf):
+            start = 0
+            for c in range(num_chunks):
+                end = int(chunks_cumulative[b * num_chunks + c])
+                chunk = mv[offset + start : offset + end]
+                chunk_type = chunks_type[b * num_chunks + c]
+                if chunk_type == 0:
+                    groups_mv[b][c * chunk_size : c * chunk_size + len(chunk)] = chunk
+                    counters["chunks_raw"][b] += 1
+                elif chunk_type == 1 and (codecs is None or codecs[b] != EnumCodec.RAW.value):
+                    jobs.append((b, c, chunk))
+                else:
+                    raise ValueError(f"Unsupported chunk type {chunk_type}")
+                start = end
+            offset += start
+            counters["bytes_in"][b] = start
+
+        def decompress_job(job):
+            b, c, chunk = job
+            if codecs is None:
+                return self._decompress_chunk(chunk)
+            return self._decompress_codec(codecs[b], chunk, min(chunk_size, group_lens[b] - c * chunk_size))
+
+        def timed_decompress_job(job):
+            start = time.perf_counter()
+            return decompress_job(job), time.perf_counter() - start
+
+        if frame_stats is None:
+            results = self._map_jobs(decompress_job, jobs)
+        else:
+            timed_results = list(self._map_jobs(timed_decompress_job, jobs))
+            results = [ba_decom for ba_decom, _ in timed_results]
+            frame_stats["entropy"] = frame_stats.get("entropy", 0.0) + sum(seconds for _, seconds in timed_results)
+            frame_stats.update(counters, bytes_out=list(group_lens), chunks=[num_chunks] * num_buf)
+        for (b, c, _), ba_decom in zip(jobs, results):
+            groups_mv[b][c * chunk_size : c * chunk_size + len(ba_decom)] = ba_decom
+        return groups
 
     def write_bin(self, ba_decom):
         """
@@ -918,7 +2403,7 @@ class ZipNN:
             out_file_handler.write(ba_decom)
         return 0
 
-    def decompress_bin(self, ba_compress: bytes):
+    def decompress_bin(self, ba_compress: bytes, out=None, base=None):
         """
         Decompresses byte data from either a byte array or a tensor.
 
@@ -927,11 +2412,19 @@ class ZipNN:
         ba_compress: byte
                 Byte data to decompress.
 
+        out: memoryview
+                Writable byte buffer to combine the byte groups into.
+                Default is None.
+
+        base: byte
+                The base the data was compressed as a delta against, as long as the decompressed data (see _delta_base).
+                Default is None.
+
         Returns
         -------------------------------------
-        Returns a byte array of the decompressed data.
+        Returns a byte array of the decompressed data, or the number of bytes written if the byte groups were combined into out.
         """
-        is_print = 0
+        frame_stats = None if self.stats is None else {}
         after_header = self._retrieve_header(ba_compress)
 
         dtype_size = 0  # Need to implement
@@ -943,71 +2436,188 @@ class ZipNN:
                 return ba_decom
             raise ValueError(f"Unsupported Torch with byte_reorder 0b1_01_01_001 or 0b0_00_01_001")
         else:
+            float64 = 0
             float32 = 0
             bfloat16 = 0
             float16 = 0
-            uint16 = 0
-            uint32 = 0
+            float8 = 0
+            int16 = 0
+            int32 = 0
+            integer_dtype = _INTEGER_DTYPES.get(self.dtype)
             if self.dtype in (ZipNNDtypeEnum.FLOAT32.code, ZipNNDtypeEnum.FLOAT.code):
                 groups = 4
                 float32 = 1
+            elif self.dtype == ZipNNDtypeEnum.FLOAT64.code:
+                groups = 8
+                float64 = 1
             elif self.dtype == ZipNNDtypeEnum.BFLOAT16.code:
                 groups = 2
                 bfloat16 = 1
             elif self.dtype in (ZipNNDtypeEnum.FLOAT16.code, ZipNNDtypeEnum.HALF.code):
                 groups = 2
                 float16 = 1
-            elif self.dtype == ZipNNDtypeEnum.UINT32.code:
-                groups = 1
-                uint32 = 1
+            elif self.dtype in (ZipNNDtypeEnum.FLOAT8_E4M3FN.code, ZipNNDtypeEnum.FLOAT8_E5M2.code):
+                groups = 2
+                float8 = 1
+            elif integer_dtype is not None:
+                groups = 4
+                if integer_dtype.itemsize == 2:
+                    int16 = 1
+                else:
+                    int32 = 1
             else:
                 raise ValueError(f"Unsupported Dtype {self.dtype}")
 
             skip_combine = 0
-            if self.input_format == EnumFormat.NUMPY.value and (self._byte_reorder in (9, 255)):
+            # 64 bit integers that fit in 32 bits were narrowed (see _plan_integer)
+            narrowed = integer_dtype is not None and integer_dtype.itemsize == 8 and self._byte_reorder != 255
+            if (self.version_major, self.version_minor, self.version_tiny) < (0, 3, 3):
+                # Before 0.3.3 only uint32 of NumPy were supported, truncating 2 bytes was a cast to uint16
+                groups = 1 if int32 else groups
+                if self.input_format == EnumFormat.NUMPY.value and (self._byte_reorder in (9, 255)):
+                    skip_combine = 1
+            elif integer_dtype is not None and self._byte_reorder == 255:
                 skip_combine = 1
+            out_args = () if out is None or narrowed else (out,)
+            # An odd length (of float8) was padded with a zero byte, it is combined and trimmed
+            combine_len = self.original_len + self.original_len % 2
+            if combine_len != self.original_len:
+                out_args = ()
+
+            combine_kwargs = {}
+            if self._delta_type != EnumDelta.NONE.value:
+                if base is None:
+                    raise ValueError("The data was compressed as a delta, decompress it with its base (delta_second_data)")
+                if _source_len(base) != self.original_len:
+                    raise ValueError("The delta base must be as long as the data")
+                base = _source_read(base, 0, self.original_len)
+                if combine_len != self.original_len:
+                    base = bytes(base) + b"\x00"
+                combine_kwargs = self._delta_kwargs(base, self.dtype, self._delta_type)
+            # The lossy conversion is reverted in C after the delta
+            combine_kwargs.update(self._lossy_kwargs(self.dtype, memoryview(ba_compress)[: self.header_length]))
+
+            # With method AUTO, the codec of every byte group is after the header
+            codecs = None
+            if self.method == EnumMethod.AUTO.value and (self.version_major, self.version_minor, self.version_tiny) >= (0, 3, 3):
+                if bfloat16 or float16 or float8 or int16:
+                    num_groups = 2 if self._byte_reorder == 10 else 1
+                else:
+                    num_groups = len(self._dtype_group_lens(skip_combine))
+                codecs = self._read_codecs(memoryview(ba_compress)[after_header:], num_groups)
+                after_header += num_groups
 
             ba_bg = []
             start_len = after_header + groups
             start_ba = [start_len + 8 * groups]
             end_ba = []
-            if skip_combine == 0:
-                if float32 or uint32:
+            if float64 or float32 or int32:
+                if (self.version_major, self.version_minor, self.version_tiny) < (0, 3, 3):
+                    # Before 0.3.3 every byte group was compressed as a single buffer
                     for i in range(groups):
-                        btime = time.time()
                         mv = memoryview(ba_compress)
                         is_comp = int.from_bytes(mv[after_header + i : after_header + i + 1], byteorder="little")
                         end_ba.append(int.from_bytes(mv[start_len + i * 8 : start_len + (i + 1) * 8 - 1], byteorder="little") + start_ba[i])
                         start_ba.append(end_ba[i])
                         if is_comp == 1:
-                            ba_bg.append(self.decompress_method(ba_compress[start_ba[i] : end_ba[i]]))
+                            with _timed(frame_stats, "entropy"):
+                                ba_bg.append(self.decompress_method(ba_compress[start_ba[i] : end_ba[i]]))
                         else:
                             ba_bg.append(mv[start_ba[i] : end_ba[i]])
-                        if is_print:
-                            print(f"the time of this byte is: {time.time()-btime}")
+                else:
+                    ba_bg = self._decompress_chunks(
+                        memoryview(ba_compress)[after_header:], self._dtype_group_lens(skip_combine), codecs, frame_stats
+                    )
 
-                    if float32:
-                        ba_decom = split_dtype.combine_dtype32(
-                            ba_bg[0], ba_bg[1], ba_bg[2], ba_bg[3], self._bit_reorder, self._byte_reorder, self.threads
+            if skip_combine == 0:
+                if float64:
+                    ba_decom = split_dtype.combine_dtype64(
+                        *ba_bg,
+                        self._bit_reorder,
+                        self._byte_reorder,
+                        self.threads,
+                        *out_args,
+                        stats=frame_stats,
+                        **combine_kwargs,
+                    )
+                elif float32 or int32:
+                    # The truncated byte groups are empty
+                    ba_bg = list(ba_bg) + [bytearray(0)] * (4 - len(ba_bg))
+                    ba_decom = split_dtype.combine_dtype32(
+                        ba_bg[0],
+                        ba_bg[1],
+                        ba_bg[2],
+                        ba_bg[3],
+                        self._bit_reorder,
+                        self._byte_reorder,
+                        self.threads,
+                        *out_args,
+                        stats=frame_stats,
+                        **combine_kwargs,
+                    )
+                elif bfloat16 or float16 or float8 or int16:
+                    mv = memoryview(ba_compress)
+                    if codecs is None or all(codec in _DTYPE16_CODECS for codec in codecs):
+                        ba_decom = split_dtype.combine_dtype16(
+                            mv[after_header:],
+                            self._bit_reorder,
+                            self._byte_reorder,
+                            self.compression_chunk,
+                            combine_len,
+                            self.threads,
+                            *out_args,
+                            stats=frame_stats,
+                            **combine_kwargs,
                         )
-                    else:  # uint32_t
-                        mv = memoryview(ba_compress)
-                        ba_decom = split_dtype.combine_dtype32(
-                            ba_bg[0], bytearray(0), bytearray(0), bytearray(0), self._bit_reorder, self._byte_reorder, self.threads
+                    else:
+                        ba_bg = self._decompress_chunks(mv[after_header:], [combine_len // 2] * len(codecs), codecs, frame_stats)
+                        ba_decom = split_dtype.combine_groups16(
+                            ba_bg[0],
+                            ba_bg[1] if len(ba_bg) > 1 else b"",
+                            self._bit_reorder,
+                            self._byte_reorder,
+                            self.threads,
+                            *out_args,
+                            stats=frame_stats,
+                            **combine_kwargs,
                         )
-                elif bfloat16 or float16:
-                    mv = memoryview(ba_compress)
-                    ba_decom = split_dtype.combine_dtype16(
-                        mv[after_header:], self._bit_reorder, self._byte_reorder, self.compression_chunk, self.original_len, self.threads
-                    )
             else:
                 ba_decom = ba_bg[0]
 
+            if combine_len != self.original_len:
+                del ba_decom[self.original_len :]
+                if out is not None:
+                    out[: self.original_len] = ba_decom
+                    ba_decom = self.original_len
+
+            if frame_stats is not None:
+                self.stats._add("decompress", frame_stats, len(ba_compress), self.original_len)
+
+            if out is not None and isinstance(ba_decom, int):
+                return ba_decom
+
             if self.input_format == EnumFormat.BYTE.value:
                 return ba_decom
 
+            if integer_dtype is not None:
+                if self.input_format == EnumFormat.NUMPY.value and self._byte_reorder == 9 and skip_combine:
+                    # Before 0.3.3 uint32 was truncated to 2 bytes by a cast to uint16
+                    array = np.frombuffer(ba_decom, dtype=np.uint16).astype(np.uint32)
+                elif narrowed:
+                    array = np.frombuffer(ba_decom, dtype=np.int32 if integer_dtype.kind == "i" else np.uint32).astype(integer_dtype)
+                else:
+                    array = np.frombuffer(ba_decom, dtype=integer_dtype)
+                array = array.reshape(self.shape_bytes)
+                if self.input_format == EnumFormat.TORCH.value:
+                    return torch.from_numpy(array)
+                return array
+
             if self.input_format == EnumFormat.TORCH.value:
-                if float32:
+                if float64:
+                    array = np.frombuffer(ba_decom, dtype=np.float64)
+                    array = array.reshape(self.shape_bytes)
+                    tensor = torch.from_numpy(array)
+                elif float32:
                     array = np.frombuffer(ba_decom, dtype=np.float32)
                     array = array.reshape(self.shape_bytes)
                     tensor = torch.from_numpy(array)
@@ -1016,23 +2626,24 @@ class ZipNN:
                     array = array.reshape(self.shape_bytes)
                     tensor = torch.from_numpy(array)
                     tensor = tensor.view(torch.bfloat16)
+                elif float8:
+                    array = np.frombuffer(ba_decom, dtype=np.uint8)
+                    array = array.reshape(self.shape_bytes)
+                    tensor = torch.from_numpy(array)
+                    tensor = tensor.view(torch.float8_e4m3fn if self.dtype == ZipNNDtypeEnum.FLOAT8_E4M3FN.code else torch.float8_e5m2)
                 elif float16:
                     array = np.frombuffer(ba_decom, dtype=np.float16)
                     array = array.reshape(self.shape_bytes)
-                    tensor = torch.tensor(array, dtype=torch.float16)
+                    tensor = torch.from_numpy(array)
                 return tensor
 
             if self.input_format == EnumFormat.NUMPY.value:
-                if float32:
+                if float64:
+                    array = np.frombuffer(ba_decom, dtype=np.float64)
+                elif float32:
                     array = np.frombuffer(ba_decom, dtype=np.float32)
                 elif float16:
                     array = np.frombuffer(ba_decom, dtype=np.float16)
-                elif uint32:
-                    if self._byte_reorder == 9:  # Truncate MSB, mid-high
-                        array_uint16 = np.frombuffer(ba_decom, dtype=np.uint16)
-                        array = array_uint16.astype(np.uint32)
-                    else:
-                        array = np.frombuffer(ba_decom, dtype=np.uint32)
                 array = array.reshape(self.shape_bytes)
                 return array
 
@@ -1041,6 +2652,7 @@ class ZipNN:
     def decompress_read_file(self, data):
         """
         Decompresses data from file.
+        The file is memory mapped and decompressed from the page cache without copying it to memory first.
 
         Parameters
         -------------------------------------
@@ -1054,10 +2666,88 @@ class ZipNN:
         filename = self.use_var(data, self.compressed_file)
         if not os.path.exists(filename):
             raise FileNotFoundError(f"The file at {filename} was not found.")
-        with open(filename, "rb") as in_file_handler:
-            ba = in_file_handler.read()
-        return self.decompress_bin(ba)
+        with _mmap_file(filename) as mv:
+            return self.decompress(mv)
+
+    #############
+    ## asyncio ##
+    #############
+
+    def _get_async_executor(self):
+        """
+        Returns the executor of the async API, it is created on first use.
+        It has a single thread, so the steps of the async calls of this instance never run concurrently,
+        while the chunks are still compressed on the thread pool of the instance (see threads).
+        """
+        if self._async_executor is None:
+            self._async_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="zipnn-async")
+        return self._async_executor
 
+    async def _run_steps_async(self, steps):
+        """
+        Runs a steps generator (see _run_steps) one chunk at a time on the async executor, so the event loop isn't blocked.
+        If the task is cancelled, the generator is closed after the chunk it is running, and no more chunks are processed.
+        The cancellation is raised only after the generator is closed, so the caller may close the streams it reads and writes.
+        """
+        loop = asyncio.get_running_loop()
+        executor = self._get_async_executor()
+        try:
+            while True:
+                done, value = await loop.run_in_executor(executor, _next_step, steps)
+                if done:
+                    return value
+        except BaseException:
+            # The current step may still be running, the executor closes the generator after it
+            closed = asyncio.wrap_future(executor.submit(steps.close))
+            while not closed.done():
+                # Waits even if the task is cancelled again, the original exception is raised after it
+                with contextlib.suppress(asyncio.CancelledError):
+                    await asyncio.wait({closed})
+            raise
+
+    async def compress_async(self, data, lossy_compressed_type=None, lossy_compressed_factor=None, delta_second_data=None):
+        """
+        Async version of compress, the compression runs on an executor and can be cancelled between streaming chunks.
+        """
+        return await self._run_steps_async(self._compress_steps(data, lossy_compressed_type, lossy_compressed_factor, delta_second_data))
 
-#    def decompress_delta(self, base_path, delta_file):
-#        return 0
+    async def decompress_async(self, data, delta_second_data=None):
+        """
+        Async version of decompress, the decompression runs on an executor and can be cancelled between streaming chunks.
+        """
+        return await self._run_steps_async(self._decompress_steps(data, delta_second_data))
+
+    async def compress_stream_async(self, in_stream, out_stream, index=False, delta_second_data=None):
+        """
+        Async version of compress_stream, the streams are read and written on an executor and it can be cancelled between chunks.
+        """
+        return await self._run_steps_async(self._compress_stream_steps(in_stream, out_stream, index, delta_second_data))
+
+    async def decompress_stream_async(self, in_stream, out_stream, delta_second_data=None):
+        """
+        Async version of decompress_stream, the streams are read and written on an executor and it can be cancelled between chunks.
+        """
+        return await self._run_steps_async(self._decompress_stream_steps(in_stream, out_stream, delta_second_data))
+
+    async def compress_file_async(self, input_file=None, compressed_file=None, index=False, delta_second_data=None):
+        """
+        Async version of compress_file.
+        """
+        input_file = self.use_var(input_file, self.input_file)
+        compressed_file = self.use_var(compressed_file, self.compressed_file)
+        if not os.path.exists(input_file):
+            raise FileNotFoundError(f"The file at {input_file} was not found.")
+        self._check_file_elements(input_file)
+        with open(input_file, "rb") as in_file_handler, open(compressed_file, "wb") as out_file_handler:
+            return await self.compress_stream_async(in_file_handler, out_file_handler, index=index, delta_second_data=delta_second_data)
+
+    async def decompress_file_async(self, compressed_file=None, decompressed_file=None, delta_second_data=None):
+        """
+        Async version of decompress_file.
+        """
+        compressed_file = self.use_var(compressed_file, self.compressed_file)
+        decompressed_file = self.use_var(decompressed_file, self.decompressed_file)
+        if not os.path.exists(compressed_file):
+            raise FileNotFoundError(f"The file at {compressed_file} was not found.")
+        with open(compressed_file, "rb") as in_file_handler, open(decompressed_file, "wb") as out_file_handler:
+            return await self.decompress_stream_async(in_file_handler, out_file_handler, delta_second_data)
@@ -0,0 +1,208 @@
+import bisect
+import contextlib
+import json
+import threading
+from collections import OrderedDict
+import torch
+from zipnn.zipnn import ZipNN, _mmap_file
+from zipnn.util_safetensors import zipnn_parse_safetensors_header
+
+# safetensors dtype -> torch dtype
+ZIPNN_SAFETENSORS_TORCH_DTYPES = {
+    "BOOL": torch.bool,
+    "U8": torch.uint8,
+    "I8": torch.int8,
+    "I16": torch.int16,
+    "I32": torch.int32,
+    "I64": torch.int64,
+    "F16": torch.float16,
+    "BF16": torch.bfloat16,
+    "F32": torch.float32,
+    "F64": torch.float64,
+    "F8_E4M3": torch.float8_e4m3fn,
+    "F8_E5M2": torch.float8_e5m2,
+}
+
+
+def safe_open(filename, framework="pt", device="cpu", cache_size=16):
+    """
+    Opens a compressed safetensors file (see ZipNN.compress_safetensors) for lazy loading of tensors,
+    like safetensors.safe_open.
+
+    Parameters
+    -------------------------------------
+    filename: string
+            Path to the compressed safetensors file, the file is memory mapped.
+
+    framework: string
+            Only 'pt' is supported.
+            Default is 'pt'.
+
+    device: string
+            The device of the returned tensors.
+            Default is 'cpu'.
+
+    cache_size: int
+            Number of decompressed frames to keep in the LRU cache.
+            Default is 16.
+
+    Returns
+    -------------------------------------
+    ZipNNSafeOpen instance, it can be used as a context manager.
+    """
+    return ZipNNSafeOpen(filename, framework, device, cache_size)
+
+
+class ZipNNSafeOpen:
+    """
+    Lazy loader of a compressed safetensors file, only the frames that back the requested tensors are decompressed.
+    """
+
+    def __init__(self, filename, framework="pt", device="cpu", cache_size=16):
+        if framework not in ("pt", "torch"):
+            raise ValueError(f"Unsupported framework {framework}")
+        self.device = device
+        self.cache_size = cache_size
+        self._zpn = ZipNN()
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._exit_stack = contextlib.ExitStack()
+        self._mv = self._exit_stack.enter_context(_mmap_file(filename))
+        try:
+            st_header, self._frames, self._tensors_frames, _ = self._zpn.read_safetensors_index(self._mv)
+        except Exception:
+            self.close()
+            raise
+        self._metadata = json.loads(st_header[8:]).get("__metadata__")
+        self._tensors = zipnn_parse_safetensors_header(st_header)
+        self._frames_starts = [frame[3] for frame in self._frames]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """
+        Releases the cache and unmaps the file.
+        """
+        self._cache.clear()
+        self._mv = None
+        self._exit_stack.close()
+
+    def keys(self):
+        """
+        Returns the names of the tensors, in the order of the safetensors header.
+        """
+        return list(self._tensors)
+
+    def metadata(self):
+        """
+        Returns the __metadata__ of the safetensors header, or None.
+        """
+        return self._metadata
+
+    def get_tensor(self, name):
+        """
+        Decompresses a single tensor.
+        """
+        return ZipNNSafeSlice(self, name)[...]
+
+    def get_slice(self, name):
+        """
+        Returns a ZipNNSafeSlice of a tensor, indexing it decompresses only the rows of the index.
+        """
+        return ZipNNSafeSlice(self, name)
+
+    def _frame(self, frame_id):
+        """
+        Returns a decompressed frame, from the LRU cache if it is there.
+        """
+        with self._lock:
+            if frame_id in self._cache:
+                self._cache.move_to_end(frame_id)
+                return self._cache[frame_id]
+            ba_decom = self._zpn._decompress_safetensors_frame(self._mv, self._frames[frame_id])
+            if self.cache_size > 0:
+                self._cache[frame_id] = ba_decom
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+            return ba_decom
+
+    def _read(self, name, begin, end):
+        """
+        Returns the bytes [begin, end) of the data section of a tensor, decompressing only the frames that cover them.
+        """
+        first, num_frames = self._tensors_frames[name]
+        ba = bytearray(end - begin)
+        if begin >= end:
+            return ba
+        last = first + num_frames
+        first = max(first, bisect.bisect_right(self._frames_starts, begin) - 1)
+        for frame_id in range(first, last):
+            _, _, _, frame_begin, frame_len = self._frames[frame_id]
+            if frame_begin >= end:
+                break
+            start = max(begin, frame_begin)
+            stop = min(end, frame_begin + frame_len)
+            if start < stop:
+                ba[start - begin : stop - begin] = memoryview(self._frame(frame_id))[start - frame_begin : stop - frame_begin]
+        return ba
+
+
+class ZipNNSafeSlice:
+    """
+    A tensor of a compressed safetensors file, indexing the first dimension decompresses only the frames of these rows.
+    """
+
+    def __init__(self, safe_file, name):
+        if name not in safe_file._tensors:
+            raise KeyError(f"The tensor {name} was not found")
+        self._safe_file = safe_file
+        self._name = name
+        dtype, self._shape, self._begin, self._end = safe_file._tensors[name]
+        if dtype not in ZIPNN_SAFETENSORS_TORCH_DTYPES:
+            raise ValueError(f"Unsupported dtype {dtype}")
+        self._dtype = dtype
+
+    def get_shape(self):
+        return list(self._shape)
+
+    def get_dtype(self):
+        return self._dtype
+
+    def __getitem__(self, index):
+        if not isinstance(index, tuple):
+            index = (index,)
+        start, stop = 0, self._shape[0] if self._shape else 0
+        rows = index[0] if index else Ellipsis
+        if self._shape and isinstance(rows, slice) and (rows.step is None or rows.step > 0):
+            # Decompress only the rows of the slice
+            start, stop, step = rows.indices(self._shape[0])
+            stop = max(start, stop)
+            index = (slice(None, None, step),) + index[1:]
+        elif self._shape and isinstance(rows, int):
+            start = rows + self._shape[0] if rows < 0 else rows
+            if not 0 <= start < self._shape[0]:
+                raise IndexError(f"Index {rows} is out of bounds for dimension 0 with size {self._shape[0]}")
+            stop = start + 1
+            index = (0,) + index[1:]
+        return self._load_rows(start, stop)[index].to(self._safe_file.device)
+
+    def _load_rows(self, start, stop):
+        """
+        Decompresses the rows [start, stop) of the tensor, a tensor without dimensions is decompressed whole.
+        """
+        dtype = ZIPNN_SAFETENSORS_TORCH_DTYPES[self._dtype]
+        if self._shape:
+            row_len = (self._end - self._begin) // self._shape[0] if self._shape[0] else 0
+            shape = [stop - start] + list(self._shape[1:])
+            begin, end = self._begin + start * row_len, self._begin + stop * row_len
+        else:
+            shape = []
+            begin, end = self._begin, self._end
+        ba = self._safe_file._read(self._name, begin, end)
+        if len(ba) == 0:
+            return torch.empty(shape, dtype=dtype)
+        return torch.frombuffer(ba, dtype=dtype).reshape(shape)